@@ -11,7 +11,9 @@ For simple requests of finite time windows see
 data streams see
 :class:`~obspy.clients.seedlink.easyseedlink.EasySeedLinkClient`, or for
 lower-level packet handling see
-:class:`~obspy.clients.seedlink.slclient.SLClient`.
+:class:`~obspy.clients.seedlink.slclient.SLClient`. Many servers and stations
+can be handled on one :mod:`asyncio` event loop with
+:class:`~obspy.clients.seedlink.asyncseedlink.AsyncSeedLinkClient`.
 
 :copyright:
     The ObsPy Development Team (devs@obspy.org) & Anthony Lomax
@@ -0,0 +1,599 @@
+# -*- coding: utf-8 -*-
+"""
+A SeedLink client based on :mod:`asyncio`.
+
+The :class:`~.AsyncSeedLinkClient` receives data from many SeedLink servers
+on a single event loop. Every server is handled by a non-blocking
+:class:`asyncio.Protocol`, the packets are parsed with the same
+:class:`~obspy.clients.seedlink.client.slstate.SLState` buffer and
+:class:`~obspy.clients.seedlink.slpacket.SLPacket` classes as the blocking
+:class:`~obspy.clients.seedlink.client.seedlinkconnection.SeedLinkConnection`,
+which also holds the stream selection and the resume state of a server.
+
+.. code-block:: python
+
+    import asyncio
+    from obspy.clients.seedlink.asyncseedlink import AsyncSeedLinkClient
+
+    async def main():
+        client = AsyncSeedLinkClient()
+        client.add_server('geofon.gfz-potsdam.de', 'GE_WLF:BH?,GE_APE:BH?',
+                          statefile='geofon.state')
+        client.add_server('rtserve.iris.washington.edu', 'IU_ANMO:BH?')
+        async for trace in client:
+            print(trace)
+
+    asyncio.get_event_loop().run_until_complete(main())
+
+Lost connections are re-established after ``netdly`` seconds, resuming
+every station after the sequence number of its last received packet. With a
+state file the sequence numbers are saved regularly and recovered when the
+server is added, so a restarted program resumes where it stopped.
+
+.. note::
+
+    Requires Python 3.5 or later. The module can be imported with older
+    versions but creating an :class:`~.AsyncSeedLinkClient` raises a
+    :class:`NotImplementedError`.
+
+:copyright:
+    The ObsPy Development Team (devs@obspy.org)
+:license:
+    GNU Lesser General Public License, Version 3
+    (http://www.gnu.org/copyleft/lesser.html)
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+from future.builtins import *  # NOQA
+
+import collections
+import logging
+import sys
+
+try:
+    import asyncio
+except ImportError:  # Python 2.7 and 3.3
+    asyncio = None
+
+from obspy.core.utcdatetime import UTCDateTime
+from .client.seedlinkconnection import SeedLinkConnection
+from .client.slnetstation import SLNetStation
+from .client.slstate import SLState
+from .slpacket import SLPacket
+from .seedlinkexception import SeedLinkException
+
+
+# default logger
+logger = logging.getLogger('obspy.clients.seedlink')
+
+# base class of the protocol, only defined by asyncio
+_Protocol = asyncio.Protocol if asyncio is not None else object
+
+
+class AsyncSeedLinkClient(object):
+    """
+    SeedLink client receiving data from many servers on one event loop.
+
+    Iterate over the client with ``async for`` to get the received data
+    packets as :class:`~obspy.core.trace.Trace` objects. Connecting starts
+    with the iteration (or :meth:`start`). The iteration ends after
+    :meth:`close` or when all servers finished sending the requested time
+    windows.
+
+    :type queue_size: int, optional
+    :param queue_size: Maximum number of received traces waiting for the
+        consumer. Reading from the servers is paused while the queue is full.
+    :type netto: float, optional
+    :param netto: Network timeout in seconds, the connection is
+        re-established if no data was received for this time.
+    :type netdly: float, optional
+    :param netdly: Delay in seconds before reconnecting.
+    :type keepalive: float, optional
+    :param keepalive: Send a keepalive request if no data was received for
+        this time in seconds, ``0`` disables keepalives.
+    :type state_interval: float, optional
+    :param state_interval: Interval in seconds for saving the sequence
+        numbers to the state files of the servers.
+    :param loop: The event loop, defaults to the current event loop.
+    """
+    def __init__(self, queue_size=10000, netto=120, netdly=30, keepalive=0,
+                 state_interval=10.0, loop=None):
+        if sys.version_info < (3, 5):
+            msg = "AsyncSeedLinkClient requires Python 3.5 or later"
+            raise NotImplementedError(msg)
+        self.queue_size = queue_size
+        self.netto = netto
+        self.netdly = netdly
+        self.keepalive = keepalive
+        self.state_interval = state_interval
+        self.loop = loop
+        # SeedLinkConnection of every server holding streams and state
+        self.connections = []
+        self._protocols = {}
+        self._running = set()
+        self._traces = collections.deque()
+        self._waiter = None
+        self._paused = False
+        self._started = False
+        self._closed = False
+
+    def add_server(self, server_url, streams=None, selectors=None,
+                   statefile=None, begin_time=None, end_time=None,
+                   dialup=False):
+        """
+        Adds a SeedLink server.
+
+        :type server_url: str
+        :param server_url: The SeedLink server as ``host[:port]``, the port
+            defaults to 18000.
+        :type streams: str, optional
+        :param streams: Stations to request in multi-station mode, e.g.
+            ``"IU_KONO:BHE BHN,GE_WLF,MN_AQU:HH?.D"``. Uni-station mode is
+            used if not given.
+        :type selectors: str, optional
+        :param selectors: Default selectors for stations without selectors
+            (or all selectors in uni-station mode), e.g. ``"BH?"``.
+        :type statefile: str, optional
+        :param statefile: File to save the sequence numbers of the stations
+            to and to recover them from.
+        :type begin_time: :class:`~obspy.core.utcdatetime.UTCDateTime`
+        :param begin_time: Request data starting at this time (unless
+            resuming from a sequence number).
+        :type end_time: :class:`~obspy.core.utcdatetime.UTCDateTime`
+        :param end_time: End of the requested time window, the server
+            finishes after sending it.
+        :type dialup: bool, optional
+        :param dialup: Request only the data buffered by the server (``FETCH``)
+            instead of continuous data.
+        :rtype: :class:`~.SeedLinkConnection`
+        :return: The connection description of the server.
+        """
+        if ':' not in server_url:
+            server_url += ':18000'
+        if server_url.startswith(SeedLinkConnection.SEEDLINK_PROTOCOL_PREFIX):
+            server_url = server_url[
+                len(SeedLinkConnection.SEEDLINK_PROTOCOL_PREFIX):]
+        conn = SeedLinkConnection()
+        conn.sladdr = server_url
+        conn.netto = self.netto
+        conn.netdly = self.netdly
+        conn.keepalive = self.keepalive
+        conn.dialup = dialup
+        if streams is not None:
+            if conn.parseStreamlist(streams, selectors) < 1:
+                msg = "no valid streams in stream list: %s" % streams
+                raise SeedLinkException(msg)
+        else:
+            conn.setUniParams(selectors, -1, None)
+        if not conn.checkslcd():
+            msg = "invalid SeedLink server address: %s" % server_url
+            raise SeedLinkException(msg)
+        if begin_time is not None:
+            conn.begin_time = UTCDateTime(begin_time)
+        if end_time is not None:
+            conn.end_time = UTCDateTime(end_time)
+        if statefile is not None:
+            conn.setStateFile(statefile)
+        self.connections.append(conn)
+        if self._started:
+            self._running.add(conn)
+            self._connect(conn)
+        return conn
+
+    def start(self):
+        """
+        Connects to all servers.
+        """
+        if self._started:
+            return
+        if self.loop is None:
+            self.loop = asyncio.get_event_loop()
+        self._started = True
+        for conn in self.connections:
+            self._running.add(conn)
+            self._connect(conn)
+
+    def close(self):
+        """
+        Closes all connections and saves the state files.
+
+        Traces received before are still returned by the iteration.
+        """
+        self._closed = True
+        for protocol in list(self._protocols.values()):
+            protocol.transport.close()
+        for conn in self.connections:
+            _save_state(conn)
+        self._running.clear()
+        self._wakeup()
+
+    def __aiter__(self):
+        return self
+
+    def __anext__(self):
+        self.start()
+        future = asyncio.Future(loop=self.loop)
+        if self._traces:
+            future.set_result(self._traces.popleft())
+            if self._paused and len(self._traces) <= self.queue_size // 2:
+                self._pause(False)
+        elif not self._running:
+            future.set_exception(StopAsyncIteration())  # NOQA
+        else:
+            self._waiter = future
+        return future
+
+    def _put(self, trace):
+        """
+        Passes a received trace to the waiting consumer or queues it.
+        """
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(trace)
+            self._waiter = None
+            return
+        self._traces.append(trace)
+        if not self._paused and len(self._traces) >= self.queue_size:
+            self._pause(True)
+
+    def _pause(self, pause):
+        """
+        Pauses or resumes reading from all servers.
+        """
+        self._paused = pause
+        for protocol in self._protocols.values():
+            protocol.set_paused(pause)
+
+    def _wakeup(self):
+        """
+        Ends a pending iteration step when no server is left.
+        """
+        if self._running or self._traces:
+            return
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_exception(StopAsyncIteration())  # NOQA
+        self._waiter = None
+
+    def _connect(self, conn):
+        if self._closed or conn not in self._running:
+            return
+        host, port = conn.sladdr.rsplit(':', 1)
+        coro = self.loop.create_connection(
+            lambda: _SeedLinkProtocol(self, conn), host, int(port))
+        future = asyncio.ensure_future(coro, loop=self.loop)
+        future.add_done_callback(lambda f: self._connected(conn, f))
+
+    def _connected(self, conn, future):
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            msg = "[%s] cannot connect to SeedLink server: %s, " + \
+                "reconnecting in %ss"
+            logger.error(msg % (conn.sladdr, future.exception(), conn.netdly))
+            self._reconnect(conn)
+            return
+        transport, protocol = future.result()
+        if self._closed:
+            transport.close()
+            return
+        self._protocols[conn] = protocol
+        protocol.set_paused(self._paused)
+
+    def _disconnected(self, conn, finished):
+        """
+        Called when the connection to a server was lost or it finished
+        sending data.
+        """
+        self._protocols.pop(conn, None)
+        _save_state(conn)
+        if finished or self._closed:
+            self._running.discard(conn)
+            self._wakeup()
+        else:
+            self._reconnect(conn)
+
+    def _reconnect(self, conn):
+        if not self._closed:
+            self.loop.call_later(conn.netdly, self._connect, conn)
+
+
+class _SeedLinkProtocol(_Protocol):
+    """
+    Protocol negotiating the streams with a SeedLink server and parsing the
+    received packets.
+    """
+    # check timeouts, keepalives and state file in this interval (seconds)
+    TICK = 1.0
+
+    def __init__(self, client, conn):
+        self.client = client
+        self.conn = conn
+        self.transport = None
+        self.buffer = bytearray()
+        # pending commands as (command, station, kind) during negotiation
+        self.commands = None
+        self.current = None
+        self.hello = []
+        self.accepted = 0
+        self.selected = 0
+        self.finished = False
+        self.paused = False
+        self.last_data = 0.0
+        self.last_save = 0.0
+        self.timer = None
+
+    def connection_made(self, transport):
+        logger.info("[%s] network socket opened" % self.conn.sladdr)
+        self.transport = transport
+        self.conn.state = SLState()
+        self.conn.state.state = SLState.SL_UP
+        self.last_data = self.last_save = self.client.loop.time()
+        self.timer = self.client.loop.call_later(self.TICK, self._tick)
+        self._send(b"HELLO")
+
+    def connection_lost(self, exc):
+        if self.timer is not None:
+            self.timer.cancel()
+        self.conn.state = SLState()
+        if not self.finished and not self.client._closed:
+            msg = "[%s] connection lost (%s), reconnecting in %ss"
+            logger.warning(msg % (self.conn.sladdr, exc, self.conn.netdly))
+        self.client._disconnected(self.conn, self.finished)
+
+    def data_received(self, data):
+        self.last_data = self.client.loop.time()
+        try:
+            if self.conn.state.state != SLState.SL_DATA:
+                self.buffer += data
+                self._negotiate()
+                if self.conn.state.state == SLState.SL_DATA:
+                    data, self.buffer = bytes(self.buffer), bytearray()
+                else:
+                    return
+            self._receive(data)
+        except SeedLinkException as e:
+            logger.error("[%s] %s" % (self.conn.sladdr, e))
+            self.transport.close()
+
+    def set_paused(self, paused):
+        """
+        Pauses or resumes reading from the server. A connection still
+        negotiating the streams is paused when it enters data mode.
+        """
+        if paused == self.paused:
+            return
+        self.paused = paused
+        if self.conn.state.state != SLState.SL_DATA:
+            return
+        if paused:
+            self.transport.pause_reading()
+        else:
+            self.transport.resume_reading()
+            self.last_data = self.client.loop.time()
+
+    def _send(self, command):
+        logger.debug("[%s] sending: %s" % (self.conn.sladdr,
+                                           command.decode()))
+        self.transport.write(command + b"\r")
+
+    def _negotiate(self):
+        """
+        Handles the responses to the negotiation commands.
+        """
+        while b"\r\n" in self.buffer:
+            line, _, rest = bytes(self.buffer).partition(b"\r\n")
+            self.buffer = bytearray(rest)
+            if self.commands is None:
+                self.hello.append(line.decode('ascii', 'replace'))
+                if len(self.hello) == 2:
+                    self._parse_hello()
+                    self.commands = self._build_commands()
+                    self._next_command()
+                continue
+            command, station, kind = self.current
+            if line == b"OK":
+                if kind == 'SELECT':
+                    self.selected += 1
+                elif kind == 'DATA':
+                    self.accepted += 1
+            elif line == b"ERROR":
+                if kind == 'SELECT':
+                    logger.error("[%s] response: selector %s not accepted" %
+                                 (self.conn.sladdr, command[7:].decode()))
+                else:
+                    msg = "[%s] response: %s not accepted" % (
+                        self.conn.sladdr, command.decode())
+                    if not self.conn.multistation:
+                        raise SeedLinkException(msg)
+                    logger.error(msg)
+                    # skip the remaining commands of the station
+                    while self.commands and self.commands[0][1] is station:
+                        self.commands.popleft()
+            else:
+                msg = "invalid response to %s: %s" % (command.decode(), line)
+                raise SeedLinkException(msg)
+            if kind == 'SELECT' and self.commands and \
+                    self.commands[0][2] == 'DATA' and not self.selected:
+                msg = "[%s] response: no data stream selector(s) accepted"
+                logger.error(msg % self.conn.sladdr)
+                self.commands.popleft()
+            self._next_command()
+            if self.conn.state.state == SLState.SL_DATA:
+                return
+
+    def _parse_hello(self):
+        """
+        Parses server ID and version from the response to ``HELLO``.
+        """
+        servstr = self.hello[0]
+        vndx = servstr.find(" v")
+        self.conn.server_id = servstr if vndx < 0 else servstr[:vndx]
+        self.conn.server_version = 0.0
+        if vndx >= 0:
+            try:
+                self.conn.server_version = \
+                    float(servstr[vndx + 2:].split(" ")[0])
+            except ValueError:
+                pass
+        if self.conn.server_id.lower() != "seedlink":
+            msg = "incorrect response to HELLO: '%s'" % servstr
+            raise SeedLinkException(msg)
+        logger.info("[%s] connected to: '%s'" % (self.conn.sladdr, servstr))
+        if self.conn.multistation and self.conn.checkVersion(2.5) < 0:
+            msg = "detected SeedLink version %s does not support " + \
+                "multi-station protocol"
+            raise SeedLinkException(msg % self.conn.server_version)
+
+    def _build_commands(self):
+        """
+        Returns the negotiation commands for all streams of the connection.
+        """
+        commands = collections.deque()
+        for stream in self.conn.streams:
+            if self.conn.multistation:
+                command = "STATION %s %s" % (stream.station, stream.net)
+                commands.append((command.encode('ascii', 'strict'), stream,
+                                 'STATION'))
+            for selector in stream.getSelectors():
+                if len(selector) > SLNetStation.MAX_SELECTOR_SIZE:
+                    logger.warning("[%s] invalid selector: %s" %
+                                   (self.conn.sladdr, selector))
+                    continue
+                command = ("SELECT " + selector).encode('ascii', 'strict')
+                commands.append((command, stream, 'SELECT'))
+            commands.append((_action_command(self.conn, stream), stream,
+                             'DATA'))
+        if self.conn.multistation:
+            commands.append((b"END", None, 'END'))
+        return commands
+
+    def _next_command(self):
+        """
+        Sends the next negotiation command or switches to data mode.
+        """
+        if self.current is not None and self.current[2] != 'SELECT':
+            self.selected = 0
+        if not self.commands:
+            if not self.conn.multistation and self.accepted:
+                self._start_data()
+                return
+            raise SeedLinkException("no stations accepted")
+        self.current = self.commands.popleft()
+        if self.current[2] == 'END':
+            if not self.accepted:
+                raise SeedLinkException("no stations accepted")
+            logger.info("[%s] %s station(s) accepted" %
+                        (self.conn.sladdr, self.accepted))
+            self._send(b"END")
+            self._start_data()
+            return
+        self._send(self.current[0])
+
+    def _start_data(self):
+        state = self.conn.state
+        state.recptr = 0
+        state.sendptr = 0
+        state.state = SLState.SL_DATA
+        if self.paused:
+            self.transport.pause_reading()
+
+    def _receive(self, data):
+        """
+        Parses received packets and passes their data to the client.
+        """
+        state = self.conn.state
+        while data:
+            nbytes = min(state.bytesRemaining(), len(data))
+            state.appendBytes(data[:nbytes])
+            data = data[nbytes:]
+            while state.packetAvailable():
+                trace = None
+                if not state.packetIsInfo():
+                    # INFO packets are responses to keepalives
+                    slpacket = state.getPacket()
+                    try:
+                        self.conn.updateStream(slpacket)
+                        trace = slpacket.get_trace()
+                    except SeedLinkException as e:
+                        logger.error("[%s] bad packet: %s" %
+                                     (self.conn.sladdr, e))
+                state.incrementSendPointer()
+                if trace is not None:
+                    self.client._put(trace)
+            state.packDataBuffer()
+        pending = state.recptr - state.sendptr
+        if pending >= len(SLPacket.ENDSIGNATURE) and state.isEnd():
+            logger.info("[%s] end of buffer or selected time window" %
+                        self.conn.sladdr)
+            self.finished = True
+            self.transport.close()
+        elif pending >= len(SLPacket.ERRORSIGNATURE) and state.isError():
+            raise SeedLinkException(
+                "SeedLink reported an error with the last command")
+
+    def _tick(self):
+        """
+        Checks the network timeout, sends keepalives and saves the state.
+        """
+        now = self.client.loop.time()
+        self.timer = self.client.loop.call_later(self.TICK, self._tick)
+        conn = self.conn
+        if self.paused and conn.state.state == SLState.SL_DATA:
+            # nothing is read while the consumer is behind, that is no
+            # network timeout and no reason for keepalives
+            self.last_data = now
+        elif conn.netto > 0 and now - self.last_data > conn.netto:
+            logger.warning("[%s] network timeout (%s)" %
+                           (conn.sladdr, conn.netto))
+            self.transport.abort()
+            return
+        if conn.keepalive > 0 and conn.state.state == SLState.SL_DATA and \
+                now - self.last_data > conn.keepalive and \
+                conn.checkVersion(2.92) >= 0:
+            self._send(b"INFO ID")
+            self.last_data = now
+        if now - self.last_save > self.client.state_interval:
+            _save_state(conn)
+            self.last_save = now
+
+
+def _action_command(conn, stream):
+    """
+    Returns the ``DATA``, ``FETCH`` or ``TIME`` command requesting data of a
+    station, resuming after the last received packet if possible.
+    """
+    action = b"FETCH" if conn.dialup else b"DATA"
+    if stream.seqnum != -1 and conn.resume:
+        command = action + b" " + ("%06X" % (stream.seqnum + 1)).encode()
+        if conn.lastpkttime and conn.checkVersion(2.93) >= 0 and \
+                stream.btime is not None:
+            command += b" " + stream.getSLTimeStamp().encode()
+        msg = "[%s] requesting resume data from 0x%06X (decimal: %s)"
+        logger.info(msg % (conn.sladdr, stream.seqnum + 1,
+                           stream.seqnum + 1))
+        return command
+    if conn.begin_time is not None:
+        if conn.checkVersion(2.92) < 0:
+            msg = "detected SeedLink version %s does not support TIME windows"
+            raise SeedLinkException(msg % conn.server_version)
+        command = b"TIME " + conn.begin_time.format_seedlink().encode()
+        if conn.end_time is not None:
+            command += b" " + conn.end_time.format_seedlink().encode()
+        return command
+    return action
+
+
+def _save_state(conn):
+    """
+    Saves the sequence numbers of a connection if it has a state file.
+    """
+    if conn.statefile is None:
+        return
+    try:
+        conn.saveState(conn.statefile)
+    except SeedLinkException as e:
+        logger.error("[%s] %s" % (conn.sladdr, e))
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(exclude_empty=True)
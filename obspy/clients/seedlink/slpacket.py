@@ -14,18 +14,26 @@ JSeedLink of Anthony Lomax
 from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
 from future.builtins import *  # NOQA
+from future.utils import native_str
 
 import ctypes as C
+import sys
+from collections import OrderedDict
 
 import numpy as np
 
 from obspy.core.compatibility import from_buffer
+from obspy.core.stream import Stream
 from obspy.core.trace import Trace
+from obspy.core.utcdatetime import UTCDateTime
 from obspy.core.util.decorator import deprecated_keywords
-from obspy.io.mseed.headers import clibmseed
+from obspy.io.mseed.headers import FIXED_HEADER_DTYPE_SIZE, clibmseed
 from obspy.io.mseed.util import (_convert_MSR_to_dict,
                                  _ctypes_array_2_numpy_array,
-                                 _convert_MSTime_to_datetime)
+                                 _convert_MSTime_to_datetime,
+                                 _get_fixed_headers, _get_record_ids,
+                                 _get_record_times, _unpack_steim_1,
+                                 _unpack_steim_2)
 from .seedlinkexception import SeedLinkException
 
 
@@ -203,3 +211,180 @@ class SLPacket(object):
         finally:
             self.free_ms_record(msr, msrecord_py)
         return ret
+
+
+# output data type of the encodings decoded by decode_packets()
+_DECODE_DTYPES = {1: np.int32, 3: np.int32, 4: np.float32, 5: np.float64,
+                  10: np.int32, 11: np.int32}
+_DECODE_RAW_DTYPES = {1: 'i2', 3: 'i4', 4: 'f4', 5: 'f8'}
+
+
+def decode_packets(data):
+    """
+    Decodes many SeedLink packets at once into merged traces.
+
+    Instead of unpacking every packet separately with libmseed (see
+    :meth:`SLPacket.get_trace`), the fixed headers and blockettes of all
+    packets are parsed with NumPy. Records following each other without a
+    gap are decoded directly into one preallocated array per channel and
+    time span, Steim compressed payloads are read in place from the given
+    buffer. INFO packets are skipped.
+
+    Records with encodings other than Steim1/2, INT16, INT32, FLOAT32 and
+    FLOAT64 are unpacked with :meth:`SLPacket.get_trace` and returned as
+    separate traces.
+
+    :type data: bytes, bytearray or :class:`numpy.ndarray`
+    :param data: Contiguous buffer of complete SeedLink packets (520 bytes
+        each), e.g. as received during a backfill.
+    :rtype: :class:`~obspy.core.stream.Stream`
+    :return: One trace per channel and contiguous time span, ordered by
+        channel (first appearance in the buffer) and start time.
+    """
+    packet_size = SLPacket.SLHEADSIZE + SLPacket.SLRECSIZE
+    if isinstance(data, np.ndarray):
+        buffer_ = data.view(np.uint8).ravel()
+    else:
+        buffer_ = np.frombuffer(data, dtype=np.uint8)
+    if len(buffer_) % packet_size:
+        msg = "buffer length %d is not a multiple of the packet size %d" % (
+            len(buffer_), packet_size)
+        raise SeedLinkException(msg)
+    packets = buffer_.reshape((-1, packet_size))
+    # "SL" signature, case insensitive (0x20 sets the lower case bit)
+    signature = np.frombuffer(SLPacket.SIGNATURE.lower(), dtype=np.uint8)
+    info_signature = np.frombuffer(SLPacket.INFOSIGNATURE.lower(),
+                                   dtype=np.uint8)
+    heads = packets[:, :len(SLPacket.INFOSIGNATURE)] | 0x20
+    if not np.all(heads[:, :len(signature)] == signature):
+        raise SeedLinkException("invalid SeedLink packet signature")
+    is_info = np.all(heads == info_signature, axis=1)
+    records = packets[:, SLPacket.SLHEADSIZE:]
+    # byte order of the headers, the year is read big endian
+    year = records[:, 20].astype(np.int32) * 256 + records[:, 21]
+    big_endian = (year >= 1900) & (year <= 2100)
+
+    segments = OrderedDict()
+    others = []
+    for byteorder, mask in (('>', big_endian), ('<', ~big_endian)):
+        rows = np.nonzero(mask & ~is_info)[0]
+        if not len(rows):
+            continue
+        headers = _get_fixed_headers(
+            np.ascontiguousarray(
+                records[rows, :FIXED_HEADER_DTYPE_SIZE]).ravel(),
+            FIXED_HEADER_DTYPE_SIZE, byteorder)
+        if headers is None:
+            raise SeedLinkException("invalid Mini-SEED record header")
+        starttimes, _, samp_rates = _get_record_times(headers)
+        blockettes = _get_blockettes(records, rows, headers, byteorder)
+        starttimes += blockettes['microsecond'] * 1e-6
+        b100 = np.isfinite(blockettes['samp_rate'])
+        samp_rates[b100] = blockettes['samp_rate'][b100]
+        for i, (row, _id) in enumerate(zip(rows, _get_record_ids(headers))):
+            npts = int(headers['npts'][i])
+            encoding = int(blockettes['encoding'][i])
+            if npts == 0:
+                continue
+            if encoding not in _DECODE_DTYPES or \
+                    headers['begin_of_data'][i] >= SLPacket.SLRECSIZE:
+                others.append(SLPacket(packets[row].tobytes(), 0).get_trace())
+                continue
+            segments.setdefault(_id, []).append(
+                (starttimes[i], row, npts, samp_rates[i], encoding,
+                 int(headers['begin_of_data'][i]),
+                 int(blockettes['word_order'][i])))
+
+    stream = Stream()
+    for _id, items in segments.items():
+        items.sort(key=lambda item: (item[0], item[1]))
+        run = [items[0]]
+        for item in items[1:]:
+            last = run[-1]
+            expected = last[0] + last[2] / last[3]
+            if abs(item[0] - expected) <= 0.5 / last[3] and \
+                    abs(item[3] - last[3]) <= 1e-4 * last[3] and \
+                    _DECODE_DTYPES[item[4]] == _DECODE_DTYPES[last[4]]:
+                run.append(item)
+                continue
+            stream.append(_decode_run(_id, run, records))
+            run = [item]
+        stream.append(_decode_run(_id, run, records))
+    stream.traces.extend(others)
+    return stream
+
+
+def _get_blockettes(records, rows, headers, byteorder):
+    """
+    Reads encoding and word order (blockette 1000), microseconds (blockette
+    1001) and the actual sampling rate (blockette 100) of the given records.
+
+    All records are processed together following their blockette chains one
+    level at a time.
+    """
+    num = len(rows)
+    result = {'encoding': np.empty(num, dtype=np.int16),
+              'word_order': np.ones(num, dtype=np.uint8),
+              'microsecond': np.zeros(num, dtype=np.int8),
+              'samp_rate': np.empty(num, dtype=np.float64)}
+    result['encoding'].fill(-1)
+    result['samp_rate'].fill(np.nan)
+    offsets = headers['first_blockette'].astype(np.int64)
+    index = np.arange(num)
+    for _ in range(max(int(headers['number_of_blockettes'].max()), 1)):
+        valid = (offsets >= FIXED_HEADER_DTYPE_SIZE) & \
+            (offsets + 8 <= records.shape[1])
+        index, offsets = index[valid], offsets[valid]
+        if not len(index):
+            break
+        # type and offset of the next blockette
+        fields = records[rows[index, None], offsets[:, None] + np.arange(8)]
+        fields = np.ascontiguousarray(fields)
+        blkt_type = fields[:, 0:2].copy().view(
+            np.dtype(native_str('u2')).newbyteorder(byteorder)).ravel()
+        next_blkt = fields[:, 2:4].copy().view(
+            np.dtype(native_str('u2')).newbyteorder(byteorder)).ravel()
+        is_1000 = blkt_type == 1000
+        result['encoding'][index[is_1000]] = fields[is_1000, 4]
+        result['word_order'][index[is_1000]] = fields[is_1000, 5]
+        is_1001 = blkt_type == 1001
+        result['microsecond'][index[is_1001]] = \
+            fields[is_1001, 5].view(np.int8)
+        is_100 = blkt_type == 100
+        result['samp_rate'][index[is_100]] = fields[is_100, 4:8].copy().view(
+            np.dtype(native_str('f4')).newbyteorder(byteorder)).ravel()
+        # blockettes must follow each other
+        forward = next_blkt > offsets
+        index, offsets = index[forward], next_blkt[forward].astype(np.int64)
+    return result
+
+
+def _decode_run(_id, run, records):
+    """
+    Decodes records following each other without gaps into one trace.
+    """
+    first = run[0]
+    data = np.empty(sum(item[2] for item in run),
+                    dtype=_DECODE_DTYPES[first[4]])
+    start = 0
+    for _, row, npts, _, encoding, begin, word_order in run:
+        payload = records[row, begin:]
+        out = data[start:start + npts]
+        if encoding in (10, 11):
+            # Steim frames are big endian if the word order is 1
+            swapflag = int((word_order == 1) != (sys.byteorder == 'big'))
+            unpack = _unpack_steim_1 if encoding == 10 else _unpack_steim_2
+            unpack(payload, npts, swapflag=swapflag, out=out)
+        else:
+            dtype = np.dtype(native_str(_DECODE_RAW_DTYPES[encoding]))
+            dtype = dtype.newbyteorder('>' if word_order == 1 else '<')
+            if npts * dtype.itemsize > len(payload):
+                msg = "record of %s with %d samples exceeds record length"
+                raise SeedLinkException(msg % (_id, npts))
+            out[:] = payload[:npts * dtype.itemsize].view(dtype)
+        start += npts
+    network, station, location, channel = _id.split('.')
+    header = {'network': network, 'station': station, 'location': location,
+              'channel': channel, 'starttime': UTCDateTime(first[0]),
+              'sampling_rate': first[3]}
+    return Trace(data, header)
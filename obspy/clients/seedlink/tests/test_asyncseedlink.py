@@ -0,0 +1,322 @@
+# -*- coding: utf-8 -*-
+"""
+The obspy.clients.seedlink.asyncseedlink test suite.
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+from future.builtins import *  # NOQA
+
+import io
+import sys
+import unittest
+
+import numpy as np
+
+from obspy import Trace, UTCDateTime
+from obspy.core.util import NamedTemporaryFile
+
+from obspy.clients.seedlink.asyncseedlink import (AsyncSeedLinkClient,
+                                                  _SeedLinkProtocol)
+
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
+
+
+def _packets(net, sta, num=5):
+    """
+    Returns SeedLink packets of a station with sequence numbers 0 to num - 1.
+    """
+    packets = []
+    for i in range(num):
+        tr = Trace(data=np.arange(i * 100, (i + 1) * 100, dtype=np.int32))
+        tr.stats.network = net
+        tr.stats.station = sta
+        tr.stats.channel = 'BHZ'
+        tr.stats.starttime = UTCDateTime(2015, 1, 1) + i * 100
+        buf = io.BytesIO()
+        tr.write(buf, format='MSEED', reclen=512, encoding='STEIM1')
+        packets.append(('SL%06X' % i).encode() + buf.getvalue())
+    return packets
+
+
+if asyncio is not None:
+    class _FakeServer(asyncio.Protocol):
+        """
+        Minimal SeedLink server sending the packets of the requested
+        stations after ``END``.
+        """
+        def __init__(self, server, packets):
+            self.server = server
+            self.packets = packets
+            self.commands = []
+            self.buffer = b''
+            self.station = None
+            self.requested = {}
+
+        def connection_made(self, transport):
+            self.transport = transport
+            self.server.connections.append(self)
+
+        def data_received(self, data):
+            self.buffer += data
+            while b'\r' in self.buffer:
+                line, self.buffer = self.buffer.split(b'\r', 1)
+                line = line.strip().decode()
+                self.commands.append(line)
+                self._command(line)
+
+        def _command(self, line):
+            if line == 'HELLO':
+                self.transport.write(b'SeedLink v3.1 (2015.001)\r\n'
+                                     b'Fake SeedLink server\r\n')
+            elif line.startswith('STATION'):
+                _, sta, net = line.split()
+                if (net, sta) in self.packets:
+                    self.station = (net, sta)
+                    self.transport.write(b'OK\r\n')
+                else:
+                    self.transport.write(b'ERROR\r\n')
+            elif line.startswith('SELECT'):
+                self.transport.write(b'OK\r\n')
+            elif line.split()[0] in ('DATA', 'FETCH', 'TIME'):
+                self.requested[self.station] = line
+                self.transport.write(b'OK\r\n')
+            elif line == 'END':
+                self._send_data()
+
+        def _send_data(self):
+            data = b''
+            for station, command in self.requested.items():
+                parts = command.split()
+                start = 0
+                if parts[0] == 'DATA' and len(parts) > 1:
+                    start = int(parts[1], 16)
+                data += b''.join(self.packets[station][start:])
+            stop = self.server.stop_after
+            if stop is not None and len(self.server.connections) == 1:
+                # lose the connection after some packets
+                self.transport.write(data[:stop * 520])
+                self.transport.close()
+                return
+            # deliver in small chunks
+            for i in range(0, len(data), 300):
+                self.transport.write(data[i:i + 300])
+            if self.server.send_end:
+                self.transport.write(b'END')
+
+
+class _Server(object):
+    """
+    Starts a fake SeedLink server on a free local port.
+    """
+    def __init__(self, loop, packets, stop_after=None, send_end=True):
+        self.connections = []
+        self.stop_after = stop_after
+        self.send_end = send_end
+        coro = loop.create_server(lambda: _FakeServer(self, packets),
+                                  '127.0.0.1', 0)
+        self.server = loop.run_until_complete(coro)
+        self.url = '127.0.0.1:%d' % self.server.sockets[0].getsockname()[1]
+
+    def close(self):
+        self.server.close()
+
+
+@unittest.skipIf(sys.version_info < (3, 5), 'needs asyncio and async for')
+class AsyncSeedLinkClientTestCase(unittest.TestCase):
+    """
+    Test cases for the AsyncSeedLinkClient class.
+    """
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.packets = {('GE', 'WLF'): _packets('GE', 'WLF'),
+                        ('IU', 'ANMO'): _packets('IU', 'ANMO', 3)}
+        namespace = {}
+        exec('async def collect(client):\n'
+             '    return [tr async for tr in client]\n', namespace)
+        self.collect = namespace['collect']
+
+    def tearDown(self):
+        self.loop.close()
+
+    def _run(self, client, timeout=10):
+        return self.loop.run_until_complete(
+            asyncio.wait_for(self.collect(client), timeout))
+
+    def test_multiStation(self):
+        """
+        Data of multiple stations is received until the server sends END.
+        Unknown stations are skipped.
+        """
+        server = _Server(self.loop, self.packets)
+        try:
+            client = AsyncSeedLinkClient(loop=self.loop)
+            client.add_server(server.url, 'GE_WLF:BHZ,IU_ANMO,XX_NONE',
+                              begin_time=UTCDateTime(2015, 1, 1))
+            traces = self._run(client)
+        finally:
+            server.close()
+        self.assertEqual(len(traces), 8)
+        ids = [tr.id for tr in traces]
+        self.assertEqual(ids.count('GE.WLF..BHZ'), 5)
+        self.assertEqual(ids.count('IU.ANMO..BHZ'), 3)
+        wlf = [tr for tr in traces if tr.stats.station == 'WLF']
+        np.testing.assert_array_equal(np.concatenate([tr.data for tr in wlf]),
+                                      np.arange(500))
+        commands = server.connections[0].commands
+        self.assertEqual(commands[:4], ['HELLO', 'STATION WLF GE',
+                                        'SELECT BHZ', 'TIME 2015,1,1,0,0,0'])
+        self.assertIn('STATION NONE XX', commands)
+        self.assertEqual(commands[-1], 'END')
+
+    def test_reconnectResume(self):
+        """
+        After losing the connection the client reconnects and resumes after
+        the last received packet. The sequence numbers are kept in the state
+        file.
+        """
+        server = _Server(self.loop, self.packets, stop_after=2)
+        try:
+            with NamedTemporaryFile() as tf:
+                client = AsyncSeedLinkClient(netdly=0.01, loop=self.loop)
+                client.add_server(server.url, 'GE_WLF', statefile=tf.name)
+                traces = self._run(client)
+                with open(tf.name, 'r') as fh:
+                    state = fh.read().split()
+        finally:
+            server.close()
+        self.assertEqual(len(server.connections), 2)
+        self.assertIn('DATA', server.connections[0].commands)
+        self.assertIn('DATA 000002', server.connections[1].commands)
+        np.testing.assert_array_equal(
+            np.concatenate([tr.data for tr in traces]), np.arange(500))
+        self.assertEqual(state[:3], ['GE', 'WLF', '4'])
+
+    def test_recoverState(self):
+        """
+        Sequence numbers are recovered from an existing state file.
+        """
+        server = _Server(self.loop, self.packets)
+        try:
+            with NamedTemporaryFile() as tf:
+                with open(tf.name, 'w') as fh:
+                    fh.write('GE WLF 2 2015,1,1,0,3,20\n')
+                client = AsyncSeedLinkClient(loop=self.loop)
+                conn = client.add_server(server.url, 'GE_WLF',
+                                         statefile=tf.name)
+                self.assertEqual(conn.streams[0].seqnum, 2)
+                traces = self._run(client)
+        finally:
+            server.close()
+        self.assertIn('DATA 000003', server.connections[0].commands)
+        self.assertEqual(len(traces), 2)
+        self.assertEqual(traces[0].stats.starttime,
+                         UTCDateTime(2015, 1, 1) + 300)
+
+    def test_multipleServers(self):
+        """
+        Data of several servers is received on one event loop, closing the
+        client stops the iteration.
+        """
+        servers = [_Server(self.loop, self.packets, send_end=False)
+                   for _ in range(3)]
+        try:
+            client = AsyncSeedLinkClient(loop=self.loop)
+            for server in servers:
+                client.add_server(server.url, 'GE_WLF,IU_ANMO')
+            namespace = {}
+            exec('async def take(client, num):\n'
+                 '    traces = []\n'
+                 '    async for tr in client:\n'
+                 '        traces.append(tr)\n'
+                 '        if len(traces) == num:\n'
+                 '            client.close()\n'
+                 '    return traces\n', namespace)
+            traces = self.loop.run_until_complete(
+                namespace['take'](client, 24))
+        finally:
+            for server in servers:
+                server.close()
+        self.assertEqual(len(traces), 24)
+        self.assertTrue(all(len(server.connections) == 1
+                            for server in servers))
+
+    def test_backpressure(self):
+        """
+        Reading from the servers pauses while the queue is full.
+        """
+        server = _Server(self.loop, self.packets, send_end=False)
+        try:
+            client = AsyncSeedLinkClient(queue_size=2, loop=self.loop)
+            conn = client.add_server(server.url, 'GE_WLF,IU_ANMO')
+            client.start()
+            self.loop.run_until_complete(asyncio.sleep(0.2))
+            self.assertTrue(client._paused)
+            transport = client._protocols[conn].transport
+            self.assertFalse(transport.is_reading())
+            # queued traces are still returned after closing
+            client.close()
+            traces = self._run(client)
+        finally:
+            server.close()
+        self.assertEqual(len(traces), 8)
+        self.assertFalse(client._paused)
+
+    def test_pausedNoTimeout(self):
+        """
+        Paused connections are not aborted by the network timeout, and
+        connections made while paused still negotiate the streams.
+        """
+        servers = [_Server(self.loop, self.packets, send_end=False)
+                   for _ in range(2)]
+        tick = _SeedLinkProtocol.TICK
+        _SeedLinkProtocol.TICK = 0.05
+        try:
+            client = AsyncSeedLinkClient(queue_size=2, netto=0.2,
+                                         loop=self.loop)
+            conn = client.add_server(servers[0].url, 'GE_WLF,IU_ANMO')
+            client.start()
+            self.loop.run_until_complete(asyncio.sleep(0.1))
+            self.assertTrue(client._paused)
+            # connect to another server while paused
+            conn2 = client.add_server(servers[1].url, 'GE_WLF')
+            self.loop.run_until_complete(asyncio.sleep(0.6))
+            self.assertEqual(len(servers[0].connections), 1)
+            self.assertEqual(len(servers[1].connections), 1)
+            self.assertEqual(servers[1].connections[0].commands[-1], 'END')
+            for c in (conn, conn2):
+                self.assertFalse(
+                    client._protocols[c].transport.is_reading())
+            client.close()
+            traces = self._run(client)
+        finally:
+            _SeedLinkProtocol.TICK = tick
+            for server in servers:
+                server.close()
+        self.assertGreaterEqual(len(traces), 8)
+
+
+@unittest.skipIf(sys.version_info >= (3, 5), 'supported Python version')
+class AsyncSeedLinkClientUnsupportedTestCase(unittest.TestCase):
+    """
+    Test cases for the AsyncSeedLinkClient class on old Python versions.
+    """
+    def test_unsupportedPython(self):
+        """
+        Creating a client raises a clear error.
+        """
+        self.assertRaises(NotImplementedError, AsyncSeedLinkClient)
+
+
+def suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(AsyncSeedLinkClientTestCase, 'test'))
+    suite.addTest(unittest.makeSuite(AsyncSeedLinkClientUnsupportedTestCase,
+                                     'test'))
+    return suite
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite')
@@ -6,10 +6,15 @@ from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
 from future.builtins import *  # NOQA
 
+import io
 import os.path
 import unittest
 
-from obspy.clients.seedlink.slpacket import SLPacket
+import numpy as np
+
+from obspy import Stream, Trace, UTCDateTime
+from obspy.clients.seedlink.seedlinkexception import SeedLinkException
+from obspy.clients.seedlink.slpacket import SLPacket, decode_packets
 
 
 class SLPacketTestCase(unittest.TestCase):
@@ -48,6 +53,73 @@ class SLPacketTestCase(unittest.TestCase):
         self.assertTrue(payload.startswith(xml))
         self.assertEqual(len(payload), 456)
 
+    def _packets(self, tr, encoding, byteorder='>'):
+        """
+        Returns SeedLink packets of the 512 byte records of a trace.
+        """
+        buf = io.BytesIO()
+        tr.write(buf, format='MSEED', reclen=512, encoding=encoding,
+                 byteorder=byteorder)
+        buf = buf.getvalue()
+        return [('SL%06X' % i).encode() + buf[i * 512:(i + 1) * 512]
+                for i in range(len(buf) // 512)]
+
+    def test_decodePackets(self):
+        """
+        Decoding many packets at once gives the same traces as decoding each
+        packet and merging them.
+        """
+        rng = np.random.RandomState(42)
+        starttime = UTCDateTime(2015, 1, 1, 0, 0, 0, 123456)
+        channels = []
+        for channel, encoding, dtype, byteorder in (
+                ('BHZ', 'STEIM1', np.int32, '>'),
+                ('BHN', 'STEIM2', np.int32, '<'),
+                ('BHE', 'INT32', np.int32, '>'),
+                ('LHZ', 'FLOAT64', np.float64, '<'),
+                ('LHN', 'FLOAT32', np.float32, '>')):
+            data = (rng.randn(3000) * 1000).astype(dtype)
+            packets = []
+            # second part starts after a gap
+            for part, offset in ((data[:2000], 0), (data[2000:], 2100)):
+                tr = Trace(data=part.copy())
+                tr.stats.network = 'GE'
+                tr.stats.station = 'WLF'
+                tr.stats.channel = channel
+                tr.stats.sampling_rate = 20.0
+                tr.stats.starttime = starttime + offset / 20.0
+                packets += self._packets(tr, encoding, byteorder)
+            channels.append(packets)
+        # interleave the channels and add an INFO packet
+        packets = []
+        for i in range(max(len(p) for p in channels)):
+            packets += [p[i] for p in channels if i < len(p)]
+        with open(os.path.join(os.path.dirname(__file__), 'data',
+                               'info_packet_geofon.slink'), 'rb') as fh:
+            packets.insert(3, fh.read()[:520])
+        buf = b''.join(packets)
+
+        expected = Stream([SLPacket(buf, i).get_trace()
+                           for i in range(0, len(buf), 520)
+                           if not buf[i:i + 6] == b'SLINFO'])
+        expected.merge(-1)
+        expected.sort()
+        for got in (decode_packets(buf), decode_packets(bytearray(buf)),
+                    decode_packets(np.frombuffer(buf, dtype=np.uint8))):
+            self.assertEqual(len(got), 10)
+            got.sort()
+            for tr_got, tr_expected in zip(got, expected):
+                self.assertEqual(tr_got.id, tr_expected.id)
+                self.assertEqual(tr_got.stats.starttime,
+                                 tr_expected.stats.starttime)
+                self.assertEqual(tr_got.stats.sampling_rate, 20.0)
+                self.assertEqual(tr_got.data.dtype, tr_expected.data.dtype)
+                np.testing.assert_array_equal(tr_got.data, tr_expected.data)
+        self.assertEqual(got[0].stats.starttime, starttime)
+
+        # incomplete packets
+        self.assertRaises(SeedLinkException, decode_packets, buf[:-1])
+
 
 def suite():
     return unittest.makeSuite(SLPacketTestCase, 'test')
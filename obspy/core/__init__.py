@@ -120,7 +120,7 @@ from obspy.core.utcdatetime import UTCDateTime
 from obspy.core.util import DynamicAttributeImportRerouteModule
 from obspy.core.util.attribdict import AttribDict
 from obspy.core.trace import Stats, Trace
-from obspy.core.stream import Stream, read
+from obspy.core.stream import Stream, iter_read, read
 from obspy.scripts.runtests import run_tests
 
 
@@ -14,8 +14,10 @@ from __future__ import (absolute_import, division, print_function,
 from future.builtins import *  # NOQA
 
 import ctypes as C
+import hashlib
+import threading
 import warnings
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
 from copy import deepcopy
 from math import pi
 
@@ -28,6 +30,58 @@ from obspy.core.util.obspy_types import (CustomComplex, CustomFloat,
 from .util import Angle, Frequency
 
 
+# Unit names known to evalresp and the corresponding evalresp unit types.
+_EVALRESP_UNITS = {
+    "M": "DIS",
+    "NM": "DIS",
+    "CM": "DIS",
+    "MM": "DIS",
+    "M/S": "VEL",
+    "M/SEC": "VEL",
+    "NM/S": "VEL",
+    "NM/SEC": "VEL",
+    "CM/S": "VEL",
+    "CM/SEC": "VEL",
+    "MM/S": "VEL",
+    "MM/SEC": "VEL",
+    "M/S**2": "ACC",
+    "M/(S**2)": "ACC",
+    "M/SEC**2": "ACC",
+    "M/(SEC**2)": "ACC",
+    "NM/S**2": "ACC",
+    "NM/(S**2)": "ACC",
+    "NM/SEC**2": "ACC",
+    "NM/(SEC**2)": "ACC",
+    "CM/S**2": "ACC",
+    "CM/(S**2)": "ACC",
+    "CM/SEC**2": "ACC",
+    "CM/(SEC**2)": "ACC",
+    "MM/S**2": "ACC",
+    "MM/(S**2)": "ACC",
+    "MM/SEC**2": "ACC",
+    "MM/(SEC**2)": "ACC",
+    "V": "VOLTS",
+    "VOLT": "VOLTS",
+    "VOLTS": "VOLTS",
+    # This is weird, but evalresp appears to do the same.
+    "V/M": "VOLTS",
+    "COUNTS": "COUNTS",
+    "T": "TESLA",
+    "PA": "PRESSURE",
+    "MBAR": "PRESSURE"}
+
+# Tolerance for the sum of FIR coefficients used by evalresp.
+_FIR_NORM_TOL = 0.02
+
+# Least recently used cache of calculated responses, see
+# Response.get_evalresp_response(). The lock guards the cache and the total
+# size of the cached arrays.
+_RESPONSES = OrderedDict()
+_RESPONSES_LOCK = threading.Lock()
+_RESPONSES_NBYTES = 0
+_RESPONSE_CACHE_MAX_BYTES = 64 * 1024 ** 2
+
+
 class ResponseStage(ComparingObject):
     """
     From the StationXML Definition:
@@ -730,6 +784,16 @@ class Response(ComparingObject):
         Returns frequency response and corresponding frequencies using
         evalresp.
 
+        Responses consisting of poles and zeros, FIR, IIR coefficients and
+        gain only stages are evaluated directly with NumPy, following the
+        computations of evalresp. All other responses are passed on to
+        evalresp.
+
+        The most recently calculated responses are cached (up to a total
+        size of ``_RESPONSE_CACHE_MAX_BYTES``), keyed by the contents of the
+        response and all arguments. Repeated calls, e.g. for many traces of
+        the same channel epoch, return copies of the cached arrays.
+
         :type t_samp: float
         :param t_samp: time resolution (inverse frequency resolution)
         :type nfft: int
@@ -753,15 +817,81 @@ class Response(ComparingObject):
         :rtype: tuple of two arrays
         :returns: frequency response and corresponding frequencies
         """
-        import obspy.signal.evrespwrapper as ew
-        from obspy.signal.headers import clibevresp
-
         out_units = output.upper()
         if out_units not in ("DISP", "VEL", "ACC"):
             msg = ("requested output is '%s' but must be one of 'DISP', 'VEL' "
                    "or 'ACC'") % output
             raise ValueError(msg)
 
+        key = (self._get_fingerprint(), float(t_samp), int(nfft), out_units,
+               start_stage, end_stage)
+        with _RESPONSES_LOCK:
+            cached = _RESPONSES.pop(key, None)
+            if cached is not None:
+                # reinsert as most recently used
+                _RESPONSES[key] = cached
+        if cached is None:
+            cached = self._calc_response(
+                t_samp, nfft, out_units, start_stage, end_stage)
+            _cache_response(key, cached)
+        response, freqs = cached
+        return response.copy(), freqs.copy()
+
+    def _get_fingerprint(self):
+        """
+        Returns a hash of the contents of the instrument sensitivity and all
+        response stages, used to identify cached responses.
+        """
+        digest = hashlib.sha1()
+        for obj in [self.instrument_sensitivity] + list(self.response_stages):
+            if obj is None:
+                items = None
+            else:
+                items = sorted(vars(obj).items())
+            digest.update(repr((type(obj).__name__, items)).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _calc_response(self, t_samp, nfft, out_units, start_stage=None,
+                       end_stage=None):
+        """
+        Calculates the frequency response, see
+        :meth:`~Response.get_evalresp_response`.
+        """
+        all_stages = defaultdict(list)
+
+        for stage in self.response_stages:
+            # optionally select only stages as requested by user
+            if start_stage is not None:
+                if stage.stage_sequence_number < start_stage:
+                    continue
+            if end_stage is not None:
+                if stage.stage_sequence_number > end_stage:
+                    continue
+            all_stages[stage.stage_sequence_number].append(stage)
+
+        stage_lengths = set(map(len, all_stages.values()))
+        if len(stage_lengths) != 1 or stage_lengths.pop() != 1:
+            msg = "Each stage can only appear once."
+            raise ValueError(msg)
+
+        stages = [all_stages[i][0] for i in sorted(all_stages.keys())]
+
+        fy = 1 / (t_samp * 2.0)
+        # start at zero to get zero for offset/ DC of fft
+        freqs = np.linspace(0, fy, nfft // 2 + 1).astype(np.float64)
+
+        output = self._calc_response_numpy(stages, freqs, out_units)
+        if output is None:
+            output = self._call_evalresp(stages, freqs, out_units)
+        return output, freqs
+
+    def _call_evalresp(self, stages, freqs, out_units):
+        """
+        Evaluates the given response stages with evalresp.
+        """
+        import obspy.signal.evrespwrapper as ew
+        from obspy.signal.headers import clibevresp
+
         # Whacky. Evalresp uses a global variable and uses that to scale the
         # response if it encounters any unit that is not SI.
         scale_factor = [1.0]
@@ -771,45 +901,7 @@ class Response(ComparingObject):
                 key = key.upper()
             except:
                 pass
-            units_mapping = {
-                "M": ew.ENUM_UNITS["DIS"],
-                "NM": ew.ENUM_UNITS["DIS"],
-                "CM": ew.ENUM_UNITS["DIS"],
-                "MM": ew.ENUM_UNITS["DIS"],
-                "M/S": ew.ENUM_UNITS["VEL"],
-                "M/SEC": ew.ENUM_UNITS["VEL"],
-                "NM/S": ew.ENUM_UNITS["VEL"],
-                "NM/SEC": ew.ENUM_UNITS["VEL"],
-                "CM/S": ew.ENUM_UNITS["VEL"],
-                "CM/SEC": ew.ENUM_UNITS["VEL"],
-                "MM/S": ew.ENUM_UNITS["VEL"],
-                "MM/SEC": ew.ENUM_UNITS["VEL"],
-                "M/S**2": ew.ENUM_UNITS["ACC"],
-                "M/(S**2)": ew.ENUM_UNITS["ACC"],
-                "M/SEC**2": ew.ENUM_UNITS["ACC"],
-                "M/(SEC**2)": ew.ENUM_UNITS["ACC"],
-                "NM/S**2": ew.ENUM_UNITS["ACC"],
-                "NM/(S**2)": ew.ENUM_UNITS["ACC"],
-                "NM/SEC**2": ew.ENUM_UNITS["ACC"],
-                "NM/(SEC**2)": ew.ENUM_UNITS["ACC"],
-                "CM/S**2": ew.ENUM_UNITS["ACC"],
-                "CM/(S**2)": ew.ENUM_UNITS["ACC"],
-                "CM/SEC**2": ew.ENUM_UNITS["ACC"],
-                "CM/(SEC**2)": ew.ENUM_UNITS["ACC"],
-                "MM/S**2": ew.ENUM_UNITS["ACC"],
-                "MM/(S**2)": ew.ENUM_UNITS["ACC"],
-                "MM/SEC**2": ew.ENUM_UNITS["ACC"],
-                "MM/(SEC**2)": ew.ENUM_UNITS["ACC"],
-                "V": ew.ENUM_UNITS["VOLTS"],
-                "VOLT": ew.ENUM_UNITS["VOLTS"],
-                "VOLTS": ew.ENUM_UNITS["VOLTS"],
-                # This is weird, but evalresp appears to do the same.
-                "V/M": ew.ENUM_UNITS["VOLTS"],
-                "COUNTS": ew.ENUM_UNITS["COUNTS"],
-                "T": ew.ENUM_UNITS["TESLA"],
-                "PA": ew.ENUM_UNITS["PRESSURE"],
-                "MBAR": ew.ENUM_UNITS["PRESSURE"]}
-            if key not in units_mapping:
+            if key not in _EVALRESP_UNITS:
                 if key is not None:
                     msg = ("The unit '%s' is not known to ObsPy. Raw evalresp "
                            "would refuse to calculate a response for this "
@@ -817,7 +909,7 @@ class Response(ComparingObject):
                     warnings.warn(msg)
                 value = ew.ENUM_UNITS["UNDEF_UNITS"]
             else:
-                value = units_mapping[key]
+                value = ew.ENUM_UNITS[_EVALRESP_UNITS[key]]
 
             # Scale factor with the same logic as evalresp.
             if key in ["CM/S**2", "CM/S", "CM/SEC", "CM"]:
@@ -829,35 +921,14 @@ class Response(ComparingObject):
 
             return value
 
-        all_stages = defaultdict(list)
-
-        for stage in self.response_stages:
-            # optionally select only stages as requested by user
-            if start_stage is not None:
-                if stage.stage_sequence_number < start_stage:
-                    continue
-            if end_stage is not None:
-                if stage.stage_sequence_number > end_stage:
-                    continue
-            all_stages[stage.stage_sequence_number].append(stage)
-
-        stage_lengths = set(map(len, all_stages.values()))
-        if len(stage_lengths) != 1 or stage_lengths.pop() != 1:
-            msg = "Each stage can only appear once."
-            raise ValueError(msg)
-
-        stage_list = sorted(all_stages.keys())
-
         stage_objects = []
 
-        for stage_number in stage_list:
+        for blockette in stages:
             st = ew.stage()
-            st.sequence_no = stage_number
+            st.sequence_no = blockette.stage_sequence_number
 
             stage_blkts = []
 
-            blockette = all_stages[stage_number][0]
-
             # Write the input and output units.
             st.input_units = get_unit_mapping(blockette.input_units)
             st.output_units = get_unit_mapping(blockette.output_units)
@@ -1062,10 +1133,6 @@ class Response(ComparingObject):
         chan.sensit = 0.0
         chan.sensfreq = 0.0
 
-        fy = 1 / (t_samp * 2.0)
-        # start at zero to get zero for offset/ DC of fft
-        freqs = np.linspace(0, fy, nfft // 2 + 1).astype(np.float64)
-
         output = np.empty(len(freqs), dtype=np.complex128)
         out_units = C.c_char_p(out_units.encode('ascii', 'strict'))
 
@@ -1098,7 +1165,175 @@ class Response(ComparingObject):
         finally:
             clibevresp.curr_file.value = None
 
-        return output, freqs
+        return output
+
+    def _calc_response_numpy(self, stages, freqs, out_units):
+        """
+        Evaluates the given response stages with NumPy.
+
+        Follows the computations of evalresp (``check_channel()``,
+        ``norm_resp()`` and ``calc_resp()``) for chains of poles and zeros
+        (Laplace transform), FIR, IIR coefficients and gain only stages.
+        Returns ``None`` for all other responses and for responses that
+        evalresp would reject, these are left to evalresp.
+        """
+        sensitivity = self.instrument_sensitivity
+        if not stages or sensitivity is None or not sensitivity.value or \
+                sensitivity.frequency is None:
+            return None
+
+        filters = []
+        previous_output_units = None
+        for stage in stages:
+            # Units unknown to evalresp are left to evalresp (which warns),
+            # missing units are undefined units for evalresp.
+            units = []
+            for key in (stage.input_units, stage.output_units):
+                if key is None:
+                    units.append("UNDEF_UNITS")
+                elif hasattr(key, "upper") and key.upper() in _EVALRESP_UNITS:
+                    units.append(_EVALRESP_UNITS[key.upper()])
+                else:
+                    return None
+            input_units, output_units = units
+            if not stage.stage_gain or stage.stage_gain_frequency is None:
+                return None
+
+            decimation_values = set([
+                stage.decimation_correction, stage.decimation_delay,
+                stage.decimation_factor, stage.decimation_input_sample_rate,
+                stage.decimation_offset])
+            if None in decimation_values:
+                if len(decimation_values) != 1:
+                    return None
+                sample_int = None
+            elif stage.decimation_input_sample_rate == 0:
+                sample_int = 0.0
+            else:
+                sample_int = 1.0 / stage.decimation_input_sample_rate
+
+            if isinstance(stage, PolesZerosResponseStage):
+                if stage.pz_transfer_function_type == \
+                        "LAPLACE (RADIANS/SECOND)":
+                    hertz = False
+                elif stage.pz_transfer_function_type == "LAPLACE (HERTZ)":
+                    hertz = True
+                else:
+                    return None
+                if stage.normalization_factor is None or \
+                        stage.normalization_frequency is None:
+                    return None
+                filt = {
+                    "type": "PZ", "hertz": hertz,
+                    "zeros": np.array(stage.zeros, dtype=np.complex128),
+                    "poles": np.array(stage.poles, dtype=np.complex128),
+                    "h0": float(stage.normalization_factor),
+                    "h0_freq": float(stage.normalization_frequency)}
+            elif isinstance(stage, CoefficientsTypeResponseStage):
+                filt = {"coeffs": np.array(stage.numerator, dtype=np.float64)}
+                if len(stage.denominator) != 0:
+                    filt["type"] = "IIR"
+                    filt["denominator"] = np.array(stage.denominator,
+                                                   dtype=np.float64)
+                elif stage.cf_transfer_function_type.lower() == "digital":
+                    filt["type"] = "FIR_ASYM"
+                else:
+                    return None
+            elif isinstance(stage, FIRResponseStage):
+                fir_types = {"NONE": "FIR_ASYM", "ODD": "FIR_SYM_1",
+                             "EVEN": "FIR_SYM_2"}
+                if stage.symmetry not in fir_types:
+                    return None
+                filt = {"type": fir_types[stage.symmetry],
+                        "coeffs": np.array(stage.coefficients,
+                                           dtype=np.float64)}
+            elif isinstance(stage, (ResponseListResponseStage,
+                                    PolynomialResponseStage)):
+                return None
+            else:
+                filt = {"type": "GAIN"}
+
+            if filt["type"] == "GAIN":
+                # evalresp does not allow decimation in gain only stages
+                if sample_int is not None:
+                    return None
+            else:
+                # evalresp checks units between all but gain only stages
+                if previous_output_units is not None and \
+                        previous_output_units != input_units:
+                    return None
+                previous_output_units = output_units
+
+            if filt["type"] not in ("PZ", "GAIN"):
+                # digital filters need the sampling interval of the decimation
+                if sample_int is None:
+                    return None
+                if len(filt["coeffs"]) == 0:
+                    if filt["type"] == "IIR":
+                        return None
+                    # FIR filters without coefficients are not evaluated
+                    filt = {"type": "GAIN"}
+                else:
+                    filt["h0"] = 1.0
+                    filt["sample_int"] = sample_int
+                    filt["correction"] = float(stage.decimation_correction)
+                    if filt["type"] == "FIR_ASYM":
+                        _check_fir_symmetry(filt)
+            filt["input_units"] = input_units
+            filt["gain"] = float(stage.stage_gain)
+            filt["gain_freq"] = float(stage.stage_gain_frequency)
+            filters.append(filt)
+
+        # Normalize all stages at the frequency of the overall sensitivity
+        # and calculate the resulting sensitivity (norm_resp()).
+        sens_freq = np.array([float(sensitivity.frequency)])
+        calc_sensit = 1.0
+        for filt in filters:
+            gain = filt["gain"]
+            if filt["type"] != "GAIN" and (
+                    filt["gain_freq"] != sens_freq[0] or
+                    (filt["type"] == "PZ" and
+                     filt["h0_freq"] != sens_freq[0])):
+                gain_freq = np.array([filt["gain_freq"]])
+                filt["h0"] = 1.0
+                df = _evaluate_filter(filt, gain_freq)[0]
+                of = _evaluate_filter(filt, sens_freq)[0]
+                if filt["type"] == "PZ" and (df == 0 or of == 0):
+                    return None
+                gain = gain / abs(df) * abs(of)
+                filt["h0"] = 1.0 / abs(of)
+            calc_sensit *= gain
+
+        # Evaluate all stages (calc_resp()).
+        w = 2.0 * pi * freqs
+        output = np.empty(len(freqs), dtype=np.complex128)
+        output.fill(calc_sensit)
+        with np.errstate(all="ignore"):
+            for filt in filters:
+                if filt["type"] == "GAIN":
+                    continue
+                output *= _evaluate_filter(filt, freqs)
+                # The delay of symmetric FIR filters is already removed.
+                if filt["type"] == "FIR_ASYM":
+                    output *= np.exp(1j * w * filt["correction"])
+
+            # Convert to the requested output units (convert_to_units()).
+            input_units = filters[0]["input_units"]
+            nonzero = w != 0
+            if (input_units == "DIS" and out_units == "DISP") or \
+                    (input_units == "ACC" and out_units == "ACC"):
+                return output
+            if input_units == "DIS":
+                output[nonzero] *= -1j / w[nonzero]
+                output[~nonzero] = 0.0
+            elif input_units == "ACC":
+                output *= 1j * w
+            if out_units == "DISP":
+                output *= 1j * w
+            elif out_units == "ACC":
+                output[nonzero] *= -1j / w[nonzero]
+                output[~nonzero] = 0.0
+        return output
 
     def __str__(self):
         i_s = self.instrument_sensitivity
@@ -1580,6 +1815,72 @@ class CoefficientWithUncertainties(FloatWithUncertainties):
         self._number = value
 
 
+def _check_fir_symmetry(filt):
+    """
+    Normalizes the coefficients of an asymmetric FIR filter and converts it
+    to a symmetric filter if possible, like ``check_sym()`` of evalresp.
+    """
+    coeffs = filt["coeffs"]
+    total = coeffs.sum()
+    if total < 1.0 - _FIR_NORM_TOL or total > 1.0 + _FIR_NORM_TOL:
+        coeffs = coeffs / total
+    filt["coeffs"] = coeffs
+    nc = len(coeffs)
+    n0 = nc // 2
+    if nc % 2 == 0:
+        if np.array_equal(coeffs[n0:], coeffs[:n0][::-1]):
+            filt["type"] = "FIR_SYM_2"
+            filt["coeffs"] = coeffs[:n0]
+    elif np.array_equal(coeffs[n0 + 1:], coeffs[:n0][::-1]):
+        filt["type"] = "FIR_SYM_1"
+        filt["coeffs"] = coeffs[:n0 + 1]
+
+
+def _evaluate_filter(filt, freqs):
+    """
+    Returns the complex response of a single poles and zeros, FIR or IIR
+    filter (as set up in :meth:`Response._calc_response_numpy`) at the given
+    frequencies, like ``analog_trans()``, ``fir_sym_trans()``,
+    ``fir_asym_trans()`` and ``iir_trans()`` of evalresp.
+    """
+    if filt["type"] == "PZ":
+        if filt["hertz"]:
+            s = 1j * freqs
+        else:
+            s = 2j * pi * freqs
+        num = np.ones(len(freqs), dtype=np.complex128)
+        denom = np.ones(len(freqs), dtype=np.complex128)
+        for zero in filt["zeros"]:
+            num *= s - zero
+        for pole in filt["poles"]:
+            denom *= s - pole
+        return filt["h0"] * num / denom
+
+    coeffs = filt["coeffs"]
+    wsint = 2.0 * pi * freqs * filt["sample_int"]
+    if filt["type"] == "IIR":
+        z = np.exp(-1j * wsint)
+        with np.errstate(all="ignore"):
+            response = np.polyval(coeffs[::-1], z) / \
+                np.polyval(filt["denominator"][::-1], z)
+    elif filt["type"] == "FIR_SYM_1":
+        z = np.exp(1j * wsint)
+        response = 2.0 * np.polyval(coeffs, z).real - coeffs[-1]
+    elif filt["type"] == "FIR_SYM_2":
+        z = np.exp(1j * wsint)
+        response = 2.0 * (np.polyval(coeffs, z) * np.exp(0.5j * wsint)).real
+    elif np.all(coeffs == coeffs[0]):
+        # boxcar, evalresp ignores the normalization in this case
+        with np.errstate(all="ignore"):
+            response = np.sin(wsint / 2.0 * len(coeffs)) / \
+                np.sin(wsint / 2.0) * coeffs[0]
+        response[wsint == 0] = 1.0
+        return response.astype(np.complex128)
+    else:
+        response = np.polyval(coeffs[::-1], np.exp(-1j * wsint))
+    return (filt["h0"] * response).astype(np.complex128)
+
+
 def _adjust_bode_plot_figure(fig, grid=True, show=True):
     """
     Helper function to do final adjustments to Bode plot figure.
@@ -1638,6 +1939,25 @@ def _pitick2latex(x):
     return string
 
 
+def _cache_response(key, value):
+    """
+    Adds a calculated response and its frequencies to the cache of
+    :meth:`Response.get_evalresp_response`, evicting the least recently used
+    responses above ``_RESPONSE_CACHE_MAX_BYTES``.
+    """
+    global _RESPONSES_NBYTES
+    with _RESPONSES_LOCK:
+        # another thread may have calculated the same response meanwhile
+        old = _RESPONSES.pop(key, None)
+        if old is not None:
+            _RESPONSES_NBYTES -= old[0].nbytes + old[1].nbytes
+        _RESPONSES[key] = value
+        _RESPONSES_NBYTES += value[0].nbytes + value[1].nbytes
+        while _RESPONSES_NBYTES > _RESPONSE_CACHE_MAX_BYTES:
+            _, (response, freqs) = _RESPONSES.popitem(last=False)
+            _RESPONSES_NBYTES -= response.nbytes + freqs.nbytes
+
+
 if __name__ == '__main__':
     import doctest
     doctest.testmod(exclude_empty=True)
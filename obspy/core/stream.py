@@ -16,7 +16,9 @@ from future.utils import native_str
 
 import copy
 import fnmatch
+import itertools
 import math
+import multiprocessing
 import os
 import pickle
 import warnings
@@ -29,9 +31,11 @@ from pkg_resources import load_entry_point
 import numpy as np
 
 from obspy.core import compatibility
-from obspy.core.trace import Trace
+from obspy.core.trace import (Trace, _get_processing_info,
+                              _get_remove_response_info,
+                              _remove_response_batch)
 from obspy.core.utcdatetime import UTCDateTime
-from obspy.core.util import NamedTemporaryFile
+from obspy.core.util import NamedTemporaryFile, create_empty_data_chunk
 from obspy.core.util.base import (ENTRY_POINTS, _get_function_from_entry_point,
                                   _read_from_plugin)
 from obspy.core.util.decorator import (deprecated_keywords,
@@ -42,7 +46,7 @@ from obspy.core.util.decorator import (deprecated_keywords,
 @map_example_filename("pathname_or_url")
 def read(pathname_or_url=None, format=None, headonly=False, starttime=None,
          endtime=None, nearest_sample=True, dtype=None, apply_calib=False,
-         **kwargs):
+         workers=None, executor=None, **kwargs):
     """
     Read waveform files into an ObsPy Stream object.
 
@@ -84,6 +88,20 @@ def read(pathname_or_url=None, format=None, headonly=False, starttime=None,
     :type apply_calib: bool, optional
     :param apply_calib: Automatically applies the calibration factor
         ``trace.stats.calib`` for each trace, if set. Defaults to ``False``.
+    :type workers: int, optional
+    :param workers: Only used if a file name with wildcards matches multiple
+        files. If given, the files are read in parallel using a
+        :class:`multiprocessing.Pool` with the given number of worker
+        processes. The traces are returned in the same order as when reading
+        the files one after another. Files that cannot be read do not abort
+        reading the other files, a warning listing all failed files is shown
+        instead.
+    :type executor: optional
+    :param executor: Same as ``workers`` but uses the given pool to read the
+        files. Any object with an order preserving ``map()`` method works,
+        e.g. :class:`multiprocessing.pool.ThreadPool`,
+        :class:`multiprocessing.Pool` or the executors of
+        :mod:`concurrent.futures`. The pool is not shut down afterwards.
     :param kwargs: Additional keyword arguments passed to the underlying
         waveform reader method.
     :return: An ObsPy :class:`~obspy.core.stream.Stream` object.
@@ -227,8 +245,13 @@ def read(pathname_or_url=None, format=None, headonly=False, starttime=None,
     else:
         # some file name
         pathname = pathname_or_url
-        for file in sorted(glob(pathname)):
-            st.extend(_read(file, format, headonly, **kwargs).traces)
+        if workers or executor is not None:
+            st.extend(_read_files(sorted(glob(pathname)), format, headonly,
+                                  workers=workers, executor=executor,
+                                  **kwargs))
+        else:
+            for file in sorted(glob(pathname)):
+                st.extend(_read(file, format, headonly, **kwargs).traces)
         if len(st) == 0:
             # try to give more specific information why the stream is empty
             if has_magic(pathname) and not glob(pathname):
@@ -279,6 +302,195 @@ def _read(filename, format=None, headonly=False, **kwargs):
     return stream
 
 
+# formats whose plug-ins only read the data between starttime and endtime
+_RANGE_READ_FORMATS = ('MSEED',)
+
+
+@map_example_filename("pathname")
+def iter_read(pathname, chunk=3600, overlap=0, starttime=None, endtime=None,
+              format=None, **kwargs):
+    """
+    Iterate over waveform files in chunks instead of reading everything at
+    once.
+
+    Using this generator, the memory needed for processing long continuous
+    data sets is bounded by the chunk length instead of the length of the
+    whole data set.
+
+    :type pathname: str
+    :param pathname: File name, wildcards are allowed.
+    :type chunk: float or ``None``, optional
+    :param chunk: Length of the yielded chunks in seconds. If ``None``, one
+        :class:`~obspy.core.stream.Stream` is yielded for each file. Defaults
+        to one hour.
+    :type overlap: float, optional
+    :param overlap: Overlap of consecutive chunks in seconds. Defaults to
+        ``0``.
+    :type starttime: :class:`~obspy.core.utcdatetime.UTCDateTime`, optional
+    :param starttime: Start time of the first chunk. Defaults to the earliest
+        start time of all files.
+    :type endtime: :class:`~obspy.core.utcdatetime.UTCDateTime`, optional
+    :param endtime: End time of the last chunk. Defaults to the latest end
+        time of all files.
+    :type format: str, optional
+    :param format: Format of the files, see :func:`read`.
+    :param kwargs: Additional keyword arguments passed to :func:`read`, e.g.
+        ``mmap=True`` or ``index=True`` for MiniSEED files.
+    :rtype: generator of :class:`~obspy.core.stream.Stream`
+
+    All files are first scanned with ``headonly=True`` to determine their
+    time spans. Files in a format supporting range reads (MiniSEED) are then
+    read again for each chunk overlapping with them, passing ``starttime``
+    and ``endtime`` on to the file format plug-in so that only the records
+    in the chunk are unpacked. All other files are read completely once,
+    when the first chunk overlapping with them is reached, and kept in
+    memory until the chunks have moved past their end time. The memory
+    needed is therefore bounded by the size of the files overlapping with a
+    chunk rather than by the chunk length for such formats. Without overlap,
+    a sample lying exactly on the border between two chunks is only part of
+    the later chunk. Chunks without any data are skipped.
+
+    .. rubric:: Example
+
+    >>> from obspy.core.stream import iter_read
+    >>> for st in iter_read("/path/to/slist.ascii", chunk=5):
+    ...     print(st)  # doctest: +ELLIPSIS
+    1 Trace(s) in Stream:
+    XX.TEST..BHZ | 2008-01-15T00:00:00.025000Z - ... | 40.0 Hz, 200 samples
+    1 Trace(s) in Stream:
+    XX.TEST..BHZ | 2008-01-15T00:00:05.025000Z - ... | 40.0 Hz, 200 samples
+    1 Trace(s) in Stream:
+    XX.TEST..BHZ | 2008-01-15T00:00:10.025000Z - ... | 40.0 Hz, 200 samples
+    1 Trace(s) in Stream:
+    XX.TEST..BHZ | 2008-01-15T00:00:15.025000Z - ... | 40.0 Hz, 35 samples
+    """
+    filenames = sorted(glob(pathname))
+    if not filenames:
+        raise Exception("No file matching file pattern: %s" % pathname)
+    if chunk is None:
+        for filename in filenames:
+            st = read(filename, format=format, starttime=starttime,
+                      endtime=endtime, **kwargs)
+            if len(st):
+                yield st
+        return
+    if chunk <= 0 or overlap < 0 or overlap >= chunk:
+        msg = "chunk has to be positive and larger than overlap"
+        raise ValueError(msg)
+    # scan the time spans of all files
+    spans = []
+    for filename in filenames:
+        st = read(filename, format=format, headonly=True)
+        if not len(st):
+            continue
+        spans.append((filename, st[0].stats._format,
+                      min(tr.stats.starttime for tr in st),
+                      max(tr.stats.endtime for tr in st)))
+    if not spans:
+        return
+    if starttime is None:
+        starttime = min(span[2] for span in spans)
+    if endtime is None:
+        endtime = max(span[3] for span in spans)
+    # files without range reads, read once and sliced for each chunk
+    cache = {}
+    t1 = starttime
+    while t1 <= endtime:
+        t2 = t1 + chunk
+        last = t2 >= endtime
+        if last:
+            t2 = endtime
+        for filename in list(cache):
+            if cache[filename][1] < t1:
+                del cache[filename]
+        st = Stream()
+        for filename, file_format, file_start, file_end in spans:
+            if file_start > t2 or file_end < t1:
+                continue
+            if file_format in _RANGE_READ_FORMATS:
+                st.extend(read(filename, format=format, starttime=t1,
+                               endtime=t2, nearest_sample=False,
+                               **kwargs).traces)
+                continue
+            if filename not in cache:
+                cache[filename] = (read(filename, format=format, **kwargs),
+                                   file_end)
+            for trace in cache[filename][0]:
+                tr = copy.copy(trace)
+                tr.stats = copy.deepcopy(trace.stats)
+                tr.trim(starttime=t1, endtime=t2, nearest_sample=False)
+                if len(tr):
+                    tr.data = tr.data.copy()
+                    st.append(tr)
+        if not last:
+            # a sample exactly at the end belongs to the next chunk
+            for tr in st:
+                if len(tr) and tr.stats.endtime >= t2:
+                    tr.data = tr.data[:-1]
+            st.traces = [tr for tr in st if len(tr)]
+        if len(st):
+            yield st
+        if last:
+            break
+        t1 = t1 + (chunk - overlap)
+
+
+def _read_files(filenames, format=None, headonly=False, workers=None,
+                executor=None, **kwargs):
+    """
+    Read multiple files in parallel.
+
+    Errors when reading single files are collected and shown as a single
+    warning after all files have been read.
+
+    :type filenames: list of str
+    :param filenames: Files to read.
+    :type workers: int, optional
+    :param workers: Number of worker processes of the
+        :class:`multiprocessing.Pool` used if no ``executor`` is given.
+    :param executor: Pool with an order preserving ``map()`` method.
+    :rtype: list of :class:`~obspy.core.trace.Trace`
+    :return: All traces in the order of the given files.
+    """
+    args = [(filename, format, headonly, kwargs) for filename in filenames]
+    if executor is not None:
+        results = list(executor.map(_read_file_in_worker, args))
+    else:
+        pool = multiprocessing.Pool(processes=workers)
+        try:
+            results = pool.map(_read_file_in_worker, args)
+        finally:
+            pool.close()
+            pool.join()
+    traces = []
+    errors = []
+    for filename, (stream, error) in zip(filenames, results):
+        if error is not None:
+            errors.append("%s: %s" % (filename, error))
+            continue
+        traces.extend(stream.traces)
+    if errors:
+        msg = "Could not read %i file(s):\n%s" % (
+            len(errors), "\n".join(errors))
+        warnings.warn(msg, UserWarning)
+    return traces
+
+
+def _read_file_in_worker(args):
+    """
+    Read a single file, used by :func:`_read_files`.
+
+    Returns a tuple of the read stream and ``None`` or ``None`` and the
+    error message if reading failed. Exceptions are not passed on as they
+    cannot always be transferred between processes.
+    """
+    filename, format, headonly, kwargs = args
+    try:
+        return _read(filename, format, headonly, **kwargs), None
+    except Exception as e:
+        return None, "%s: %s" % (e.__class__.__name__, e)
+
+
 def _createExampleStream(headonly=False):
     """
     Create an example stream.
@@ -1775,58 +1987,34 @@ class Stream(object):
         The ``method`` argument controls the handling of overlapping data
         values.
         """
-        def listsort(order, current):
-            """
-            Helper method for keeping trace's ordering
-            """
-            try:
-                return order.index(current)
-            except ValueError:
-                return -1
-
         self._cleanup(**kwargs)
         if method == -1:
             return
         # check sampling rates and dtypes
         self._mergeChecks()
         # remember order of traces
-        order = [id(i) for i in self.traces]
+        order = dict((id(tr), i) for i, tr in enumerate(self.traces))
         # order matters!
         self.sort(keys=['network', 'station', 'location', 'channel',
                         'starttime', 'endtime'])
         # build up dictionary with with lists of traces with same ids
         traces_dict = {}
-        # using pop() and try-except saves memory
-        try:
-            while True:
-                trace = self.traces.pop(0)
-                # skip empty traces
-                if len(trace) == 0:
-                    continue
-                _id = trace.getId()
-                if _id not in traces_dict:
-                    traces_dict[_id] = [trace]
-                else:
-                    traces_dict[_id].append(trace)
-        except IndexError:
-            pass
+        for trace in self.traces:
+            # skip empty traces
+            if len(trace) == 0:
+                continue
+            traces_dict.setdefault(trace.getId(), []).append(trace)
         # clear traces of current stream
         self.traces = []
         # loop through ids
         for _id in traces_dict.keys():
-            cur_trace = traces_dict[_id].pop(0)
-            # loop through traces of same id
-            for _i in range(len(traces_dict[_id])):
-                trace = traces_dict[_id].pop(0)
-                # disable sanity checks because there are already done
-                cur_trace = cur_trace.__add__(
-                    trace, method, fill_value=fill_value, sanity_checks=False,
-                    interpolation_samples=interpolation_samples)
-            self.traces.append(cur_trace)
+            self.traces.append(_merge_trace_group(
+                traces_dict[_id], method=method, fill_value=fill_value,
+                interpolation_samples=interpolation_samples))
 
         # trying to restore order, newly created traces are placed at
         # start
-        self.traces.sort(key=lambda x: listsort(order, id(x)))
+        self.traces.sort(key=lambda x: order.get(id(x), -1))
         return self
 
     def simulate(self, paz_remove=None, paz_simulate=None,
@@ -2897,7 +3085,9 @@ seismometer_correction_simulation.html#using-a-resp-file>`_.
                     raise
         return skipped_traces
 
-    def remove_response(self, *args, **kwargs):
+    def remove_response(self, output="VEL", water_level=60, pre_filt=None,
+                        zero_mean=True, taper=True, taper_fraction=0.05,
+                        batch=True, workers=None, executor=None, **kwargs):
         """
         Deconvolve instrument response for all Traces in Stream.
 
@@ -2905,6 +3095,27 @@ seismometer_correction_simulation.html#using-a-resp-file>`_.
         :meth:`~obspy.core.trace.Trace.remove_response` method of
         :class:`~obspy.core.trace.Trace`.
 
+        By default, traces with the same number of samples, sampling rate and
+        response are processed together: their data is stacked and tapered,
+        transformed, deconvolved and transformed back in single vectorized
+        operations and the frequency response is only evaluated once per
+        group. The results are the same as when processing the traces one by
+        one.
+
+        :type batch: bool
+        :param batch: Process traces with equal number of samples, sampling
+            rate and response together. If ``False``, traces are processed
+            one by one.
+        :type workers: int, optional
+        :param workers: Process the groups of traces in a
+            :class:`multiprocessing.Pool` with the given number of worker
+            processes (implies ``batch=True``). The data of only two groups
+            per worker is stacked at a time.
+        :param executor: Same as ``workers`` but uses the given pool with an
+            order preserving ``map()`` method, e.g.
+            :class:`multiprocessing.pool.ThreadPool` or the executors of
+            :mod:`concurrent.futures`. The pool is not shut down afterwards.
+
         >>> from obspy import read
         >>> st = read()
         >>> # Response object is already attached to example data:
@@ -2936,11 +3147,219 @@ seismometer_correction_simulation.html#using-a-resp-file>`_.
             original data, use :meth:`~obspy.core.stream.Stream.copy` to create
             a copy of your stream object.
         """
+        options = dict(output=output, water_level=water_level,
+                       pre_filt=pre_filt, zero_mean=zero_mean, taper=taper,
+                       taper_fraction=taper_fraction, **kwargs)
+        if not batch and workers is None and executor is None:
+            for tr in self:
+                tr.remove_response(**options)
+            return self
+
+        # group traces by number of samples, sampling interval and response
+        groups = {}
         for tr in self:
-            tr.remove_response(*args, **kwargs)
+            if not _can_remove_response_batch(tr):
+                tr.remove_response(**options)
+                continue
+            key = (tr.stats.npts, tr.stats.delta,
+                   tr.stats.response._get_fingerprint())
+            groups.setdefault(key, []).append(tr)
+
+        def batches():
+            # stack the data of the traces lazily, limiting the size of the
+            # stacked data arrays
+            for (npts, delta, _), traces in groups.items():
+                rows = max(1, _REMOVE_RESPONSE_BATCH_SAMPLES // max(npts, 1))
+                for i in range(0, len(traces), rows):
+                    chunk = traces[i:i + rows]
+                    data = np.vstack([tr.data for tr in chunk])
+                    yield chunk, (data, delta, chunk[0].stats.response,
+                                  options)
+
+        remove_response = Trace.remove_response.__wrapped__
+        info = _get_remove_response_info(**options)
+
+        def write_back(chunk, data):
+            for tr, tr_data in zip(chunk, data):
+                tr.data = tr_data
+                tr._addProcessingInfo(info)
+                tr._addProcessingInfo(
+                    _get_processing_info(remove_response, (tr,), options))
+
+        if executor is None and workers is None:
+            for chunk, args in batches():
+                write_back(chunk, _remove_response_in_worker(args))
+            return self
+
+        # only hand over a few batches per worker at a time so that not all
+        # stacked data arrays and results are in memory at once
+        pool = executor
+        if pool is None:
+            pool = multiprocessing.Pool(processes=workers)
+        window = 2 * (workers or multiprocessing.cpu_count())
+        try:
+            iterator = batches()
+            while True:
+                part = list(itertools.islice(iterator, window))
+                if not part:
+                    break
+                results = pool.map(_remove_response_in_worker,
+                                   [args for _, args in part])
+                for (chunk, _), data in zip(part, results):
+                    write_back(chunk, data)
+                del part, results
+        finally:
+            if executor is None:
+                pool.close()
+                pool.join()
         return self
 
 
+# Maximum number of samples of all traces stacked into a single array by
+# Stream.remove_response().
+_REMOVE_RESPONSE_BATCH_SAMPLES = 2 ** 22
+
+
+def _can_remove_response_batch(trace):
+    """
+    Checks if the response of a trace can be removed by
+    :func:`~obspy.core.trace._remove_response_batch`. All other traces (no
+    or polynomial response, masked data) are handled by
+    :meth:`~obspy.core.trace.Trace.remove_response` itself.
+    """
+    from obspy.core.inventory import Response, PolynomialResponseStage
+    response = trace.stats.get("response")
+    if not isinstance(response, Response) or \
+            isinstance(trace.data, np.ma.MaskedArray):
+        return False
+    if not response.response_stages and response.instrument_polynomial:
+        return False
+    if len(response.response_stages) == 1 and \
+            isinstance(response.response_stages[0], PolynomialResponseStage):
+        return False
+    return True
+
+
+def _remove_response_in_worker(args):
+    """
+    Remove the response from a stack of traces, used by
+    :meth:`Stream.remove_response`.
+    """
+    data, delta, response, options = args
+    return _remove_response_batch(data, delta, response, **options)
+
+
+def _merge_trace_group(traces, method=0, fill_value=None,
+                       interpolation_samples=0):
+    """
+    Merge a list of traces with the same id into a single trace.
+
+    The traces have to be sorted by start and end time and need to pass
+    :meth:`~obspy.core.stream.Stream._mergeChecks`. The result is identical
+    to consecutively adding all traces via
+    :meth:`~obspy.core.trace.Trace.__add__`, but instead of creating a new
+    data array for each added trace, the data chunks are collected and the
+    merged data array is allocated once at the end. Overlapping or contained
+    traces are handed to :meth:`~obspy.core.trace.Trace.__add__` together
+    with only the part of the data merged so far that they overlap (plus two
+    samples before it for the interpolation of ``method=1``), so the merged
+    samples are not copied again for every overlap.
+
+    :type traces: list of :class:`~obspy.core.trace.Trace`
+    :param traces: Sorted, non-empty traces sharing the same id.
+    :rtype: :class:`~obspy.core.trace.Trace`
+    :return: The merged trace. If only a single trace is given, the trace
+        itself is returned.
+
+    See :meth:`~obspy.core.stream.Stream.merge` for all other parameters.
+    """
+    cur = traces[0]
+    sr = cur.stats.sampling_rate
+    delta_t = cur.stats.delta
+    starttime = cur.stats.starttime
+    chunks = [cur.data]
+    npts = len(cur.data)
+    for trace in traces[1:]:
+        endtime = starttime + (npts - 1) * delta_t
+        delta = (trace.stats.starttime - endtime) * sr
+        delta = int(compatibility.round_away(delta)) - 1
+        if delta < 0:
+            # overlap or contained trace - depends on the actual data merged
+            # so far, so leave it to Trace.__add__ operating on the merged
+            # data from two samples before the added trace on
+            offset = (trace.stats.starttime - starttime) * sr
+            offset = max(int(compatibility.round_away(offset)) - 2, 0)
+            tail = cur.__class__(header=copy.deepcopy(cur.stats))
+            tail.data = _pop_chunks(chunks, npts - offset)
+            tail.stats.starttime = starttime + offset * delta_t
+            # disable sanity checks because there are already done
+            tail = tail.__add__(trace, method, fill_value=fill_value,
+                                sanity_checks=False,
+                                interpolation_samples=interpolation_samples)
+            chunks.append(tail.data)
+            npts = offset + len(tail.data)
+            continue
+        if delta > 0:
+            # gap - use fixed value or interpolate in between
+            if fill_value == "latest":
+                value = chunks[-1][-1]
+            elif fill_value == "interpolate":
+                value = (chunks[-1][-1], trace.data[0])
+            else:
+                value = fill_value
+            chunks.append(
+                create_empty_data_chunk(delta, cur.data.dtype, value))
+            npts += delta
+        chunks.append(trace.data)
+        npts += len(trace.data)
+    return _concatenate_chunks(cur, chunks)
+
+
+def _pop_chunks(chunks, npts):
+    """
+    Remove the last npts samples from a list of data chunks and return them
+    as a single array.
+    """
+    tail = []
+    while npts > 0:
+        chunk = chunks.pop()
+        if len(chunk) > npts:
+            chunks.append(chunk[:-npts])
+            chunk = chunk[-npts:]
+        tail.append(chunk)
+        npts -= len(chunk)
+    tail.reverse()
+    if len(tail) == 1:
+        return tail[0]
+    if any(isinstance(_i, np.ma.masked_array) for _i in tail):
+        return np.ma.concatenate(tail)
+    return np.concatenate(tail)
+
+
+def _concatenate_chunks(trace, chunks):
+    """
+    Create a new trace with the header of the given trace and all data chunks
+    concatenated in a single allocation.
+
+    Returns the given trace itself if its data is the only chunk.
+    """
+    if len(chunks) == 1 and chunks[0] is trace.data:
+        return trace
+    out = trace.__class__(header=copy.deepcopy(trace.stats))
+    # merge chunks depending on NumPy array type
+    if any(isinstance(_i, np.ma.masked_array) for _i in chunks):
+        data = np.ma.concatenate(chunks)
+    else:
+        data = np.concatenate(chunks)
+        data = np.require(data, dtype=trace.data.dtype)
+    # Check if we can downgrade to normal ndarray
+    if isinstance(data, np.ma.masked_array) and \
+       np.ma.count_masked(data) == 0:
+        data = data.compressed()
+    out.data = data
+    return out
+
+
 def _is_pickle(filename):  # @UnusedVariable
     """
     Check whether a file is a pickled ObsPy Stream file.
@@ -103,6 +103,54 @@ class ResponseTestCase(unittest.TestCase):
                 self.assertTrue(np.allclose(seed_response, xml_response,
                                             rtol=1E-5))
 
+    def test_numpy_response_matches_evalresp(self):
+        """
+        Responses evaluated with NumPy are the same as the ones calculated
+        by evalresp.
+        """
+        filenames = ["IRIS_single_channel_with_response", "XM.05", "AU.MEEK"]
+        freqs = np.linspace(0, 10, 2049)
+        for filename in filenames:
+            xml_filename = os.path.join(self.data_dir,
+                                        filename + os.path.extsep + "xml")
+            response = read_inventory(xml_filename)[0][0][0].response
+            stages = sorted(response.response_stages,
+                            key=lambda x: x.stage_sequence_number)
+            for unit in ["DISP", "VEL", "ACC"]:
+                numpy_response = response._calc_response_numpy(
+                    stages, freqs, unit)
+                self.assertIsNotNone(numpy_response)
+                with CatchOutput():
+                    evalresp_response = response._call_evalresp(
+                        stages, freqs, unit)
+                np.testing.assert_allclose(
+                    numpy_response, evalresp_response, rtol=1E-10,
+                    atol=1E-10 * np.abs(evalresp_response).max())
+
+    def test_response_cache(self):
+        """
+        Cached responses are returned as copies and are recalculated if the
+        response is changed.
+        """
+        response = read_inventory()[0][0][0].response
+        response_1, freqs_1 = response.get_evalresp_response(0.01, 1024)
+        response_1[:] = 0
+        response_2, freqs_2 = response.get_evalresp_response(0.01, 1024)
+        self.assertTrue(np.all(response_2[1:] != 0))
+        np.testing.assert_array_equal(freqs_1, freqs_2)
+        # different output units or stages are not mixed up
+        response_3, _ = response.get_evalresp_response(0.01, 1024,
+                                                       output="DISP")
+        response_4, _ = response.get_evalresp_response(0.01, 1024,
+                                                       start_stage=1,
+                                                       end_stage=1)
+        self.assertFalse(np.allclose(response_2, response_3))
+        self.assertFalse(np.allclose(response_2, response_4))
+        # changing the response invalidates the cached spectrum
+        response.response_stages[0].stage_gain *= 2
+        response_5, _ = response.get_evalresp_response(0.01, 1024)
+        np.testing.assert_allclose(response_5, response_2 * 2, rtol=1E-10)
+
     def test_pitick2latex(self):
         self.assertEqual(_pitick2latex(3 * pi / 2), r'$\frac{3\pi}{2}$')
         self.assertEqual(_pitick2latex(2 * pi / 2), r'$\pi$')
@@ -8,14 +8,17 @@ import pickle
 import unittest
 import warnings
 from copy import deepcopy
+from multiprocessing.pool import ThreadPool
 
 import numpy as np
 
 from obspy import Stream, Trace, UTCDateTime, read
 from obspy.core.compatibility import mock
-from obspy.core.stream import _is_pickle, _read_pickle, _write_pickle
+from obspy.core.stream import (_is_pickle, _read, _read_pickle,
+                               _write_pickle, iter_read)
 from obspy.core.util.attribdict import AttribDict
 from obspy.core.util.base import NamedTemporaryFile, get_scipy_version
+from obspy.core.util.misc import TemporaryWorkingDirectory
 from obspy.io.xseed import Parser
 
 
@@ -1661,6 +1664,114 @@ class StreamTestCase(unittest.TestCase):
         np.testing.assert_array_almost_equal(
             st1[0].data[:-1], st2[0].data[:-1], decimal=5)
 
+    def test_read_parallel(self):
+        """
+        Reading multiple files in parallel has to return the traces in the
+        same order as reading them one after another and collect errors.
+        """
+        st = read()
+        st += read()[::-1]
+        with TemporaryWorkingDirectory():
+            for i, tr in enumerate(st):
+                tr.stats.station = "S%i" % i
+                tr.write("%02i.sac" % i, format="SAC")
+            expected = read("*.sac")
+            self.assertEqual([tr.id for tr in expected],
+                             [tr.id for tr in st])
+            got = read("*.sac", workers=2)
+            self.assertEqual(got, expected)
+            t1 = st[0].stats.starttime + 1
+            t2 = st[0].stats.endtime - 1
+            pool = ThreadPool(2)
+            try:
+                got = read("*.sac", executor=pool, starttime=t1, endtime=t2)
+            finally:
+                pool.close()
+                pool.join()
+            self.assertEqual(got, read("*.sac", starttime=t1, endtime=t2))
+            # a broken file does not abort reading the other files
+            with open("03.sac", "wb") as fh:
+                fh.write(b"garbage" * 10)
+            with warnings.catch_warnings(record=True) as w:
+                warnings.simplefilter("always")
+                got = read("*.sac", workers=2, format="SAC")
+            self.assertEqual(len(got), 5)
+            self.assertEqual(len(w), 1)
+            self.assertTrue("03.sac" in str(w[0].message))
+
+    def test_iter_read(self):
+        """
+        Tests iterating over files in time chunks and per file.
+        """
+        tr = Trace(data=np.arange(1000, dtype=np.float64),
+                   header={"starttime": UTCDateTime(2012, 1, 1),
+                           "sampling_rate": 10.0, "station": "A"})
+        with TemporaryWorkingDirectory():
+            tr.slice(endtime=tr.stats.starttime + 49.9).write(
+                "1.sac", format="SAC")
+            tr.slice(starttime=tr.stats.starttime + 50).write(
+                "2.sac", format="SAC")
+            # per file
+            chunks = list(iter_read("*.sac", chunk=None))
+            self.assertEqual([len(st[0]) for st in chunks], [500, 500])
+            # chunks without overlap contain every sample exactly once
+            chunks = list(iter_read("*.sac", chunk=30))
+            self.assertEqual(len(chunks), 4)
+            for i, st in enumerate(chunks):
+                st.merge()
+                self.assertEqual(len(st), 1)
+                self.assertEqual(st[0].stats.starttime,
+                                 tr.stats.starttime + i * 30)
+            data = np.concatenate([st[0].data for st in chunks])
+            np.testing.assert_array_equal(data, tr.data)
+            # overlapping chunks within a given time span
+            t = tr.stats.starttime + 10
+            chunks = list(iter_read("*.sac", chunk=20, overlap=5,
+                                    starttime=t, endtime=t + 50))
+            self.assertEqual(
+                [st[0].stats.starttime - t for st in chunks], [0, 15, 30])
+            for st in chunks:
+                st.merge()
+            # the last chunk includes the sample at the given end time
+            self.assertEqual([len(st[0]) for st in chunks], [200, 200, 201])
+            self.assertEqual(chunks[-1][0].stats.endtime, t + 50)
+            self.assertRaises(ValueError, list,
+                              iter_read("*.sac", chunk=10, overlap=10))
+
+    def test_iter_read_once(self):
+        """
+        Files without range reads are read only once by iter_read, files
+        with range reads once per chunk. Both give the same chunks.
+        """
+        tr = Trace(data=np.arange(1000, dtype=np.int32),
+                   header={"starttime": UTCDateTime(2012, 1, 1),
+                           "sampling_rate": 10.0, "station": "A"})
+        with TemporaryWorkingDirectory():
+            for i in range(2):
+                tr2 = tr.slice(starttime=tr.stats.starttime + i * 50,
+                               endtime=tr.stats.starttime + i * 50 + 49.9)
+                tr2.write("%d.sac" % i, format="SAC")
+                tr2.write("%d.mseed" % i, format="MSEED")
+            chunks = {}
+            for ext in ("sac", "mseed"):
+                with mock.patch("obspy.core.stream._read",
+                                side_effect=_read) as patch:
+                    chunks[ext] = list(iter_read("*." + ext, chunk=7,
+                                                 overlap=2))
+                data_reads = [c for c in patch.call_args_list
+                              if not c[0][2]]
+                self.assertEqual(len(data_reads),
+                                 2 if ext == "sac" else 21)
+        self.assertEqual(len(chunks["sac"]), len(chunks["mseed"]))
+        for st1, st2 in zip(chunks["sac"], chunks["mseed"]):
+            self.assertEqual(len(st1), len(st2))
+            for tr1, tr2 in zip(st1, st2):
+                self.assertEqual(tr1.stats.starttime, tr2.stats.starttime)
+                np.testing.assert_array_equal(tr1.data, tr2.data)
+        # chunks do not share memory with each other
+        chunks["sac"][0][0].data[:] = -1
+        self.assertEqual(chunks["sac"][1][0].data[0], 50)
+
     def test_read(self):
         """
         Testing read function.
@@ -1758,6 +1869,78 @@ class StreamTestCase(unittest.TestCase):
         st.merge(fill_value='interpolate')
         self.assertEqual(len(st), 1)
 
+    def test_merge_many_fragments_equals_consecutive_adding(self):
+        """
+        Merging many fragments with gaps, exact fits and overlaps has to give
+        the same result as consecutively adding the (cleaned up) traces.
+        """
+        np.random.seed(815)
+        traces = []
+        t = UTCDateTime(2000, 1, 1)
+        for i in range(200):
+            npts = np.random.randint(1, 20)
+            traces.append(Trace(
+                data=np.random.randint(0, 5, npts).astype(np.int32),
+                header={'starttime': t, 'station': 'A'}))
+            t += npts + np.random.randint(-3, 4)
+        for method, fill_value in [(0, None), (0, 0), (0, 'latest'),
+                                   (1, None), (1, 'interpolate')]:
+            st = Stream(traces=[tr.copy() for tr in traces])
+            st.merge(method=method, fill_value=fill_value)
+            self.assertEqual(len(st), 1)
+            cleaned = Stream(traces=[tr.copy() for tr in traces])
+            cleaned.merge(method=-1)
+            sorted_traces = sorted(cleaned, key=lambda x: (x.stats.starttime,
+                                                           x.stats.endtime))
+            expected = sorted_traces[0]
+            for tr in sorted_traces[1:]:
+                expected = expected.__add__(tr, method=method,
+                                            fill_value=fill_value)
+            self.assertEqual(st[0].stats, expected.stats)
+            self.assertEqual(type(st[0].data), type(expected.data))
+            np.testing.assert_array_equal(st[0].data, expected.data)
+            if isinstance(expected.data, np.ma.masked_array):
+                np.testing.assert_array_equal(st[0].data.mask,
+                                              expected.data.mask)
+
+    def test_merge_duplicate_and_overlapping_packets(self):
+        """
+        Merging packets with duplicates and overlaps of differing data has to
+        give the same result as consecutively adding the traces.
+        """
+        np.random.seed(816)
+        data = np.random.randint(0, 100, 1000).astype(np.int32)
+        t = UTCDateTime(2000, 1, 1)
+        traces = []
+        for i in range(0, 1000, 10):
+            tr = Trace(data=data[i:i + 15].copy(),
+                       header={'starttime': t + i, 'station': 'A'})
+            if i % 30 == 0:
+                # overlap with differing data
+                tr.data[-3:] += 1
+            traces.append(tr)
+            # duplicate packet
+            traces.append(tr.copy())
+        for method, kwargs in [(0, {}), (0, {'fill_value': 0}),
+                               (1, {}), (1, {'interpolation_samples': 2}),
+                               (1, {'interpolation_samples': -1})]:
+            st = Stream(traces=[tr.copy() for tr in traces])
+            st.merge(method=method, **kwargs)
+            self.assertEqual(len(st), 1)
+            cleaned = Stream(traces=[tr.copy() for tr in traces])
+            cleaned.merge(method=-1)
+            sorted_traces = sorted(cleaned, key=lambda x: (x.stats.starttime,
+                                                           x.stats.endtime))
+            expected = sorted_traces[0]
+            for tr in sorted_traces[1:]:
+                expected = expected.__add__(tr, method=method, **kwargs)
+            self.assertEqual(st[0].stats, expected.stats)
+            self.assertEqual(type(st[0].data), type(expected.data))
+            np.testing.assert_array_equal(st[0].data, expected.data)
+            if isinstance(expected.data, np.ma.masked_array):
+                np.testing.assert_array_equal(st[0].data.mask,
+                                              expected.data.mask)
+
     def test_rotate(self):
         """
         Testing the rotate method.
@@ -2106,6 +2289,73 @@ class StreamTestCase(unittest.TestCase):
         st2.remove_response(pre_filt=(0.1, 0.5, 30, 50))
         self.assertEqual(st1, st2)
 
+    def test_remove_response_batch(self):
+        """
+        Removing the response from groups of traces with equal length,
+        sampling rate and response gives the same results and processing
+        information as removing it trace by trace.
+        """
+        st = read()
+        st += read()
+        for tr in st[3:]:
+            tr.data = np.roll(tr.data, 100)
+        st += st[0].copy().trim(endtime=st[0].stats.starttime + 10)
+        kwargs = dict(output="DISP", pre_filt=(0.1, 0.5, 30, 50),
+                      end_stage=3)
+        expected = st.copy()
+        for tr in expected:
+            tr.remove_response(**kwargs)
+        got = st.copy().remove_response(**kwargs)
+        self.assertEqual(expected, got)
+        got = st.copy().remove_response(batch=False, **kwargs)
+        self.assertEqual(expected, got)
+        got = st.copy().remove_response(workers=2, **kwargs)
+        self.assertEqual(expected, got)
+        pool = ThreadPool(2)
+        try:
+            got = st.copy().remove_response(executor=pool, **kwargs)
+        finally:
+            pool.close()
+            pool.join()
+        self.assertEqual(expected, got)
+        # traces without response still raise
+        st[2].stats.pop("response")
+        self.assertRaises(KeyError, st.remove_response)
+
+    def test_remove_response_threads(self):
+        """
+        Removing the response of many traces with different responses in a
+        thread pool shares the response cache between the threads.
+        """
+        from obspy.core.inventory import response
+        st = Stream()
+        for i in range(100):
+            tr = read()[0]
+            tr.stats.response = deepcopy(tr.stats.response)
+            tr.stats.response.response_stages[0].stage_gain *= 1.0 + 1e-3 * i
+            st += tr
+        expected = st.copy()
+        for tr in expected:
+            tr.remove_response()
+        with response._RESPONSES_LOCK:
+            response._RESPONSES.clear()
+            response._RESPONSES_NBYTES = 0
+        max_bytes = response._RESPONSE_CACHE_MAX_BYTES
+        # force evictions while other threads use the cache
+        response._RESPONSE_CACHE_MAX_BYTES = 1024 ** 2
+        pool = ThreadPool(8)
+        try:
+            got = st.copy().remove_response(executor=pool)
+        finally:
+            pool.close()
+            pool.join()
+            response._RESPONSE_CACHE_MAX_BYTES = max_bytes
+        self.assertEqual(expected, got)
+        nbytes = sum(resp.nbytes + freqs.nbytes
+                     for resp, freqs in response._RESPONSES.values())
+        self.assertEqual(response._RESPONSES_NBYTES, nbytes)
+        self.assertLessEqual(nbytes, 1024 ** 2)
+
     def test_interpolate(self):
         """
         Tests that the interpolate command is called for all traces of a
@@ -3,11 +3,17 @@ from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
 from future.builtins import *  # NOQA
 
+import io
 import os
 import shutil
 import unittest
 
-from obspy.core.util.base import NamedTemporaryFile, get_matplotlib_version
+from obspy.core.util.base import (ENTRY_POINTS, _FORMAT_BY_EXTENSION,
+                                  _PLUGIN_FUNCTIONS, NamedTemporaryFile,
+                                  _detect_format, _get_format_candidates,
+                                  _guess_formats,
+                                  _read_from_plugin, _read_signature,
+                                  get_example_file, get_matplotlib_version)
 from obspy.core.util.testing import ImageComparison, ImageComparisonException
 
 # checking for matplotlib
@@ -115,6 +121,96 @@ class UtilBaseTestCase(unittest.TestCase):
         # check that temp file is deleted
         self.assertFalse(os.path.exists(ic.name))
 
+    def test_format_detection_fast_path(self):
+        """
+        Tests guessing formats from the first bytes of example files and
+        the ordering of the format candidates.
+        """
+        for filename, format in [("test.mseed", "MSEED"),
+                                 ("test.sac", "SAC"),
+                                 ("loc_RJOB20050831023349.z", "GSE2"),
+                                 ("IRIS_single_channel_with_response.xml",
+                                  "STATIONXML"),
+                                 ("qml-example-1.2-RC3.xml", "QUAKEML")]:
+            filename = get_example_file(filename)
+            with open(filename, "rb") as fh:
+                signature = fh.read(512)
+            self.assertEqual(_read_signature(filename), signature)
+            self.assertEqual(_guess_formats(signature), [format])
+        # the guessed format comes first, all other formats follow in their
+        # default order
+        filename = get_example_file("test.sac")
+        eps = ENTRY_POINTS["waveform"]
+        candidates = _get_format_candidates("waveform", filename, eps)
+        self.assertEqual(candidates[0].name, "SAC")
+        self.assertEqual(sorted(ep.name for ep in candidates),
+                         sorted(eps.keys()))
+        self.assertEqual([ep.name for ep in candidates[1:]],
+                         [name for name in eps.keys() if name != "SAC"])
+        # detection works the same with file-like objects, the position is
+        # not changed
+        with open(filename, "rb") as fh:
+            buf = io.BytesIO(b"12345" + fh.read())
+        buf.seek(5)
+        self.assertEqual(
+            _get_format_candidates("waveform", buf, eps)[0].name, "SAC")
+        self.assertEqual(buf.tell(), 5)
+        # the detected format is remembered per extension
+        _read_from_plugin("waveform", filename, headonly=True)
+        self.assertEqual(_FORMAT_BY_EXTENSION[("waveform", ".sac")], "SAC")
+        self.assertTrue(("waveform", "SAC", "isFormat") in _PLUGIN_FUNCTIONS)
+        self.assertTrue(("waveform", "SAC", "readFormat") in
+                        _PLUGIN_FUNCTIONS)
+
+    def test_detect_format_priority(self):
+        """
+        Formats checked first because of a guess or the file extension do
+        not change the result of the detection if several formats match.
+        """
+        eps = ENTRY_POINTS["waveform"]
+        names = list(eps.keys())
+        matching = set([names[1], names[2]])
+        checked = []
+
+        def is_format(name):
+            def _is_format(filename):
+                checked.append(name)
+                return name in matching
+            return _is_format
+
+        backup = dict(_PLUGIN_FUNCTIONS)
+        try:
+            for name in names:
+                _PLUGIN_FUNCTIONS[("waveform", name, "isFormat")] = \
+                    is_format(name)
+            with NamedTemporaryFile(suffix=".xyz") as tf:
+                tf.write(b"\x00" * 100)
+                tf.flush()
+                # default order
+                self.assertEqual(
+                    _detect_format("waveform", tf.name, eps).name, names[1])
+                self.assertEqual(checked, names[:2])
+                self.assertEqual(_FORMAT_BY_EXTENSION[("waveform", ".xyz")],
+                                 names[1])
+                # the lower ranked format remembered for the extension is
+                # checked first, but the higher ranked one still wins
+                _FORMAT_BY_EXTENSION[("waveform", ".xyz")] = names[2]
+                checked[:] = []
+                self.assertEqual(
+                    _detect_format("waveform", tf.name, eps).name, names[1])
+                self.assertEqual(checked, [names[2], names[0], names[1]])
+                # a remembered format ranked first needs no further checks
+                matching.add(names[0])
+                checked[:] = []
+                _FORMAT_BY_EXTENSION[("waveform", ".xyz")] = names[0]
+                self.assertEqual(
+                    _detect_format("waveform", tf.name, eps).name, names[0])
+                self.assertEqual(checked, [names[0]])
+        finally:
+            _PLUGIN_FUNCTIONS.clear()
+            _PLUGIN_FUNCTIONS.update(backup)
+            _FORMAT_BY_EXTENSION.pop(("waveform", ".xyz"), None)
+
 
 def suite():
     return unittest.makeSuite(UtilBaseTestCase, 'test')
@@ -212,22 +212,7 @@ def _add_processing_info(func):
     """
     @functools.wraps(func)
     def new_func(*args, **kwargs):
-        callargs = inspect.getcallargs(func, *args, **kwargs)
-        callargs.pop("self")
-        kwargs_ = callargs.pop("kwargs", {})
-        from obspy import __version__
-        info = "ObsPy {version}: {function}(%s)".format(
-            version=__version__,
-            function=func.__name__)
-        arguments = []
-        arguments += \
-            ["%s=%s" % (k, v) if not isinstance(v, native_str) else
-             "%s='%s'" % (k, v) for k, v in callargs.items()]
-        arguments += \
-            ["%s=%s" % (k, v) if not isinstance(v, native_str) else
-             "%s='%s'" % (k, v) for k, v in kwargs_.items()]
-        arguments.sort()
-        info = info % "::".join(arguments)
+        info = _get_processing_info(func, args, kwargs)
         self = args[0]
         result = func(*args, **kwargs)
         # Attach after executing the function to avoid having it attached
@@ -238,9 +223,34 @@ def _add_processing_info(func):
     new_func.__name__ = func.__name__
     new_func.__doc__ = func.__doc__
     new_func.__dict__.update(func.__dict__)
+    new_func.__wrapped__ = func
     return new_func
 
 
+def _get_processing_info(func, args, kwargs):
+    """
+    Returns the processing information string that
+    :func:`_add_processing_info` attaches for a call of the (undecorated)
+    method ``func`` with the given arguments.
+    """
+    callargs = inspect.getcallargs(func, *args, **kwargs)
+    callargs.pop("self")
+    kwargs_ = callargs.pop("kwargs", {})
+    from obspy import __version__
+    info = "ObsPy {version}: {function}(%s)".format(
+        version=__version__,
+        function=func.__name__)
+    arguments = []
+    arguments += \
+        ["%s=%s" % (k, v) if not isinstance(v, native_str) else
+         "%s='%s'" % (k, v) for k, v in callargs.items()]
+    arguments += \
+        ["%s=%s" % (k, v) if not isinstance(v, native_str) else
+         "%s='%s'" % (k, v) for k, v in kwargs_.items()]
+    arguments.sort()
+    return info % "::".join(arguments)
+
+
 class Trace(object):
     """
     An object containing data of a continuous series, such as a seismic trace.
@@ -2364,8 +2374,6 @@ seismometer_correction_simulation.html#using-a-resp-file>`_.
         :param taper_fraction: Taper fraction of cosine taper to use.
         """
         from obspy.core.inventory import Response, PolynomialResponseStage
-        from obspy.signal.invsim import (cosine_taper, cosine_sac_taper,
-                                         invert_spectrum)
 
         if "response" not in self.stats:
             msg = ("No response information attached to trace "
@@ -2401,43 +2409,85 @@ seismometer_correction_simulation.html#using-a-resp-file>`_.
             return self
 
         # use evalresp
-        data = self.data.astype(np.float64)
-        npts = len(data)
-        # time domain pre-processing
-        if zero_mean:
-            data -= data.mean()
-        if taper:
-            data *= cosine_taper(npts, taper_fraction,
-                                 sactaper=True, halfcosine=False)
-        # smart calculation of nfft dodging large primes
-        from obspy.signal.util import _npts2nfft
-        nfft = _npts2nfft(npts)
-        # Transform data to Frequency domain
-        data = np.fft.rfft(data, n=nfft)
-        # calculate and apply frequency response,
-        # optionally prefilter in frequency domain and/or apply water level
-        freq_response, freqs = \
-            self.stats.response.get_evalresp_response(self.stats.delta, nfft,
-                                                      output=output, **kwargs)
-        if pre_filt:
-            data *= cosine_sac_taper(freqs, flimit=pre_filt)
-        if water_level is not None:
-            invert_spectrum(freq_response, water_level)
-        data *= freq_response
-
-        data[-1] = abs(data[-1]) + 0.0j
-        # transform data back into the time domain
-        data = np.fft.irfft(data)[0:npts]
+        data = _remove_response_batch(
+            self.data[np.newaxis], self.stats.delta, response, output=output,
+            water_level=water_level, pre_filt=pre_filt, zero_mean=zero_mean,
+            taper=taper, taper_fraction=taper_fraction, **kwargs)
         # assign processed data and store processing information
-        self.data = data
-        info = ":".join(["remove_response"] +
-                        [str(x) for x in (output, water_level, pre_filt,
-                                          zero_mean, taper, taper_fraction)] +
-                        ["%s=%s" % (k, v) for k, v in kwargs.items()])
-        self._addProcessingInfo(info)
+        self.data = data[0]
+        self._addProcessingInfo(_get_remove_response_info(
+            output, water_level, pre_filt, zero_mean, taper, taper_fraction,
+            **kwargs))
         return self
 
 
+def _remove_response_batch(data, delta, response, output="VEL",
+                           water_level=60, pre_filt=None, zero_mean=True,
+                           taper=True, taper_fraction=0.05, **kwargs):
+    """
+    Deconvolve the instrument response from several equally long traces
+    with the same sampling interval and response at once.
+
+    All steps of :meth:`Trace.remove_response` (detrending, tapering, FFT,
+    deconvolution and inverse FFT) are applied to all rows of ``data`` in
+    single vectorized operations, the frequency response is only evaluated
+    once.
+
+    :type data: :class:`numpy.ndarray`
+    :param data: Two dimensional array with the data of one trace per row.
+    :type delta: float
+    :param delta: Sampling interval of all traces.
+    :type response: :class:`~obspy.core.inventory.response.Response`
+    :param response: Response of all traces.
+    :rtype: :class:`numpy.ndarray`
+    :returns: Two dimensional array with the corrected data of all traces.
+
+    See :meth:`Trace.remove_response` for all other parameters.
+    """
+    from obspy.signal.invsim import (cosine_taper, cosine_sac_taper,
+                                     invert_spectrum)
+    from obspy.signal.util import _npts2nfft
+
+    data = data.astype(np.float64)
+    npts = data.shape[1]
+    # time domain pre-processing
+    if zero_mean:
+        data -= data.mean(axis=1)[:, np.newaxis]
+    if taper:
+        data *= cosine_taper(npts, taper_fraction,
+                             sactaper=True, halfcosine=False)
+    # smart calculation of nfft dodging large primes
+    nfft = _npts2nfft(npts)
+    # Transform data to Frequency domain
+    data = np.fft.rfft(data, n=nfft, axis=1)
+    # calculate and apply frequency response,
+    # optionally prefilter in frequency domain and/or apply water level
+    freq_response, freqs = \
+        response.get_evalresp_response(delta, nfft, output=output, **kwargs)
+    if pre_filt:
+        data *= cosine_sac_taper(freqs, flimit=pre_filt)
+    if water_level is not None:
+        invert_spectrum(freq_response, water_level)
+    data *= freq_response
+
+    data[:, -1] = abs(data[:, -1]) + 0.0j
+    # transform data back into the time domain
+    return np.fft.irfft(data, axis=1)[:, 0:npts]
+
+
+def _get_remove_response_info(output="VEL", water_level=60, pre_filt=None,
+                              zero_mean=True, taper=True, taper_fraction=0.05,
+                              **kwargs):
+    """
+    Returns the detailed processing information string stored by
+    :meth:`Trace.remove_response`.
+    """
+    return ":".join(["remove_response"] +
+                    [str(x) for x in (output, water_level, pre_filt,
+                                      zero_mean, taper, taper_fraction)] +
+                    ["%s=%s" % (k, v) for k, v in kwargs.items()])
+
+
 def _data_sanity_checks(value):
     """
     Check if a given input is suitable to be used for Trace.data. Raises the
@@ -399,6 +399,196 @@ def get_scipy_version():
     return version
 
 
+# cache of already loaded plug-in functions
+_PLUGIN_FUNCTIONS = {}
+# last detected format per plug-in type and file extension (bounded)
+_FORMAT_BY_EXTENSION = OrderedDict()
+_FORMAT_BY_EXTENSION_SIZE = 128
+# number of bytes read for guessing the file format
+_FORMAT_SIGNATURE_LENGTH = 512
+
+
+def _get_plugin_function(plugin_type, format_ep, name):
+    """
+    Loads (and caches) the function ``name`` (e.g. ``"isFormat"``) of the
+    given format entry point of a plug-in type.
+    """
+    key = (plugin_type, format_ep.name, name)
+    try:
+        return _PLUGIN_FUNCTIONS[key]
+    except KeyError:
+        pass
+    func = load_entry_point(
+        format_ep.dist.key,
+        'obspy.plugin.%s.%s' % (plugin_type, format_ep.name), name)
+    _PLUGIN_FUNCTIONS[key] = func
+    return func
+
+
+def _read_signature(filename):
+    """
+    Reads the first bytes of a file or file-like object without moving the
+    file pointer. Returns ``None`` if that is not possible.
+    """
+    try:
+        if isinstance(filename, (str, native_str)):
+            with open(filename, 'rb') as fh:
+                return fh.read(_FORMAT_SIGNATURE_LENGTH)
+        elif hasattr(filename, 'read') and hasattr(filename, 'tell') and \
+                hasattr(filename, 'seek'):
+            position = filename.tell()
+            try:
+                data = filename.read(_FORMAT_SIGNATURE_LENGTH)
+            finally:
+                filename.seek(position, 0)
+            if isinstance(data, bytes):
+                return data
+    except Exception:
+        pass
+    return None
+
+
+def _guess_formats(signature):
+    """
+    Guesses possible formats from the first bytes of a file.
+
+    Only a cheap check of magic bytes and characteristic header layouts is
+    done, the returned formats still have to be verified with the isFormat
+    function of the respective plug-in.
+
+    :type signature: bytes
+    :param signature: The first bytes of a file.
+    :rtype: list of str
+    :returns: Names of likely formats, most likely first.
+
+    .. rubric:: Example
+
+    >>> _guess_formats(b'000001D BGLD  EHEBW')
+    ['MSEED']
+    >>> _guess_formats(b'<?xml version="1.0"?><FDSNStationXML>')
+    ['STATIONXML']
+    >>> _guess_formats(b'')
+    []
+    """
+    formats = []
+    if not signature:
+        return formats
+    head = signature[:8]
+    # MiniSEED/full SEED: sequence number followed by a control header
+    seqnr = head[0:6].replace(b'\x00', b' ').strip()
+    if len(head) >= 7 and head[6:7] in (b'D', b'R', b'Q', b'M', b'V') and \
+            (seqnr.isdigit() or seqnr == b''):
+        formats.append('MSEED')
+    # SAC: header version nvhdr at position 76 in either byte order
+    if len(signature) >= 308:
+        nvhdr = signature[304:308]
+        if nvhdr in (b'\x06\x00\x00\x00', b'\x00\x00\x00\x06'):
+            formats.append('SAC')
+    # GSE2: waveform identification block
+    if b'WID2' in signature:
+        formats.append('GSE2')
+    # SEG Y: textual header starting with "C 1" or "C01" in EBCDIC or ASCII
+    if head[:3] in (b'\xc3\x40\xf1', b'\xc3\xf0\xf1', b'C 1', b'C01'):
+        formats.append('SEGY')
+    # XML based formats: check the root element
+    lower = signature.lower()
+    if b'<' in lower:
+        if b'quakeml' in lower:
+            formats.append('QUAKEML')
+        if b'fdsnstationxml' in lower:
+            formats.append('STATIONXML')
+    return formats
+
+
+def _get_format_candidates(plugin_type, filename, entry_points):
+    """
+    Returns all format entry points of a plug-in type in the order they
+    should be checked for the given file.
+
+    The format last detected for a file with the same extension and the
+    formats guessed from the first bytes of the file come first, all other
+    formats follow in their default order. See :func:`_detect_format` for
+    how the default priority is preserved.
+    """
+    preferred = []
+    if isinstance(filename, (str, native_str)):
+        extension = os.path.splitext(filename)[1].lower()
+        if extension:
+            name = _FORMAT_BY_EXTENSION.get((plugin_type, extension))
+            if name is not None:
+                preferred.append(name)
+    signature = _read_signature(filename)
+    if signature is not None:
+        preferred.extend(_guess_formats(signature))
+    candidates = []
+    for name in preferred:
+        format_ep = entry_points.get(name)
+        if format_ep is not None and format_ep not in candidates:
+            candidates.append(format_ep)
+    for format_ep in entry_points.values():
+        if format_ep not in candidates:
+            candidates.append(format_ep)
+    return candidates
+
+
+def _is_format(plugin_type, format_ep, filename):
+    """
+    Checks a file with the isFormat function of a format entry point.
+    """
+    is_format = _get_plugin_function(plugin_type, format_ep, 'isFormat')
+    # If it is a file-like object, store the position and restore it
+    # later to avoid that the isFormat() functions move the file
+    # pointer.
+    if hasattr(filename, "tell") and hasattr(filename, "seek"):
+        position = filename.tell()
+    else:
+        position = None
+    # check format
+    is_format = is_format(filename)
+    if position is not None:
+        filename.seek(0, 0)
+    return is_format
+
+
+def _detect_format(plugin_type, filename, entry_points):
+    """
+    Automatically detects the format of a file.
+
+    Likely formats (see :func:`_get_format_candidates`) are checked first,
+    but the result is always the same as checking all formats in their
+    default order: if a likely format matches, the formats ranked above it
+    that were not checked yet are checked as well and the first matching one
+    wins. So the cheap guesses only save checks of formats ranked below the
+    detected format.
+
+    :returns: The format entry point.
+    """
+    defaults = list(entry_points.values())
+    checked = []
+    for format_ep in _get_format_candidates(plugin_type, filename,
+                                            entry_points):
+        if _is_format(plugin_type, format_ep, filename):
+            break
+        checked.append(format_ep)
+    else:
+        raise TypeError('Unknown format for file %s' % filename)
+    for higher_ep in defaults[:defaults.index(format_ep)]:
+        if higher_ep not in checked and \
+                _is_format(plugin_type, higher_ep, filename):
+            format_ep = higher_ep
+            break
+    # remember the format for files with the same extension
+    if isinstance(filename, (str, native_str)):
+        extension = os.path.splitext(filename)[1].lower()
+        if extension:
+            key = (plugin_type, extension)
+            _FORMAT_BY_EXTENSION.pop(key, None)
+            if len(_FORMAT_BY_EXTENSION) >= _FORMAT_BY_EXTENSION_SIZE:
+                _FORMAT_BY_EXTENSION.popitem(last=False)
+            _FORMAT_BY_EXTENSION[key] = format_ep.name
+    return format_ep
+
+
 def _read_from_plugin(plugin_type, filename, format=None, **kwargs):
     """
     Reads a single file from a plug-in's readFormat function.
@@ -407,28 +597,7 @@ def _read_from_plugin(plugin_type, filename, format=None, **kwargs):
     # get format entry point
     format_ep = None
     if not format:
-        # auto detect format - go through all known formats in given sort order
-        for format_ep in EPS.values():
-            # search isFormat for given entry point
-            is_format = load_entry_point(
-                format_ep.dist.key,
-                'obspy.plugin.%s.%s' % (plugin_type, format_ep.name),
-                'isFormat')
-            # If it is a file-like object, store the position and restore it
-            # later to avoid that the isFormat() functions move the file
-            # pointer.
-            if hasattr(filename, "tell") and hasattr(filename, "seek"):
-                position = filename.tell()
-            else:
-                position = None
-            # check format
-            is_format = is_format(filename)
-            if position is not None:
-                filename.seek(0, 0)
-            if is_format:
-                break
-        else:
-            raise TypeError('Unknown format for file %s' % filename)
+        format_ep = _detect_format(plugin_type, filename, EPS)
     else:
         # format given via argument
         format = format.upper()
@@ -440,10 +609,8 @@ def _read_from_plugin(plugin_type, filename, format=None, **kwargs):
     # file format should be known by now
     try:
         # search readFormat for given entry point
-        read_format = load_entry_point(
-            format_ep.dist.key,
-            'obspy.plugin.%s.%s' % (plugin_type, format_ep.name),
-            'readFormat')
+        read_format = _get_plugin_function(plugin_type, format_ep,
+                                           'readFormat')
     except ImportError:
         msg = "Format \"%s\" is not supported. Supported types: %s"
         raise TypeError(msg % (format_ep.name, ', '.join(EPS)))
@@ -18,6 +18,11 @@ import os
 import sys
 import time
 
+from future import standard_library
+
+with standard_library.hooks():
+    import queue
+
 from obspy import read
 from obspy.core.preview import create_preview
 from obspy.core.util.base import _get_entry_points
@@ -31,14 +36,60 @@ class WaveformFileCrawler(object):
 
     This class scans periodically all given paths for waveform files and
     collects them into a watch list.
+
+    Files to index are put into ``input_queue`` and processed by
+    :func:`worker` processes, which return their results through
+    ``output_queue``. The set ``work_queue`` holds all files currently
+    processed, the crawler stops handing over files while there are two per
+    worker. Results are inserted into the database in batches. The list
+    ``workers`` holds the worker processes, pending files are given up when
+    stopping if a worker process died.
     """
     def _update_or_insert(self, dataset):
         """
         Add a new file into or modifies existing file in database.
         """
-        if len(dataset) < 1:
+        self._update_or_insert_many([dataset])
+
+    def _update_or_insert_many(self, datasets):
+        """
+        Add new files into or modifies existing files in database using a
+        single transaction.
+
+        If the transaction fails, all files are inserted one by one again so
+        that a single broken file does not affect the other files.
+        """
+        datasets = [dataset for dataset in datasets if dataset]
+        if not datasets:
             return
         session = self.session()
+        messages = []
+        try:
+            for dataset in datasets:
+                msg = self._add_dataset(session, dataset)
+                if msg:
+                    messages.append(msg)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            session.close()
+            if len(datasets) == 1:
+                self.log.error(str(e))
+                return
+            # retry files one by one
+            for dataset in datasets:
+                self._update_or_insert_many([dataset])
+            return
+        for msg in messages:
+            self.log.debug(msg)
+        session.close()
+
+    def _add_dataset(self, session, dataset):
+        """
+        Adds all entries of a single file to the given session.
+
+        Returns a log message or ``None`` if the file was skipped.
+        """
         data = dataset[0]
         # check for duplicates
         if self.options.check_duplicates:
@@ -57,7 +108,7 @@ class WaveformFileCrawler(object):
             if query.count() > 0:
                 msg = "Duplicate entry '%s' in '%s'."
                 self.log.error(msg % (data['file'], data['path']))
-                return
+                return None
         # fetch or create path
         try:
             # search for existing path
@@ -93,15 +144,7 @@ class WaveformFileCrawler(object):
             # add features
             for feature in data['features']:
                 channel.features.append(WaveformFeatures(feature))
-        try:
-            session.commit()
-        except Exception as e:
-            session.rollback()
-            self.log.error(str(e))
-        else:
-            self.log.debug("%s '%s' in '%s'" % (msg, data['file'],
-                                                data['path']))
-        session.close()
+        return "%s '%s' in '%s'" % (msg, data['file'], data['path'])
 
     def _delete(self, path, file=None):
         """
@@ -178,25 +221,57 @@ class WaveformFileCrawler(object):
                 return True
         return False
 
-    def _process_output_queue(self):
-        try:
-            dataset = self.output_queue.pop(0)
-        except:
-            pass
-        else:
-            self._update_or_insert(dataset)
+    def _process_output_queue(self, timeout=None):
+        """
+        Fetches all currently processed files from the output queue and
+        inserts them into the database in batches.
+
+        :param timeout: Time to wait for the first processed file in seconds.
+            Default is to not wait at all.
+        """
+        batch_size = getattr(self.options, 'batch_size', 100)
+        datasets = []
+        while True:
+            try:
+                if timeout and not datasets:
+                    filepath, dataset = self.output_queue.get(
+                        timeout=timeout)
+                else:
+                    filepath, dataset = self.output_queue.get_nowait()
+            except queue.Empty:
+                break
+            self.work_queue.discard(filepath)
+            if dataset:
+                datasets.append(dataset)
+            if len(datasets) >= batch_size:
+                self._update_or_insert_many(datasets)
+                datasets = []
+        self._update_or_insert_many(datasets)
 
     def _process_log_queue(self):
-        try:
-            msg = self.log_queue.pop(0)
-        except:
-            pass
-        else:
+        """
+        Logs all messages currently waiting in the log queue.
+        """
+        while True:
+            try:
+                msg = self.log_queue.get_nowait()
+            except queue.Empty:
+                break
             if msg.startswith('['):
                 self.log.error(msg)
             else:
                 self.log.debug(msg)
 
+    def _enqueue(self, filepath, path, file):
+        """
+        Hands a file over to the worker processes, unless it is already being
+        processed.
+        """
+        if filepath in self.work_queue:
+            return
+        self.work_queue.add(filepath)
+        self.input_queue.put((filepath, path, file, self.features))
+
     def _reset_walker(self):
         """
         Resets the crawler parameters.
@@ -204,27 +279,22 @@ class WaveformFileCrawler(object):
         # break if options run_once is set and a run was completed already
         if self.options.run_once and \
                 getattr(self, 'first_run_complete', False):
-            # before shutting down make sure all queues are empty!
-            while self.output_queue or self.work_queue:
-                msg = 'Crawler stopped but waiting for empty queues to exit.'
-                self.log.debug(msg)
-                if self.log_queue:
-                    msg = 'log_queue still has %s item(s)'
-                    self.log.debug(msg % len(self.log_queue))
-                    # Fetch items from the log queue
-                    self._process_log_queue()
-                    continue
-                if self.output_queue:
-                    msg = 'output_queue still has %s item(s)'
-                    self.log.debug(msg % len(self.output_queue))
-                    # try to finalize a single processed stream object from
-                    # output queue
-                    self._process_output_queue()
-                    continue
-                if self.work_queue:
-                    msg = 'work_queue still has %s items'
-                    self.log.debug(msg % len(self.work_queue))
-                time.sleep(10)
+            # before shutting down make sure all files have been processed
+            while self.work_queue:
+                msg = 'Crawler stopped but waiting for %s file(s) to be ' + \
+                    'processed before exiting.'
+                self.log.debug(msg % len(self.work_queue))
+                pending = len(self.work_queue)
+                self._process_output_queue(timeout=10)
+                self._process_log_queue()
+                # files of dead worker processes will never be returned
+                workers = getattr(self, 'workers', [])
+                if len(self.work_queue) == pending and \
+                        not all(w.is_alive() for w in workers):
+                    msg = 'Worker process died, giving up on %s file(s).'
+                    self.log.error(msg % len(self.work_queue))
+                    self.work_queue.clear()
+            self._process_log_queue()
             self.log.debug('Crawler stopped by option run_once.')
             sys.exit()
             return
@@ -329,13 +399,13 @@ class WaveformFileCrawler(object):
         # be aware that the processor pool is still active waiting for work
         if not self.running:
             return
-        # skip if input queue is full
-        if len(self.input_queue) > self.options.number_of_cpus:
-            return
-        # try to finalize a single processed stream object from output queue
+        # insert all processed files into the database
         self._process_output_queue()
         # Fetch items from the log queue
         self._process_log_queue()
+        # skip if enough files are waiting for the workers (backpressure)
+        if len(self.work_queue) >= 2 * self.options.number_of_cpus:
+            return
         # walk through directories and files
         try:
             file = self._current_files.pop(0)
@@ -373,12 +443,12 @@ class WaveformFileCrawler(object):
         # option force-reindex set -> process file regardless if already in
         # database or recent or whatever
         if self.options.force_reindex:
-            self.input_queue[filepath] = (path, file, self.features)
+            self._enqueue(filepath, path, file)
             return
         # compare with database entries
         if file not in self._db_files.keys():
             # file does not exists in database -> add file
-            self.input_queue[filepath] = (path, file, self.features)
+            self._enqueue(filepath, path, file)
             return
         # file is already in database
         # -> remove from file list so it won't be deleted on database cleanup
@@ -390,155 +460,203 @@ class WaveformFileCrawler(object):
         if mtime == db_file_mtime:
             return
         # modification time differs -> update file
-        self.input_queue[filepath] = (path, file, self.features)
+        self._enqueue(filepath, path, file)
+
+
+def _load_features(log_queue):
+    """
+    Fetches and initializes all available waveform feature plug-ins.
+    """
+    all_features = {}
+    for (key, ep) in _get_entry_points('obspy.db.feature').items():
+        try:
+            # load plug-in
+            cls = ep.load()
+            # initialize class
+            func = cls().process
+        except Exception as e:
+            msg = 'Could not initialize feature %s. (%s)'
+            log_queue.put(msg % (key, str(e)))
+            continue
+        all_features[key] = {}
+        all_features[key]['run'] = func
+        all_features[key]['indexer_kwargs'] = \
+            getattr(cls, 'indexer_kwargs', {})
+        # features have to explicitly state that they do not need any data
+        # samples, e.g. if they only use header information
+        all_features[key]['needs_data'] = getattr(cls, 'needs_data', True)
+    return all_features
 
 
-def worker(_i, input_queue, work_queue, output_queue, log_queue, mappings={}):
+def _merge_headers(stream):
+    """
+    Combines header-only traces of the same id like
+    ``stream.merge(fill_value=0)`` would do for traces with data.
+    """
+    traces = {}
+    for trace in stream:
+        if trace.id not in traces:
+            traces[trace.id] = trace
+            continue
+        merged = traces[trace.id]
+        starttime = min(merged.stats.starttime, trace.stats.starttime)
+        endtime = max(merged.stats.endtime, trace.stats.endtime)
+        merged.stats.starttime = starttime
+        merged.stats.npts = int(round(
+            (endtime - starttime) * merged.stats.sampling_rate)) + 1
+    stream.traces = list(traces.values())
+    return stream
+
+
+def _process_file(filepath, path, file, features, all_features, log_queue,
+                  mappings={}, preview=True):
+    """
+    Reads a single waveform file and collects all information stored in the
+    database.
+
+    If neither a preview nor any feature needing data samples is requested
+    only the headers are read, skipping decoding of all samples.
+
+    :returns: List with one dictionary per channel or ``None`` if the file
+        could not be read.
+    """
+    # get additional kwargs for read method from waveform plug-ins
+    kwargs = {'verify_chksum': False}
+    headonly = not preview
+    for feature in features:
+        if feature not in all_features:
+            log_queue.put('%s: Unknown feature %s' % (filepath, feature))
+            continue
+        kwargs.update(all_features[feature]['indexer_kwargs'])
+        if all_features[feature]['needs_data']:
+            headonly = False
+    # read file and get file stats
     try:
-        # fetch and initialize all possible waveform feature plug-ins
-        all_features = {}
-        for (key, ep) in _get_entry_points('obspy.db.feature').items():
+        stats = os.stat(filepath)
+        stream = read(filepath, headonly=headonly, **kwargs)
+        # get gap and overlap information
+        gap_list = stream.getGaps()
+        if headonly:
+            _merge_headers(stream)
+        else:
+            # merge channels and replace gaps/overlaps with 0 to prevent
+            # generation of masked arrays
+            stream.merge(fill_value=0)
+    except Exception as e:
+        msg = '[Reading stream] %s: %s'
+        log_queue.put(msg % (filepath, e))
+        return None
+    # build up dictionary of gaps and overlaps for easier lookup
+    gap_dict = {}
+    for gap in gap_list:
+        id = '.'.join(gap[0:4])
+        temp = {
+            'gap': gap[6] >= 0,
+            'starttime': gap[4].datetime,
+            'endtime': gap[5].datetime,
+            'samples': abs(gap[7])
+        }
+        gap_dict.setdefault(id, []).append(temp)
+    # loop through traces
+    dataset = []
+    for trace in stream:
+        result = {}
+        # general file information
+        result['mtime'] = int(stats.st_mtime)
+        result['size'] = stats.st_size
+        result['path'] = path
+        result['file'] = file
+        result['filepath'] = filepath
+        # trace information
+        result['format'] = trace.stats._format
+        result['station'] = trace.stats.station
+        result['location'] = trace.stats.location
+        result['channel'] = trace.stats.channel
+        result['network'] = trace.stats.network
+        result['starttime'] = trace.stats.starttime.datetime
+        result['endtime'] = trace.stats.endtime.datetime
+        result['calib'] = trace.stats.calib
+        result['npts'] = trace.stats.npts
+        result['sampling_rate'] = trace.stats.sampling_rate
+        # check for any id mappings
+        if trace.id in mappings:
+            old_id = trace.id
+            for mapping in mappings[old_id]:
+                if trace.stats.starttime and \
+                   trace.stats.starttime > mapping['endtime']:
+                    continue
+                if trace.stats.endtime and \
+                   trace.stats.endtime < mapping['starttime']:
+                    continue
+                result['network'] = mapping['network']
+                result['station'] = mapping['station']
+                result['location'] = mapping['location']
+                result['channel'] = mapping['channel']
+                msg = "Mapping '%s' to '%s.%s.%s.%s'" % \
+                    (old_id, mapping['network'], mapping['station'],
+                     mapping['location'], mapping['channel'])
+                log_queue.put(msg)
+        # gaps/overlaps for current trace
+        result['gaps'] = gap_dict.get(trace.id, [])
+        # apply feature functions
+        result['features'] = []
+        for key in features:
+            if key not in all_features:
+                continue
             try:
-                # load plug-in
-                cls = ep.load()
-                # initialize class
-                func = cls().process
+                # run plug-in and update results
+                temp = all_features[key]['run'](trace)
+                for key, value in temp.items():
+                    result['features'].append({'key': key,
+                                               'value': value})
             except Exception as e:
-                msg = 'Could not initialize feature %s. (%s)'
-                log_queue.append(msg % (key, str(e)))
+                msg = '[Processing feature] %s: %s'
+                log_queue.put(msg % (filepath, e))
                 continue
-            all_features[key] = {}
-            all_features[key]['run'] = func
+        # generate preview of trace
+        result['preview'] = None
+        if preview and \
+                ('.LOG.L.' not in file or trace.stats.channel != 'LOG'):
+            # create previews only for non-log files (see issue #400)
             try:
-                all_features[key]['indexer_kwargs'] = cls['indexer_kwargs']
-            except:
-                all_features[key]['indexer_kwargs'] = {}
+                trace = create_preview(trace, 30)
+                result['preview'] = trace.data.dumps()
+            except ValueError:
+                pass
+            except Exception as e:
+                msg = '[Creating preview] %s: %s'
+                log_queue.put(msg % (filepath, e))
+        # update dataset
+        dataset.append(result)
+    del stream
+    return dataset
+
+
+def worker(_i, input_queue, work_queue, output_queue, log_queue, mappings={},
+           preview=True):
+    """
+    Indexer worker process.
+
+    Blocks on the input queue until a ``(filepath, path, file, features)``
+    item is available and puts a ``(filepath, dataset)`` tuple into the output
+    queue for each processed file. A ``None`` item stops the worker.
+
+    ``work_queue`` is not used anymore, the crawler keeps track of the files
+    being processed. It is only kept for backwards compatibility.
+    """
+    try:
+        all_features = _load_features(log_queue)
         # loop through input queue
         while True:
-            # fetch a unprocessed item
-            try:
-                filepath, (path, file, features) = input_queue.popitem()
-            except:
-                continue
-            # skip item if already in work queue
-            if filepath in work_queue:
-                continue
-            work_queue.append(filepath)
-            # get additional kwargs for read method from waveform plug-ins
-            kwargs = {'verify_chksum': False}
-            for feature in features:
-                if feature not in all_features:
-                    log_queue.append('%s: Unknown feature %s' % (filepath,
-                                                                 feature))
-                    continue
-                kwargs.update(all_features[feature]['indexer_kwargs'])
-            # read file and get file stats
-            try:
-                stats = os.stat(filepath)
-                stream = read(filepath, **kwargs)
-                # get gap and overlap information
-                gap_list = stream.getGaps()
-                # merge channels and replace gaps/overlaps with 0 to prevent
-                # generation of masked arrays
-                stream.merge(fill_value=0)
-            except Exception as e:
-                msg = '[Reading stream] %s: %s'
-                log_queue.append(msg % (filepath, e))
-                try:
-                    work_queue.remove(filepath)
-                except:
-                    pass
-                continue
-            # build up dictionary of gaps and overlaps for easier lookup
-            gap_dict = {}
-            for gap in gap_list:
-                id = '.'.join(gap[0:4])
-                temp = {
-                    'gap': gap[6] >= 0,
-                    'starttime': gap[4].datetime,
-                    'endtime': gap[5].datetime,
-                    'samples': abs(gap[7])
-                }
-                gap_dict.setdefault(id, []).append(temp)
-            # loop through traces
-            dataset = []
-            for trace in stream:
-                result = {}
-                # general file information
-                result['mtime'] = int(stats.st_mtime)
-                result['size'] = stats.st_size
-                result['path'] = path
-                result['file'] = file
-                result['filepath'] = filepath
-                # trace information
-                result['format'] = trace.stats._format
-                result['station'] = trace.stats.station
-                result['location'] = trace.stats.location
-                result['channel'] = trace.stats.channel
-                result['network'] = trace.stats.network
-                result['starttime'] = trace.stats.starttime.datetime
-                result['endtime'] = trace.stats.endtime.datetime
-                result['calib'] = trace.stats.calib
-                result['npts'] = trace.stats.npts
-                result['sampling_rate'] = trace.stats.sampling_rate
-                # check for any id mappings
-                if trace.id in mappings:
-                    old_id = trace.id
-                    for mapping in mappings[old_id]:
-                        if trace.stats.starttime and \
-                           trace.stats.starttime > mapping['endtime']:
-                            continue
-                        if trace.stats.endtime and \
-                           trace.stats.endtime < mapping['starttime']:
-                            continue
-                        result['network'] = mapping['network']
-                        result['station'] = mapping['station']
-                        result['location'] = mapping['location']
-                        result['channel'] = mapping['channel']
-                        msg = "Mapping '%s' to '%s.%s.%s.%s'" % \
-                            (old_id, mapping['network'], mapping['station'],
-                             mapping['location'], mapping['channel'])
-                        log_queue.append(msg)
-                # gaps/overlaps for current trace
-                result['gaps'] = gap_dict.get(trace.id, [])
-                # apply feature functions
-                result['features'] = []
-                for key in features:
-                    if key not in all_features:
-                        continue
-                    try:
-                        # run plug-in and update results
-                        temp = all_features[key]['run'](trace)
-                        for key, value in temp.items():
-                            result['features'].append({'key': key,
-                                                       'value': value})
-                    except Exception as e:
-                        msg = '[Processing feature] %s: %s'
-                        log_queue.append(msg % (filepath, e))
-                        continue
-                # generate preview of trace
-                result['preview'] = None
-                if '.LOG.L.' not in file or trace.stats.channel != 'LOG':
-                    # create previews only for non-log files (see issue #400)
-                    try:
-                        trace = create_preview(trace, 30)
-                        result['preview'] = trace.data.dumps()
-                    except ValueError:
-                        pass
-                    except Exception as e:
-                        msg = '[Creating preview] %s: %s'
-                        log_queue.append(msg % (filepath, e))
-                # update dataset
-                dataset.append(result)
-            del stream
+            # wait for an unprocessed item
+            item = input_queue.get()
+            if item is None:
+                return
+            filepath, path, file, features = item
+            dataset = _process_file(filepath, path, file, features,
+                                    all_features, log_queue, mappings,
+                                    preview)
             # return results to main loop
-            try:
-                output_queue.append(dataset)
-            except:
-                pass
-            try:
-                work_queue.remove(filepath)
-            except:
-                pass
+            output_queue.put((filepath, dataset))
     except KeyboardInterrupt:
         return
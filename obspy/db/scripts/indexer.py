@@ -130,18 +130,20 @@ def _runIndexer(options):
                          (len(data), options.mapping_file))
         else:
             mappings = {}
-        # create file queue and worker processes
-        manager = multiprocessing.Manager()
-        in_queue = manager.dict()
-        work_queue = manager.list()
-        out_queue = manager.list()
-        log_queue = manager.list()
+        # create file queues and worker processes - the crawler hands over
+        # at most two files per worker at a time (see iterate())
+        in_queue = multiprocessing.Queue(2 * options.number_of_cpus)
+        out_queue = multiprocessing.Queue()
+        log_queue = multiprocessing.Queue()
         # spawn processes
+        workers = []
         for i in range(options.number_of_cpus):
-            args = (i, in_queue, work_queue, out_queue, log_queue, mappings)
+            args = (i, in_queue, None, out_queue, log_queue, mappings,
+                    options.preview)
             p = multiprocessing.Process(target=worker, args=args)
             p.daemon = True
             p.start()
+            workers.append(p)
         # connect to database
         engine = create_engine(options.db_uri, encoding='utf-8',
                                convert_unicode=True)
@@ -157,9 +159,10 @@ def _runIndexer(options):
         service.mappings = mappings
         # set queues
         service.input_queue = in_queue
-        service.work_queue = work_queue
+        service.work_queue = set()
         service.output_queue = out_queue
         service.log_queue = log_queue
+        service.workers = workers
         service.paths = paths
         service._reset_walker()
         service._step_walker()
@@ -235,6 +238,15 @@ Default path option is 'data=*.*'.""")
     parser.add_argument(
         '-f', '--force-reindex', action='store_true',
         help="Reindex existing index entry for every crawled file.")
+    parser.add_argument(
+        '--no-preview', action='store_false', dest='preview',
+        help="Do not create previews of the waveform data. If no feature "
+             "plug-in needs the data samples either, only the headers of "
+             "the files are read which is much faster.")
+    parser.add_argument(
+        '--batch-size', type=int, default=100,
+        help="Maximum number of files inserted into the database within "
+             "one transaction (default is 100).")
     parser.add_argument(
         '--drop-database', action='store_true',
         help="Deletes and recreates the complete database at start up.")
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+from future.builtins import *  # NOQA
+from future import standard_library
+
+import logging
+import os
+import threading
+import unittest
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm.session import sessionmaker
+
+from obspy.core.util.attribdict import AttribDict
+from obspy.db.db import Base, WaveformChannel, WaveformFile
+from obspy.db.indexer import (WaveformFileCrawler, _process_file, worker)
+
+with standard_library.hooks():
+    import queue
+
+
+class IndexerTestCase(unittest.TestCase):
+    """
+    Test suite for obspy.db.indexer.
+    """
+    def setUp(self):
+        self.path = os.path.join(os.path.dirname(__file__), os.pardir,
+                                 os.pardir, 'io', 'mseed', 'tests', 'data')
+        self.path = os.path.normpath(self.path)
+        self.file = 'gaps.mseed'
+        self.filepath = os.path.join(self.path, self.file)
+
+    def test_process_file_headers_only(self):
+        """
+        Without previews and features needing data only headers are read,
+        resulting in the same database entries.
+        """
+        log_queue = queue.Queue()
+        full = _process_file(self.filepath, self.path, self.file, [], {},
+                             log_queue)
+        fast = _process_file(self.filepath, self.path, self.file, [], {},
+                             log_queue, preview=False)
+        self.assertTrue(log_queue.empty())
+        self.assertEqual(len(full), len(fast))
+        for result_full, result_fast in zip(full, fast):
+            self.assertNotEqual(result_full['preview'], None)
+            self.assertEqual(result_fast['preview'], None)
+            for key in ('network', 'station', 'location', 'channel',
+                        'starttime', 'endtime', 'npts', 'sampling_rate',
+                        'gaps', 'size', 'mtime', 'format'):
+                self.assertEqual(result_full[key], result_fast[key])
+        self.assertEqual(len(full[0]['gaps']), 3)
+
+    def test_worker_and_batched_inserts(self):
+        """
+        Runs a worker on a blocking queue and inserts its results in one
+        batch.
+        """
+        input_queue = queue.Queue()
+        output_queue = queue.Queue()
+        log_queue = queue.Queue()
+        thread = threading.Thread(target=worker, args=(
+            0, input_queue, None, output_queue, log_queue))
+        thread.start()
+        files = ['gaps.mseed', 'test.mseed', 'not_existing.mseed']
+        crawler = WaveformFileCrawler()
+        crawler.input_queue = input_queue
+        crawler.output_queue = output_queue
+        crawler.log_queue = log_queue
+        crawler.work_queue = set()
+        crawler.paths = {self.path: (['*.mseed'], [])}
+        crawler._root = self.path
+        crawler.options = AttribDict(check_duplicates=False, batch_size=10)
+        crawler.log = logging.getLogger('obspy.db.tests')
+        engine = create_engine('sqlite:///:memory:')
+        Base.metadata.create_all(engine)
+        crawler.session = sessionmaker(bind=engine)
+        for file in files + files:
+            crawler._enqueue(os.path.join(self.path, file), self.path, file)
+        # files already being processed are not handed over twice
+        self.assertEqual(len(crawler.work_queue), 3)
+        while crawler.work_queue:
+            crawler._process_output_queue(timeout=10)
+        input_queue.put(None)
+        thread.join()
+        # error for the missing file is logged
+        msg = log_queue.get_nowait()
+        self.assertTrue(msg.startswith('[Reading stream]'))
+        session = crawler.session()
+        self.assertEqual(session.query(WaveformFile).count(), 2)
+        self.assertEqual(session.query(WaveformChannel).count(), 2)
+        session.close()
+
+
+def suite():
+    return unittest.makeSuite(IndexerTestCase, 'test')
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite')
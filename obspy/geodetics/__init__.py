@@ -18,8 +18,8 @@ import sys
 from obspy.core.util.deprecation_helpers import \
     DynamicAttributeImportRerouteModule
 
-from .base import (calc_vincenty_inverse, degrees2kilometers, gps2dist_azimuth,
-                   kilometer2degrees, locations2degrees)
+from .base import (calc_vincenty_inverse, degrees2kilometers, distance_matrix,
+                   gps2dist_azimuth, kilometer2degrees, locations2degrees)
 from .flinnengdahl import FlinnEngdahl
 
 
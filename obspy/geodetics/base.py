@@ -20,6 +20,11 @@ import numpy as np
 from obspy.core.util.decorator import deprecated
 
 
+# Number of point pairs evaluated at once by distance_matrix().
+_DISTANCE_MATRIX_BLOCK_SIZE = 2 ** 18
+_EPS = np.finfo(np.float64).eps
+
+
 @deprecated("'calcVincentyInverse' has been renamed to "
             "'calc_vincenty_inverse'. Use that instead.")
 def calcVincentyInverse(lat1, lon1, lat2, lon2):
@@ -47,6 +52,15 @@ def calc_vincenty_inverse(lat1, lon1, lat2, lon2):
         points; an iteration limit traps this case and a ``StopIteration``
         exception will be raised.
 
+    All parameters can also be given as (broadcastable) arrays, in which case
+    the iteration is carried out for all point pairs at once and arrays of
+    distances and azimuths are returned. Point pairs without a solution are
+    set to ``NaN`` instead of raising ``StopIteration``.
+
+    >>> dist, az, baz = calc_vincenty_inverse(0, 0, 0, [10, 17])
+    >>> print(dist.round(4).tolist())
+    [1113194.9078, 1892431.3432]
+
     .. note::
         This code is based on an implementation incorporated in
         Matplotlib Basemap Toolkit 0.9.5 http://sourceforge.net/projects/\
@@ -77,6 +91,8 @@ matplotlib/files/matplotlib-toolkits/basemap-0.9.5/
             * Direct problem: Latitude and longitude from known position,
               azimuth and distance.
     """
+    if _is_array_input(lat1, lon1, lat2, lon2):
+        return _calc_vincenty_inverse_array(lat1, lon1, lat2, lon2)
     # Check inputs
     if lat1 > 90 or lat1 < -90:
         msg = "Latitude of Point 1 out of bounds! (-90 <= lat1 <=90)"
@@ -188,6 +204,161 @@ matplotlib/files/matplotlib-toolkits/basemap-0.9.5/
     return dist, alpha12, alpha21
 
 
+def _is_array_input(*args):
+    """
+    Returns True if any of the given coordinates is not a scalar.
+    """
+    return any(np.ndim(arg) > 0 for arg in args)
+
+
+def _normalize_longitude(lon):
+    """
+    Maps an array of longitudes into [-180, 180] like the scalar code does.
+    """
+    lon = np.where(lon > 180, lon - 360 * np.ceil((lon - 180) / 360), lon)
+    lon = np.where(lon < -180, lon + 360 * np.ceil((-180 - lon) / 360), lon)
+    return lon
+
+
+def _calc_vincenty_inverse_array(lat1, lon1, lat2, lon2):
+    """
+    Vectorized version of :func:`calc_vincenty_inverse`.
+
+    All point pairs are iterated together, point pairs leave the iteration
+    individually as soon as they converged. Pairs that do not converge within
+    the iteration limit of the scalar version or that run into a domain error
+    get ``NaN`` as distance and azimuths.
+    """
+    lat1, lon1, lat2, lon2 = np.broadcast_arrays(
+        *[np.asarray(x, dtype=np.float64) for x in (lat1, lon1, lat2, lon2)])
+    shape = lat1.shape
+    lat1, lon1, lat2, lon2 = [x.ravel() for x in (lat1, lon1, lat2, lon2)]
+
+    # Check inputs
+    if np.any((lat1 > 90) | (lat1 < -90)):
+        msg = "Latitude of Point 1 out of bounds! (-90 <= lat1 <=90)"
+        raise ValueError(msg)
+    if np.any((lat2 > 90) | (lat2 < -90)):
+        msg = "Latitude of Point 2 out of bounds! (-90 <= lat2 <=90)"
+        raise ValueError(msg)
+    lon1 = _normalize_longitude(lon1)
+    lon2 = _normalize_longitude(lon2)
+
+    # Data on the WGS84 reference ellipsoid:
+    a = 6378137.0          # semimajor axis in m
+    f = 1 / 298.257223563  # flattening
+    b = a * (1 - f)        # semiminor axis
+
+    dist = np.zeros(lat1.size, dtype=np.float64)
+    alpha12 = np.zeros(lat1.size, dtype=np.float64)
+    alpha21 = np.zeros(lat1.size, dtype=np.float64)
+
+    # coinciding points keep zero distance and azimuths
+    todo = np.flatnonzero((np.abs(lat1 - lat2) >= 1e-8) |
+                          (np.abs(lon1 - lon2) >= 1e-8))
+    if not todo.size:
+        return (dist.reshape(shape), alpha12.reshape(shape),
+                alpha21.reshape(shape))
+
+    # convert latitudes and longitudes to radians:
+    lat1 = lat1[todo] * 2.0 * np.pi / 360.
+    lon1 = lon1[todo] * 2.0 * np.pi / 360.
+    lat2 = lat2[todo] * 2.0 * np.pi / 360.
+    lon2 = lon2[todo] * 2.0 * np.pi / 360.
+
+    U1 = np.arctan((1 - f) * np.tan(lat1))
+    U2 = np.arctan((1 - f) * np.tan(lat2))
+    sin_U1, cos_U1 = np.sin(U1), np.cos(U1)
+    sin_U2, cos_U2 = np.sin(U2), np.cos(U2)
+
+    omega = lon2 - lon1
+    dlon = omega.copy()
+    dist_ = np.empty_like(dlon)
+    alpha12_ = np.empty_like(dlon)
+    alpha21_ = np.empty_like(dlon)
+
+    # Iterate only the point pairs that did not converge yet. The scalar
+    # version raises after its 101st iteration, pairs still iterating at that
+    # point have no solution.
+    active = np.arange(len(dlon))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for iteration in range(101):
+            sU1, cU1 = sin_U1[active], cos_U1[active]
+            sU2, cU2 = sin_U2[active], cos_U2[active]
+            dl = dlon[active]
+            sin_dl, cos_dl = np.sin(dl), np.cos(dl)
+            sqr_sin_sigma = (cU2 * sin_dl) ** 2 + \
+                (cU1 * sU2 - sU1 * cU2 * cos_dl) ** 2
+            Sin_sigma = np.sqrt(sqr_sin_sigma)
+            Cos_sigma = sU1 * sU2 + cU1 * cU2 * cos_dl
+            sigma = np.arctan2(Sin_sigma, Cos_sigma)
+            Sin_alpha = cU1 * cU2 * sin_dl / np.sin(sigma)
+            # lines along the equator can end up a rounding error above one
+            Sin_alpha = np.where(np.abs(Sin_alpha) <= 1 + 4 * _EPS,
+                                 np.clip(Sin_alpha, -1, 1), Sin_alpha)
+            alpha = np.arcsin(Sin_alpha)
+            sqr_cos_alpha = np.cos(alpha) ** 2
+            Cos2sigma_m = np.cos(sigma) - (2 * sU1 * sU2 / sqr_cos_alpha)
+            C = (f / 16) * sqr_cos_alpha * \
+                (4 + f * (4 - 3 * sqr_cos_alpha))
+            last_dl = dl
+            dl = omega[active] + (1 - C) * f * np.sin(alpha) * \
+                (sigma + C * np.sin(sigma) *
+                    (Cos2sigma_m + C * np.cos(sigma) *
+                        (-1 + 2 * Cos2sigma_m ** 2)))
+            dlon[active] = dl
+
+            u2 = sqr_cos_alpha * (a * a - b * b) / (b * b)
+            A = 1 + (u2 / 16384) * \
+                (4096 + u2 * (-768 + u2 * (320 - 175 * u2)))
+            B = (u2 / 1024) * (256 + u2 * (-128 + u2 * (74 - 47 * u2)))
+            delta_sigma = B * Sin_sigma * \
+                (Cos2sigma_m + (B / 4) *
+                    (Cos_sigma * (-1 + 2 * Cos2sigma_m ** 2) - (B / 6) *
+                        Cos2sigma_m * (-3 + 4 * sqr_sin_sigma) *
+                        (-3 + 4 * Cos2sigma_m ** 2)))
+
+            sin_dl, cos_dl = np.sin(dl), np.cos(dl)
+            dist_[active] = b * A * (sigma - delta_sigma)
+            alpha12_[active] = np.arctan2(cU2 * sin_dl,
+                                          cU1 * sU2 - sU1 * cU2 * cos_dl)
+            alpha21_[active] = np.arctan2(cU1 * sin_dl,
+                                          -sU1 * cU2 + cU1 * sU2 * cos_dl)
+            if iteration == 100:
+                # iteration limit reached
+                dist_[active] = np.nan
+                break
+            active = active[(dl != 0) &
+                            (np.abs((last_dl - dl) / dl) > 1.0e-9)]
+            if not active.size:
+                break
+
+    # domain errors propagate as NaN through the iteration
+    failed = np.isnan(dist_) | np.isnan(alpha12_) | np.isnan(alpha21_)
+
+    alpha12_ = np.where(alpha12_ < 0.0, alpha12_ + (2.0 * np.pi), alpha12_)
+    alpha12_ = np.where(alpha12_ > (2.0 * np.pi), alpha12_ - (2.0 * np.pi),
+                        alpha12_)
+
+    alpha21_ = alpha21_ + np.pi
+
+    alpha21_ = np.where(alpha21_ < 0.0, alpha21_ + (2.0 * np.pi), alpha21_)
+    alpha21_ = np.where(alpha21_ > (2.0 * np.pi), alpha21_ - (2.0 * np.pi),
+                        alpha21_)
+
+    # convert to degrees:
+    alpha12_ = alpha12_ * 360 / (2.0 * np.pi)
+    alpha21_ = alpha21_ * 360 / (2.0 * np.pi)
+
+    dist_[failed] = np.nan
+    alpha12_[failed] = np.nan
+    alpha21_[failed] = np.nan
+    dist[todo] = dist_
+    alpha12[todo] = alpha12_
+    alpha21[todo] = alpha21_
+    return dist.reshape(shape), alpha12.reshape(shape), alpha21.reshape(shape)
+
+
 @deprecated("'gps2DistAzimuth' has been renamed to "
             "'gps2dist_azimuth'. Use that instead.")
 def gps2DistAzimuth(lat1, lon1, lat2, lon2):
@@ -219,7 +390,15 @@ def gps2dist_azimuth(lat1, lon1, lat2, lon2):
         (:func:`obspy.core.util.geodetics.calc_vincenty_inverse`) is used which
         has known limitations for two nearly antipodal points and is ca. 4x
         slower.
+
+    All parameters can also be given as (broadcastable) arrays. In this case
+    the vectorized Vincenty's Inverse formulae are used for all point pairs
+    and geographiclib (if installed) is only consulted for the nearly
+    antipodal point pairs without a Vincenty solution. Arrays of distances
+    and azimuths are returned.
     """
+    if _is_array_input(lat1, lon1, lat2, lon2):
+        return _gps2dist_azimuth_array(lat1, lon1, lat2, lon2)
     try:
         # try using geographiclib
         from geographiclib.geodesic import Geodesic
@@ -247,6 +426,23 @@ def gps2dist_azimuth(lat1, lon1, lat2, lon2):
         raise e
 
 
+def _gps2dist_azimuth_array(lat1, lon1, lat2, lon2):
+    """
+    Array version of :func:`gps2dist_azimuth`.
+    """
+    dist, azim, bazim = _calc_vincenty_inverse_array(lat1, lon1, lat2, lon2)
+    failed = np.isnan(dist)
+    if not failed.any():
+        return dist, azim, bazim
+    # nearly antipodal points, use geographiclib if available or the
+    # fallback values of the scalar version
+    coords = [x[failed] for x in np.broadcast_arrays(lat1, lon1, lat2, lon2)]
+    values = [gps2dist_azimuth(*[float(x) for x in args])
+              for args in zip(*coords)]
+    dist[failed], azim[failed], bazim[failed] = np.array(values).T
+    return dist, azim, bazim
+
+
 def kilometer2degrees(kilometer, radius=6371):
     """
     Convenience function to convert kilometers to degrees assuming a perfectly
@@ -309,12 +505,19 @@ def locations2degrees(lat1, long1, lat2, long2):
     :rtype: float
     :return: Distance in degrees as a floating point number.
 
+    All parameters can also be given as (broadcastable) arrays, an array of
+    distances is returned then.
+
     .. rubric:: Example
 
     >>> from obspy.geodetics import locations2degrees
     >>> locations2degrees(5, 5, 10, 10)
     7.0397014191753815
+    >>> locations2degrees(5, 5, [10, 5], 10).round(6).tolist()
+    [7.039701, 4.980961]
     """
+    if _is_array_input(lat1, long1, lat2, long2):
+        return _locations2degrees_array(lat1, long1, lat2, long2)
     # Convert to radians.
     lat1 = math.radians(lat1)
     lat2 = math.radians(lat2)
@@ -332,6 +535,81 @@ def locations2degrees(lat1, long1, lat2, long2):
     return gd
 
 
+def _locations2degrees_array(lat1, long1, lat2, long2):
+    """
+    Array version of :func:`locations2degrees`.
+    """
+    # Convert to radians.
+    lat1 = np.radians(np.asarray(lat1, dtype=np.float64))
+    lat2 = np.radians(np.asarray(lat2, dtype=np.float64))
+    long1 = np.radians(np.asarray(long1, dtype=np.float64))
+    long2 = np.radians(np.asarray(long2, dtype=np.float64))
+    long_diff = long2 - long1
+    gd = np.degrees(
+        np.arctan2(
+            np.sqrt((
+                np.cos(lat2) * np.sin(long_diff)) ** 2 +
+                (np.cos(lat1) * np.sin(lat2) - np.sin(lat1) *
+                    np.cos(lat2) * np.cos(long_diff)) ** 2),
+            np.sin(lat1) * np.sin(lat2) + np.cos(lat1) * np.cos(lat2) *
+            np.cos(long_diff)))
+    return gd
+
+
+def distance_matrix(lat1, lon1, lat2, lon2, spherical=False):
+    """
+    Calculates the distances between all pairs of points of two sets of
+    locations, e.g. between a list of events and a list of stations.
+
+    :type lat1: array_like
+    :param lat1: Latitudes of the first set of points in degrees
+    :type lon1: array_like
+    :param lon1: Longitudes of the first set of points in degrees
+    :type lat2: array_like
+    :param lat2: Latitudes of the second set of points in degrees
+    :type lon2: array_like
+    :param lon2: Longitudes of the second set of points in degrees
+    :type spherical: bool
+    :param spherical: If ``False`` geodesic distances in m on the WGS84
+        ellipsoid are calculated (see :func:`gps2dist_azimuth`), otherwise
+        great circle distances in degrees on a spherical Earth (see
+        :func:`locations2degrees`).
+    :rtype: :class:`numpy.ndarray`
+    :return: Distances with shape ``(len(lat1), len(lat2))``, the element
+        ``[i, j]`` is the distance between point ``i`` of the first and point
+        ``j`` of the second set.
+
+    .. rubric:: Example
+
+    >>> from obspy.geodetics import distance_matrix
+    >>> distance_matrix([5, 0], [5, 0], [10, 5, 0], [10, 5, 0],
+    ...                 spherical=True).round(6).tolist()
+    [[7.039701, 0.0, 7.066574], [14.106044, 7.066574, 0.0]]
+    """
+    lat1 = np.atleast_1d(np.asarray(lat1, dtype=np.float64))
+    lon1 = np.atleast_1d(np.asarray(lon1, dtype=np.float64))
+    lat2 = np.atleast_1d(np.asarray(lat2, dtype=np.float64))
+    lon2 = np.atleast_1d(np.asarray(lon2, dtype=np.float64))
+    if lat1.shape != lon1.shape or lat2.shape != lon2.shape or \
+            lat1.ndim != 1 or lat2.ndim != 1:
+        msg = "Latitudes and longitudes of each set must be 1-D arrays " + \
+              "of the same length."
+        raise ValueError(msg)
+    if spherical:
+        func = _locations2degrees_array
+    else:
+        def func(*args):
+            return _gps2dist_azimuth_array(*args)[0]
+    result = np.empty((len(lat1), len(lat2)), dtype=np.float64)
+    # Process blocks of rows to bound the memory of intermediate arrays.
+    rows = max(1, _DISTANCE_MATRIX_BLOCK_SIZE // max(1, len(lat2)))
+    for i in range(0, len(lat1), rows):
+        result[i:i + rows] = func(lat1[i:i + rows, np.newaxis],
+                                  lon1[i:i + rows, np.newaxis],
+                                  lat2[np.newaxis, :], lon2[np.newaxis, :])
+    return result
+
+
 if __name__ == '__main__':
     import doctest
     doctest.testmod(exclude_empty=True)
@@ -7,9 +7,11 @@ import math
 import unittest
 import warnings
 
+import numpy as np
+
 from obspy.geodetics import (calc_vincenty_inverse, degrees2kilometers,
-                             gps2dist_azimuth, kilometer2degrees,
-                             locations2degrees)
+                             distance_matrix, gps2dist_azimuth,
+                             kilometer2degrees, locations2degrees)
 
 # checking for geographiclib
 try:
@@ -110,6 +112,78 @@ class UtilGeodeticsTestCase(unittest.TestCase):
         self.assertAlmostEqual(alpha12, calc_alpha12)
         self.assertAlmostEqual(alpha21, calc_alpha21)
 
+    def test_calc_vincenty_inverse_array(self):
+        """
+        Array input of calc_vincenty_inverse() gives the results of the
+        scalar version, pairs without solution are set to NaN.
+        """
+        lat1 = [-37.95103342, 0, 0, 15.26804251, 10, 50]
+        lon1 = [144.42486789, 0.2, 0, 2.93007342, 20, 370]
+        lat2 = [-37.65282114, 0, 0, -14.80522806, 10, 51]
+        lon2 = [143.92649553, 20, 10, -177.2299081, 380, -709]
+        dist, alpha12, alpha21 = calc_vincenty_inverse(lat1, lon1, lat2, lon2)
+        self.assertEqual(dist.shape, (6,))
+        for i, args in enumerate(zip(lat1, lon1, lat2, lon2)):
+            try:
+                expected = calc_vincenty_inverse(*args)
+            except StopIteration:
+                self.assertTrue(np.isnan(dist[i]))
+                self.assertTrue(np.isnan(alpha12[i]))
+                self.assertTrue(np.isnan(alpha21[i]))
+                continue
+            np.testing.assert_allclose(
+                (dist[i], alpha12[i], alpha21[i]), expected, rtol=1e-12)
+        # coinciding points
+        self.assertEqual((dist[4], alpha12[4], alpha21[4]), (0, 0, 0))
+        # broadcasting
+        dist, _, _ = calc_vincenty_inverse(0, 0, [[0], [10]], [10, 17])
+        self.assertEqual(dist.shape, (2, 2))
+        self.assertAlmostEqual(dist[0, 0], 1113194.9077920639)
+        self.assertAlmostEqual(dist[0, 1], 1892431.3432465086)
+        # out of bounds
+        self.assertRaises(ValueError, calc_vincenty_inverse,
+                          [0, 91], 0, 0, 0)
+        self.assertRaises(ValueError, calc_vincenty_inverse,
+                          0, 0, [0, -91], 0)
+
+    def test_gps2dist_azimuth_array(self):
+        """
+        Array input of gps2dist_azimuth().
+        """
+        lat1 = np.array([50, 50, 15.26804251])
+        lon1 = np.array([10, 10, 2.93007342])
+        lat2 = np.array([51, 49, -14.80522806])
+        lon2 = np.array([11, 9, -177.2299081])
+        with warnings.catch_warnings(record=True):
+            warnings.simplefilter('ignore')
+            dist, azim, bazim = gps2dist_azimuth(lat1, lon1, lat2, lon2)
+            for i, args in enumerate(zip(lat1, lon1, lat2, lon2)):
+                expected = gps2dist_azimuth(*args)
+                self.assertAlmostEqual(dist[i], expected[0], 2)
+                self.assertAlmostEqual(azim[i], expected[1], 6)
+                self.assertAlmostEqual(bazim[i], expected[2], 6)
+
+    def test_distance_matrix(self):
+        """
+        Test the pairwise distance matrix of two sets of locations.
+        """
+        lat1, lon1 = [5, 0, -30], [5, 0, 170]
+        lat2, lon2 = [10, 5, 0, 60], [10, 5, 0, -20]
+        degrees = distance_matrix(lat1, lon1, lat2, lon2, spherical=True)
+        meters = distance_matrix(lat1, lon1, lat2, lon2)
+        self.assertEqual(degrees.shape, (3, 4))
+        self.assertEqual(meters.shape, (3, 4))
+        for i in range(3):
+            for j in range(4):
+                self.assertAlmostEqual(
+                    degrees[i, j],
+                    locations2degrees(lat1[i], lon1[i], lat2[j], lon2[j]))
+                self.assertAlmostEqual(
+                    meters[i, j],
+                    gps2dist_azimuth(lat1[i], lon1[i], lat2[j], lon2[j])[0],
+                    3)
+        self.assertRaises(ValueError, distance_matrix, [1, 2], [1], [1], [1])
+
     @unittest.skipIf(HAS_GEOGRAPHICLIB, 'Module geographiclib is installed, '
                                         'not using calc_vincenty_inverse')
     def test_gps2DistAzimuthBUG150(self):
@@ -180,6 +254,17 @@ class UtilGeodeticsTestCase(unittest.TestCase):
         assertLoc(0, 0, 0, 180, 20004)
         assertLoc(11, 55, 11, 55, 0)
 
+        # Array input.
+        lat1 = np.array([36.12, 11.11, -11.11, 11])
+        long1 = np.array([-86.67, 22.22, -22.22, 55])
+        lat2 = np.array([33.94, 33.33, -33.33, 11])
+        long2 = np.array([-118.40, 44.44, -44.44, 55])
+        result = locations2degrees(lat1, long1, lat2, long2)
+        self.assertEqual(result.shape, (4,))
+        for i in range(4):
+            self.assertAlmostEqual(result[i], locations2degrees(
+                lat1[i], long1[i], lat2[i], long2[i]))
+
     @unittest.skipIf(not HAS_GEOGRAPHICLIB, 'Module geographiclib is not '
                                             'installed')
     def test_issue_375(self):
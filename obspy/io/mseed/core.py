@@ -104,7 +104,8 @@ def _is_mseed(filename):
 
 def _read_mseed(mseed_object, starttime=None, endtime=None, headonly=False,
                 sourcename=None, reclen=None, details=False,
-                header_byteorder=None, verbose=None, **kwargs):
+                header_byteorder=None, verbose=None, mmap=False, index=False,
+                **kwargs):
     """
     Reads a Mini-SEED file and returns a Stream object.
 
@@ -150,6 +151,23 @@ def _read_mseed(mseed_object, starttime=None, endtime=None, headonly=False,
         little-endian, ``1`` or ``'>'`` for MBF or big-endian. ``'='`` is the
         native byte order. Used to enforce the header byte order. Useful in
         some rare cases where the automatic byte order detection fails.
+    :type mmap: bool, optional
+    :param mmap: If ``True``, a file given by its name is memory mapped
+        instead of being read into memory as a whole. If ``starttime``,
+        ``endtime`` or ``sourcename`` are given in addition, only the fixed
+        headers of all records are parsed first and only the records
+        possibly overlapping with the selection are passed on to libmseed to
+        be unpacked. This greatly speeds up cutting small time windows out
+        of large files. Only applies to files with a constant record length,
+        otherwise the whole memory mapped file is passed on.
+        Defaults to ``False``.
+    :type index: bool, optional
+    :param index: If ``True`` and ``starttime``, ``endtime`` or
+        ``sourcename`` are given, a record index of the file is used to only
+        read the records matching the selection. The index is stored next to
+        the file and rebuilt if the file changes, see
+        :func:`~obspy.io.mseed.util.get_record_index`. Useful when cutting
+        many small time windows out of the same files. Defaults to ``False``.
 
     .. rubric:: Example
 
@@ -248,10 +266,38 @@ def _read_mseed(mseed_object, starttime=None, endtime=None, headonly=False,
             'byteorder': info['byteorder'],
             'number_of_records': info['number_of_records']}
 
+    is_selection = starttime is not None or endtime is not None or \
+        sourcename is not None
+    if (mmap or index) and is_selection:
+        for value in (starttime, endtime):
+            if value is not None and not isinstance(value, UTCDateTime):
+                msg = 'starttime and endtime need to be UTCDateTime objects'
+                raise ValueError(msg)
+
+    # Use the record index to only read the records of interest.
+    record_index = None
+    if index and is_selection and \
+            isinstance(mseed_object, (str, native_str)) and \
+            (sourcename is None or isinstance(sourcename, (str, native_str))):
+        record_index = util.get_record_index(mseed_object)
+
+    if record_index is not None:
+        offsets = util._select_records_from_index(
+            record_index, starttime=starttime, endtime=endtime,
+            sourcename=sourcename)
+        if not len(offsets):
+            return Stream()
+        bfrNp = util._read_records(mseed_object, offsets,
+                                   record_index['record_length'])
     # If it's a file name just read it.
-    if isinstance(mseed_object, (str, native_str)):
-        # Read to NumPy array which is used as a buffer.
-        bfrNp = np.fromfile(mseed_object, dtype=np.int8)
+    elif isinstance(mseed_object, (str, native_str)):
+        if mmap:
+            # Memory map the file - only the parts actually accessed will be
+            # read from disc.
+            bfrNp = np.memmap(mseed_object, dtype=np.int8, mode="r")
+        else:
+            # Read to NumPy array which is used as a buffer.
+            bfrNp = np.fromfile(mseed_object, dtype=np.int8)
     elif hasattr(mseed_object, 'read'):
         bfrNp = np.fromstring(mseed_object.read(), dtype=np.int8)
 
@@ -283,6 +329,22 @@ def _read_mseed(mseed_object, starttime=None, endtime=None, headonly=False,
             continue
         break
     bfrNp = bfrNp[offset:]
+
+    # Only pass on the records possibly matching the selection. Everything
+    # else is never read or unpacked.
+    if mmap and is_selection and record_index is None:
+        mask = None
+        if sourcename is None or isinstance(sourcename, (str, native_str)):
+            mask = util._select_records(
+                bfrNp, info['record_length'], info['byteorder'],
+                starttime=starttime, endtime=endtime, sourcename=sourcename)
+        if mask is not None:
+            if not mask.any():
+                return Stream()
+            if not mask.all():
+                bfrNp = bfrNp.reshape((-1, info['record_length']))[mask]
+                bfrNp = bfrNp.ravel()
+
     buflen = len(bfrNp)
 
     # If no selection is given pass None to the C function.
@@ -44,6 +44,34 @@ SEED_CONTROL_HEADERS = [ord('V'), ord('A'), ord('S'), ord('T')]
 MINI_SEED_CONTROL_HEADERS = [ord('D'), ord('R'), ord('Q'), ord('M')]
 VALID_CONTROL_HEADERS = SEED_CONTROL_HEADERS + MINI_SEED_CONTROL_HEADERS
 
+# NumPy dtype of the fixed section of the data header (without byte order).
+FIXED_HEADER_DTYPE = [
+    (native_str('sequence_number'), native_str('S6')),
+    (native_str('data_header_indicator'), native_str('S1')),
+    (native_str('reserved'), native_str('S1')),
+    (native_str('station'), native_str('S5')),
+    (native_str('location'), native_str('S2')),
+    (native_str('channel'), native_str('S3')),
+    (native_str('network'), native_str('S2')),
+    (native_str('year'), native_str('u2')),
+    (native_str('julday'), native_str('u2')),
+    (native_str('hour'), native_str('u1')),
+    (native_str('minute'), native_str('u1')),
+    (native_str('second'), native_str('u1')),
+    (native_str('unused'), native_str('u1')),
+    (native_str('fract'), native_str('u2')),
+    (native_str('npts'), native_str('u2')),
+    (native_str('samp_rate_factor'), native_str('i2')),
+    (native_str('samp_rate_mult'), native_str('i2')),
+    (native_str('activity_flags'), native_str('u1')),
+    (native_str('io_and_clock_flags'), native_str('u1')),
+    (native_str('data_quality_flags'), native_str('u1')),
+    (native_str('number_of_blockettes'), native_str('u1')),
+    (native_str('time_correction'), native_str('i4')),
+    (native_str('begin_of_data'), native_str('u2')),
+    (native_str('first_blockette'), native_str('u2'))]
+FIXED_HEADER_DTYPE_SIZE = 48
+
 # expected data types for libmseed id: (numpy, ctypes)
 DATATYPES = {b"a": C.c_char, b"i": C.c_int32, b"f": C.c_float,
              b"d": C.c_double}
@@ -1232,6 +1232,51 @@ class MSEEDReadingAndWritingTestCase(unittest.TestCase):
             self.assertRaises(ValueError, st.write, tf, format="mseed",
                               encoding=11, reclen=512)
 
+    def test_read_with_mmap(self):
+        """
+        Reading memory mapped files with and without a selection has to give
+        the same results as reading the whole file.
+        """
+        for filename in ['gaps.mseed', 'two_channels.mseed', 'test.mseed',
+                         'BW.BGLD.__.EHE.D.2008.001.first_10_records',
+                         'fullseed.mseed']:
+            filename = os.path.join(self.path, 'data', filename)
+            st = _read_mseed(filename)
+            self.assertEqual(_read_mseed(filename, mmap=True), st)
+            t = st[0].stats.starttime + (st[0].stats.endtime -
+                                         st[0].stats.starttime) * 0.5
+            for kwargs in [dict(starttime=t), dict(endtime=t),
+                           dict(starttime=t - 1, endtime=t + 1),
+                           dict(sourcename=st[-1].id),
+                           dict(starttime=t + 1E6),
+                           dict(endtime=t - 1E6)]:
+                self.assertEqual(_read_mseed(filename, mmap=True, **kwargs),
+                                 _read_mseed(filename, **kwargs))
+
+    def test_select_records(self):
+        """
+        Tests the preselection of records based on the fixed headers only.
+        """
+        filename = os.path.join(self.path, 'data', 'gaps.mseed')
+        buf = np.fromfile(filename, dtype=np.int8)
+        headers = util._get_fixed_headers(buf, 512, ">")
+        self.assertEqual(len(headers), 128)
+        self.assertEqual(set(util._get_record_ids(headers)),
+                         set(["BW.BGLD..EHE"]))
+        starttimes, endtimes, samp_rates = util._get_record_times(headers)
+        self.assertEqual(UTCDateTime(starttimes[1]),
+                         UTCDateTime(2008, 1, 1, 0, 0, 4, 35000))
+        np.testing.assert_array_equal(samp_rates, 200.0)
+        # selection is done with a tolerance of one record length
+        mask = util._select_records(
+            buf, 512, ">", starttime=UTCDateTime(starttimes[1]) + 0.5,
+            endtime=UTCDateTime(starttimes[1]) + 1.0)
+        self.assertEqual(np.nonzero(mask)[0].tolist(), [0, 1, 2])
+        mask = util._select_records(buf, 512, ">", sourcename="BW.*.EHZ")
+        self.assertFalse(mask.any())
+        # wrong record length
+        self.assertEqual(util._get_fixed_headers(buf, 256, ">"), None)
+
 
 def suite():
     return unittest.makeSuite(MSEEDReadingAndWritingTestCase, 'test')
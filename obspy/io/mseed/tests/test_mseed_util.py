@@ -19,6 +19,7 @@ import numpy as np
 from obspy import UTCDateTime
 from obspy.core import Stream, Trace
 from obspy.core.util import NamedTemporaryFile
+from obspy.core.util.misc import TemporaryWorkingDirectory
 from obspy.io.mseed import util
 from obspy.io.mseed.core import _read_mseed
 from obspy.io.mseed.headers import (FIXED_HEADER_ACTIVITY_FLAGS,
@@ -771,6 +772,49 @@ class MSEEDUtilTestCase(unittest.TestCase):
             self.assertRaises(ValueError, set_flags_in_fixed_headers,
                               file_name, wrong_trace)
 
+    def test_get_record_index(self):
+        """
+        Tests building, storing and using the record index of a file.
+        """
+        with open(os.path.join(self.path, 'data', 'gaps.mseed'), 'rb') as fh:
+            data = fh.read()
+        with TemporaryWorkingDirectory():
+            filename = 'gaps.mseed'
+            index_filename = filename + util.RECORD_INDEX_SUFFIX
+            with open(filename, 'wb') as fh:
+                fh.write(data)
+            index = util.get_record_index(filename)
+            self.assertTrue(os.path.exists(index_filename))
+            self.assertEqual(index['record_length'], 512)
+            self.assertEqual(index['byteorder'], '>')
+            self.assertEqual(len(index['offset']), 128)
+            self.assertEqual(index['source_ids'].tolist(), ['BW.BGLD..EHE'])
+            np.testing.assert_array_equal(index['encoding'], 10)
+            np.testing.assert_array_equal(index['samp_rate'], 200.0)
+            self.assertTrue(np.all(np.diff(index['starttime']) >= 0))
+            # the stored index is used as long as the file is unchanged
+            stored = util.get_record_index(filename)
+            for key in ['offset', 'starttime', 'endtime', 'source_id']:
+                np.testing.assert_array_equal(stored[key], index[key])
+            self.assertEqual(stored['record_length'], 512)
+            # reading with the index gives the same results
+            t = UTCDateTime(2008, 1, 1, 0, 0, 30)
+            for kwargs in [dict(starttime=t), dict(endtime=t),
+                           dict(starttime=t, endtime=t + 20),
+                           dict(sourcename='BW.BGLD..EHE', endtime=t),
+                           dict(sourcename='BW.BGLD..EHZ'),
+                           dict(starttime=t + 1E6)]:
+                self.assertEqual(_read_mseed(filename, index=True, **kwargs),
+                                 _read_mseed(filename, **kwargs))
+            # a changed file results in a new index
+            with open(filename, 'wb') as fh:
+                fh.write(data[:512 * 10])
+            os.utime(filename, (0, 0))
+            index = util.get_record_index(filename)
+            self.assertEqual(len(index['offset']), 10)
+            self.assertEqual(_read_mseed(filename, index=True, starttime=t),
+                             _read_mseed(filename, starttime=t))
+
     def _check_values(self, file_bfr, trace_id, record_numbers, expected_bytes,
                       reclen):
         """
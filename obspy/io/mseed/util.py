@@ -9,6 +9,7 @@ from future.utils import native_str
 
 import collections
 import ctypes as C
+import fnmatch
 import math
 import os
 import sys
@@ -22,9 +23,11 @@ from obspy import UTCDateTime
 from obspy.core.util import score_at_percentile
 from obspy.core.util.decorator import deprecated
 from .headers import (ENCODINGS, ENDIAN, FIXED_HEADER_ACTIVITY_FLAGS,
-                      FIXED_HEADER_DATA_QUAL_FLAGS,
-                      FIXED_HEADER_IO_CLOCK_FLAGS, FRAME, HPTMODULUS,
-                      SAMPLESIZES, UNSUPPORTED_ENCODINGS, clibmseed)
+                      FIXED_HEADER_DATA_QUAL_FLAGS, FIXED_HEADER_DTYPE,
+                      FIXED_HEADER_DTYPE_SIZE, FIXED_HEADER_IO_CLOCK_FLAGS,
+                      FRAME, HPTMODULUS, MINI_SEED_CONTROL_HEADERS,
+                      SAMPLESIZES, SEED_CONTROL_HEADERS,
+                      UNSUPPORTED_ENCODINGS, clibmseed)
 
 
 @deprecated("'getStartAndEndTime' has been renamed to "
@@ -500,6 +503,348 @@ def _get_record_information(file_object, offset=0, endian=None):
     return info
 
 
+def _get_fixed_headers(buffer_, record_length, byteorder):
+    """
+    Parses the fixed section of the data header of all records in a buffer
+    with a constant record length without reading any data payload.
+
+    :type buffer_: :class:`numpy.ndarray`
+    :param buffer_: One dimensional buffer (e.g. a :class:`numpy.memmap`)
+        starting with a Mini-SEED record.
+    :type record_length: int
+    :param record_length: Record length in bytes.
+    :type byteorder: str
+    :param byteorder: Byte order of the headers, either ``"<"`` or ``">"``.
+    :rtype: :class:`numpy.ndarray` or ``None``
+    :return: Structured array with one entry per record or ``None`` if the
+        buffer cannot be split into records of the given length.
+    """
+    if record_length < FIXED_HEADER_DTYPE_SIZE or \
+            len(buffer_) % record_length:
+        return None
+    records = np.asarray(buffer_).view(np.uint8).reshape(
+        (-1, record_length))
+    # Sequence numbers must be digits, spaces or null bytes and each record
+    # needs a valid data header/quality indicator.
+    seqnr = records[:, :6]
+    if not np.all(((seqnr >= ord('0')) & (seqnr <= ord('9'))) |
+                  (seqnr == ord(' ')) | (seqnr == 0)):
+        return None
+    indicators = records[:, 6:7] == np.array(MINI_SEED_CONTROL_HEADERS,
+                                             dtype=np.uint8)
+    if not np.all(indicators.any(axis=1)):
+        return None
+    dtype = np.dtype(FIXED_HEADER_DTYPE).newbyteorder(byteorder)
+    # Only the fixed headers are copied, the data payload is never touched.
+    headers = np.ascontiguousarray(records[:, :FIXED_HEADER_DTYPE_SIZE])
+    return headers.view(dtype).ravel()
+
+
+def _get_record_times(headers):
+    """
+    Computes approximate start and end times of records from their fixed
+    headers as returned by :func:`_get_fixed_headers`.
+
+    The times are derived from the fixed header only: blockettes 100, 500
+    and 1001 are not taken into account, thus the values might be off by a
+    couple of microseconds and the sampling rate might be slightly off. Use
+    them only for a preselection of records with some tolerance.
+
+    :rtype: tuple of :class:`numpy.ndarray`
+    :return: Start times, end times (time of the last sample) as POSIX
+        timestamps and the sampling rates of all records.
+    """
+    years = headers['year'].astype(np.int64)
+    days = (years - 1970).astype(native_str('datetime64[Y]')).astype(
+        native_str('datetime64[D]')).astype(np.int64)
+    days += headers['julday'].astype(np.int64) - 1
+    starttimes = days * 86400.0 + headers['hour'] * 3600.0 + \
+        headers['minute'] * 60.0 + headers['second'] + \
+        headers['fract'] * 1e-4
+    # Apply the time correction if not already applied (bit 1 of the
+    # activity flags).
+    not_applied = (headers['activity_flags'] & 2) == 0
+    starttimes += np.where(not_applied, headers['time_correction'], 0) * 1e-4
+    # Sampling rate according to the SEED manual.
+    factor = headers['samp_rate_factor'].astype(np.float64)
+    mult = headers['samp_rate_mult'].astype(np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        samp_rates = np.select(
+            [(factor > 0) & (mult > 0), (factor > 0) & (mult < 0),
+             (factor < 0) & (mult > 0), (factor < 0) & (mult < 0)],
+            [factor * mult, -factor / mult, -mult / factor,
+             1.0 / (factor * mult)], default=1.0)
+    npts = headers['npts'].astype(np.float64)
+    endtimes = starttimes + np.maximum(npts - 1, 0) / samp_rates
+    return starttimes, endtimes, samp_rates
+
+
+def _get_record_ids(headers):
+    """
+    Returns the SEED identifiers of all records from their fixed headers as
+    returned by :func:`_get_fixed_headers`.
+
+    :rtype: list of str
+    :return: ``'network.station.location.channel'`` for every record.
+    """
+    ids = []
+    cache = {}
+    for key in zip(headers['network'], headers['station'],
+                   headers['location'], headers['channel']):
+        try:
+            ids.append(cache[key])
+        except KeyError:
+            _id = ".".join(_i.decode('ascii', 'replace').strip()
+                           for _i in key)
+            cache[key] = _id
+            ids.append(_id)
+    return ids
+
+
+def _select_records(buffer_, record_length, byteorder, starttime=None,
+                    endtime=None, sourcename=None):
+    """
+    Determines which records of a buffer might contain data in the requested
+    time span and for the requested source names by only looking at the fixed
+    headers.
+
+    The selection is conservative, records are kept with a tolerance of one
+    record length in time. The final selection still has to be done by
+    libmseed.
+
+    :rtype: :class:`numpy.ndarray` or ``None``
+    :return: Boolean array, ``True`` for every record to be read, or ``None``
+        if the buffer does not consist of records with a constant length.
+    """
+    headers = _get_fixed_headers(buffer_, record_length, byteorder)
+    if headers is None:
+        return None
+    mask = np.ones(len(headers), dtype=np.bool_)
+    if starttime is not None or endtime is not None:
+        starttimes, endtimes, samp_rates = _get_record_times(headers)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            tolerance = 1.0 + headers['npts'] / samp_rates
+        # Non-finite values result in records always being read.
+        tolerance[~np.isfinite(tolerance)] = np.inf
+        if starttime is not None:
+            mask &= ~(endtimes + tolerance < starttime.timestamp)
+        if endtime is not None:
+            mask &= ~(starttimes - tolerance > endtime.timestamp)
+    if sourcename is not None:
+        matches = {}
+        for _i, _id in enumerate(_get_record_ids(headers)):
+            if _id not in matches:
+                matches[_id] = fnmatch.fnmatchcase(_id, sourcename)
+            if not matches[_id]:
+                mask[_i] = False
+    return mask
+
+
+def _get_record_encodings(buffer_, headers, record_length, byteorder):
+    """
+    Returns the encoding stored in blockette 1000 of all records.
+
+    :rtype: :class:`numpy.ndarray`
+    :return: Encoding of every record, ``-1`` if no blockette 1000 is found.
+    """
+    records = np.asarray(buffer_).view(np.uint8).reshape(
+        (-1, record_length))
+    encodings = np.empty(len(headers), dtype=np.int16)
+    encodings.fill(-1)
+    dtype = np.dtype(native_str('u2')).newbyteorder(byteorder)
+    # Fast path: blockette 1000 is nearly always the first blockette
+    # directly following the fixed header.
+    blkt_type = records[:, 48:50].copy().view(dtype).ravel()
+    fast = (headers['first_blockette'] == 48) & (blkt_type == 1000)
+    encodings[fast] = records[fast, 52]
+    # Otherwise traverse the blockettes.
+    for _i in np.nonzero(~fast)[0]:
+        blkt_offset = int(headers['first_blockette'][_i])
+        while blkt_offset and blkt_offset + 5 <= record_length:
+            blkt_type, next_blkt = \
+                records[_i, blkt_offset:blkt_offset + 4].copy().view(dtype)
+            if blkt_type == 1000:
+                encodings[_i] = records[_i, blkt_offset + 4]
+                break
+            if next_blkt <= blkt_offset:
+                break
+            blkt_offset = next_blkt
+    return encodings
+
+
+RECORD_INDEX_SUFFIX = ".index.npz"
+
+
+def get_record_index(filename, sidecar=True):
+    """
+    Returns an index of all data records in a Mini-SEED file.
+
+    The index contains offset, approximate start and end time, sampling rate,
+    encoding and SEED identifier of every record and can be used to only read
+    the records of interest of a file, see the ``index`` parameter of
+    :func:`~obspy.io.mseed.core._read_mseed`. It is only derived from the
+    record headers, no data is unpacked.
+
+    :type filename: str
+    :param filename: Name of a Mini-SEED file with a constant record length.
+    :type sidecar: bool, optional
+    :param sidecar: If ``True``, the index is stored in a file next to the
+        Mini-SEED file (named like the file plus ``".index.npz"``) and reused
+        as long as the size and modification time of the Mini-SEED file do
+        not change. Otherwise the file is scanned on every call.
+    :rtype: dict or ``None``
+    :return: The index with the records sorted by start time or ``None`` if
+        the file cannot be indexed, e.g. because the record length changes
+        within the file.
+
+    .. rubric:: Example
+
+    >>> from obspy.core.util import get_example_file
+    >>> filename = get_example_file("test.mseed")
+    >>> index = get_record_index(filename, sidecar=False)
+    >>> print(index["record_length"], index["byteorder"])
+    4096 >
+    >>> print(index["offset"])
+    [   0 4096]
+    >>> print(index["source_ids"][index["source_id"]])
+    ['NL.HGN.00.BHZ' 'NL.HGN.00.BHZ']
+    """
+    stat = os.stat(filename)
+    index_filename = filename + RECORD_INDEX_SUFFIX
+    if sidecar and os.path.exists(index_filename):
+        try:
+            with np.load(index_filename) as npz:
+                index = dict((k, npz[k]) for k in npz.files)
+        except Exception:
+            index = None
+        if index is not None and \
+                int(index["filesize"]) == stat.st_size and \
+                float(index["mtime"]) == stat.st_mtime:
+            index["record_length"] = int(index["record_length"])
+            index["byteorder"] = str(index["byteorder"])
+            index["max_duration"] = float(index["max_duration"])
+            return index
+    # (Re)scan the file.
+    index = _build_record_index(filename)
+    if index is None:
+        return None
+    index["filesize"] = stat.st_size
+    index["mtime"] = stat.st_mtime
+    if sidecar:
+        try:
+            with open(index_filename, "wb") as fh:
+                np.savez(fh, **dict((native_str(k), v)
+                                    for k, v in index.items()))
+        except (IOError, OSError):
+            msg = "Could not write record index file '%s'." % index_filename
+            warnings.warn(msg)
+    return index
+
+
+def _build_record_index(filename):
+    """
+    Scans the headers of all records of a Mini-SEED file and builds the
+    record index. See :func:`get_record_index`.
+    """
+    info = get_record_information(filename)
+    record_length = info["record_length"]
+    byteorder = info["byteorder"]
+    buf = np.memmap(filename, dtype=np.uint8, mode="r")
+    # Skip SEED control headers, e.g. for full SEED files.
+    offset = 0
+    while offset < len(buf) and buf[offset + 6] in SEED_CONTROL_HEADERS:
+        offset += record_length
+    buf = buf[offset:]
+    headers = _get_fixed_headers(buf, record_length, byteorder)
+    if headers is None or not len(headers):
+        return None
+    starttimes, endtimes, samp_rates = _get_record_times(headers)
+    encodings = _get_record_encodings(buf, headers, record_length, byteorder)
+    ids = _get_record_ids(headers)
+    source_ids = sorted(set(ids))
+    id_map = dict((_id, _i) for _i, _id in enumerate(source_ids))
+    source_id = np.array([id_map[_id] for _id in ids], dtype=np.int32)
+    offsets = offset + np.arange(len(headers), dtype=np.int64) * \
+        record_length
+    with np.errstate(divide='ignore', invalid='ignore'):
+        durations = headers['npts'] / samp_rates
+    durations = durations[np.isfinite(durations)]
+    # Sort by start time to allow binary searches.
+    order = np.argsort(starttimes, kind="mergesort")
+    return {
+        "record_length": record_length,
+        "byteorder": byteorder,
+        "offset": offsets[order],
+        "starttime": starttimes[order],
+        "endtime": endtimes[order],
+        "samp_rate": samp_rates[order],
+        "encoding": encodings[order],
+        "source_id": source_id[order],
+        "source_ids": np.array(source_ids, dtype=np.str_),
+        "max_duration": float(durations.max()) if len(durations) else 0.0}
+
+
+def _select_records_from_index(index, starttime=None, endtime=None,
+                               sourcename=None):
+    """
+    Returns the offsets of all records of a record index (see
+    :func:`get_record_index`) possibly matching the given selection.
+
+    As with :func:`_select_records` the selection is conservative, the final
+    selection has to be done by libmseed.
+
+    :rtype: :class:`numpy.ndarray`
+    :return: Sorted byte offsets of the selected records.
+    """
+    # Times in the index are approximate, see _get_record_times().
+    tolerance = 1.0 + index["max_duration"]
+    starttimes = index["starttime"]
+    first, last = 0, len(starttimes)
+    # Records are sorted by start time and no record is longer than the
+    # maximum duration so two binary searches suffice.
+    if starttime is not None:
+        first = np.searchsorted(
+            starttimes,
+            starttime.timestamp - index["max_duration"] - tolerance,
+            side="left")
+    if endtime is not None:
+        last = np.searchsorted(starttimes, endtime.timestamp + tolerance,
+                               side="right")
+    selected = np.arange(first, max(first, last))
+    if starttime is not None:
+        selected = selected[index["endtime"][selected] + tolerance >=
+                            starttime.timestamp]
+    if sourcename is not None:
+        matching = np.array([fnmatch.fnmatchcase(str(_id), sourcename)
+                             for _id in index["source_ids"]], dtype=np.bool_)
+        selected = selected[matching[index["source_id"][selected]]]
+    return np.sort(index["offset"][selected])
+
+
+def _read_records(filename, offsets, record_length):
+    """
+    Reads the records at the given sorted offsets of a file into a single
+    buffer. Consecutive records are read at once.
+
+    :rtype: :class:`numpy.ndarray`
+    :return: ``np.int8`` buffer containing all records.
+    """
+    buf = np.empty(len(offsets) * record_length, dtype=np.int8)
+    # Split into runs of consecutive records.
+    breaks = np.nonzero(np.diff(offsets) != record_length)[0] + 1
+    position = 0
+    with open(filename, "rb") as fh:
+        for run in np.split(offsets, breaks):
+            if not len(run):
+                continue
+            nbytes = len(run) * record_length
+            fh.seek(int(run[0]), 0)
+            buf[position:position + nbytes] = np.frombuffer(
+                fh.read(nbytes), dtype=np.int8)
+            position += nbytes
+    return buf
+
+
 def _ctypes_array_2_numpy_array(buffer_, buffer_elements, sampletype):
     """
     Takes a Ctypes array and its length and type and returns it as a
@@ -551,24 +896,34 @@ def _convert_MSTime_to_datetime(timestring):
     return UTCDateTime(timestring / HPTMODULUS)
 
 
-def _unpack_steim_1(data_string, npts, swapflag=0, verbose=0):
+def _unpack_steim_1(data_string, npts, swapflag=0, verbose=0, out=None):
     """
     Unpack steim1 compressed data given as string.
 
-    :param data_string: data as string
+    :param data_string: data as string or as contiguous
+        :class:`numpy.ndarray` (e.g. a view of a larger buffer)
     :param npts: number of data points
     :param swapflag: Swap bytes, defaults to 0
+    :param out: Contiguous int32 array of length ``npts`` the data is
+        decoded into, a new array is allocated if not given.
     :return: Return data as numpy.ndarray of dtype int32
     """
-    dbuf = data_string
-    datasize = len(dbuf)
+    if isinstance(data_string, np.ndarray):
+        dbuf = data_string.ctypes.data_as(C.POINTER(FRAME))
+        datasize = data_string.nbytes
+    else:
+        dbuf = C.cast(data_string, C.POINTER(FRAME))
+        datasize = len(data_string)
     samplecnt = npts
-    datasamples = np.empty(npts, dtype=np.int32)
+    if out is None:
+        datasamples = np.empty(npts, dtype=np.int32)
+    else:
+        datasamples = out
     diffbuff = np.empty(npts, dtype=np.int32)
     x0 = C.c_int32()
     xn = C.c_int32()
     nsamples = clibmseed.msr_unpack_steim1(
-        C.cast(dbuf, C.POINTER(FRAME)), datasize,
+        dbuf, datasize,
         samplecnt, samplecnt, datasamples, diffbuff,
         C.byref(x0), C.byref(xn), swapflag, verbose)
     if nsamples != npts:
@@ -576,24 +931,34 @@ def _unpack_steim_1(data_string, npts, swapflag=0, verbose=0):
     return datasamples
 
 
-def _unpack_steim_2(data_string, npts, swapflag=0, verbose=0):
+def _unpack_steim_2(data_string, npts, swapflag=0, verbose=0, out=None):
     """
     Unpack steim2 compressed data given as string.
 
-    :param data_string: data as string
+    :param data_string: data as string or as contiguous
+        :class:`numpy.ndarray` (e.g. a view of a larger buffer)
     :param npts: number of data points
     :param swapflag: Swap bytes, defaults to 0
+    :param out: Contiguous int32 array of length ``npts`` the data is
+        decoded into, a new array is allocated if not given.
     :return: Return data as numpy.ndarray of dtype int32
     """
-    dbuf = data_string
-    datasize = len(dbuf)
+    if isinstance(data_string, np.ndarray):
+        dbuf = data_string.ctypes.data_as(C.POINTER(FRAME))
+        datasize = data_string.nbytes
+    else:
+        dbuf = C.cast(data_string, C.POINTER(FRAME))
+        datasize = len(data_string)
     samplecnt = npts
-    datasamples = np.empty(npts, dtype=np.int32)
+    if out is None:
+        datasamples = np.empty(npts, dtype=np.int32)
+    else:
+        datasamples = out
     diffbuff = np.empty(npts, dtype=np.int32)
     x0 = C.c_int32()
     xn = C.c_int32()
     nsamples = clibmseed.msr_unpack_steim2(
-        C.cast(dbuf, C.POINTER(FRAME)), datasize,
+        dbuf, datasize,
         samplecnt, samplecnt, datasamples, diffbuff,
         C.byref(x0), C.byref(xn), swapflag, verbose)
     if nsamples != npts:
@@ -25,6 +25,7 @@ from future.builtins import *  # NOQA
 
 from obspy.realtime.rtmemory import RtMemory
 from obspy.realtime.rttrace import RtTrace
+from obspy.realtime.rthub import RtHub
 
 
 if __name__ == '__main__':
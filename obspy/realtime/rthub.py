@@ -0,0 +1,492 @@
+# -*- coding: utf-8 -*-
+"""
+Module for the real time processing of many channels at once.
+
+:copyright:
+    The ObsPy Development Team (devs@obspy.org)
+:license:
+    GNU Lesser General Public License, Version 3
+    (http://www.gnu.org/copyleft/lesser.html)
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+from future.builtins import *  # NOQA
+from future import standard_library
+
+import sys
+import threading
+import warnings
+from collections import OrderedDict, deque
+from multiprocessing.pool import ThreadPool
+
+from obspy.core.stream import Stream
+from obspy.realtime.rttrace import RtTrace
+
+with standard_library.hooks():
+    import queue
+
+
+POLICIES = ('block', 'drop_oldest', 'drop_newest')
+
+# marks the end of the data in the input and output queues
+_STOP = object()
+
+
+class _OutputQueue(queue.Queue):
+    """
+    Queue whose size limit can be lifted, so the dispatcher never blocks on
+    it while stopping.
+    """
+    def set_maxsize(self, maxsize):
+        # a put waiting for free space only wakes up if the new size is
+        # larger than the number of queued items, so the limit is lifted
+        # with sys.maxsize and not with 0
+        with self.mutex:
+            self.maxsize = maxsize
+            self.not_full.notify_all()
+
+
+class RtHub(object):
+    """
+    Real time processing of data packets of many channels.
+
+    Every channel (SEED identifier) gets its own
+    :class:`~obspy.realtime.rttrace.RtTrace` with all processing registered
+    with :meth:`register_rt_process`. Packets are put into a bounded queue
+    (:meth:`put`, :meth:`put_packet` or :meth:`feed`) and processed in a
+    dispatcher thread started with :meth:`start`. The dispatcher takes all
+    queued packets (up to ``batch_size``), groups them by channel and
+    appends them to the RtTraces of the channels, distributing the channels
+    over a pool. The packets of one channel are always processed in order.
+
+    The processed packets are passed to ``on_data`` and coincidence triggers
+    to ``on_trigger``. Without callbacks they are queued for iterating over
+    the hub, which yields ``('data', trace)`` and ``('trigger', event)``
+    tuples until :meth:`stop` is called. Iterating works in a loop as well as
+    with ``async for`` in a coroutine.
+
+    .. rubric:: Example
+
+    .. code-block:: python
+
+        from obspy.clients.seedlink.easyseedlink import create_client
+        from obspy.realtime import RtHub
+        from obspy.signal.trigger import CoincidenceTrigger
+
+        # characteristic functions are computed by the hub, the trigger
+        # only looks for coincidences
+        trigger = CoincidenceTrigger(None, 4.0, 1.5, 3)
+        hub = RtHub(max_length=600, policy='drop_oldest', workers=4,
+                    trigger=trigger, on_trigger=print)
+        hub.register_rt_process('bandpass', freqmin=1.0, freqmax=10.0)
+        hub.register_rt_process('recursive_stalta', nsta=100, nlta=1000)
+
+        client = create_client('geofon.gfz-potsdam.de', autoconnect=True)
+        client.select_stream('GE', '*', 'BHZ')
+        with hub:
+            hub.feed(client)
+
+    :type max_length: int, optional
+    :param max_length: Maximum length of the RtTrace of a channel in
+        seconds.
+    :type queue_size: int, optional
+    :param queue_size: Maximum number of packets in the input queue and of
+        results in the output queue (not limited while stopping).
+    :type policy: str, optional
+    :param policy: What happens when putting a packet into the full input
+        queue or a result into the full output queue. ``'block'`` waits for
+        free space, which slows down reading from the SeedLink server.
+        ``'drop_oldest'`` discards the oldest queued item and
+        ``'drop_newest'`` discards the new one. The numbers of discarded
+        items are counted in :attr:`dropped` and :attr:`dropped_output`.
+        The processing memory of a channel is re-initialized at the gap
+        caused by a discarded packet.
+    :type batch_size: int, optional
+    :param batch_size: Maximum number of packets processed at once.
+    :type workers: int, optional
+    :param workers: Process the channels of a batch in a
+        :class:`multiprocessing.pool.ThreadPool` with this number of threads.
+    :param executor: Same as ``workers`` but uses the given pool with an order
+        preserving ``map()`` method, e.g. a :class:`multiprocessing.Pool`. With
+        a process pool the RtTraces of the channels are sent to the worker
+        processes and back with every batch, so keep ``max_length`` short
+        and register only picklable processing functions. The pool is not
+        shut down by the hub.
+    :param trigger: Object with ``process(stream)`` and ``flush()`` methods
+        returning lists of events, e.g. a
+        :class:`~obspy.signal.trigger.CoincidenceTrigger`. It gets the
+        processed packets of every batch.
+    :type on_data: function, optional
+    :param on_data: Called with every processed packet
+        (:class:`~obspy.core.trace.Trace`) in the dispatcher thread.
+    :type on_trigger: function, optional
+    :param on_trigger: Called with every event of ``trigger`` in the
+        dispatcher thread.
+    """
+    def __init__(self, max_length=None, queue_size=10000, policy='block',
+                 batch_size=1000, workers=None, executor=None, trigger=None,
+                 on_data=None, on_trigger=None):
+        if policy not in POLICIES:
+            msg = "policy must be one of %s, not '%s'" % (POLICIES, policy)
+            raise ValueError(msg)
+        self.max_length = max_length
+        self.policy = policy
+        self.batch_size = batch_size
+        self.workers = workers
+        self.executor = executor
+        self.trigger = trigger
+        self.on_data = on_data
+        self.on_trigger = on_trigger
+        # registered processing as (process, options)
+        self.processing = []
+        # RtTrace of every channel by SEED identifier
+        self.traces = OrderedDict()
+        self.dropped = 0
+        self.dropped_output = 0
+        self.queue_size = queue_size
+        self._input = queue.Queue(maxsize=queue_size)
+        self._output = _OutputQueue(maxsize=queue_size)
+        # results taken from the output queue but not yet consumed and the
+        # pending get and waiting futures of async iteration
+        self._results = deque()
+        self._getter = None
+        self._waiters = deque()
+        self._loop = None
+        self._pool = None
+        self._thread = None
+        self._stopping = False
+
+    def __getitem__(self, key):
+        return self.traces[key]
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def register_rt_process(self, process, **options):
+        """
+        Adds real-time processing algorithm to the processing list of all
+        channels.
+
+        See :meth:`obspy.realtime.rttrace.RtTrace.register_rt_process` for
+        the parameters.
+
+        :rtype: int
+        :return: Length of processing list after registering new processing
+            function.
+        """
+        self.processing.append((process, options))
+        for rt_trace in self.traces.values():
+            rt_trace.register_rt_process(process, **options)
+        return len(self.processing)
+
+    def put(self, trace):
+        """
+        Queues a data packet for processing.
+
+        :type trace: :class:`~obspy.core.trace.Trace`
+        :param trace: Data packet of a channel.
+        :rtype: bool
+        :return: ``False`` if the packet was discarded (or the hub is
+            stopping), ``True`` otherwise.
+        """
+        if self._stopping:
+            return False
+        queued, dropped = self._put(self._input, trace)
+        self.dropped += dropped
+        return queued
+
+    def put_packet(self, slpack):
+        """
+        Queues the data of a SeedLink packet for processing, other packets
+        are ignored.
+
+        :type slpack: :class:`~obspy.clients.seedlink.slpacket.SLPacket`
+        :param slpack: Packet returned by
+            :meth:`~obspy.clients.seedlink.client.seedlinkconnection.SeedLinkConnection.collect`.
+        :rtype: bool
+        :return: ``True`` if data was queued.
+        """
+        from obspy.clients.seedlink.slpacket import SLPacket
+        if not isinstance(slpack, SLPacket):
+            return False
+        if slpack.get_type() in (SLPacket.TYPE_SLINF, SLPacket.TYPE_SLINFT):
+            return False
+        return self.put(slpack.get_trace())
+
+    def feed(self, source):
+        """
+        Queues all data packets of a SeedLink connection.
+
+        Blocks until the connection is terminated.
+
+        :param source: A connected
+            :class:`~obspy.clients.seedlink.easyseedlink.EasySeedLinkClient`
+            with selected streams or a
+            :class:`~obspy.clients.seedlink.client.seedlinkconnection.SeedLinkConnection`.
+        """
+        from obspy.clients.seedlink.slpacket import SLPacket
+        if hasattr(source, 'collect'):
+            while True:
+                slpack = source.collect()
+                if slpack == SLPacket.SLTERMINATE:
+                    break
+                self.put_packet(slpack)
+        else:
+            source.on_data = self.put
+            source.run()
+
+    def start(self):
+        """
+        Starts processing the queued packets in a dispatcher thread.
+        """
+        if self._thread is not None:
+            if not self._stopping:
+                return
+            # a previous stop timed out, wait for the old dispatcher
+            self.stop()
+        self._stopping = False
+        self._output.set_maxsize(self.queue_size)
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """
+        Processes all queued packets and stops the dispatcher thread.
+
+        Triggers that are still on are closed. Iterating over the hub ends
+        after the remaining results. The size of the output queue is not
+        limited while stopping, so results of the remaining packets are kept
+        for iterating even if nobody consumes them concurrently.
+
+        :type timeout: float, optional
+        :param timeout: Maximum time in seconds to wait for the dispatcher.
+            If it is still running afterwards, call :meth:`stop` again to
+            wait for it. :meth:`start` waits for it before starting a new
+            one.
+        """
+        if self._thread is None:
+            return
+        if not self._stopping:
+            self._stopping = True
+            self._output.set_maxsize(sys.maxsize)
+            self._input.put(_STOP)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            return
+        self._thread = None
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def process(self, traces):
+        """
+        Processes a batch of data packets in the calling thread.
+
+        :type traces: list of :class:`~obspy.core.trace.Trace`
+        :param traces: Data packets of any channels.
+        :rtype: tuple
+        :return: The processed packets as a
+            :class:`~obspy.core.stream.Stream` (in the order of the input per
+            channel) and the list of events of ``trigger``.
+        """
+        # group the packets by channel keeping their order
+        channels = OrderedDict()
+        for trace in traces:
+            channels.setdefault(trace.id, []).append(trace)
+        args = []
+        for tr_id, packets in channels.items():
+            rt_trace = self.traces.get(tr_id)
+            if rt_trace is None:
+                rt_trace = RtTrace(max_length=self.max_length)
+                for process, options in self.processing:
+                    rt_trace.register_rt_process(process, **options)
+            args.append((rt_trace, packets))
+        if self.executor is not None:
+            results = self.executor.map(_process_channel, args)
+        elif self.workers is not None and len(args) > 1:
+            if self._pool is None:
+                self._pool = ThreadPool(processes=self.workers)
+            results = self._pool.map(_process_channel, args)
+        else:
+            results = [_process_channel(arg) for arg in args]
+        stream = Stream()
+        for tr_id, (rt_trace, processed, errors) in zip(channels, results):
+            self.traces[tr_id] = rt_trace
+            for msg in errors:
+                warnings.warn("%s: %s" % (tr_id, msg))
+            stream.traces.extend(processed)
+        events = []
+        if self.trigger is not None and len(stream):
+            # the trigger expects contiguous packets of a channel in one trace
+            merged = stream.copy()
+            merged.merge(method=-1)
+            events = self.trigger.process(merged)
+        return stream, events
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            item = self._results.popleft()
+        except IndexError:
+            item = self._output.get()
+        if item is _STOP:
+            # let other consumers stop as well
+            self._output.put(_STOP)
+            raise StopIteration
+        return item
+
+    next = __next__
+
+    def __aiter__(self):
+        return self
+
+    def __anext__(self):
+        import asyncio
+        loop = asyncio.get_event_loop()
+        result = asyncio.Future(loop=loop)
+        self._loop = loop
+        self._waiters.append(result)
+        if self._results:
+            self._deliver(self._results.popleft())
+        elif self._getter is None:
+            # only one get at a time, a get of a cancelled iteration step
+            # serves the next step
+            self._getter = loop.run_in_executor(None, self._output.get)
+            self._getter.add_done_callback(self._got)
+        return result
+
+    def _got(self, future):
+        """
+        Passes the result of a get from the output queue to the next waiting
+        iteration step.
+        """
+        self._getter = None
+        self._deliver(future.result())
+        if any(not waiter.cancelled() for waiter in self._waiters):
+            self._getter = self._loop.run_in_executor(None, self._output.get)
+            self._getter.add_done_callback(self._got)
+
+    def _deliver(self, item):
+        """
+        Resolves the first waiting iteration step that was not cancelled
+        with an item, keeps the item for later if there is none.
+        """
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if waiter.cancelled():
+                continue
+            if item is _STOP:
+                self._output.put(_STOP)
+                waiter.set_exception(StopAsyncIteration())  # NOQA
+            else:
+                waiter.set_result(item)
+            return
+        self._results.append(item)
+
+    def _run(self):
+        """
+        Loop of the dispatcher thread.
+        """
+        stop = False
+        while not stop:
+            batch = [self._input.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._input.get_nowait())
+                except queue.Empty:
+                    break
+            for i, item in enumerate(batch):
+                if item is _STOP:
+                    batch = batch[:i]
+                    stop = True
+                    break
+            if not batch:
+                continue
+            try:
+                stream, events = self.process(batch)
+            except Exception as e:
+                warnings.warn("Processing of a batch failed: %s" % e)
+                continue
+            for trace in stream:
+                self._emit(trace, None)
+            for event in events:
+                self._emit(None, event)
+        if self.trigger is not None:
+            for event in self.trigger.flush():
+                self._emit(None, event)
+        self._output.put(_STOP)
+
+    def _emit(self, trace, event):
+        """
+        Passes a processed packet or an event to its callback or queues it
+        for iterating over the hub.
+        """
+        if trace is not None:
+            callback, item = self.on_data, ('data', trace)
+        else:
+            callback, item = self.on_trigger, ('trigger', event)
+        if callback is None:
+            self.dropped_output += self._put(self._output, item)[1]
+            return
+        try:
+            callback(item[1])
+        except Exception as e:
+            warnings.warn("Callback failed: %s" % e)
+
+    def _put(self, queue_, item):
+        """
+        Puts an item into a queue according to the policy.
+
+        :rtype: tuple
+        :return: Whether the item was queued and the number of discarded
+            items.
+        """
+        if self.policy == 'block':
+            queue_.put(item)
+            return True, 0
+        dropped = 0
+        while True:
+            try:
+                queue_.put_nowait(item)
+                return True, dropped
+            except queue.Full:
+                if self.policy == 'drop_newest':
+                    return False, 1
+            try:
+                queue_.get_nowait()
+                dropped += 1
+            except queue.Empty:
+                pass
+
+
+def _process_channel(args):
+    """
+    Appends the data packets of a channel to its RtTrace.
+
+    :type args: tuple
+    :param args: RtTrace and data packets of the channel.
+    :returns: The RtTrace, the processed packets and error messages of
+        packets that could not be appended.
+    """
+    rt_trace, packets = args
+    processed = []
+    errors = []
+    for trace in packets:
+        try:
+            processed.append(rt_trace.append(trace))
+        except Exception as e:
+            errors.append("%s" % e)
+    return rt_trace, processed, errors
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(exclude_empty=True)
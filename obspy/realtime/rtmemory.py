@@ -18,6 +18,11 @@ import numpy as np
 class RtMemory:
     """
     Real time memory class.
+
+    The input and output memory arrays are views of preallocated buffers of
+    twice their length, so that updating the memory with a new packet only
+    copies the new samples. The memory is moved back to the front of the
+    buffer only when the end of the buffer is reached.
     """
     def __init__(self):
         self.initialized = False
@@ -40,37 +45,63 @@ class RtMemory:
         :param output_initial_value: Initialization value for the output
             memory array (default is 1.0).
         """
-        self.input = np.empty(length_input, data_type)
-        self.input.fill(input_initial_value)
-
-        self.output = np.empty(length_output, data_type)
-        self.output.fill(output_initial_value)
+        self._buffers = {}
+        self.input = self._allocate('input', data_type, length_input,
+                                    input_initial_value)
+        self.output = self._allocate('output', data_type, length_output,
+                                     output_initial_value)
 
         self.initialized = True
 
-    def _update(self, memory_array, data):
+    def _allocate(self, name, data_type, length, initial_value):
+        """
+        Allocates the buffer of a memory array and returns the memory array.
+        """
+        buffer_ = np.empty(2 * length, data_type)
+        buffer_.fill(initial_value)
+        self._buffers[name] = [buffer_, 0]
+        return buffer_[:length]
+
+    def _update(self, name, data):
         """
         Update specified memory array using specified number of points from
         end of specified data array.
 
-        :type memory_array: numpy.ndarray
-        :param memory_array:  Memory array (input or output) in this
-            RtMemory object to update.
+        :type name: str
+        :param name: Name of the memory array (``'input'`` or ``'output'``)
+            in this RtMemory object to update.
         :type data: numpy.ndarray
         :param data:  Data array to use for update.
         :return: NumPy :class:`~numpy.ndarray` object containing updated
             memory array (input or output).
         """
-        if data.size >= np.size(memory_array):
+        memory_array = getattr(self, name)
+        length = np.size(memory_array)
+        buffers = self.__dict__.setdefault('_buffers', {})
+        buffer_, start = buffers.get(name, (None, 0))
+        if buffer_ is None or \
+                _get_view_offset(memory_array, buffer_) != start:
+            # memory array was replaced from outside, set up a new buffer
+            buffer_ = np.empty(2 * length, memory_array.dtype)
+            buffer_[:length] = memory_array
+            start = 0
+        data = np.asarray(data)
+        if data.size >= length:
             # data length greater than or equal to memory length
-            memory_array = data[np.size(data) - np.size(memory_array):]
+            buffer_[:length] = data[data.size - length:]
+            start = 0
+        elif start + length + data.size > len(buffer_):
+            # end of buffer reached, move memory to the front
+            buffer_[:length - data.size] = \
+                buffer_[start + data.size:start + length]
+            buffer_[length - data.size:length] = data
+            start = 0
         else:
-            # data length less than memory length
-            # shift memory
-            memory_array = memory_array[data.size:]
-            # append data
-            memory_array = np.concatenate((memory_array, data))
-        return memory_array
+            # append data behind the memory
+            buffer_[start + length:start + length + data.size] = data
+            start += data.size
+        buffers[name] = [buffer_, start]
+        return buffer_[start:start + length]
 
     def update_output(self, data):
         """
@@ -80,7 +111,7 @@ class RtMemory:
         :type data: numpy.ndarray
         :param data:  Data array to use for update.
         """
-        self.output = self._update(self.output, data)
+        self.output = self._update('output', data)
 
     def update_input(self, data):
         """
@@ -90,4 +121,17 @@ class RtMemory:
         :type data: numpy.ndarray
         :param data:  Data array to use for update.
         """
-        self.input = self._update(self.input, data)
+        self.input = self._update('input', data)
+
+
+def _get_view_offset(view, buffer_):
+    """
+    Returns the index of the first element of a view within the array it was
+    sliced from or ``None`` if it is not a contiguous view of that array.
+    """
+    if not isinstance(view, np.ndarray) or view.base is not buffer_ or \
+            view.dtype != buffer_.dtype or \
+            view.strides != buffer_.strides:
+        return None
+    offset = view.ctypes.data - buffer_.ctypes.data
+    return offset // buffer_.itemsize
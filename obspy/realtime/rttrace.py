@@ -20,7 +20,7 @@ import numpy as np
 from obspy import Trace
 from obspy.core import Stats
 from obspy.realtime import signal
-from obspy.realtime.rtmemory import RtMemory
+from obspy.realtime.rtmemory import RtMemory, _get_view_offset
 
 
 # dictionary to map given type-strings to processing functions keys must be all
@@ -34,6 +34,11 @@ REALTIME_PROCESS_FUNCTIONS = {
     'tauc': (signal.tauc, 2),
     'mwpintegral': (signal.mwpIntegral, 1),
     'kurtosis': (signal.kurtosis, 3),
+    'bandpass': (signal.bandpass, 1),
+    'bandstop': (signal.bandstop, 1),
+    'lowpass': (signal.lowpass, 1),
+    'highpass': (signal.highpass, 1),
+    'recursive_stalta': (signal.recursive_STALTA, 1),
 }
 
 
@@ -49,6 +54,12 @@ class RtTrace(Trace):
     :type max_length: int, optional
     :param max_length: maximum trace length in seconds
 
+    The data of an RtTrace is kept in a preallocated buffer and
+    :attr:`data` is a view of the most recent samples within that buffer, so
+    appending a packet only costs the copy of the new samples. Later appends
+    may overwrite the buffer, so make a copy of :attr:`data` if it is needed
+    beyond the next call to :meth:`append`.
+
     .. rubric:: Example
 
     RtTrace has been built to handle real time processing of periodically
@@ -112,6 +123,8 @@ class RtTrace(Trace):
         8.78902911791...
     """
     have_appended_data = False
+    # preallocated buffer, self.data is a view of it
+    _buffer = None
 
     @classmethod
     def rt_process_functions_to_string(cls):
@@ -261,7 +274,9 @@ class RtTrace(Trace):
                     print("%s: self.stats.starttime adjusted by: %gs"
                           % (self.__class__.__name__, diff -
                              self.stats.delta))
-        # first apply all registered processing to Trace
+        # first apply all registered processing to a copy of Trace
+        if self.processing:
+            trace = trace.copy()
         for proc in self.processing:
             process_name, options, rtmemory_list = proc
             # if gap or overlap, clear memory
@@ -269,7 +284,6 @@ class RtTrace(Trace):
                 for n in range(len(rtmemory_list)):
                     rtmemory_list[n] = RtMemory()
             # apply processing
-            trace = trace.copy()
             dtype = trace.data.dtype
             if hasattr(process_name, '__call__'):
                 # check if direct function call
@@ -283,19 +297,24 @@ class RtTrace(Trace):
             trace.data = np.require(trace.data, dtype=dtype)
         # if first data, set stats
         if not self.have_appended_data:
-            self.data = np.array(trace.data)
             self.stats = Stats(header=trace.stats)
+            self.data = np.array([], dtype=trace.data.dtype)
+            self._append_data(trace.data)
             self.have_appended_data = True
             return trace
         # handle all following data sets
-        # fix Trace.__add__ parameters
-        # TODO: IMPORTANT? Should check for gaps and overlaps and handle
-        # more elegantly
-        sum_trace = Trace.__add__(
-            self, trace, method=0, interpolation_samples=0,
-            fill_value='latest', sanity_checks=True)
-        # Trace.__add__ returns new Trace, so update to this RtTrace
-        self.data = sum_trace.data
+        if gap_or_overlap or isinstance(self.data, np.ma.MaskedArray) or \
+                isinstance(trace.data, np.ma.MaskedArray):
+            # fix Trace.__add__ parameters
+            # TODO: IMPORTANT? Should check for gaps and overlaps and handle
+            # more elegantly
+            sum_trace = Trace.__add__(
+                self, trace, method=0, interpolation_samples=0,
+                fill_value='latest', sanity_checks=True)
+            # Trace.__add__ returns new Trace, so update to this RtTrace
+            self.data = sum_trace.data
+        else:
+            self._append_data(trace.data)
         # left trim if data length exceeds max_length
         if self.max_length is not None:
             max_samples = int(self.max_length * self.stats.sampling_rate + 0.5)
@@ -307,6 +326,40 @@ class RtTrace(Trace):
                             fill_value=None)
         return trace
 
+    def _append_data(self, data):
+        """
+        Appends data samples to the buffer holding the data of this RtTrace.
+
+        The data of this RtTrace is a view of a preallocated buffer, so
+        appending only copies the new samples and trimming to
+        :attr:`max_length` only moves the start of the view. The most recent
+        samples are moved to the front of the buffer (or into a larger
+        buffer) when the end of the buffer is reached, which is rare enough
+        to keep the cost proportional to the number of appended samples.
+
+        :type data: :class:`numpy.ndarray`
+        :param data: Data to append, must have the dtype of this RtTrace.
+        """
+        old = self.data
+        npts = len(old)
+        size = npts + len(data)
+        buffer_ = self._buffer
+        start = None
+        if buffer_ is not None:
+            start = _get_view_offset(old, buffer_)
+        if start is None or start + size > len(buffer_):
+            if start is not None and len(buffer_) >= npts + size:
+                # end of buffer reached, move data to the front
+                buffer_[:npts] = buffer_[start:start + npts]
+            else:
+                # data was replaced from outside or the buffer is too small
+                buffer_ = np.empty(2 * size, dtype=data.dtype)
+                buffer_[:npts] = old
+            start = 0
+        buffer_[start + npts:start + size] = data
+        self._buffer = buffer_
+        self.data = buffer_[start:start + size]
+
     def register_rt_process(self, process, **options):
         """
         Adds real-time processing algorithm to processing list of this RtTrace.
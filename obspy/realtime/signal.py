@@ -26,17 +26,26 @@ from future.builtins import *  # NOQA
 
 import math
 import sys
+from collections import OrderedDict
 
 import numpy as np
+from scipy.signal import lfilter
 
 from obspy.core.trace import Trace, UTCDateTime
 from obspy.realtime.rtmemory import RtMemory
+from obspy.signal.filter import (_bandpass_sos, _bandstop_sos, _highpass_sos,
+                                 _lowpass_sos, sosfilt)
 
 
 _PI = math.pi
 _TWO_PI = 2.0 * math.pi
 _MIN_FLOAT_VAL = 1.0e-20
 
+# second-order sections of recently used filters, designing a filter takes
+# longer than filtering a typical data packet
+SOS_CACHE_SIZE = 32
+_sos_cache = OrderedDict()
+
 
 def offset(trace, offset=0.0, rtmemory_list=None):  # @UnusedVariable
     """
@@ -634,3 +643,227 @@ def kurtosis(trace, win=3.0, rtmemory_list=None):
     rtmemory_k4_bar.input[0] = k4_bar_last
 
     return kappa4
+
+
+def bandpass(trace, freqmin, freqmax, corners=4, rtmemory_list=None):
+    """
+    Apply a Butterworth-Bandpass filter to data.
+
+    Uses the same second-order sections as
+    :func:`obspy.signal.filter.bandpass` and carries the filter delays over
+    to the next packet, so filtering packet by packet gives exactly the same
+    result as filtering the whole trace at once (``zerophase=False``).
+
+    :type trace: :class:`~obspy.core.trace.Trace`
+    :param trace: :class:`~obspy.core.trace.Trace` object to append to this
+        RtTrace
+    :type freqmin: float
+    :param freqmin: Pass band low corner frequency.
+    :type freqmax: float
+    :param freqmax: Pass band high corner frequency.
+    :type corners: int, optional
+    :param corners: Filter corners / order.
+    :type rtmemory_list: list of :class:`~obspy.realtime.rtmemory.RtMemory`,
+        optional
+    :param rtmemory_list: Persistent memory used by this process for specified
+        trace.
+    :rtype: NumPy :class:`numpy.ndarray`
+    :return: Processed trace data from appended Trace object.
+    """
+    return _sos_filter(trace, _bandpass_sos, (freqmin, freqmax), corners,
+                       rtmemory_list)
+
+
+def bandstop(trace, freqmin, freqmax, corners=4, rtmemory_list=None):
+    """
+    Apply a Butterworth-Bandstop filter to data.
+
+    Uses the same second-order sections as
+    :func:`obspy.signal.filter.bandstop` and carries the filter delays over
+    to the next packet, so filtering packet by packet gives exactly the same
+    result as filtering the whole trace at once (``zerophase=False``).
+
+    :type trace: :class:`~obspy.core.trace.Trace`
+    :param trace: :class:`~obspy.core.trace.Trace` object to append to this
+        RtTrace
+    :type freqmin: float
+    :param freqmin: Stop band low corner frequency.
+    :type freqmax: float
+    :param freqmax: Stop band high corner frequency.
+    :type corners: int, optional
+    :param corners: Filter corners / order.
+    :type rtmemory_list: list of :class:`~obspy.realtime.rtmemory.RtMemory`,
+        optional
+    :param rtmemory_list: Persistent memory used by this process for specified
+        trace.
+    :rtype: NumPy :class:`numpy.ndarray`
+    :return: Processed trace data from appended Trace object.
+    """
+    return _sos_filter(trace, _bandstop_sos, (freqmin, freqmax), corners,
+                       rtmemory_list)
+
+
+def lowpass(trace, freq, corners=4, rtmemory_list=None):
+    """
+    Apply a Butterworth-Lowpass filter to data.
+
+    Uses the same second-order sections as
+    :func:`obspy.signal.filter.lowpass` and carries the filter delays over
+    to the next packet, so filtering packet by packet gives exactly the same
+    result as filtering the whole trace at once (``zerophase=False``).
+
+    :type trace: :class:`~obspy.core.trace.Trace`
+    :param trace: :class:`~obspy.core.trace.Trace` object to append to this
+        RtTrace
+    :type freq: float
+    :param freq: Filter corner frequency.
+    :type corners: int, optional
+    :param corners: Filter corners / order.
+    :type rtmemory_list: list of :class:`~obspy.realtime.rtmemory.RtMemory`,
+        optional
+    :param rtmemory_list: Persistent memory used by this process for specified
+        trace.
+    :rtype: NumPy :class:`numpy.ndarray`
+    :return: Processed trace data from appended Trace object.
+    """
+    return _sos_filter(trace, _lowpass_sos, (freq,), corners, rtmemory_list)
+
+
+def highpass(trace, freq, corners=4, rtmemory_list=None):
+    """
+    Apply a Butterworth-Highpass filter to data.
+
+    Uses the same second-order sections as
+    :func:`obspy.signal.filter.highpass` and carries the filter delays over
+    to the next packet, so filtering packet by packet gives exactly the same
+    result as filtering the whole trace at once (``zerophase=False``).
+
+    :type trace: :class:`~obspy.core.trace.Trace`
+    :param trace: :class:`~obspy.core.trace.Trace` object to append to this
+        RtTrace
+    :type freq: float
+    :param freq: Filter corner frequency.
+    :type corners: int, optional
+    :param corners: Filter corners / order.
+    :type rtmemory_list: list of :class:`~obspy.realtime.rtmemory.RtMemory`,
+        optional
+    :param rtmemory_list: Persistent memory used by this process for specified
+        trace.
+    :rtype: NumPy :class:`numpy.ndarray`
+    :return: Processed trace data from appended Trace object.
+    """
+    return _sos_filter(trace, _highpass_sos, (freq,), corners, rtmemory_list)
+
+
+def recursive_STALTA(trace, nsta, nlta, rtmemory_list=None):
+    """
+    Apply the recursive STA/LTA on data.
+
+    Gives exactly the same characteristic function as
+    :func:`obspy.signal.trigger.recursive_STALTA` applied to the whole trace,
+    assuming the trace is longer than ``nlta`` samples. The short and long
+    time averages are carried over to the next packet.
+
+    :type trace: :class:`~obspy.core.trace.Trace`
+    :param trace: :class:`~obspy.core.trace.Trace` object to append to this
+        RtTrace
+    :type nsta: int
+    :param nsta: Length of short time average window in samples
+    :type nlta: int
+    :param nlta: Length of long time average window in samples
+    :type rtmemory_list: list of :class:`~obspy.realtime.rtmemory.RtMemory`,
+        optional
+    :param rtmemory_list: Persistent memory used by this process for specified
+        trace.
+    :rtype: NumPy :class:`numpy.ndarray`
+    :return: Processed trace data from appended Trace object.
+    """
+    if not isinstance(trace, Trace):
+        msg = "trace parameter must be an obspy.core.trace.Trace object."
+        raise ValueError(msg)
+
+    if not rtmemory_list:
+        rtmemory_list = [RtMemory()]
+
+    sample = np.ascontiguousarray(trace.data, np.float64)
+    if np.size(sample) < 1:
+        return sample
+
+    rtmemory = rtmemory_list[0]
+
+    # memory holds the last short and long time average and the number of
+    # samples processed so far
+    if not rtmemory.initialized:
+        memory_size_input = 3
+        memory_size_output = 0
+        rtmemory.initialize(np.float64, memory_size_input,
+                            memory_size_output, 0, 0)
+
+    sta_last, lta_last, count = rtmemory.input
+    count = int(count)
+    csta = 1. / nsta
+    clta = 1. / nlta
+
+    squared = sample ** 2
+    if count == 0:
+        # the first sample does not enter the averages
+        squared[0] = 0.0
+    # both averages are first order recursive filters, the filter delay is
+    # the weighted average of the previous sample
+    sta = lfilter([csta], [1.0, csta - 1.0], squared,
+                  zi=[(1 - csta) * sta_last])[0]
+    lta = lfilter([clta], [1.0, clta - 1.0], squared,
+                  zi=[(1 - clta) * lta_last])[0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        charfct = sta / lta
+    charfct[:max(nlta - count, 0)] = 0.0
+
+    rtmemory.input[:] = [sta[-1], lta[-1], count + len(sample)]
+
+    return charfct
+
+
+def _sos_filter(trace, design, freqs, corners, rtmemory_list):
+    """
+    Filter data with cascaded second-order sections keeping the filter
+    delays of all sections in memory.
+
+    :type design: function
+    :param design: Function returning the second-order sections for the
+        given corner frequencies, sampling rate and corners.
+    """
+    if not isinstance(trace, Trace):
+        msg = "trace parameter must be an obspy.core.trace.Trace object."
+        raise ValueError(msg)
+
+    if not rtmemory_list:
+        rtmemory_list = [RtMemory()]
+
+    sample = trace.data
+    if np.size(sample) < 1:
+        return sample
+
+    key = (design, freqs, trace.stats.sampling_rate, corners)
+    try:
+        sos = _sos_cache.pop(key)
+    except KeyError:
+        sos = design(*(freqs + (trace.stats.sampling_rate, corners)))
+        if len(_sos_cache) >= SOS_CACHE_SIZE:
+            _sos_cache.popitem(last=False)
+    _sos_cache[key] = sos
+
+    rtmemory = rtmemory_list[0]
+    n_sections = len(sos)
+
+    # initialize the filter delays of all sections at rest
+    if not rtmemory.initialized:
+        memory_size_input = 2 * n_sections
+        memory_size_output = 0
+        rtmemory.initialize(np.float64, memory_size_input,
+                            memory_size_output, 0, 0)
+
+    zi = rtmemory.input.reshape(n_sections, 2)
+    new_sample, zf = sosfilt(sos, sample, zi=zi)
+    rtmemory.input[:] = zf.ravel()
+
+    return new_sample
@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+"""
+The obspy.realtime.rthub test suite.
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+from future.builtins import *  # NOQA
+
+import sys
+import threading
+import time
+import unittest
+import warnings
+from multiprocessing.pool import ThreadPool
+
+import numpy as np
+
+from obspy import Trace, UTCDateTime
+from obspy.realtime import RtHub, RtTrace
+from obspy.signal.trigger import CoincidenceTrigger
+
+
+def _packets(num_channels=5, num_packets=10, npts=50, seed=0):
+    """
+    Returns the data of all channels and their packets interleaved in time.
+    """
+    rng = np.random.RandomState(seed)
+    data = {}
+    packets = []
+    for i in range(num_packets):
+        for j in range(num_channels):
+            tr_id = 'XX.S%02d..BHZ' % j
+            if tr_id not in data:
+                data[tr_id] = rng.randn(num_packets * npts)
+            tr = Trace(data=data[tr_id][i * npts:(i + 1) * npts].copy())
+            tr.stats.network = 'XX'
+            tr.stats.station = 'S%02d' % j
+            tr.stats.channel = 'BHZ'
+            tr.stats.sampling_rate = 20.0
+            tr.stats.starttime = UTCDateTime(2015, 1, 1) + i * npts / 20.0
+            packets.append(tr)
+    return data, packets
+
+
+class RtHubTestCase(unittest.TestCase):
+    """
+    Test cases for the RtHub class.
+    """
+    def test_processSameAsRtTrace(self):
+        """
+        Processing interleaved packets of many channels gives the same
+        result as one RtTrace per channel.
+        """
+        data, packets = _packets()
+        for kwargs in ({}, {'workers': 3}, {'batch_size': 7}):
+            results = []
+            hub = RtHub(on_data=results.append, **kwargs)
+            hub.register_rt_process('bandpass', freqmin=1.0, freqmax=5.0)
+            with hub:
+                for tr in packets:
+                    self.assertTrue(hub.put(tr))
+            self.assertEqual(len(results), len(packets))
+            self.assertEqual(sorted(hub.traces), sorted(data))
+            for tr_id in data:
+                rt_trace = RtTrace()
+                rt_trace.register_rt_process('bandpass', freqmin=1.0,
+                                             freqmax=5.0)
+                for tr in packets:
+                    if tr.id == tr_id:
+                        rt_trace.append(tr)
+                np.testing.assert_array_equal(hub[tr_id].data, rt_trace.data)
+                # processed packets are delivered in order
+                processed = [tr for tr in results if tr.id == tr_id]
+                np.testing.assert_array_equal(
+                    np.concatenate([tr.data for tr in processed]),
+                    rt_trace.data)
+
+    def test_executor(self):
+        """
+        Channels can be processed with a given pool.
+        """
+        data, packets = _packets(num_channels=3)
+        pool = ThreadPool(2)
+        try:
+            hub = RtHub(executor=pool)
+            hub.register_rt_process('scale', factor=2.0)
+            stream, events = hub.process(packets)
+        finally:
+            pool.close()
+            pool.join()
+        self.assertEqual(len(stream), len(packets))
+        self.assertEqual(events, [])
+        for tr_id in data:
+            np.testing.assert_array_equal(hub[tr_id].data, 2 * data[tr_id])
+
+    def test_iterate(self):
+        """
+        Without callbacks the results are yielded by iterating over the hub.
+        """
+        data, packets = _packets(num_channels=2, num_packets=3)
+        hub = RtHub()
+        with hub:
+            for tr in packets:
+                hub.put(tr)
+        items = list(hub)
+        self.assertEqual(len(items), len(packets))
+        self.assertTrue(all(kind == 'data' for kind, _ in items))
+        self.assertEqual(sorted(tr.id for _, tr in items),
+                         sorted(tr.id for tr in packets))
+        # iterating again stops right away
+        self.assertEqual(list(hub), [])
+
+    @unittest.skipIf(sys.version_info < (3, 5), 'needs async iteration')
+    def test_asyncIterate(self):
+        """
+        Iterating in a coroutine with ``async for``.
+        """
+        import asyncio
+        namespace = {}
+        exec('async def collect(hub):\n'
+             '    return [item async for item in hub]\n', namespace)
+        data, packets = _packets(num_channels=2, num_packets=3)
+        hub = RtHub()
+        with hub:
+            for tr in packets:
+                hub.put(tr)
+        loop = asyncio.new_event_loop()
+        try:
+            items = loop.run_until_complete(namespace['collect'](hub))
+        finally:
+            loop.close()
+        self.assertEqual(len(items), len(packets))
+
+    @unittest.skipIf(sys.version_info < (3, 5), 'needs async iteration')
+    def test_asyncIterateCancelled(self):
+        """
+        Results are not lost if waiting for the next result is cancelled.
+        """
+        import asyncio
+        namespace = {}
+        exec('async def collect(hub, asyncio):\n'
+             '    iterator = hub.__aiter__()\n'
+             '    try:\n'
+             '        await asyncio.wait_for(iterator.__anext__(), 0.05)\n'
+             '    except asyncio.TimeoutError:\n'
+             '        pass\n'
+             '    return [item async for item in iterator]\n', namespace)
+        data, packets = _packets(num_channels=1, num_packets=3)
+        hub = RtHub()
+
+        def put():
+            with hub:
+                for tr in packets:
+                    hub.put(tr)
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.call_later(0.2, put)
+            items = loop.run_until_complete(
+                namespace['collect'](hub, asyncio))
+        finally:
+            loop.close()
+        self.assertEqual([tr for _, tr in items], packets)
+
+    def test_stopWithFullOutputQueue(self):
+        """
+        Stopping does not block if the dispatcher already waits for free
+        space in the full output queue.
+        """
+        data, packets = _packets(num_channels=1, num_packets=5)
+        hub = RtHub(queue_size=3)
+        blocked = threading.Event()
+        put = hub._output.put
+
+        def put_(item, *args, **kwargs):
+            if hub._output.full():
+                blocked.set()
+            put(item, *args, **kwargs)
+
+        hub._output.put = put_
+        hub.start()
+        for tr in packets:
+            hub.put(tr)
+        self.assertTrue(blocked.wait(10))
+        # give the dispatcher time to start waiting in put()
+        time.sleep(0.2)
+        self.assertEqual(hub._output.qsize(), 3)
+        hub.stop(timeout=10)
+        self.assertIsNone(hub._thread)
+        self.assertEqual([tr for _, tr in hub], packets)
+        # the queue size is restored when restarting
+        with hub:
+            self.assertEqual(hub._output.maxsize, 3)
+
+    def test_stopTimeout(self):
+        """
+        A dispatcher still running after the timeout of stop() is waited for
+        before starting a new one.
+        """
+        data, packets = _packets(num_channels=1, num_packets=2)
+        release = threading.Event()
+        received = []
+
+        def on_data(tr):
+            release.wait(10)
+            received.append(tr)
+
+        hub = RtHub(on_data=on_data)
+        hub.start()
+        hub.put(packets[0])
+        hub.stop(timeout=0.1)
+        thread = hub._thread
+        self.assertTrue(thread.is_alive())
+        release.set()
+        hub.start()
+        self.assertFalse(thread.is_alive())
+        self.assertIsNot(hub._thread, thread)
+        hub.put(packets[1])
+        hub.stop(timeout=10)
+        self.assertIsNone(hub._thread)
+        self.assertEqual(received, packets)
+
+    def test_dropPolicies(self):
+        """
+        Full queues either block or discard packets.
+        """
+        _, packets = _packets(num_channels=1, num_packets=10)
+        self.assertRaises(ValueError, RtHub, policy='wait')
+        # dispatcher not started, so the queue fills up
+        hub = RtHub(queue_size=4, policy='drop_newest')
+        results = [hub.put(tr) for tr in packets]
+        self.assertEqual(results, [True] * 4 + [False] * 6)
+        self.assertEqual(hub.dropped, 6)
+        hub = RtHub(queue_size=4, policy='drop_oldest', on_data=lambda x: x)
+        self.assertTrue(all(hub.put(tr) for tr in packets))
+        self.assertEqual(hub.dropped, 6)
+        # the newest packets are kept, the gap resets the processing
+        with warnings.catch_warnings(record=True):
+            warnings.simplefilter('always')
+            with hub:
+                pass
+        tr_id = packets[0].id
+        self.assertEqual(hub[tr_id].stats.starttime,
+                         packets[6].stats.starttime)
+        self.assertEqual(hub[tr_id].stats.npts, 4 * 50)
+
+    def test_trigger(self):
+        """
+        Characteristic functions computed by the hub are passed to a
+        coincidence trigger.
+        """
+        data, packets = _packets(num_channels=3, num_packets=20)
+        # an event in all channels
+        for tr in packets:
+            if tr.stats.starttime == UTCDateTime(2015, 1, 1) + 25.0:
+                tr.data[10:40] *= 20
+        events = []
+        trigger = CoincidenceTrigger(None, 4.0, 1.5, 3)
+        hub = RtHub(trigger=trigger, on_trigger=events.append, batch_size=4)
+        hub.register_rt_process('recursive_stalta', nsta=10, nlta=100)
+        with hub:
+            for tr in packets:
+                hub.put(tr)
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]['coincidence_sum'], 3.0)
+        self.assertTrue(UTCDateTime(2015, 1, 1) + 25.5 <= events[0]['time'] <=
+                        UTCDateTime(2015, 1, 1) + 27.0)
+
+    def test_processingErrors(self):
+        """
+        Packets that can not be appended are reported but do not stop the
+        processing of other packets.
+        """
+        _, packets = _packets(num_channels=2, num_packets=2)
+        packets[2].stats.sampling_rate = 10.0
+        hub = RtHub()
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter('always')
+            stream, _ = hub.process(packets)
+        self.assertEqual(len(stream), 3)
+        self.assertEqual(len(w), 1)
+        self.assertIn(packets[2].id, str(w[0].message))
+
+
+def suite():
+    return unittest.makeSuite(RtHubTestCase, 'test')
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite')
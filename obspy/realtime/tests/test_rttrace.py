@@ -204,6 +204,69 @@ class RtTraceTestCase(unittest.TestCase):
         rt_trace.register_rt_process('tauc', width=20, notexistingoption=True)
         self.assertRaises(TypeError, rt_trace.append, trace)
 
+    def test_appendIntoBuffer(self):
+        """
+        Appending many packets yields the same data as concatenating them and
+        does not reallocate the buffer once it is large enough.
+        """
+        data = np.arange(10000, dtype=np.float64)
+        trace = Trace(data=data)
+        trace.stats.sampling_rate = 10.0
+        traces = trace / 100
+        rtr = RtTrace()
+        for tr in traces:
+            rtr.append(tr)
+        np.testing.assert_array_equal(rtr.data, data)
+        self.assertEqual(rtr.stats.npts, len(data))
+        self.assertEqual(rtr.stats.endtime, trace.stats.endtime)
+        # with max_length the buffer is reused once the window is full
+        rtr = RtTrace(max_length=20)
+        buffers = []
+        for tr in traces:
+            rtr.append(tr)
+            buffers.append(rtr._buffer)
+        np.testing.assert_array_equal(rtr.data, data[-200:])
+        self.assertEqual(rtr.stats.npts, 200)
+        self.assertTrue(all(b is buffers[-1] for b in buffers[10:]))
+        self.assertTrue(np.may_share_memory(rtr.data, rtr._buffer))
+        # data replaced from outside is adopted on the next append
+        rtr = RtTrace()
+        rtr.append(traces[0])
+        rtr.data = rtr.data * 2
+        rtr.append(traces[1])
+        np.testing.assert_array_equal(rtr.data,
+                                      np.concatenate([2 * data[:100],
+                                                      data[100:200]]))
+        # gaps still go through Trace.__add__
+        rtr = RtTrace()
+        rtr.append(traces[0])
+        rtr.append(traces[2])
+        rtr.append(traces[3])
+        np.testing.assert_array_equal(rtr.data[:100], data[:100])
+        np.testing.assert_array_equal(rtr.data[100:200], data[99])
+        np.testing.assert_array_equal(rtr.data[200:], data[200:400])
+
+    def test_rtMemoryUpdate(self):
+        """
+        RtMemory keeps the most recent samples as a view of its buffer.
+        """
+        memory = RtMemory()
+        memory.initialize(np.float64, 5, 3, 0, 0)
+        data = np.arange(100, dtype=np.float64)
+        input_ = memory.input
+        for i in range(0, 99, 3):
+            memory.update_input(data[i:i + 3])
+            np.testing.assert_array_equal(
+                memory.input, np.concatenate([np.zeros(5), data])[i + 3:i + 8])
+        self.assertEqual(memory.input.base is input_.base, True)
+        # updates longer than the memory keep only the last samples
+        memory.update_output(data)
+        np.testing.assert_array_equal(memory.output, data[-3:])
+        # arrays replaced from outside are adopted
+        memory.input = np.ones(5)
+        memory.update_input(data[:2])
+        np.testing.assert_array_equal(memory.input, [1, 1, 1, 0, 1])
+
 
 def suite():
     return unittest.makeSuite(RtTraceTestCase, 'test')
@@ -14,6 +14,8 @@ import numpy as np
 from obspy import read
 from obspy.core.stream import Stream
 from obspy.realtime import RtTrace, signal
+from obspy.signal.filter import bandpass, bandstop, highpass, lowpass
+from obspy.signal.trigger import recursive_STALTA
 
 
 # some debug flags
@@ -249,6 +251,117 @@ class RealTimeSignalTestCase(unittest.TestCase):
         np.testing.assert_almost_equal(trace.data[1:],
                                        self.filt_trace_data[1:])
 
+    def test_bandpass(self):
+        """
+        Testing bandpass function.
+        """
+        trace = self.orig_trace.copy()
+        options = {'freqmin': 0.05, 'freqmax': 1.0, 'corners': 4}
+        # filtering manual
+        self.filt_trace_data = bandpass(trace.data,
+                                        df=trace.stats.sampling_rate,
+                                        **options)
+        # filtering real time
+        process_list = [('bandpass', options)]
+        self._runRtProcess(process_list)
+        # check results
+        np.testing.assert_array_equal(self.filt_trace_data,
+                                      self.rt_trace.data)
+
+    def test_bandstop(self):
+        """
+        Testing bandstop function.
+        """
+        trace = self.orig_trace.copy()
+        options = {'freqmin': 0.05, 'freqmax': 1.0}
+        # filtering manual
+        self.filt_trace_data = bandstop(trace.data,
+                                        df=trace.stats.sampling_rate,
+                                        **options)
+        # filtering real time
+        process_list = [('bandstop', options)]
+        self._runRtProcess(process_list)
+        # check results
+        np.testing.assert_array_equal(self.filt_trace_data,
+                                      self.rt_trace.data)
+
+    def test_lowpass(self):
+        """
+        Testing lowpass function.
+        """
+        trace = self.orig_trace.copy()
+        options = {'freq': 0.5, 'corners': 6}
+        # filtering manual
+        self.filt_trace_data = lowpass(trace.data,
+                                       df=trace.stats.sampling_rate,
+                                       **options)
+        # filtering real time
+        process_list = [('lowpass', options)]
+        self._runRtProcess(process_list)
+        # check results
+        np.testing.assert_array_equal(self.filt_trace_data,
+                                      self.rt_trace.data)
+
+    def test_highpass(self):
+        """
+        Testing highpass function.
+        """
+        trace = self.orig_trace.copy()
+        options = {'freq': 0.1}
+        # filtering manual
+        self.filt_trace_data = highpass(trace.data,
+                                        df=trace.stats.sampling_rate,
+                                        **options)
+        # filtering real time
+        process_list = [('highpass', options)]
+        self._runRtProcess(process_list)
+        # check results
+        np.testing.assert_array_equal(self.filt_trace_data,
+                                      self.rt_trace.data)
+
+    def test_recursive_STALTA(self):
+        """
+        Testing recursive_STALTA function.
+        """
+        trace = self.orig_trace.copy()
+        options = {'nsta': 20, 'nlta': 200}
+        # filtering manual
+        self.filt_trace_data = recursive_STALTA(trace.data, **options)
+        # filtering real time
+        process_list = [('recursive_stalta', options)]
+        self._runRtProcess(process_list)
+        # check results
+        np.testing.assert_array_equal(self.filt_trace_data,
+                                      self.rt_trace.data)
+
+    def test_filterSmallPackets(self):
+        """
+        Filter and STA/LTA results do not depend on the packet size, even
+        for packets shorter than the STA/LTA windows.
+        """
+        trace = self.orig_trace.copy()
+        df = trace.stats.sampling_rate
+        filt = bandpass(trace.data, 0.05, 1.0, df)
+        self.filt_trace_data = recursive_STALTA(filt, 20, 200)
+        # filtering real time with packets of 1 to 150 samples
+        self.rt_trace = RtTrace()
+        self.rt_trace.register_rt_process('bandpass', freqmin=0.05,
+                                          freqmax=1.0)
+        self.rt_trace.register_rt_process('recursive_stalta', nsta=20,
+                                          nlta=200)
+        start = 0
+        sizes = np.random.RandomState(42).randint(1, 150, len(trace))
+        for size in sizes:
+            if start >= len(trace):
+                break
+            chunk = trace.copy()
+            chunk.data = trace.data[start:start + size].copy()
+            chunk.stats.starttime += start * trace.stats.delta
+            self.rt_trace.append(chunk, gap_overlap_check=True)
+            start += size
+        np.testing.assert_array_equal(self.filt_trace_data,
+                                      self.rt_trace.data)
+
     def _runRtProcess(self, process_list, max_length=None):
         """
         Helper function to create a RtTrace, register all given process
@@ -21,7 +21,10 @@ from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
 from future.builtins import *  # NOQA
 
+import hashlib
 import math
+import multiprocessing
+import os
 import warnings
 
 import numpy as np
@@ -732,6 +735,19 @@ def get_spoint(stream, stime, etime):
     return spoint, epoint
 
 
+def _get_limits(lim, name):
+    """
+    Returns (xmin, xmax, ymin, ymax) from a float (symmetric limits) or a
+    tuple of length 4.
+    """
+    if isinstance(lim, float):
+        return -lim, lim, -lim, lim
+    elif isinstance(lim, tuple) and len(lim) == 4:
+        return lim
+    msg = '%s must either be a float or a tuple of length 4' % name
+    raise TypeError(msg)
+
+
 def array_transff_wavenumber(coords, klim, kstep, coordsys='lonlat'):
     """
     Returns array transfer function as a function of wavenumber difference
@@ -744,37 +760,10 @@ def array_transff_wavenumber(coords, klim, kstep, coordsys='lonlat'):
         to use
     :param klim: either a float to use symmetric limits for wavenumber
         differences or the tuple (kxmin, kxmax, kymin, kymax)
-    """
-    coords = get_geometry(coords, coordsys)
-    if isinstance(klim, float):
-        kxmin = -klim
-        kxmax = klim
-        kymin = -klim
-        kymax = klim
-    elif isinstance(klim, tuple):
-        if len(klim) == 4:
-            kxmin = klim[0]
-            kxmax = klim[1]
-            kymin = klim[2]
-            kymax = klim[3]
-    else:
-        raise TypeError('klim must either be a float or a tuple of length 4')
 
-    nkx = int(np.ceil((kxmax + kstep / 10. - kxmin) / kstep))
-    nky = int(np.ceil((kymax + kstep / 10. - kymin) / kstep))
-
-    transff = np.empty((nkx, nky))
-
-    for i, kx in enumerate(np.arange(kxmin, kxmax + kstep / 10., kstep)):
-        for j, ky in enumerate(np.arange(kymin, kymax + kstep / 10., kstep)):
-            _sum = 0j
-            for k in range(len(coords)):
-                _sum += np.exp(complex(0.,
-                               coords[k, 0] * kx + coords[k, 1] * ky))
-            transff[i, j] = abs(_sum) ** 2
-
-    transff /= transff.max()
-    return transff
+    .. seealso:: :meth:`ArrayGeometry.transff_wavenumber`
+    """
+    return ArrayGeometry(coords, coordsys).transff_wavenumber(klim, kstep)
 
 
 def array_transff_freqslowness(coords, slim, sstep, fmin, fmax, fstep,
@@ -797,42 +786,244 @@ def array_transff_freqslowness(coords, slim, sstep, fmin, fmax, fstep,
     :param fmin: maximum frequency in signal
     :type fstep: float
     :param fmin: frequency sample distance
+
+    .. seealso:: :meth:`ArrayGeometry.transff_freqslowness`
     """
-    coords = get_geometry(coords, coordsys)
-    if isinstance(slim, float):
-        sxmin = -slim
-        sxmax = slim
-        symin = -slim
-        symax = slim
-    elif isinstance(slim, tuple):
-        if len(slim) == 4:
-            sxmin = slim[0]
-            sxmax = slim[1]
-            symin = slim[2]
-            symax = slim[3]
-    else:
-        raise TypeError('slim must either be a float or a tuple of length 4')
+    return ArrayGeometry(coords, coordsys).transff_freqslowness(
+        slim, sstep, fmin, fmax, fstep)
 
-    nsx = int(np.ceil((sxmax + sstep / 10. - sxmin) / sstep))
-    nsy = int(np.ceil((symax + sstep / 10. - symin) / sstep))
-    nf = int(np.ceil((fmax + fstep / 10. - fmin) / fstep))
 
-    transff = np.empty((nsx, nsy))
-    buff = np.zeros(nf)
+class ArrayGeometry(object):
+    """
+    Geometry of a seismic array with cached derived quantities.
+
+    Time shift tables, steering vectors (see :class:`SteeringTable`) and
+    array transfer functions only depend on the array geometry and the
+    slowness/frequency grids. An instance keeps all steering tables computed
+    so far in memory and can additionally store them on disk, so repeated
+    analyses with the same array do not compute them again.
+
+    >>> coords = np.array([[0.0, 0.0, 0.0], [-0.05, 0.07, 0.0],
+    ...                    [0.05, 0.07, 0.0], [0.1, 0.0, 0.0]])
+    >>> array = ArrayGeometry(coords, coordsys='xy')
+    >>> transff = array.transff_wavenumber(10., 1.)
+    >>> transff.shape
+    (21, 21)
+    >>> print(transff.max())
+    1.0
+
+    :param coords: :class:`~obspy.core.stream.Stream` with coordinates or
+        array with coordinates of the stations, see :func:`get_geometry`.
+    :type coordsys: str
+    :param coordsys: valid values: 'lonlat' and 'xy', choose which
+        coordinates to use
+    """
+    def __init__(self, coords, coordsys='lonlat'):
+        self.geometry = get_geometry(coords, coordsys=coordsys)
+        self._steering_tables = {}
+
+    def __len__(self):
+        return len(self.geometry)
+
+    @property
+    def key(self):
+        """
+        Hex digest identifying the geometry, e.g. to use in file names.
+        """
+        return _hash_arrays(np.round(self.geometry, 9))
+
+    def get_timeshift(self, sll_x, sll_y, sl_s, grdpts_x, grdpts_y):
+        """
+        Returns timeshift table for the slowness grid, see
+        :func:`get_timeshift`.
+        """
+        return get_timeshift(self.geometry, sll_x, sll_y, sl_s, grdpts_x,
+                             grdpts_y)
+
+    def get_steering_table(self, win_len, sll_x, slm_x, sll_y, slm_y, sl_s,
+                           frqlow, frqhigh, sampling_rate, cache_dir=None):
+        """
+        Returns the (cached) steering table matching the given
+        :func:`array_processing` parameters.
+
+        :type sampling_rate: float
+        :param sampling_rate: Sampling rate of the data to be processed.
+        :type cache_dir: str
+        :param cache_dir: Directory to look for a stored steering table
+            first. Newly computed tables are stored there.
+        :rtype: :class:`SteeringTable`
+        """
+        params = _get_processing_params(win_len, sll_x, slm_x, sll_y, slm_y,
+                                        sl_s, frqlow, frqhigh, sampling_rate)
+        params = params[:5] + params[6:]
+        try:
+            return self._steering_tables[params]
+        except KeyError:
+            pass
+        table = SteeringTable(self.geometry, *params)
+        if cache_dir is not None:
+            filename = os.path.join(cache_dir, "steer_%s.npz" % table.key)
+            if os.path.exists(filename):
+                table = SteeringTable.load(filename)
+            else:
+                table.save(filename)
+        self._steering_tables[params] = table
+        return table
+
+    def transff_wavenumber(self, klim, kstep):
+        """
+        Returns array transfer function as a function of wavenumber
+        difference.
+
+        :param klim: either a float to use symmetric limits for wavenumber
+            differences or the tuple (kxmin, kxmax, kymin, kymax)
+        :type kstep: float
+        :param kstep: wavenumber step
+        """
+        kxmin, kxmax, kymin, kymax = _get_limits(klim, 'klim')
+        kx = np.arange(kxmin, kxmax + kstep / 10., kstep)
+        ky = np.arange(kymin, kymax + kstep / 10., kstep)
+        # sum over stations of exp(i (x kx + y ky)) for all grid points
+        ex = np.exp(1j * np.outer(kx, self.geometry[:, 0]))
+        ey = np.exp(1j * np.outer(ky, self.geometry[:, 1]))
+        transff = np.abs(np.dot(ex, ey.T)) ** 2
+        transff /= transff.max()
+        return transff
+
+    def transff_freqslowness(self, slim, sstep, fmin, fmax, fstep):
+        """
+        Returns array transfer function as a function of slowness difference
+        and frequency.
+
+        :param slim: either a float to use symmetric limits for slowness
+            differences or the tupel (sxmin, sxmax, symin, symax)
+        :type sstep: float
+        :param sstep: slowness step
+        :type fmin: float
+        :param fmin: minimum frequency in signal
+        :type fmax: float
+        :param fmin: maximum frequency in signal
+        :type fstep: float
+        :param fmin: frequency sample distance
+        """
+        sxmin, sxmax, symin, symax = _get_limits(slim, 'slim')
+        sx = np.arange(sxmin, sxmax + sstep / 10., sstep)
+        sy = np.arange(symin, symax + sstep / 10., sstep)
+        freqs = np.arange(fmin, fmax + fstep / 10., fstep)
+        buff = np.empty((len(freqs), len(sx), len(sy)))
+        for k, f in enumerate(freqs):
+            ex = np.exp(2j * np.pi * f * np.outer(sx, self.geometry[:, 0]))
+            ey = np.exp(2j * np.pi * f * np.outer(sy, self.geometry[:, 1]))
+            buff[k] = np.abs(np.dot(ex, ey.T)) ** 2
+        transff = cumtrapz(buff, dx=fstep, axis=0)[-1]
+        transff /= transff.max()
+        return transff
+
+
+class SteeringTable(object):
+    """
+    Time shifts and steering vectors of an array for a slowness grid and a
+    range of frequencies, as used by :func:`array_processing`.
 
-    for i, sx in enumerate(np.arange(sxmin, sxmax + sstep / 10., sstep)):
-        for j, sy in enumerate(np.arange(symin, symax + sstep / 10., sstep)):
-            for k, f in enumerate(np.arange(fmin, fmax + fstep / 10., fstep)):
-                _sum = 0j
-                for l in np.arange(len(coords)):
-                    _sum += np.exp(
-                        complex(0., (coords[l, 0] * sx + coords[l, 1] * sy) *
-                                2 * np.pi * f))
-                buff[k] = abs(_sum) ** 2
-            transff[i, j] = cumtrapz(buff, dx=fstep)[-1]
+    Steering vectors are computed on first access. Tables can be stored with
+    :meth:`save` and restored with :meth:`load`, :attr:`key` identifies
+    geometry and parameters.
 
-    transff /= transff.max()
-    return transff
+    :type geometry: :class:`numpy.ndarray`
+    :param geometry: Array geometry as returned by :func:`get_geometry`.
+    :param sll_x: slowness x min (lower)
+    :param sll_y: slowness y min (lower)
+    :param sl_s: slowness step
+    :param grdpts_x: number of grid points in x direction
+    :param grdpts_y: number of grid points in y direction
+    :param nlow: index of the lowest frequency in the FFT
+    :param nf: number of frequencies
+    :param deltaf: frequency step of the FFT
+    """
+    def __init__(self, geometry, sll_x, sll_y, sl_s, grdpts_x, grdpts_y,
+                 nlow, nf, deltaf):
+        self.geometry = np.asarray(geometry, dtype=np.float64)
+        self.sll_x = float(sll_x)
+        self.sll_y = float(sll_y)
+        self.sl_s = float(sl_s)
+        self.grdpts_x = int(grdpts_x)
+        self.grdpts_y = int(grdpts_y)
+        self.nlow = int(nlow)
+        self.nf = int(nf)
+        self.deltaf = float(deltaf)
+        self.time_shift_table = get_timeshift(
+            self.geometry, self.sll_x, self.sll_y, self.sl_s, self.grdpts_x,
+            self.grdpts_y)
+        self._steer = None
+
+    @property
+    def params(self):
+        """
+        Slowness grid and frequency parameters of the table.
+        """
+        return (self.sll_x, self.sll_y, self.sl_s, self.grdpts_x,
+                self.grdpts_y, self.nlow, self.nf, self.deltaf)
+
+    @property
+    def key(self):
+        """
+        Hex digest identifying geometry and parameters of the table.
+        """
+        return _hash_arrays(np.round(self.geometry, 9),
+                            np.array(self.params, dtype=np.float64))
+
+    @property
+    def steer(self):
+        """
+        Steering vectors, shape ``(nf, grdpts_x, grdpts_y, nstat)``.
+        """
+        if self._steer is None:
+            self._steer = _get_steering_vectors(
+                self.time_shift_table, self.nf, self.nlow, self.deltaf)
+        return self._steer
+
+    def matches(self, geometry, *params):
+        """
+        Checks if the table was computed for the given geometry and
+        parameters (same order as in the constructor).
+        """
+        if self.geometry.shape != np.shape(geometry) or \
+                not np.allclose(self.geometry, geometry, rtol=0, atol=1e-9):
+            return False
+        return np.allclose(self.params, params, rtol=1e-12, atol=0)
+
+    def save(self, filename):
+        """
+        Stores the table including steering vectors as a NumPy NPZ file.
+        """
+        with open(filename, 'wb') as fh:
+            np.savez(fh, geometry=self.geometry,
+                     params=np.array(self.params, dtype=np.float64),
+                     steer=self.steer)
+
+    @staticmethod
+    def load(filename):
+        """
+        Restores a table stored with :meth:`save`.
+        """
+        with open(filename, 'rb') as fh:
+            data = np.load(fh)
+            geometry = data['geometry']
+            params = data['params']
+            steer = data['steer']
+        table = SteeringTable(geometry, *params)
+        table._steer = steer
+        return table
+
+
+def _hash_arrays(*arrays):
+    """
+    Returns a hex digest of the contents of the given arrays.
+    """
+    sha1 = hashlib.sha1()
+    for array in arrays:
+        sha1.update(np.ascontiguousarray(array, dtype=np.float64))
+    return sha1.hexdigest()
 
 
 def dump(pow_map, apow_map, i):
@@ -844,10 +1035,143 @@ def dump(pow_map, apow_map, i):
     np.savez('apow_map_%d.npz' % i, apow_map)
 
 
+def _get_steering_vectors(time_shift_table, nf, nlow, deltaf):
+    """
+    Returns the steering vectors for all frequencies and slowness grid
+    points, shape ``(nf, grdpts_x, grdpts_y, nstat)``.
+    """
+    nstat, grdpts_x, grdpts_y = time_shift_table.shape
+    steer = np.empty((nf, grdpts_x, grdpts_y, nstat), dtype=np.complex128)
+    clibsignal.calcSteer(nstat, grdpts_x, grdpts_y, nf, nlow, deltaf,
+                         time_shift_table, steer)
+    return steer
+
+
+# Steering vectors of the worker processes of array_processing(), set by
+# _init_beamform_worker().
+_WORKER_STEER = {}
+
+
+def _init_beamform_worker(steer):
+    """
+    Initializer of the worker processes of :func:`array_processing`, so the
+    steering vectors are only sent once to every process.
+    """
+    _WORKER_STEER['steer'] = steer
+
+
+def _pinv_stacked(a, rcond):
+    """
+    Pseudo-inverse of a stack of matrices (last two dimensions).
+    """
+    try:
+        return np.linalg.pinv(a, rcond=rcond)
+    except (ValueError, np.linalg.LinAlgError):
+        # older NumPy versions can only invert single matrices
+        out = np.empty_like(a)
+        for index in np.ndindex(*a.shape[:-2]):
+            out[index] = np.linalg.pinv(a[index], rcond=rcond)
+        return out
+
+
+def _beamform_batch(args):
+    """
+    Beamforming of a batch of sliding windows, used by
+    :func:`array_processing`.
+
+    Returns relative and absolute power and the slowness grid indices of the
+    maximum for all windows and, if requested, the complete power maps.
+    """
+    (data, offsets, nsamp, nfft, nlow, nf, tap, steer, method, prewhiten,
+     return_maps) = args
+    if steer is None:
+        steer = _WORKER_STEER['steer']
+    _, grdpts_x, grdpts_y, nstat = steer.shape
+    nwin = len(offsets)
+    ngrd = grdpts_x * grdpts_y
+    steer = steer.reshape(nf, ngrd, nstat)
+
+    # one FFT over all stations and windows
+    index = offsets[:, np.newaxis] + np.arange(nsamp)
+    windows = data[:, index].transpose(1, 0, 2)
+    windows = windows - windows.mean(axis=-1)[:, :, np.newaxis]
+    windows *= tap
+    ft = np.fft.rfft(windows, nfft, axis=-1)[:, :, nlow:nlow + nf]
+    ft = ft.transpose(0, 2, 1)
+    # cross-spectral matrices of all windows and frequencies,
+    # R[w, n, i, j] = ft[w, n, i] * conj(ft[w, n, j])
+    R = ft[:, :, :, np.newaxis] * ft[:, :, np.newaxis, :].conj()
+    if method == 1:
+        R /= np.abs(R.sum(axis=1))[:, np.newaxis, :, :]
+    diag = np.arange(nstat)
+    dpow = np.abs(R[:, :, diag, diag].sum(axis=1)).sum(axis=-1) * nstat
+    if method == 1:
+        # P(f) = 1/(e.H R(f)^-1 e)
+        R = _pinv_stacked(R, rcond=1e-6)
+        # optimized way of abspow normalization
+        dpow = np.ones(nwin)
+
+    relpow_map = np.zeros((nwin, ngrd), dtype=np.float64)
+    abspow_map = np.zeros((nwin, ngrd), dtype=np.float64)
+    for n in range(nf):
+        e = steer[n].T
+        if method == 1:
+            # R e for all windows and grid points, shape (nwin, nstat, ngrd)
+            re = np.dot(R[:, n].reshape(nwin * nstat, nstat), e)
+            re = re.reshape(nwin, nstat, ngrd)
+            pow = np.abs((e.conj()[np.newaxis, :, :] * re).sum(axis=1))
+        else:
+            # R = ft ft.H has rank one, so e.H R e = |e.H ft|**2
+            pow = np.abs(np.dot(ft[:, n], e.conj())) ** 2
+        if method == 1:
+            pow = 1. / pow
+        abspow_map += pow
+        # scale for each frequency individually
+        if prewhiten == 1:
+            relpow_map += pow / (pow.max(axis=1) * nf * nstat)[:, np.newaxis]
+        else:
+            relpow_map += pow / dpow[:, np.newaxis]
+
+    imax = relpow_map.argmax(axis=1)
+    ix, iy = np.unravel_index(imax, (grdpts_x, grdpts_y))
+    relpow = relpow_map[np.arange(nwin), imax]
+    abspow = abspow_map[np.arange(nwin), imax]
+    if return_maps:
+        maps = list(zip(relpow_map.reshape(nwin, grdpts_x, grdpts_y),
+                        abspow_map.reshape(nwin, grdpts_x, grdpts_y)))
+    else:
+        maps = [None] * nwin
+    return relpow, abspow, ix, iy, maps
+
+
+def _get_processing_params(win_len, sll_x, slm_x, sll_y, slm_y, sl_s,
+                           frqlow, frqhigh, fs):
+    """
+    Returns slowness grid and FFT frequency parameters of
+    :func:`array_processing` as tuple
+    ``(sll_x, sll_y, sl_s, grdpts_x, grdpts_y, nfft, nlow, nf, deltaf)``.
+    """
+    grdpts_x = int(((slm_x - sll_x) / sl_s + 0.5) + 1)
+    grdpts_y = int(((slm_y - sll_y) / sl_s + 0.5) + 1)
+    nsamp = int(win_len * fs)
+    # generate plan for rfftr
+    nfft = next_pow_2(nsamp)
+    deltaf = fs / float(nfft)
+    nlow = int(frqlow / float(deltaf) + 0.5)
+    nhigh = int(frqhigh / float(deltaf) + 0.5)
+    nlow = max(1, nlow)  # avoid using the offset
+    nhigh = min(nfft // 2 - 1, nhigh)  # avoid using nyquist
+    nf = nhigh - nlow + 1  # include upper and lower frequency
+    return (float(sll_x), float(sll_y), float(sl_s), grdpts_x, grdpts_y,
+            nfft, nlow, nf, deltaf)
+
+
 def array_processing(stream, win_len, win_frac, sll_x, slm_x, sll_y, slm_y,
                      sl_s, semb_thres, vel_thres, frqlow, frqhigh, stime,
                      etime, prewhiten, verbose=False, coordsys='lonlat',
-                     timestamp='mlabday', method=0, store=None):
+                     timestamp='mlabday', method=0, store=None,
+                     batch_size=32, workers=None, executor=None,
+                     steering_table=None):
     """
     Method for Seismic-Array-Beamforming/FK-Analysis/Capon
 
@@ -899,11 +1223,25 @@ def array_processing(stream, win_len, win_frac, sll_x, slm_x, sll_y, slm_y,
         second arguments and the iteration number as third argument. Useful for
         storing or plotting the map for each iteration. For this purpose the
         dump function of this module can be used.
+    :type batch_size: int
+    :param batch_size: Number of sliding windows processed at once. All
+        windows of a batch are transformed with one FFT and their
+        cross-spectral matrices (and for Capon their inverses) are computed
+        in one go. Larger batches are faster but need more memory.
+    :type workers: int
+    :param workers: If given, batches of windows are distributed over a
+        :class:`multiprocessing.Pool` with this number of processes.
+    :param executor: Same as ``workers`` but uses the given pool with an order
+        preserving ``map()`` method. The steering vectors are passed along
+        with every batch, so a process pool has to pickle them every time.
+    :type steering_table: :class:`SteeringTable`
+    :param steering_table: Precomputed steering vectors, e.g. from
+        :meth:`ArrayGeometry.get_steering_table`. Has to match geometry,
+        slowness grid and frequencies of the analysis.
     :return: :class:`numpy.ndarray` of timestamp, relative relpow, absolute
         relpow, backazimuth, slowness
     """
     res = []
-    eotr = True
 
     # check that sampling rates do not vary
     fs = stream[0].stats.sampling_rate
@@ -911,9 +1249,6 @@ def array_processing(stream, win_len, win_frac, sll_x, slm_x, sll_y, slm_y,
         msg = 'in sonic sampling rates of traces in stream are not equal'
         raise ValueError(msg)
 
-    grdpts_x = int(((slm_x - sll_x) / sl_s + 0.5) + 1)
-    grdpts_y = int(((slm_y - sll_y) / sl_s + 0.5) + 1)
-
     geometry = get_geometry(stream, coordsys=coordsys, verbose=verbose)
 
     if verbose:
@@ -923,96 +1258,95 @@ def array_processing(stream, win_len, win_frac, sll_x, slm_x, sll_y, slm_y,
         print(stream)
         print("stime = " + str(stime) + ", etime = " + str(etime))
 
-    time_shift_table = get_timeshift(geometry, sll_x, sll_y,
-                                     sl_s, grdpts_x, grdpts_y)
     # offset of arrays
     spoint, _epoint = get_spoint(stream, stime, etime)
     #
-    # loop with a sliding window over the dat trace array and apply bbfk
+    # slide a window over the data and beamform batches of windows at once
     #
     nstat = len(stream)
     fs = stream[0].stats.sampling_rate
     nsamp = int(win_len * fs)
     nstep = int(nsamp * win_frac)
-
-    # generate plan for rfftr
-    nfft = next_pow_2(nsamp)
-    deltaf = fs / float(nfft)
-    nlow = int(frqlow / float(deltaf) + 0.5)
-    nhigh = int(frqhigh / float(deltaf) + 0.5)
-    nlow = max(1, nlow)  # avoid using the offset
-    nhigh = min(nfft // 2 - 1, nhigh)  # avoid using nyquist
-    nf = nhigh - nlow + 1  # include upper and lower frequency
-    # to speed up the routine a bit we estimate all steering vectors in advance
-    steer = np.empty((nf, grdpts_x, grdpts_y, nstat), dtype=np.complex128)
-    clibsignal.calcSteer(nstat, grdpts_x, grdpts_y, nf, nlow,
-                         deltaf, time_shift_table, steer)
-    R = np.empty((nf, nstat, nstat), dtype=np.complex128)
-    ft = np.empty((nstat, nf), dtype=np.complex128)
-    newstart = stime
+    params = _get_processing_params(win_len, sll_x, slm_x, sll_y, slm_y,
+                                    sl_s, frqlow, frqhigh, fs)
+    grdpts_x, grdpts_y, nfft, nlow, nf, deltaf = params[3:]
+    # time shifts and steering vectors only depend on geometry, slowness grid
+    # and frequencies
+    params = params[:5] + params[6:]
+    if steering_table is None:
+        steering_table = SteeringTable(geometry, *params)
+    elif not steering_table.matches(geometry, *params):
+        msg = 'steering_table does not match array geometry and parameters'
+        raise ValueError(msg)
     # 0.22 matches 0.2 of historical C bbfk.c
     tap = cosine_taper(nsamp, p=0.22)
+    # start offsets and start times of all windows
+    offsets = []
+    starttimes = []
+    newstart = stime
     offset = 0
-    relpow_map = np.empty((grdpts_x, grdpts_y), dtype=np.float64)
-    abspow_map = np.empty((grdpts_x, grdpts_y), dtype=np.float64)
-    while eotr:
-        try:
-            for i, tr in enumerate(stream):
-                dat = tr.data[spoint[i] + offset:
-                              spoint[i] + offset + nsamp]
-                dat = (dat - dat.mean()) * tap
-                ft[i, :] = np.fft.rfft(dat, nfft)[nlow:nlow + nf]
-        except IndexError:
-            break
-        ft = np.ascontiguousarray(ft, np.complex128)
-        relpow_map.fill(0.)
-        abspow_map.fill(0.)
-        # computing the covariances of the signal at different receivers
-        dpow = 0.
-        for i in range(nstat):
-            for j in range(i, nstat):
-                R[:, i, j] = ft[i, :] * ft[j, :].conj()
-                if method == 1:
-                    R[:, i, j] /= np.abs(R[:, i, j].sum())
-                if i != j:
-                    R[:, j, i] = R[:, i, j].conjugate()
-                else:
-                    dpow += np.abs(R[:, i, j].sum())
-        dpow *= nstat
-        if method == 1:
-            # P(f) = 1/(e.H R(f)^-1 e)
-            for n in range(nf):
-                R[n, :, :] = np.linalg.pinv(R[n, :, :], rcond=1e-6)
-
-        errcode = clibsignal.generalizedBeamformer(
-            relpow_map, abspow_map, steer, R, nstat, prewhiten,
-            grdpts_x, grdpts_y, nf, dpow, method)
-        if errcode != 0:
-            msg = 'generalizedBeamforming exited with error %d'
-            raise Exception(msg % errcode)
-        ix, iy = np.unravel_index(relpow_map.argmax(), relpow_map.shape)
-        relpow, abspow = relpow_map[ix, iy], abspow_map[ix, iy]
-        if store is not None:
-            store(relpow_map, abspow_map, offset)
-        # here we compute baz, slow
-        slow_x = sll_x + ix * sl_s
-        slow_y = sll_y + iy * sl_s
-
-        slow = np.sqrt(slow_x ** 2 + slow_y ** 2)
-        if slow < 1e-8:
-            slow = 1e-8
-        azimut = 180 * math.atan2(slow_x, slow_y) / math.pi
-        baz = azimut % -360 + 180
-        if relpow > semb_thres and 1. / slow > vel_thres:
-            res.append(np.array([newstart.timestamp, relpow, abspow, baz,
-                                 slow]))
-            if verbose:
-                print(newstart, (newstart + (nsamp / fs)), res[-1][1:])
+    while True:
+        offsets.append(offset)
+        starttimes.append(newstart)
         if (newstart + (nsamp + nstep) / fs) > etime:
-            eotr = False
+            break
         offset += nstep
-
         newstart += nstep / fs
+    data = np.empty((nstat, offsets[-1] + nsamp), dtype=np.float64)
+    for i, tr in enumerate(stream):
+        data[i, :] = tr.data[spoint[i]:spoint[i] + data.shape[1]]
+
+    batch_size = max(1, int(batch_size))
+    # the worker processes of our own pool get the steering vectors from
+    # their initializer
+    if executor is None and workers is not None:
+        steer = None
+    else:
+        steer = steering_table.steer
+    args = []
+    for i in range(0, len(offsets), batch_size):
+        batch_offsets = np.array(offsets[i:i + batch_size])
+        first = batch_offsets[0]
+        batch_data = data[:, first:batch_offsets[-1] + nsamp]
+        args.append((batch_data, batch_offsets - first, nsamp, nfft, nlow,
+                     nf, tap, steer, method, prewhiten, store is not None))
+    if executor is not None:
+        results = executor.map(_beamform_batch, args)
+    elif workers is not None:
+        pool = multiprocessing.Pool(processes=workers,
+                                    initializer=_init_beamform_worker,
+                                    initargs=(steering_table.steer,))
+        try:
+            results = pool.map(_beamform_batch, args)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = (_beamform_batch(arg) for arg in args)
+
+    i = 0
+    for result in results:
+        for relpow, abspow, ix, iy, maps in zip(*result):
+            offset = offsets[i]
+            newstart = starttimes[i]
+            i += 1
+            if store is not None:
+                relpow_map, abspow_map = maps
+                store(relpow_map, abspow_map, offset)
+            # here we compute baz, slow
+            slow_x = sll_x + ix * sl_s
+            slow_y = sll_y + iy * sl_s
+
+            slow = np.sqrt(slow_x ** 2 + slow_y ** 2)
+            if slow < 1e-8:
+                slow = 1e-8
+            azimut = 180 * math.atan2(slow_x, slow_y) / math.pi
+            baz = azimut % -360 + 180
+            if relpow > semb_thres and 1. / slow > vel_thres:
+                res.append(np.array([newstart.timestamp, relpow, abspow,
+                                     baz, slow]))
+                if verbose:
+                    print(newstart, (newstart + (nsamp / fs)), res[-1][1:])
     res = np.array(res)
     if timestamp == 'julsec':
         pass
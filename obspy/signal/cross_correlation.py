@@ -22,6 +22,7 @@ from future.builtins import *  # NOQA
 from future.utils import native_str
 
 import ctypes as C
+import multiprocessing
 import warnings
 
 import numpy as np
@@ -30,6 +31,12 @@ import scipy
 from obspy import Stream, Trace
 from obspy.signal.headers import clibsignal
 from obspy.signal.invsim import cosine_taper
+from obspy.signal.util import next_pow_2
+
+
+# maximum number of samples (templates times FFT length times blocks)
+# transformed at once in the frequency domain template correlation
+XCORR_BATCH_MAX_SAMPLES = 2 ** 22
 
 
 def xcorr(tr1, tr2, shift_len, full_xcorr=False):
@@ -540,6 +547,237 @@ def templatesMaxSimilarity(st, time, streams_templates):
         return 0
 
 
+def correlate_templates(stream, templates, workers=None, executor=None):
+    """
+    Normalized cross correlation of multi-channel templates with continuous
+    data, stacked over all channels of each template.
+
+    Each channel of the continuous data is correlated with the matching
+    channels of all templates at once in the frequency domain (overlap-save
+    with FFT lengths adapted to the template lengths). The correlation is
+    normalized to the Pearson correlation coefficient of template and data
+    window for every lag using running sums of the data. The coefficients
+    of all channels of a template are aligned according to the relative
+    start times of the template traces (e.g. P and S windows or moveout
+    across stations) and averaged.
+
+    >>> from obspy import read, UTCDateTime
+    >>> st = read()
+    >>> t = UTCDateTime(2009, 8, 24, 0, 20, 7, 700000)
+    >>> templ = st.copy().slice(t, t + 5)
+    >>> cc = correlate_templates(st, [templ])
+    >>> print(cc[0].stats.station, cc[0].stats.npts)
+    0 2500
+    >>> i = cc[0].data.argmax()
+    >>> print(cc[0].stats.starttime + i * cc[0].stats.delta)
+    2009-08-24T00:20:07.700000Z
+    >>> print(round(cc[0].data[i], 3))
+    1.0
+
+    :type stream: :class:`~obspy.core.stream.Stream`
+    :param stream: Continuous data, one trace per SEED id. Masked values
+        (gaps) are filled with zeros.
+    :type templates: list or dict of :class:`~obspy.core.stream.Stream`
+    :param templates: Template events. A dictionary maps template names to
+        streams, templates of a list are named by their index. Template
+        channels without continuous data are skipped with a warning.
+    :type workers: int
+    :param workers: If given, the channels are correlated in parallel in a
+        :class:`multiprocessing.Pool` with this number of processes.
+    :param executor: Same as ``workers`` but uses the given pool with an order
+        preserving ``map()`` method (e.g. a
+        :class:`multiprocessing.pool.ThreadPool`).
+    :rtype: :class:`~obspy.core.stream.Stream`
+    :returns: One trace of stacked correlation coefficients per template in
+        the given order. The trace start time corresponds to a zero lag of
+        the earliest template trace, i.e. the correlation maximum is at the
+        time the template starts in the continuous data. The station code is
+        set to the template name, ``stats.template`` holds the name and
+        ``stats.trace_ids`` the channels used.
+    """
+    if isinstance(templates, dict):
+        names = sorted(templates.keys())
+        templates = [templates[name] for name in names]
+    else:
+        names = list(range(len(templates)))
+    ids = sorted(set(tr.id for tr in stream))
+    for id_ in ids:
+        if len(stream.select(id=id_)) > 1:
+            msg = "Continuous data has to be merged (found multiple " + \
+                  "traces for %s)." % id_
+            raise ValueError(msg)
+    sampling_rate = stream[0].stats.sampling_rate
+    if any(tr.stats.sampling_rate != sampling_rate
+           for st_tmpl in [stream] + list(templates) for tr in st_tmpl):
+        msg = "All traces have to have the same sampling rate."
+        raise ValueError(msg)
+    delta = 1.0 / sampling_rate
+    # collect the template channels for every continuous trace
+    channels = dict((id_, []) for id_ in ids)
+    used = []
+    for i, st_tmpl in enumerate(templates):
+        reference = min(tr.stats.starttime for tr in st_tmpl)
+        used.append([])
+        for tr in st_tmpl:
+            if tr.id not in channels:
+                msg = "Skipping trace %s of template %s (not present in " + \
+                      "continuous data)."
+                warnings.warn(msg % (tr.id, names[i]))
+                continue
+            if tr.id in used[i]:
+                msg = "Template %s contains multiple traces for %s."
+                raise ValueError(msg % (names[i], tr.id))
+            channels[tr.id].append(
+                (i, tr.data, tr.stats.starttime - reference))
+            used[i].append(tr.id)
+    ids = [id_ for id_ in ids if channels[id_]]
+    args = []
+    for id_ in ids:
+        tr = stream.select(id=id_)[0]
+        data = tr.data
+        if isinstance(data, np.ma.masked_array):
+            data = data.filled(0)
+        template_data = [tmpl for _, tmpl, _ in channels[id_]]
+        if any(len(tmpl) > len(data) for tmpl in template_data):
+            msg = "Templates have to be shorter than the continuous data " + \
+                  "(%s)." % id_
+            raise ValueError(msg)
+        args.append((data, template_data))
+    if executor is not None:
+        results = executor.map(_normxcorr_templates, args)
+    elif workers is not None:
+        pool = multiprocessing.Pool(processes=workers)
+        try:
+            results = pool.map(_normxcorr_templates, args)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = (_normxcorr_templates(arg) for arg in args)
+
+    # stack the coefficients of all channels of each template on a common
+    # time grid (start of the earliest template trace)
+    starttimes = [None] * len(templates)
+    for id_ in ids:
+        tr_start = stream.select(id=id_)[0].stats.starttime
+        for i, _, offset in channels[id_]:
+            start = tr_start - offset
+            if starttimes[i] is None or start < starttimes[i]:
+                starttimes[i] = start
+    stacks = [None] * len(templates)
+    for id_, ccs in zip(ids, results):
+        tr_start = stream.select(id=id_)[0].stats.starttime
+        for (i, _, offset), cc in zip(channels[id_], ccs):
+            shift = int(round((tr_start - offset - starttimes[i]) *
+                              sampling_rate))
+            npts = shift + len(cc)
+            if stacks[i] is None:
+                stacks[i] = np.zeros(npts, dtype=np.float64)
+            elif len(stacks[i]) < npts:
+                stacks[i] = np.concatenate(
+                    [stacks[i], np.zeros(npts - len(stacks[i]))])
+            stacks[i][shift:npts] += cc
+    st = Stream()
+    for i, name in enumerate(names):
+        if stacks[i] is None:
+            msg = "No continuous data for template %s." % name
+            warnings.warn(msg)
+            continue
+        stack = (stacks[i] / len(used[i])).astype(np.float32)
+        tr = Trace(data=stack)
+        tr.stats.station = str(name)
+        tr.stats.starttime = starttimes[i]
+        tr.stats.delta = delta
+        tr.stats.template = name
+        tr.stats.trace_ids = used[i]
+        st.append(tr)
+    return st
+
+
+def _normxcorr_templates(args):
+    """
+    Normalized cross correlation of several templates with the same data
+    using FFT overlap-save.
+
+    :type args: tuple
+    :param args: Continuous data and list of template arrays.
+    :returns: List with correlation coefficients for all lags of each
+        template (length of data minus length of template plus one).
+    """
+    data, templates = args
+    data = np.require(data, dtype=np.float64)
+    data = data - data.mean()
+    # templates of equal length share FFT length and data spectra
+    lengths = sorted(set(len(tmpl) for tmpl in templates))
+    ccs = {}
+    for length in lengths:
+        group = [i for i, tmpl in enumerate(templates)
+                 if len(tmpl) == length]
+        tmpl = np.array([templates[i] for i in group], dtype=np.float64)
+        tmpl -= tmpl.mean(axis=1)[:, np.newaxis]
+        norm = np.sqrt((tmpl ** 2).sum(axis=1))
+        if np.any(norm == 0):
+            msg = "Templates must not be constant."
+            raise ValueError(msg)
+        tmpl /= norm[:, np.newaxis]
+        cc = _normxcorr_overlap_save(data, tmpl)
+        for i, j in enumerate(group):
+            ccs[j] = cc[i]
+    return [ccs[i] for i in range(len(templates))]
+
+
+def _normxcorr_overlap_save(data, templates):
+    """
+    Normalized cross correlation of demeaned, unit norm templates of equal
+    length with data.
+
+    :param data: Continuous data (float64).
+    :param templates: 2D array of templates, one per row.
+    :returns: 2D float32 array of correlation coefficients, one row per
+        template.
+    """
+    ntmpl, length = templates.shape
+    nlags = len(data) - length + 1
+    # FFT length of a few template lengths keeps the overlap overhead low
+    nfft = max(next_pow_2(4 * length), 256)
+    nfft = min(nfft, next_pow_2(len(data)))
+    step = nfft - length + 1
+    nblocks = int(np.ceil(nlags / float(step)))
+    padded = np.zeros((nblocks - 1) * step + nfft, dtype=np.float64)
+    padded[:len(data)] = data
+    tmpl_spec = np.conj(np.fft.rfft(templates, nfft, axis=1))
+    out = np.empty((ntmpl, nblocks * step), dtype=np.float32)
+    chunk = max(1, XCORR_BATCH_MAX_SAMPLES // (nfft * (ntmpl + 1)))
+    eps = np.finfo(np.float64).eps
+    for first in range(0, nblocks, chunk):
+        last = min(first + chunk, nblocks)
+        blocks = np.lib.stride_tricks.as_strided(
+            padded[first * step:], shape=(last - first, nfft),
+            strides=(step * padded.strides[0], padded.strides[0]))
+        spec = np.fft.rfft(blocks, nfft, axis=1)
+        # correlation for all templates and blocks, valid lags only
+        cc = np.fft.irfft(spec[np.newaxis, :, :] * tmpl_spec[:, np.newaxis, :],
+                          nfft, axis=2)[:, :, :step]
+        # energy of data windows from running sums (restarted in every block
+        # to limit the loss of precision)
+        cumsum = np.zeros((last - first, nfft + 1))
+        np.cumsum(blocks, axis=1, out=cumsum[:, 1:])
+        cumsum2 = np.zeros((last - first, nfft + 1))
+        np.cumsum(blocks ** 2, axis=1, out=cumsum2[:, 1:])
+        sums = cumsum[:, length:length + step] - cumsum[:, :step]
+        sums2 = cumsum2[:, length:length + step] - cumsum2[:, :step]
+        energy = sums2 - sums ** 2 / length
+        # (almost) constant data windows do not correlate
+        tol = 1e4 * eps * cumsum2[:, -1:]
+        valid = energy > tol
+        energy[~valid] = 1.0
+        cc /= np.sqrt(energy)[np.newaxis, :, :]
+        cc[:, ~valid] = 0.0
+        np.clip(cc, -1.0, 1.0, out=cc)
+        out[:, first * step:last * step] = cc.reshape(ntmpl, -1)
+    return out[:, :nlags]
+
+
 if __name__ == '__main__':
     import doctest
     doctest.testmod(exclude_empty=True)
@@ -56,6 +56,18 @@ def bandpass(data, freqmin, freqmax, df, corners=4, zerophase=False):
         the resulting filtered trace.
     :return: Filtered data.
     """
+    sos = _bandpass_sos(freqmin, freqmax, df, corners)
+    if zerophase:
+        firstpass = sosfilt(sos, data)
+        return sosfilt(sos, firstpass[::-1])[::-1]
+    else:
+        return sosfilt(sos, data)
+
+
+def _bandpass_sos(freqmin, freqmax, df, corners):
+    """
+    Design the second-order sections used by :func:`bandpass`.
+    """
     fe = 0.5 * df
     low = freqmin / fe
     high = freqmax / fe
@@ -70,12 +82,7 @@ def bandpass(data, freqmin, freqmax, df, corners=4, zerophase=False):
         raise ValueError(msg)
     z, p, k = iirfilter(corners, [low, high], btype='band',
                         ftype='butter', output='zpk')
-    sos = zpk2sos(z, p, k)
-    if zerophase:
-        firstpass = sosfilt(sos, data)
-        return sosfilt(sos, firstpass[::-1])[::-1]
-    else:
-        return sosfilt(sos, data)
+    return zpk2sos(z, p, k)
 
 
 def bandstop(data, freqmin, freqmax, df, corners=4, zerophase=False):
@@ -98,6 +105,18 @@ def bandstop(data, freqmin, freqmax, df, corners=4, zerophase=False):
         the resulting filtered trace.
     :return: Filtered data.
     """
+    sos = _bandstop_sos(freqmin, freqmax, df, corners)
+    if zerophase:
+        firstpass = sosfilt(sos, data)
+        return sosfilt(sos, firstpass[::-1])[::-1]
+    else:
+        return sosfilt(sos, data)
+
+
+def _bandstop_sos(freqmin, freqmax, df, corners):
+    """
+    Design the second-order sections used by :func:`bandstop`.
+    """
     fe = 0.5 * df
     low = freqmin / fe
     high = freqmax / fe
@@ -112,12 +131,7 @@ def bandstop(data, freqmin, freqmax, df, corners=4, zerophase=False):
         raise ValueError(msg)
     z, p, k = iirfilter(corners, [low, high],
                         btype='bandstop', ftype='butter', output='zpk')
-    sos = zpk2sos(z, p, k)
-    if zerophase:
-        firstpass = sosfilt(sos, data)
-        return sosfilt(sos, firstpass[::-1])[::-1]
-    else:
-        return sosfilt(sos, data)
+    return zpk2sos(z, p, k)
 
 
 def lowpass(data, freq, df, corners=4, zerophase=False):
@@ -139,6 +153,18 @@ def lowpass(data, freq, df, corners=4, zerophase=False):
         the resulting filtered trace.
     :return: Filtered data.
     """
+    sos = _lowpass_sos(freq, df, corners)
+    if zerophase:
+        firstpass = sosfilt(sos, data)
+        return sosfilt(sos, firstpass[::-1])[::-1]
+    else:
+        return sosfilt(sos, data)
+
+
+def _lowpass_sos(freq, df, corners):
+    """
+    Design the second-order sections used by :func:`lowpass`.
+    """
     fe = 0.5 * df
     f = freq / fe
     # raise for some bad scenarios
@@ -149,12 +175,7 @@ def lowpass(data, freq, df, corners=4, zerophase=False):
         warnings.warn(msg)
     z, p, k = iirfilter(corners, f, btype='lowpass', ftype='butter',
                         output='zpk')
-    sos = zpk2sos(z, p, k)
-    if zerophase:
-        firstpass = sosfilt(sos, data)
-        return sosfilt(sos, firstpass[::-1])[::-1]
-    else:
-        return sosfilt(sos, data)
+    return zpk2sos(z, p, k)
 
 
 def highpass(data, freq, df, corners=4, zerophase=False):
@@ -176,6 +197,18 @@ def highpass(data, freq, df, corners=4, zerophase=False):
         the resulting filtered trace.
     :return: Filtered data.
     """
+    sos = _highpass_sos(freq, df, corners)
+    if zerophase:
+        firstpass = sosfilt(sos, data)
+        return sosfilt(sos, firstpass[::-1])[::-1]
+    else:
+        return sosfilt(sos, data)
+
+
+def _highpass_sos(freq, df, corners):
+    """
+    Design the second-order sections used by :func:`highpass`.
+    """
     fe = 0.5 * df
     f = freq / fe
     # raise for some bad scenarios
@@ -184,12 +217,7 @@ def highpass(data, freq, df, corners=4, zerophase=False):
         raise ValueError(msg)
     z, p, k = iirfilter(corners, f, btype='highpass', ftype='butter',
                         output='zpk')
-    sos = zpk2sos(z, p, k)
-    if zerophase:
-        firstpass = sosfilt(sos, data)
-        return sosfilt(sos, firstpass[::-1])[::-1]
-    else:
-        return sosfilt(sos, data)
+    return zpk2sos(z, p, k)
 
 
 def envelope(data):
@@ -22,9 +22,18 @@ from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
 from future.builtins import *  # NOQA
 
+import hashlib
 import warnings
+from collections import OrderedDict
 
 import numpy as np
+import scipy.sparse
+
+
+# Least recently used cache of sparse smoothing operators, see
+# calculate_sparse_smoothing_matrix().
+_SMOOTHING_MATRICES = OrderedDict()
+_SMOOTHING_MATRIX_CACHE_SIZE = 8
 
 
 def konno_ohmachi_smoothing_window(frequencies, center_frequency,
@@ -142,9 +151,179 @@ def calculate_smoothing_matrix(frequencies, bandwidth=40.0, normalize=False):
     return sm_matrix
 
 
+def calculate_sparse_smoothing_matrix(frequencies, bandwidth=40.0,
+                                      normalize=False,
+                                      output_frequencies=None,
+                                      threshold=1e-6, max_memory_usage=512):
+    """
+    Calculates a sparse smoothing operator with one Konno & Ohmachi window
+    per output frequency.
+
+    The window has a constant width on a logarithmic frequency scale and its
+    values are bounded by ``(b * log_10(f/f_c))^-4``. Only window values of
+    frequencies with ``|b * log_10(f/f_c)| <= threshold^(-1/4)`` are stored,
+    all neglected values are smaller than ``threshold``. The result is a
+    banded :class:`scipy.sparse.csr_matrix` with
+    ``len(output_frequencies)`` rows and ``len(frequencies)`` columns that
+    smoothes and resamples spectra with a sparse matrix product::
+
+        smoothed_spectrum = smoothing_matrix.dot(spectrum)
+        smoothed_spectra = smoothing_matrix.dot(spectra.T).T
+
+    The window has a constant width on a logarithmic scale, so on a linear
+    frequency grid a row covers more frequency bins the higher its center
+    frequency is and the number of stored values grows with the square of
+    the number of frequencies (about ``0.8 * len(frequencies)**2`` for a
+    bandwidth of 40 and the default threshold). The operator is therefore
+    only small if the output frequencies are spaced logarithmically (or
+    are few). Building the operator fails if it would take more than
+    ``max_memory_usage``.
+
+    The operators are kept in a small least recently used cache keyed by the
+    frequency grids, the bandwidth, the normalization and the threshold, so
+    the returned matrix must not be modified.
+
+    :type frequencies: :class:`numpy.ndarray` (float32 or float64)
+    :param frequencies:
+        The frequencies of the spectra to be smoothed.
+    :type bandwidth: float
+    :param bandwidth:
+        Determines the width of the smoothing peak. Lower values result in a
+        broader peak. Must be greater than 0. Defaults to 40.
+    :type normalize: bool, optional
+    :param normalize:
+        Normalize the stored values of each window to a sum of one.
+        Default to False.
+    :type output_frequencies: :class:`numpy.ndarray`, optional
+    :param output_frequencies:
+        The center frequencies of the windows, i.e. the frequencies of the
+        smoothed spectra. Defaults to ``frequencies``.
+    :type threshold: float, optional
+    :param threshold:
+        Window values below this threshold are neglected. A threshold of zero
+        stores all non-zero values. Defaults to 1e-6.
+    :type max_memory_usage: int, optional
+    :param max_memory_usage:
+        The maximum amount of memory in MB for building the operator. A
+        :class:`ValueError` is raised if the estimated memory usage is
+        larger. Defaults to 512 MB.
+    :rtype: :class:`scipy.sparse.csr_matrix`
+    """
+    if frequencies.dtype != np.float32 and frequencies.dtype != np.float64:
+        msg = 'frequencies needs to have a dtype of float32/64.'
+        raise ValueError(msg)
+    if output_frequencies is None:
+        output_frequencies = frequencies
+    output_frequencies = np.require(output_frequencies, frequencies.dtype)
+    key = (_hash_array(frequencies), _hash_array(output_frequencies),
+           float(bandwidth), bool(normalize), float(threshold))
+    try:
+        sm_matrix = _SMOOTHING_MATRICES.pop(key)
+    except KeyError:
+        rows = _sparse_smoothing_rows(frequencies, output_frequencies,
+                                      bandwidth, threshold)
+        approx_mem_usage = _sparse_smoothing_memory_usage(rows[-1],
+                                                          frequencies)
+        if approx_mem_usage > max_memory_usage:
+            msg = ('The sparse smoothing matrix would need about %i MB '
+                   '(%i stored values), more than max_memory_usage (%i MB). '
+                   'Use fewer or logarithmically spaced output_frequencies '
+                   'or a larger threshold.') % (
+                approx_mem_usage, rows[-1].sum(), max_memory_usage)
+            raise ValueError(msg)
+        temp = np.geterr()
+        np.seterr(all='ignore')
+        try:
+            sm_matrix = _build_sparse_smoothing_matrix(
+                frequencies, output_frequencies, bandwidth, normalize, *rows)
+        finally:
+            np.seterr(**temp)
+        while len(_SMOOTHING_MATRICES) >= _SMOOTHING_MATRIX_CACHE_SIZE:
+            _SMOOTHING_MATRICES.popitem(last=False)
+    _SMOOTHING_MATRICES[key] = sm_matrix
+    return sm_matrix
+
+
+def _hash_array(array):
+    """
+    Returns a hash of the data type, shape and content of an array.
+    """
+    array = np.ascontiguousarray(array)
+    digest = hashlib.sha1(str((array.dtype.str, array.shape)).encode())
+    digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+def _sparse_smoothing_rows(frequencies, output_frequencies, bandwidth,
+                           threshold):
+    """
+    Returns the sort order of the frequencies and the index of the first
+    sorted frequency and the number of stored values of every row of the
+    sparse smoothing operator.
+    """
+    # Maximum distance to the center frequency on the scaled logarithmic
+    # axis. The window is bounded by x^-4.
+    if threshold > 0:
+        max_ratio = 10.0 ** ((1.0 / threshold) ** 0.25 / bandwidth)
+    else:
+        max_ratio = np.inf
+    order = np.argsort(frequencies, kind='mergesort')
+    sorted_freqs = frequencies[order].astype(np.float64)
+    center = output_frequencies.astype(np.float64)
+    # A center frequency of zero only covers the frequency zero.
+    lower = np.where(center > 0, center / max_ratio, 0.0)
+    upper = np.where(center > 0, center * max_ratio, 0.0)
+    start = np.searchsorted(sorted_freqs, lower, side='left')
+    stop = np.searchsorted(sorted_freqs, upper, side='right')
+    return order, start, stop - start
+
+
+def _sparse_smoothing_memory_usage(counts, frequencies):
+    """
+    Returns the approximate memory usage in MB for building a sparse
+    smoothing operator with the given numbers of stored values per row.
+    """
+    # Indices, frequencies, window values and temporaries of all stored
+    # values plus the data of the matrix.
+    size = 6 * 8 + frequencies.dtype.itemsize
+    return (float(counts.sum()) * size + 8.0 * len(counts)) / 1048576.0
+
+
+def _build_sparse_smoothing_matrix(frequencies, output_frequencies,
+                                   bandwidth, normalize, order, start,
+                                   counts):
+    """
+    Builds the sparse smoothing operator of
+    :func:`calculate_sparse_smoothing_matrix` without caching.
+    """
+    dtype = frequencies.dtype
+    sorted_freqs = frequencies[order].astype(np.float64)
+    center = output_frequencies.astype(np.float64)
+    indptr = np.zeros(len(center) + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    # Concatenated index ranges start[i]:start[i] + counts[i] of all rows.
+    rows = np.repeat(np.arange(len(center)), counts)
+    positions = np.arange(indptr[-1]) - np.repeat(indptr[:-1] - start,
+                                                  counts)
+    freqs = sorted_freqs[positions]
+    x = bandwidth * np.log10(freqs / center[rows])
+    values = (np.sin(x) / x) ** 4
+    values[freqs == 0.0] = 0.0
+    values[freqs == center[rows]] = 1.0
+    if normalize:
+        sums = np.add.reduceat(values, indptr[:-1][counts > 0])
+        values /= np.repeat(sums, counts[counts > 0])
+    sm_matrix = scipy.sparse.csr_matrix(
+        (values.astype(dtype), order[positions], indptr),
+        shape=(len(center), len(frequencies)))
+    sm_matrix.sort_indices()
+    return sm_matrix
+
+
 def konno_ohmachi_smoothing(spectra, frequencies, bandwidth=40, count=1,
                             enforce_no_matrix=False, max_memory_usage=512,
-                            normalize=False):
+                            normalize=False, output_frequencies=None,
+                            threshold=None):
     """
     Smooths a matrix containing one spectra per row with the Konno-Ohmachi
     smoothing window.
@@ -154,6 +333,12 @@ def konno_ohmachi_smoothing(spectra, frequencies, bandwidth=40, count=1,
 
     This method first will estimate the memory usage and then either use a fast
     and memory intensive method or a slow one with a better memory usage.
+    If ``output_frequencies`` or ``threshold`` are given, a cached sparse
+    smoothing operator (see :func:`calculate_sparse_smoothing_matrix`) is
+    used instead if it needs less than ``max_memory_usage``. It is fast and
+    small for few or logarithmically spaced output frequencies, but not for
+    large linearly spaced frequency arrays. Otherwise the smoothing windows
+    are calculated one by one.
 
     :type spectra: :class:`numpy.ndarray` (float32 or float64)
     :param spectra:
@@ -179,13 +364,23 @@ def konno_ohmachi_smoothing(spectra, frequencies, bandwidth=40, count=1,
     :type max_memory_usage: int, optional
     :param max_memory_usage:
         Set the maximum amount of extra memory in MB for this method. Decides
-        whether or not the matrix multiplication method is used. Defaults to
-        512 MB.
+        whether or not the matrix multiplication method or the sparse
+        smoothing operator is used. Defaults to 512 MB.
     :type normalize: bool, optional
     :param normalize:
         The Konno-Ohmachi smoothing window is normalized on a logarithmic
         scale. Set this parameter to True to normalize it on a normal scale.
         Default to False.
+    :type output_frequencies: :class:`numpy.ndarray`, optional
+    :param output_frequencies:
+        Frequencies of the smoothed spectra. The spectra are smoothed and
+        resampled to these frequencies using the sparse smoothing operator.
+        Only a single pass (``count=1``) is possible in this case.
+    :type threshold: float, optional
+    :param threshold:
+        Use the sparse smoothing operator neglecting window values smaller
+        than ``threshold``. Defaults to 1e-6 if only ``output_frequencies``
+        are given.
     """
     if (frequencies.dtype != np.float32 and frequencies.dtype != np.float64) \
        or (spectra.dtype != np.float32 and spectra.dtype != np.float64):
@@ -198,6 +393,44 @@ def konno_ohmachi_smoothing(spectra, frequencies, bandwidth=40, count=1,
         msg = 'frequencies and spectra should have the same dtype. It ' + \
               'will be changed to np.float64 for both.'
         warnings.warn(msg)
+    # Smooth with the cached sparse operator.
+    if output_frequencies is not None or threshold is not None:
+        if output_frequencies is not None and count > 1:
+            msg = 'count has to be 1 when resampling to output_frequencies.'
+            raise ValueError(msg)
+        if threshold is None:
+            threshold = 1e-6
+        try:
+            smoothing_matrix = calculate_sparse_smoothing_matrix(
+                frequencies, bandwidth, normalize=normalize,
+                output_frequencies=output_frequencies, threshold=threshold,
+                max_memory_usage=max_memory_usage)
+        except ValueError:
+            if output_frequencies is None:
+                return konno_ohmachi_smoothing(
+                    spectra, frequencies, bandwidth, count=count,
+                    enforce_no_matrix=True, normalize=normalize)
+            # Calculate the window of every output frequency.
+            output_frequencies = np.require(output_frequencies,
+                                            frequencies.dtype)
+            new_spec = np.empty(spectra.shape[:-1] + output_frequencies.shape,
+                                spectra.dtype)
+            temp = np.geterr()
+            np.seterr(all='ignore')
+            for _i, freq in enumerate(output_frequencies):
+                window = konno_ohmachi_smoothing_window(
+                    frequencies, freq, bandwidth, normalize=normalize)
+                new_spec[..., _i] = np.dot(spectra, window)
+            np.seterr(**temp)
+            return new_spec
+        # The transposed spectra are Fortran ordered which the CSC format
+        # handles faster.
+        if spectra.ndim > 1:
+            smoothing_matrix = smoothing_matrix.tocsc()
+        new_spec = spectra.T
+        for _i in range(count):
+            new_spec = smoothing_matrix.dot(new_spec)
+        return np.require(new_spec.T, spectra.dtype)
     # Check the dtype to get the correct size.
     if frequencies.dtype == np.float32:
         size = 4.0
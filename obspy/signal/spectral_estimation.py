@@ -23,22 +23,27 @@ from future.builtins import *  # NOQA
 
 import bisect
 import bz2
+import copy
 import math
+import multiprocessing
 import os
 import pickle
 import warnings
 
 import numpy as np
 import matplotlib.pyplot as plt
+import scipy.sparse
 from matplotlib import mlab
 from matplotlib.colors import LinearSegmentedColormap
 from matplotlib.dates import date2num
 from matplotlib.mlab import detrend_none, window_hanning
 from matplotlib.ticker import FormatStrFormatter
 
-from obspy import Stream, Trace
+from obspy import Stream, Trace, UTCDateTime
+from obspy.core.trace import Stats
 from obspy.core.util import get_matplotlib_version
-from obspy.signal.invsim import cosine_taper
+from obspy.signal.invsim import (cosine_taper, invert_spectrum,
+                                 paz_to_freq_resp)
 from obspy.signal.util import prev_pow_2
 
 
@@ -46,6 +51,13 @@ MATPLOTLIB_VERSION = get_matplotlib_version()
 
 dtiny = np.finfo(0.0).tiny
 
+# version of the PPSD file format written by PPSD.save()
+PPSD_FILE_VERSION = 1
+
+# maximum number of samples held in the stacked, windowed data during batched
+# PPSD processing (2 ** 23 float64 samples are 64 MB)
+BATCH_MAX_SAMPLES = 2 ** 23
+
 # build colormap as done in paper by mcnamara
 CDICT = {'red': ((0.0, 1.0, 1.0),
                  (0.05, 1.0, 1.0),
@@ -186,6 +198,61 @@ def welch_window(N):
     return taper
 
 
+def _stacked_welch_psd(data, nfft, noverlap, window, sampling_rate):
+    """
+    Computes one-sided Welch power spectral densities for all rows of a 2-D
+    array in one pass.
+
+    Gives the same results as calling :func:`matplotlib.mlab.psd` with
+    ``detrend=mlab.detrend_linear``, ``sides='onesided'`` and
+    ``scale_by_freq=True`` on every single row, but without looping over rows
+    or windows in Python.
+
+    :type data: :class:`~numpy.ndarray`
+    :param data: C-contiguous float64 array of shape ``(n_rows, npts)``.
+    :type nfft: int
+    :param nfft: Number of points of the single Welch windows.
+    :type noverlap: int
+    :param noverlap: Number of overlapping points of consecutive windows.
+    :type window: :class:`~numpy.ndarray`
+    :param window: Taper applied to every window (length ``nfft``).
+    :type sampling_rate: float
+    :param sampling_rate: Sampling rate of the data.
+    :rtype: :class:`~numpy.ndarray`
+    :returns: Power spectral densities of shape ``(n_rows, nfft // 2 + 1)``.
+    """
+    data = np.ascontiguousarray(data, dtype=np.float64)
+    n_rows, npts = data.shape
+    step = nfft - noverlap
+    n_windows = (npts - noverlap) // step
+    itemsize = data.itemsize
+    # view of all overlapping windows, no data is copied here
+    windows = np.lib.stride_tricks.as_strided(
+        data, shape=(n_rows, n_windows, nfft),
+        strides=(data.strides[0], step * itemsize, itemsize))
+    # linear detrend of every single window
+    x = np.arange(nfft, dtype=np.float64)
+    x -= x.mean()
+    slope = np.dot(windows, x) / np.dot(x, x)
+    windows = windows - windows.mean(axis=-1)[:, :, np.newaxis]
+    windows -= slope[:, :, np.newaxis] * x
+    windows *= window
+    spec = np.fft.rfft(windows, axis=-1)
+    del windows
+    power = spec.real ** 2
+    power += spec.imag ** 2
+    del spec
+    power = power.mean(axis=1)
+    # scale to power spectral density and account for the negative
+    # frequencies (all except DC and, for even nfft, Nyquist frequency)
+    power /= sampling_rate * (window ** 2).sum()
+    if nfft % 2:
+        power[:, 1:] *= 2
+    else:
+        power[:, 1:-1] *= 2
+    return power
+
+
 class PPSD():
     """
     Class to compile probabilistic power spectral densities for one combination
@@ -228,36 +295,48 @@ class PPSD():
 
     .. rubric:: Saving and Loading
 
-    The PPSD object supports saving to a pickled file with optional
-    compression:
+    The PPSD object supports saving to a compact binary file (NumPy's NPZ
+    format) with optional compression:
 
-    >>> ppsd.save("myfile.pkl.bz2", compress=True) # doctest: +SKIP
+    >>> ppsd.save("myfile.npz", compress=True) # doctest: +SKIP
 
     The saved PPSD can then be loaded again using the static method
     :func:`~obspy.signal.spectral_estimation.PPSD.load`, e.g. to add more data
     or plot it again:
 
-    >>> ppsd = PPSD.load("myfile.pkl.bz2")  # doctest: +SKIP
+    >>> ppsd = PPSD.load("myfile.npz")  # doctest: +SKIP
 
     The :func:`~obspy.signal.spectral_estimation.PPSD.load` method detects
-    compression automatically.
+    compression automatically and can also read PPSDs pickled by older ObsPy
+    versions.
 
     .. note::
 
-        While saving the PPSD with compression enabled takes significantly
-        longer, it can reduce the resulting file size by more than 80%.
+        Response information from a
+        :class:`~obspy.io.xseed.parser.Parser` is not saved. Set the `parser`
+        attribute of a loaded PPSD again before adding more data to it.
 
-    .. note::
+    .. rubric:: Realtime Data
+
+    Data arriving in small packets (e.g. from a SeedLink server) can be added
+    using :meth:`~obspy.signal.spectral_estimation.PPSD.add_realtime`. Every
+    full segment is added to the histogram as soon as it is available.
+
+    .. rubric:: Merging
+
+    PPSDs of the same channel with identical processing parameters (e.g.
+    computed for different time spans in parallel, see
+    :func:`~obspy.signal.spectral_estimation.parallel_ppsd`) can be combined:
 
-        It is safer (but a bit slower) to provide a
-        :class:`~obspy.io.xseed.parser.Parser` instance with information from
-        e.g. a Dataless SEED than to just provide a static PAZ dictionary.
+    >>> ppsd = ppsd1 + ppsd2  # doctest: +SKIP
+    >>> ppsd1.merge(ppsd2)  # doctest: +SKIP
 
     .. _`ObsPy Tutorial`: http://docs.obspy.org/tutorial/
     """
     def __init__(self, stats, paz=None, parser=None, skip_on_gaps=False,
                  is_rotational_data=False, db_bins=(-200, -50, 1.),
-                 ppsd_length=3600., overlap=0.5, water_level=600.0):
+                 ppsd_length=3600., overlap=0.5, water_level=600.0,
+                 batch_processing=False):
         """
         Initialize the PPSD object setting all fixed information on the station
         that should not change afterwards to guarantee consistent spectral
@@ -317,6 +396,18 @@ class PPSD():
                 result in an overlap of 1800s of the segments.
         :type water_level: float, optional
         :param water_level: Water level used in instrument correction.
+        :type batch_processing: bool, optional
+        :param batch_processing: If set to True, all segments of one
+                :meth:`add` call are stacked and processed together: Welch
+                spectra of all segments are computed in one pass, instrument
+                correction and differentiation to acceleration are applied
+                as one precomputed multiplier in the frequency domain (like
+                done by [McNamara2004]_) and octave band averaging is done
+                with a precomputed sparse matrix. This is much faster than
+                the default processing of every single segment with a time
+                domain instrument correction, but results differ slightly
+                (mostly at the longest periods). Do not mix both modes in
+                one PPSD.
         """
         if paz is not None and parser is not None:
             msg = "Both paz and parser specified. Using parser object for " \
@@ -334,6 +425,7 @@ class PPSD():
         self.ppsd_length = ppsd_length
         self.overlap = overlap
         self.water_level = water_level
+        self.batch_processing = batch_processing
         # trace length for one segment
         self.len = int(self.sampling_rate * ppsd_length)
         # set paz either from kwarg or try to get it from stats
@@ -360,6 +452,11 @@ class PPSD():
         self.times_data = []
         self.times_gaps = []
         self.hist_stack = None
+        # caches used in batched processing
+        self._octave_matrix = None
+        self._response_cache = {}
+        # ring buffer used by add_realtime()
+        self._rt_buffer = None
         self.__setup_bins()
         # set up the binning for the db scale
         num_bins = int((db_bins[1] - db_bins[0]) / db_bins[2])
@@ -510,6 +607,8 @@ class PPSD():
         # merge depending on skip_on_gaps set during __init__
         stream.merge(self.merge_method, fill_value=0)
 
+        batch = getattr(self, "batch_processing", False)
+        segments = []
         for tr in stream:
             # the following check should not be necessary due to the select()..
             if not self.__sanity_check(tr):
@@ -528,9 +627,20 @@ class PPSD():
                     # throw warnings if trace length is different
                     # than ppsd_length..!?!
                     slice = tr.slice(t1, t1 + self.ppsd_length)
-                    # XXX not good, should be working in place somehow
-                    # XXX how to do it with the padding, though?
-                    success = self.__process(slice)
+                    if batch:
+                        # only collect the segment here, all segments get
+                        # processed together at the end
+                        data = self.__prepare_segment(slice)
+                        paz = None
+                        if data is not None:
+                            paz = self.__get_paz(slice.stats.starttime)
+                        success = paz is not None
+                        if success:
+                            segments.append((data, paz))
+                    else:
+                        # XXX not good, should be working in place somehow
+                        # XXX how to do it with the padding, though?
+                        success = self.__process(slice)
                     if success:
                         self.__insert_used_time(t1)
                         if verbose:
@@ -540,53 +650,223 @@ class PPSD():
 
             # enforce time limits, pad zeros if gaps
             # tr.trim(t, t+PPSD_LENGTH, pad=True)
+        if segments:
+            self.__process_batch(segments)
         return changed
 
-    def __process(self, tr):
+    def add_realtime(self, trace, verbose=False):
         """
-        Processes a segment of data and adds the information to the
-        PPSD histogram. If Trace is compatible (station, channel, ...) has to
-        checked beforehand.
+        Adds data arriving in small packets, e.g. traces received in
+        :meth:`EasySeedLinkClient.on_data()
+        <obspy.clients.seedlink.easyseedlink.EasySeedLinkClient.on_data>` or
+        an :class:`~obspy.realtime.rttrace.RtTrace` after appending new data.
+
+        Data is collected in a ring buffer holding one PPSD segment. Every
+        time a full segment (respecting the configured overlap) is available
+        it is processed and added to the histogram right away. Data that was
+        already passed in earlier is skipped without any processing, so the
+        same (growing) :class:`~obspy.realtime.rttrace.RtTrace` can be
+        passed in repeatedly. Gaps are filled with zeros, or the buffer is
+        restarted after the gap when `skip_on_gaps` was set.
+
+        >>> from obspy.clients.seedlink.easyseedlink import \\
+        ...     EasySeedLinkClient  # doctest: +SKIP
+        >>> class PPSDClient(EasySeedLinkClient):  # doctest: +SKIP
+        ...     def on_data(self, trace):
+        ...         if ppsd.add_realtime(trace):
+        ...             ppsd.plot(filename="ppsd.png", show=False)
+
+        :type trace: :class:`~obspy.core.trace.Trace`
+        :param trace: Packet of data to add, has to be compatible with this
+            PPSD (other traces are skipped with a warning).
+        :rtype: list of :class:`~obspy.core.utcdatetime.UTCDateTime`
+        :returns: Start times of the segments that were added to the
+            histogram (an empty list if the histogram was not changed).
+        """
+        self.__check_ppsd_length()
+        if not self.__sanity_check(trace):
+            msg = "Skipping incompatible trace."
+            warnings.warn(msg)
+            return []
+        if getattr(self, "_rt_buffer", None) is None:
+            self._rt_buffer = np.zeros(self.len, dtype=np.float64)
+            self._rt_next = None
+            self._rt_reset(None)
+        data = trace.data
+        starttime = trace.stats.starttime
+        continuous = False
+        if self._rt_next is not None:
+            # skip samples that were already seen before
+            skip = int(round((self._rt_next - starttime) *
+                             self.sampling_rate))
+            if skip >= len(data):
+                return []
+            if skip >= 0:
+                data = data[skip:]
+                starttime = self._rt_next
+                continuous = True
+            else:
+                # gap since the last packet
+                self.times_gaps.append([self._rt_next - self.delta,
+                                        starttime])
+                if self.merge_method == -1 or -skip >= self.len:
+                    self._rt_reset(starttime)
+        else:
+            self._rt_reset(starttime)
+        # update the list of available data, extending the last entry if the
+        # data is continuous
+        endtime = trace.stats.endtime
+        if continuous and self.times_data:
+            self.times_data[-1][1] = endtime
+        else:
+            self.times_data.append([starttime, endtime])
+        data = np.ma.filled(data, 0).astype(np.float64)
+        if not self._rt_count:
+            self._rt_starttime = starttime
+        elif starttime > self._rt_next:
+            # fill the gap with zeros
+            gap = int(round((starttime - self._rt_next) *
+                            self.sampling_rate))
+            data = np.concatenate((np.zeros(gap), data))
+        self._rt_next = endtime + self.delta
+        added = []
+        while len(data):
+            data = self._rt_write(data)
+            if self._rt_count < self.len:
+                break
+            t1 = self._rt_starttime
+            # segments arrive in order, so it is enough to compare with the
+            # last used time
+            if self.times_used and \
+                    t1 < self.times_used[-1] + self._rt_step * self.delta - \
+                    self.delta / 2.0:
+                msg = "Already covered time spans detected (e.g. %s), " + \
+                      "skipping these slices."
+                warnings.warn(msg % t1)
+            else:
+                segment = np.roll(self._rt_buffer, -self._rt_head)
+                tr = Trace(data=segment)
+                tr.stats.sampling_rate = self.sampling_rate
+                tr.stats.starttime = t1
+                if self.__process_realtime_segment(tr):
+                    self.times_used.append(t1)
+                    added.append(t1)
+                    if verbose:
+                        print(t1)
+            # advance by the segment spacing
+            self._rt_head = (self._rt_head + self._rt_step) % self.len
+            self._rt_count -= self._rt_step
+            self._rt_starttime += self._rt_step * self.delta
+        return added
+
+    def __process_realtime_segment(self, tr):
+        """
+        Processes one full segment taken from the realtime ring buffer.
+        """
+        if getattr(self, "batch_processing", False):
+            paz = self.__get_paz(tr.stats.starttime)
+            if paz is None:
+                return False
+            self.__process_batch([(tr.data, paz)])
+            return True
+        return self.__process(tr)
+
+    def _rt_reset(self, starttime):
+        """
+        Empties the ring buffer used by
+        :meth:`~obspy.signal.spectral_estimation.PPSD.add_realtime`.
+        """
+        self._rt_head = 0
+        self._rt_count = 0
+        self._rt_starttime = starttime
+        self._rt_step = max(1, int(round((1 - self.overlap) * self.len)))
+
+    def _rt_write(self, data):
+        """
+        Writes data to the ring buffer until it holds a full segment and
+        returns the remaining data.
+        """
+        n = min(len(data), self.len - self._rt_count)
+        index = (self._rt_head + self._rt_count + np.arange(n)) % self.len
+        self._rt_buffer[index] = data[:n]
+        self._rt_count += n
+        return data[n:]
+
+    def __prepare_segment(self, tr):
+        """
+        Checks the length of a segment of data and returns its data as a
+        float64 array with masked values (gaps) filled with zeros.
 
         :type tr: :class:`~obspy.core.trace.Trace`
         :param tr: Compatible Trace with data of one PPSD segment
-        :returns: True if segment was successfully added to histogram, False
-                otherwise.
+        :returns: Prepared data or None if the segment has to be skipped.
         """
+        data = tr.data
         # XXX DIRTY HACK!!
-        if len(tr) == self.len + 1:
-            tr.data = tr.data[:-1]
+        if len(data) == self.len + 1:
+            data = data[:-1]
         # one last check..
-        if len(tr) != self.len:
+        if len(data) != self.len:
             msg = "Got a piece of data with wrong length. Skipping"
             warnings.warn(msg)
-            print(len(tr), self.len)
-            return False
+            print(len(data), self.len)
+            return None
         # being paranoid, only necessary if in-place operations would follow
-        tr.data = tr.data.astype(np.float64)
+        data = data.astype(np.float64)
         # if trace has a masked array we fill in zeros
         try:
-            tr.data[tr.data.mask] = 0.0
+            data[data.mask] = 0.0
         # if it is no masked array, we get an AttributeError
         # and have nothing to do
         except AttributeError:
             pass
+        return data
 
-        # get instrument response preferably from parser object
+    def __get_paz(self, starttime):
+        """
+        Returns the poles and zeros to use for the segment starting at the
+        given time, preferably from the parser object.
+
+        :type starttime: :class:`~obspy.core.utcdatetime.UTCDateTime`
+        :returns: Poles and zeros dictionary or None if no response
+            information is available (segment has to be skipped).
+        """
         try:
-            paz = self.parser.getPAZ(self.id, datetime=tr.stats.starttime)
+            paz = self.parser.getPAZ(self.id, datetime=starttime)
         except Exception as e:
             if self.parser is not None:
                 msg = "Error getting response from parser:\n%s: %s\n" \
                       "Skipping time segment(s)."
                 msg = msg % (e.__class__.__name__, e.message)
                 warnings.warn(msg)
-                return False
+                return None
             paz = self.paz
         if paz is None:
             msg = "Missing poles and zeros information for response " \
                   "removal. Skipping time segment(s)."
             warnings.warn(msg)
+            return None
+        return paz
+
+    def __process(self, tr):
+        """
+        Processes a segment of data and adds the information to the
+        PPSD histogram. If Trace is compatible (station, channel, ...) has to
+        checked beforehand.
+
+        :type tr: :class:`~obspy.core.trace.Trace`
+        :param tr: Compatible Trace with data of one PPSD segment
+        :returns: True if segment was successfully added to histogram, False
+                otherwise.
+        """
+        data = self.__prepare_segment(tr)
+        if data is None:
+            return False
+        tr.data = data
+
+        # get instrument response preferably from parser object
+        paz = self.__get_paz(tr.stats.starttime)
+        if paz is None:
             return False
         # restitution:
         # mcnamara apply the correction at the end in freq-domain,
@@ -634,9 +914,132 @@ class PPSD():
             spec_octaves.append(spec_center)
         spec_octaves = np.array(spec_octaves)
 
+        self.__add_to_histogram(spec_octaves[np.newaxis, :])
+        return True
+
+    def __process_batch(self, segments):
+        """
+        Processes many segments of data at once and adds the information to
+        the PPSD histogram.
+
+        Segments are grouped by instrument response. For every group, the
+        Welch spectra of all segments are computed in one pass (in chunks of
+        at most :const:`BATCH_MAX_SAMPLES` windowed samples), corrected with
+        a precomputed frequency domain multiplier and averaged over the
+        octave bands with a sparse matrix product.
+
+        :type segments: list of tuples
+        :param segments: ``(data, paz)`` tuples with data of one PPSD segment
+            (already checked and prepared) and the corresponding response.
+        """
+        groups = []
+        for data, paz in segments:
+            for group_paz, group in groups:
+                if group_paz == paz:
+                    group.append(data)
+                    break
+            else:
+                groups.append((paz, [data]))
+
+        window = cosine_taper(self.nfft, 0.2)
+        n_windows = (self.len - self.nlap) // (self.nfft - self.nlap)
+        chunk_size = max(1, BATCH_MAX_SAMPLES // (n_windows * self.nfft))
+        octave_matrix = self.__get_octave_matrix()
+        # the mean of bands without frequency bins is NaN like in the
+        # processing of single segments, not zero
+        empty_bands = np.diff(octave_matrix.indptr) == 0
+        for paz, group in groups:
+            # only the power is of interest, so applying the complex response
+            # multiplier boils down to scaling with its squared modulus
+            scaling = np.abs(self.__get_response_multiplier(paz)) ** 2
+            # leave out first entry (offset) and work with the periods not
+            # frequencies later so reverse spectrum
+            scaling = scaling[1:][::-1]
+            for i in range(0, len(group), chunk_size):
+                spec = _stacked_welch_psd(
+                    np.vstack(group[i:i + chunk_size]), self.nfft, self.nlap,
+                    window, self.sampling_rate)
+                spec = spec[:, 1:][:, ::-1] * scaling
+                # avoid calculating log of zero
+                spec[spec < dtiny] = dtiny
+                # go to dB
+                spec = np.log10(spec)
+                spec *= 10
+                spec_octaves = octave_matrix.dot(spec.T).T
+                spec_octaves[:, empty_bands] = np.nan
+                self.__add_to_histogram(spec_octaves)
+
+    def __get_octave_matrix(self):
+        """
+        Returns the sparse matrix that averages a (period ordered) spectrum
+        over all octave bands, i.e. ``matrix.dot(spec)`` gives the same
+        result as taking the mean of the spectrum inside every single band.
+        Rows of bands without frequency bins are empty.
+        """
+        if getattr(self, "_octave_matrix", None) is None:
+            rows = []
+            cols = []
+            weights = []
+            for i, (per_left, per_right) in enumerate(zip(
+                    self.per_octaves_left, self.per_octaves_right)):
+                idx = np.nonzero((per_left <= self.per) &
+                                 (self.per <= per_right))[0]
+                rows.append(np.repeat(i, len(idx)))
+                cols.append(idx)
+                weights.append(np.repeat(1.0 / max(len(idx), 1), len(idx)))
+            self._octave_matrix = scipy.sparse.csr_matrix(
+                (np.concatenate(weights),
+                 (np.concatenate(rows), np.concatenate(cols))),
+                shape=(len(self.per_octaves), len(self.per)))
+        return self._octave_matrix
+
+    def __get_response_multiplier(self, paz):
+        """
+        Returns the complex frequency domain multiplier for the frequencies
+        of the Welch spectra (including the offset) that removes the
+        instrument response and, for translational data, converts to
+        acceleration.
+
+        Differentiation is done with the transfer function of the central
+        differences used by :func:`numpy.gradient`, to stay consistent with
+        the default time domain processing.
+        """
+        try:
+            cache = self._response_cache
+        except AttributeError:
+            cache = self._response_cache = {}
+        key = repr(sorted(paz.items()))
+        try:
+            return cache[key]
+        except KeyError:
+            pass
+        num_freqs = self.nfft // 2 + 1
+        if self.is_rotational_data:
+            # in case of rotational data just remove sensitivity
+            multiplier = np.ones(num_freqs, dtype=np.complex128)
+        else:
+            multiplier, freqs = paz_to_freq_resp(
+                paz['poles'], paz['zeros'], paz['gain'], self.delta,
+                self.nfft, freq=True)
+            invert_spectrum(multiplier, self.water_level)
+            multiplier *= 1j * np.sin(2 * np.pi * freqs * self.delta) / \
+                self.delta
+        multiplier /= paz['sensitivity']
+        cache[key] = multiplier
+        return multiplier
+
+    def __add_to_histogram(self, spec_octaves):
+        """
+        Adds the octave band averaged spectra of one or more segments to the
+        PPSD histogram.
+
+        :type spec_octaves: :class:`~numpy.ndarray`
+        :param spec_octaves: Spectra in dB, shape ``(n_segments,
+            n_octaves)``.
+        """
         hist, self.xedges, self.yedges = np.histogram2d(
-            self.per_octaves,
-            spec_octaves, bins=(self.period_bins, self.spec_bins))
+            np.tile(self.per_octaves, len(spec_octaves)),
+            spec_octaves.ravel(), bins=(self.period_bins, self.spec_bins))
 
         try:
             # we have to make sure manually that the bins are always the same!
@@ -645,7 +1048,84 @@ class PPSD():
         except TypeError:
             # only during first run initialize stack with first histogram
             self.hist_stack = hist
-        return True
+
+    def __check_compatible(self, other):
+        """
+        Checks if another PPSD can be merged into this PPSD, i.e. it was
+        computed for the same channel with identical processing parameters and
+        binning. Raises a ValueError if not.
+
+        :type other: :class:`~obspy.signal.spectral_estimation.PPSD`
+        """
+        if not isinstance(other, PPSD):
+            msg = "Can only merge with another PPSD object."
+            raise TypeError(msg)
+        self.__check_ppsd_length()
+        other.__check_ppsd_length()
+        for key in ("id", "sampling_rate", "is_rotational_data",
+                    "ppsd_length", "overlap", "water_level", "nfft", "nlap",
+                    "merge_method"):
+            if getattr(self, key) != getattr(other, key):
+                msg = "Can not merge PPSDs with different '%s' (%s != %s)."
+                msg = msg % (key, getattr(self, key), getattr(other, key))
+                raise ValueError(msg)
+        if getattr(self, "batch_processing", False) != \
+                getattr(other, "batch_processing", False):
+            msg = "Can not merge PPSDs with different 'batch_processing'."
+            raise ValueError(msg)
+        for key in ("spec_bins", "period_bins"):
+            if not np.array_equal(getattr(self, key), getattr(other, key)):
+                msg = "Can not merge PPSDs with different '%s'." % key
+                raise ValueError(msg)
+
+    def merge(self, other):
+        """
+        Merges the histogram and the time information of another PPSD into
+        this PPSD (in place).
+
+        Both PPSDs have to be compatible, i.e. computed for the same channel
+        with identical processing parameters and binning, and must not contain
+        the same time segments. A segment of the other PPSD is considered to
+        be already present, if a segment of this PPSD starts closer than the
+        regular segment spacing (``(1 - overlap) * ppsd_length``) to it.
+
+        :type other: :class:`~obspy.signal.spectral_estimation.PPSD`
+        :param other: PPSD to merge into this PPSD.
+        :returns: The merged PPSD (i.e. this PPSD) for convenience.
+        """
+        self.__check_compatible(other)
+        spacing = (1 - self.overlap) * self.ppsd_length
+        for utcdatetime in other.times_used:
+            index = bisect.bisect_right(self.times_used,
+                                        utcdatetime - spacing)
+            if index < len(self.times_used) and \
+                    self.times_used[index] < utcdatetime + spacing:
+                msg = ("Can not merge PPSDs with already covered time spans "
+                       "(e.g. %s).") % utcdatetime
+                raise ValueError(msg)
+        if other.hist_stack is not None:
+            if self.hist_stack is None:
+                self.hist_stack = other.hist_stack.copy()
+                self.xedges = other.xedges
+                self.yedges = other.yedges
+            else:
+                self.hist_stack += other.hist_stack
+        # sort in place, self.times is the same list object as self.times_used
+        self.times_used.extend(other.times_used)
+        self.times_used.sort()
+        self.times_data = sorted(self.times_data + other.times_data)
+        self.times_gaps = sorted(self.times_gaps + other.times_gaps)
+        return self
+
+    def __add__(self, other):
+        """
+        Returns a new PPSD combining both PPSDs, see
+        :meth:`~obspy.signal.spectral_estimation.PPSD.merge`.
+        """
+        if not isinstance(other, PPSD):
+            return NotImplemented
+        new = copy.deepcopy(self)
+        return new.merge(other)
 
     def get_percentile(self, percentile=50, hist_cum=None):
         """
@@ -719,24 +1199,50 @@ class PPSD():
 
     def save(self, filename, compress=False):
         """
-        Saves the PPSD as a pickled file with optional compression.
+        Saves the PPSD as a binary NumPy NPZ file with optional compression.
+
+        Only the histogram, the time information and the parameters needed to
+        restore the PPSD are stored, not the whole pickled object. Response
+        information from a parser object is not saved.
 
         The resulting file can be restored using PPSD.load(filename).
 
         :type filename: str
-        :param filename: Name of output file with pickled PPSD object
+        :param filename: Name of output file
         :type compress: bool, optional
         :param compress: Enable/disable file compression.
         """
+        self.__check_ppsd_length()
+        data = {}
+        data["version"] = np.array(PPSD_FILE_VERSION)
+        for key in ("network", "station", "location", "channel"):
+            data[key] = np.array(getattr(self, key))
+        for key in ("sampling_rate", "ppsd_length", "overlap",
+                    "water_level"):
+            data[key] = np.array(getattr(self, key), dtype=np.float64)
+        for key in ("is_rotational_data", "batch_processing"):
+            data[key] = np.array(bool(getattr(self, key, False)))
+        data["skip_on_gaps"] = np.array(self.merge_method == -1)
+        data["spec_bins"] = self.spec_bins
+        if self.hist_stack is not None:
+            data["hist_stack"] = self.hist_stack
+        data["times_used"] = np.array(
+            [t.timestamp for t in self.times_used], dtype=np.float64)
+        for key in ("times_data", "times_gaps"):
+            data[key] = np.array(
+                [(t1.timestamp, t2.timestamp)
+                 for t1, t2 in getattr(self, key)],
+                dtype=np.float64).reshape(-1, 2)
+        if self.paz is not None:
+            for key, value in self.paz.items():
+                data["paz_" + key] = np.array(value)
         if compress:
-            # due to an bug in older python version we can't use with
-            # http://bugs.python.org/issue8601
-            file_ = bz2.BZ2File(filename, 'wb')
-            pickle.dump(self, file_)
-            file_.close()
+            savez = np.savez_compressed
         else:
-            with open(filename, 'wb') as file_:
-                pickle.dump(self, file_)
+            savez = np.savez
+        # use a file object, np.savez appends ".npz" to other file names
+        with open(filename, 'wb') as file_:
+            savez(file_, **data)
 
     @staticmethod
     def load(filename):
@@ -744,17 +1250,25 @@ class PPSD():
         Restores a PPSD instance from a file.
 
         Automatically determines whether the file was saved with compression
-        enabled or disabled.
+        enabled or disabled. Files with pickled PPSD objects written by older
+        versions are still supported.
 
         :type filename: str
-        :param filename: Name of file containing the pickled PPSD object
+        :param filename: Name of file containing the saved PPSD
         """
-        # identify bzip2 compressed file using bzip2's magic number
+        # identify npz files (zip archives) and bzip2 compressed pickled
+        # files using their magic numbers
+        npz_magic = b'PK\x03\x04'
         bz2_magic = b'\x42\x5a\x68'
         with open(filename, 'rb') as file_:
-            file_start = file_.read(len(bz2_magic))
+            file_start = file_.read(len(npz_magic))
 
-        if file_start == bz2_magic:
+        if file_start == npz_magic:
+            with open(filename, 'rb') as file_:
+                npz = np.load(file_)
+                data = dict((key, npz[key]) for key in npz.files)
+            ppsd = PPSD._from_npz_data(data)
+        elif file_start.startswith(bz2_magic):
             # In theory a file containing random data could also start with the
             # bzip2 magic number. However, since save() (implicitly) uses
             # version "0" of the pickle protocol, the pickled data is
@@ -773,6 +1287,55 @@ class PPSD():
 
         return ppsd
 
+    @staticmethod
+    def _from_npz_data(data):
+        """
+        Creates a PPSD from the arrays stored by
+        :meth:`~obspy.signal.spectral_estimation.PPSD.save`.
+
+        :type data: dict
+        :param data: Arrays read from the NPZ file.
+        """
+        version = int(data["version"])
+        if version > PPSD_FILE_VERSION:
+            msg = "PPSD file was written by a newer version (%i > %i)."
+            raise ValueError(msg % (version, PPSD_FILE_VERSION))
+        stats = Stats()
+        for key in ("network", "station", "location", "channel"):
+            stats[key] = str(data[key])
+        stats.sampling_rate = float(data["sampling_rate"])
+        paz = None
+        paz_keys = [key for key in data if key.startswith("paz_")]
+        if paz_keys:
+            paz = {}
+            for key in paz_keys:
+                value = data[key]
+                if value.ndim:
+                    value = value.tolist()
+                else:
+                    value = value.item()
+                paz[key[len("paz_"):]] = value
+        spec_bins = data["spec_bins"]
+        ppsd = PPSD(stats, paz=paz,
+                    is_rotational_data=bool(data["is_rotational_data"]),
+                    db_bins=(spec_bins[0], spec_bins[-1], 1.0),
+                    ppsd_length=float(data["ppsd_length"]),
+                    overlap=float(data["overlap"]),
+                    water_level=float(data["water_level"]),
+                    batch_processing=bool(data["batch_processing"]),
+                    skip_on_gaps=bool(data.get("skip_on_gaps", False)))
+        ppsd.spec_bins = spec_bins
+        if "hist_stack" in data:
+            ppsd.hist_stack = data["hist_stack"]
+            ppsd.xedges = np.asarray(ppsd.period_bins)
+            ppsd.yedges = spec_bins
+        # keep ppsd.times pointing to the same list
+        ppsd.times_used.extend(UTCDateTime(t) for t in data["times_used"])
+        for key in ("times_data", "times_gaps"):
+            setattr(ppsd, key, [[UTCDateTime(t1), UTCDateTime(t2)]
+                                for t1, t2 in data[key]])
+        return ppsd
+
     def plot(self, filename=None, show_coverage=True, show_histogram=True,
              show_percentiles=False, percentiles=[0, 25, 50, 75, 100],
              show_noise_models=True, grid=True, show=True,
@@ -945,6 +1508,109 @@ class PPSD():
         ax.autoscale_view()
 
 
+def parallel_ppsd(stats, get_waveforms, starttime, endtime,
+                  chunk_length=86400., workers=None, executor=None, **kwargs):
+    """
+    Computes a PPSD for a long time span in parallel.
+
+    The time span is split into chunks which are processed by independent
+    workers, each building a partial PPSD. The partial PPSDs are merged in the
+    end (see :meth:`~obspy.signal.spectral_estimation.PPSD.merge`).
+
+    :meth:`~obspy.signal.spectral_estimation.PPSD.add` starts the segments
+    at the first sample of every trace, so the segments of each chunk start
+    at its first sample. The result is only the same as when adding all data
+    to one PPSD if the data starts at ``starttime`` (or a multiple of the
+    segment spacing after it) and has no gaps. Otherwise the segments of a
+    chunk are shifted by less than the segment spacing and the last segment
+    before a chunk boundary can be missing.
+
+    >>> from obspy.clients.fdsn import Client  # doctest: +SKIP
+    >>> def get_waveforms(starttime, endtime):  # doctest: +SKIP
+    ...     client = Client("IRIS")
+    ...     return client.get_waveforms("IU", "ANMO", "00", "BHZ",
+    ...                                 starttime, endtime)
+    >>> ppsd = parallel_ppsd(stats, get_waveforms,  # doctest: +SKIP
+    ...                      UTCDateTime(2014, 1, 1), UTCDateTime(2015, 1, 1),
+    ...                      paz=paz, workers=8)
+
+    :type stats: :class:`~obspy.core.trace.Stats`
+    :param stats: Stats of the station/instrument to process
+    :type get_waveforms: callable
+    :param get_waveforms: Function that returns a
+        :class:`~obspy.core.stream.Stream` with the data between the two
+        :class:`~obspy.core.utcdatetime.UTCDateTime` objects it gets called
+        with. When using worker processes it has to be picklable, e.g. a
+        module level function.
+    :type starttime: :class:`~obspy.core.utcdatetime.UTCDateTime`
+    :param starttime: Start of the time span to process.
+    :type endtime: :class:`~obspy.core.utcdatetime.UTCDateTime`
+    :param endtime: End of the time span to process.
+    :type chunk_length: float, optional
+    :param chunk_length: Length of the time span processed by one worker in
+        seconds. Gets rounded to a multiple of the segment spacing.
+    :type workers: int, optional
+    :param workers: Number of worker processes of the
+        :class:`multiprocessing.Pool` used if no ``executor`` is given.
+    :param executor: Pool with an order preserving ``map()`` method, e.g. a
+        :class:`multiprocessing.pool.ThreadPool`.
+    :param kwargs: Passed on to
+        :class:`~obspy.signal.spectral_estimation.PPSD` (e.g. ``paz``).
+    :rtype: :class:`~obspy.signal.spectral_estimation.PPSD`
+    """
+    ppsd = PPSD(stats, **kwargs)
+    spacing = (1 - ppsd.overlap) * ppsd.ppsd_length
+    chunk_length = max(1, int(round(chunk_length / spacing))) * spacing
+    args = []
+    t = starttime
+    while t + ppsd.ppsd_length <= endtime:
+        # last segment of a chunk starts one spacing before the next chunk
+        t_end = min(t + chunk_length - spacing + ppsd.ppsd_length, endtime)
+        args.append((stats, get_waveforms, t, t_end, kwargs))
+        t += chunk_length
+    if executor is not None:
+        results = list(executor.map(_ppsd_in_worker, args))
+    else:
+        pool = multiprocessing.Pool(processes=workers)
+        try:
+            results = pool.map(_ppsd_in_worker, args)
+        finally:
+            pool.close()
+            pool.join()
+    errors = []
+    for (_, _, t1, t2, _), (partial_ppsd, error) in zip(args, results):
+        if error is not None:
+            errors.append("%s - %s: %s" % (t1, t2, error))
+            continue
+        ppsd.merge(partial_ppsd)
+    if errors:
+        msg = "Could not process %i time span(s):\n%s" % (
+            len(errors), "\n".join(errors))
+        warnings.warn(msg, UserWarning)
+    return ppsd
+
+
+def _ppsd_in_worker(args):
+    """
+    Computes a partial PPSD for one time span, used by
+    :func:`parallel_ppsd`.
+
+    Returns a tuple of the PPSD and ``None`` or ``None`` and the error message
+    if processing failed.
+    """
+    stats, get_waveforms, starttime, endtime, kwargs = args
+    try:
+        ppsd = PPSD(stats, **kwargs)
+        st = get_waveforms(starttime, endtime)
+        st.trim(starttime, endtime)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            ppsd.add(st)
+        return ppsd, None
+    except Exception as e:
+        return None, "%s: %s" % (e.__class__.__name__, e)
+
+
 def get_NLNM():
     """
     Returns periods and psd values for the New Low Noise Model.
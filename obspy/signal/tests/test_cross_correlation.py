@@ -8,9 +8,13 @@ from future.builtins import *  # NOQA
 
 import os
 import unittest
+from multiprocessing.pool import ThreadPool
 
-from obspy import UTCDateTime, read
-from obspy.signal.cross_correlation import xcorr_pick_correction
+import numpy as np
+
+from obspy import Stream, Trace, UTCDateTime, read
+from obspy.signal.cross_correlation import (correlate_templates,
+                                            xcorr_pick_correction)
 
 
 class CrossCorrelationTestCase(unittest.TestCase):
@@ -52,6 +56,69 @@ class CrossCorrelationTestCase(unittest.TestCase):
         self.assertEqual(tr1, tr1_copy)
         self.assertEqual(tr2, tr2_copy)
 
+    def test_correlate_templates(self):
+        """
+        Frequency domain correlation matches brute force correlation
+        coefficients, channels are aligned by template start times.
+        """
+        np.random.seed(815)
+        t0 = UTCDateTime(2014, 1, 1)
+        stream = Stream()
+        for i, sta in enumerate(["A", "B"]):
+            tr = Trace(np.random.randn(20000))
+            tr.stats.station = sta
+            tr.stats.starttime = t0 + i * 0.5
+            tr.stats.sampling_rate = 100
+            stream.append(tr)
+        # template with a moveout of 1.3 s between the channels
+        tmpl = Stream([stream[0].slice(t0 + 50, t0 + 53).copy(),
+                       stream[1].slice(t0 + 51.3, t0 + 55).copy()])
+        # second template: different length, single channel
+        tmpl2 = Stream([stream[1].slice(t0 + 100, t0 + 101).copy()])
+        tmpl2[0].data += np.random.randn(len(tmpl2[0])) * 0.5
+        cc = correlate_templates(stream, [tmpl, tmpl2])
+        self.assertEqual(len(cc), 2)
+        self.assertEqual(cc[0].stats.trace_ids, [".A..", ".B.."])
+        self.assertEqual(cc[1].stats.trace_ids, [".B.."])
+        self.assertEqual(cc[0].stats.starttime, t0 - 0.8)
+        self.assertEqual(cc[1].stats.starttime, t0 + 0.5)
+        # brute force for the single channel template
+        data = stream[1].data
+        tdata = tmpl2[0].data
+        expected = [np.corrcoef(data[i:i + len(tdata)], tdata)[0, 1]
+                    for i in range(0, len(data) - len(tdata) + 1, 97)]
+        np.testing.assert_allclose(cc[1].data[::97], expected, atol=1e-5)
+        # stacked coefficient at the template location is one
+        i = cc[0].data.argmax()
+        self.assertEqual(cc[0].stats.starttime + i * cc[0].stats.delta,
+                         t0 + 50)
+        self.assertAlmostEqual(cc[0].data[i], 1.0, 5)
+        # stack is the mean of the aligned channel coefficients
+        for j in (i - 1234, i + 333):
+            expected = np.mean([
+                np.corrcoef(stream[0].data[j - 80:j - 80 + 301],
+                            tmpl[0].data)[0, 1],
+                np.corrcoef(stream[1].data[j:j + 371], tmpl[1].data)[0, 1]])
+            self.assertAlmostEqual(cc[0].data[j], expected, 5)
+        # parallel execution gives the same results
+        pool = ThreadPool(2)
+        try:
+            cc_pool = correlate_templates(stream, {"a": tmpl, "b": tmpl2},
+                                          executor=pool)
+        finally:
+            pool.close()
+            pool.join()
+        self.assertEqual([tr.stats.template for tr in cc_pool], ["a", "b"])
+        for tr, tr_pool in zip(cc, cc_pool):
+            np.testing.assert_array_equal(tr.data, tr_pool.data)
+        # constant data does not correlate
+        stream[1].data[:5000] = 3.0
+        cc = correlate_templates(stream, [tmpl2])
+        self.assertTrue(np.all(cc[0].data[:5000 - len(tdata) + 1] == 0))
+        # unmerged data
+        stream.append(stream[0].copy())
+        self.assertRaises(ValueError, correlate_templates, stream, [tmpl])
+
 
 def suite():
     return unittest.makeSuite(CrossCorrelationTestCase, 'test')
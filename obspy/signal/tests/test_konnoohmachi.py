@@ -12,9 +12,9 @@ import warnings
 
 import numpy as np
 
-from obspy.signal.konnoohmachismoothing import (calculate_smoothing_matrix,
-                                                konno_ohmachi_smoothing_window,
-                                                konno_ohmachi_smoothing)
+from obspy.signal.konnoohmachismoothing import (
+    calculate_smoothing_matrix, calculate_sparse_smoothing_matrix,
+    konno_ohmachi_smoothing_window, konno_ohmachi_smoothing)
 
 
 class KonnoOhmachiTestCase(unittest.TestCase):
@@ -151,6 +151,93 @@ class KonnoOhmachiTestCase(unittest.TestCase):
         # Input dtype should be output dtype.
         self.assertEqual(smoothed_3.dtype, np.float64)
 
+    def test_sparseSmoothingMatrix(self):
+        """
+        Tests the sparse smoothing operator against the dense matrix.
+        """
+        temp = np.geterr()
+        np.seterr(all='ignore')
+        frequencies = np.linspace(0.0, 50.0, 501)
+        dense = calculate_smoothing_matrix(frequencies, 40.0)
+        np.seterr(**temp)
+        # Without a threshold all values are stored.
+        matrix = calculate_sparse_smoothing_matrix(frequencies, 40.0,
+                                                   threshold=0.0)
+        np.testing.assert_array_almost_equal(matrix.toarray(), dense, 12)
+        # Neglected values are smaller than the threshold.
+        matrix = calculate_sparse_smoothing_matrix(frequencies, 40.0,
+                                                   threshold=1e-4)
+        self.assertTrue(matrix.nnz < dense.size // 2)
+        self.assertTrue(np.abs(matrix.toarray() - dense).max() < 1e-4)
+        # Operators are cached.
+        self.assertTrue(matrix is calculate_sparse_smoothing_matrix(
+            frequencies, 40.0, threshold=1e-4))
+        # Resampling to output frequencies, unsorted input frequencies.
+        output_frequencies = np.logspace(-1.0, 1.5, 50)
+        matrix = calculate_sparse_smoothing_matrix(
+            frequencies[::-1], 40.0, normalize=True,
+            output_frequencies=output_frequencies, threshold=0.0)
+        self.assertEqual(matrix.shape, (50, 501))
+        for _i, freq in enumerate(output_frequencies):
+            window = konno_ohmachi_smoothing_window(
+                frequencies[::-1], freq, 40.0, normalize=True)
+            np.testing.assert_allclose(matrix[_i].toarray()[0], window,
+                                       atol=1e-12)
+        self.assertTrue(np.allclose(matrix.sum(axis=1), 1.0))
+
+    def test_sparseKonnoOhmachiSmoothing(self):
+        """
+        Tests smoothing with the sparse smoothing operator.
+        """
+        np.random.seed(1111)
+        spectra = np.random.ranf((5, 200)) * 50
+        frequencies = np.logspace(-3.0, 2.0, 200)
+        smoothed_1 = konno_ohmachi_smoothing(spectra, frequencies, count=2)
+        smoothed_2 = konno_ohmachi_smoothing(spectra, frequencies, count=2,
+                                             threshold=0.0)
+        np.testing.assert_allclose(smoothed_1, smoothed_2, rtol=1e-10)
+        smoothed_3 = konno_ohmachi_smoothing(spectra[0], frequencies)
+        smoothed_4 = konno_ohmachi_smoothing(spectra[0], frequencies,
+                                             threshold=1e-8)
+        np.testing.assert_allclose(smoothed_3, smoothed_4, rtol=1e-5)
+        # Resampling to output frequencies.
+        output_frequencies = np.logspace(-2.0, 1.0, 30)
+        smoothed = konno_ohmachi_smoothing(
+            np.require(spectra, dtype=np.float32),
+            np.require(frequencies, dtype=np.float32), normalize=True,
+            output_frequencies=output_frequencies)
+        self.assertEqual(smoothed.shape, (5, 30))
+        self.assertEqual(smoothed.dtype, np.float32)
+        self.assertRaises(ValueError, konno_ohmachi_smoothing, spectra,
+                          frequencies, count=2,
+                          output_frequencies=output_frequencies)
+
+    def test_sparseSmoothingMatrixMemoryUsage(self):
+        """
+        Too large sparse smoothing operators are not built and smoothing
+        calculates the windows one by one instead.
+        """
+        np.random.seed(1111)
+        spectra = np.random.ranf((3, 501)) * 50
+        frequencies = np.linspace(0.0, 50.0, 501)
+        self.assertRaises(ValueError, calculate_sparse_smoothing_matrix,
+                          frequencies, 40.0, max_memory_usage=1)
+        smoothed_1 = konno_ohmachi_smoothing(spectra, frequencies,
+                                             enforce_no_matrix=True)
+        smoothed_2 = konno_ohmachi_smoothing(spectra, frequencies,
+                                             threshold=1e-6,
+                                             max_memory_usage=1)
+        np.testing.assert_allclose(smoothed_1, smoothed_2, rtol=1e-10)
+        output_frequencies = np.linspace(1.0, 50.0, 200)
+        smoothed_3 = konno_ohmachi_smoothing(
+            spectra, frequencies, output_frequencies=output_frequencies,
+            threshold=0.0)
+        smoothed_4 = konno_ohmachi_smoothing(
+            spectra, frequencies, output_frequencies=output_frequencies,
+            max_memory_usage=1)
+        self.assertEqual(smoothed_4.shape, (3, 200))
+        np.testing.assert_allclose(smoothed_3, smoothed_4, rtol=1e-10)
+
 
 def suite():
     return unittest.makeSuite(KonnoOhmachiTestCase, 'test')
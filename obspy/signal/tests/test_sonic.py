@@ -5,13 +5,18 @@ from __future__ import (absolute_import, division, print_function,
 from future.builtins import *  # NOQA
 
 import io
+import os
+import shutil
+import tempfile
 import unittest
+from multiprocessing.pool import ThreadPool
 
 import numpy as np
 
 from obspy import Stream, Trace, UTCDateTime
 from obspy.core.util import AttribDict
-from obspy.signal.array_analysis import (array_processing,
+from obspy.signal.array_analysis import (ArrayGeometry, SteeringTable,
+                                         array_processing,
                                          array_transff_freqslowness,
                                          array_transff_wavenumber, get_spoint)
 from obspy.signal.util import util_lon_lat
@@ -22,7 +27,7 @@ class SonicTestCase(unittest.TestCase):
     Test fk analysis, main function is sonic() in array_analysis.py
     """
 
-    def arrayProcessing(self, prewhiten, method):
+    def arrayProcessing(self, prewhiten, method, **kwargs):
         np.random.seed(2348)
 
         geometry = np.array([[0.0, 0.0, 0.0],
@@ -88,8 +93,10 @@ class SonicTestCase(unittest.TestCase):
 
         args = (st, win_len, step_frac, sll_x, slm_x, sll_y, slm_y, sl_s,
                 semb_thres, vel_thres, frqlow, frqhigh, stime, etime)
-        kwargs = dict(prewhiten=prewhiten, coordsys='xy', verbose=False,
-                      method=method)
+        if kwargs.pop('return_stream', False):
+            return st
+        kwargs.update(dict(prewhiten=prewhiten, coordsys='xy',
+                           verbose=False, method=method))
         out = array_processing(*args, **kwargs)
         if False:  # 1 for debugging
             print('\n', out[:, 1:])
@@ -149,6 +156,75 @@ class SonicTestCase(unittest.TestCase):
         # XXX relative tolerance should be lower!
         self.assertTrue(np.allclose(ref, out[:, 1:], rtol=4e-5))
 
+    def test_array_processing_batches(self):
+        """
+        Results do not depend on the batching of windows or on processing the
+        batches in parallel.
+        """
+        for method in (0, 1):
+            maps = []
+            offsets = []
+
+            def store(relpow_map, abspow_map, offset):
+                maps.append(relpow_map.copy())
+                offsets.append(offset)
+
+            out = self.arrayProcessing(prewhiten=0, method=method, store=store)
+            self.assertEqual(len(maps), len(out))
+            self.assertEqual(offsets, [i * 40 for i in range(len(out))])
+            out_single = self.arrayProcessing(prewhiten=0, method=method,
+                                              batch_size=1)
+            np.testing.assert_allclose(out_single, out, rtol=1e-6)
+            pool = ThreadPool(2)
+            try:
+                out_pool = self.arrayProcessing(prewhiten=0, method=method,
+                                                batch_size=2, executor=pool)
+            finally:
+                pool.close()
+                pool.join()
+            np.testing.assert_allclose(out_pool, out, rtol=1e-6)
+
+    def test_steering_table(self):
+        """
+        Precomputed steering tables give the same results, are cached per
+        geometry and can be stored on disk.
+        """
+        out = self.arrayProcessing(prewhiten=0, method=0)
+        stream = self.arrayProcessing(prewhiten=0, method=0,
+                                      return_stream=True)
+        array = ArrayGeometry(stream, coordsys='xy')
+        args = (2., -3.0, 3.0, -3.0, 3.0, 0.1, 1.0, 8.0, 100.)
+        table = array.get_steering_table(*args)
+        self.assertTrue(array.get_steering_table(*args) is table)
+        self.assertEqual(table.steer.shape, (18, 61, 61, 7))
+        out_table = self.arrayProcessing(prewhiten=0, method=0,
+                                         steering_table=table)
+        np.testing.assert_array_equal(out_table, out)
+        # table for other parameters
+        other = array.get_steering_table(2., -2.0, 2.0, -3.0, 3.0, 0.1, 1.0,
+                                         8.0, 100.)
+        self.assertRaises(ValueError, self.arrayProcessing, prewhiten=0,
+                          method=0, steering_table=other)
+        # disk cache
+        tempdir = tempfile.mkdtemp(prefix='obspy-')
+        try:
+            array = ArrayGeometry(stream, coordsys='xy')
+            table2 = array.get_steering_table(*args, cache_dir=tempdir)
+            filename = os.path.join(tempdir, "steer_%s.npz" % table.key)
+            self.assertEqual(table2.key, table.key)
+            self.assertTrue(os.path.exists(filename))
+            table3 = SteeringTable.load(filename)
+            self.assertEqual(table3.params, table.params)
+            np.testing.assert_array_equal(table3.time_shift_table,
+                                          table.time_shift_table)
+            np.testing.assert_array_equal(table3.steer, table.steer)
+            table4 = ArrayGeometry(stream, coordsys='xy').get_steering_table(
+                *args, cache_dir=tempdir)
+            self.assertTrue(table4._steer is not None)
+            np.testing.assert_array_equal(table4.steer, table.steer)
+        finally:
+            shutil.rmtree(tempdir)
+
     def test_getSpoint(self):
         stime = UTCDateTime(1970, 1, 1, 0, 0)
         etime = UTCDateTime(1970, 1, 1, 0, 0) + 10
@@ -11,13 +11,18 @@ import gzip
 import os
 import unittest
 import warnings
+from multiprocessing.pool import ThreadPool
 
 import numpy as np
+from matplotlib import mlab
 
 from obspy import Stream, Trace, UTCDateTime
 from obspy.core.util.base import NamedTemporaryFile
-from obspy.signal.spectral_estimation import (PPSD, psd, welch_taper,
-                                              welch_window)
+from obspy.realtime import RtTrace
+from obspy.signal.invsim import cosine_taper
+from obspy.signal.spectral_estimation import (PPSD, _stacked_welch_psd,
+                                              fft_taper, parallel_ppsd, psd,
+                                              welch_taper, welch_window)
 
 
 PATH = os.path.join(os.path.dirname(__file__), 'data')
@@ -211,6 +216,229 @@ class PsdTestCase(unittest.TestCase):
             np.testing.assert_array_equal(ppsd_loaded.period_bins,
                                           binning['period_bins'])
 
+    def test_stacked_welch_psd(self):
+        """
+        Test that the stacked Welch estimate matches matplotlib's psd row by
+        row.
+        """
+        data = np.random.RandomState(815).randn(3, 10000)
+        got = _stacked_welch_psd(data, 1024, 768, cosine_taper(1024, 0.2),
+                                 100.0)
+        for row, spec in zip(data, got):
+            expected, _freq = mlab.psd(
+                row, 1024, 100.0, detrend=mlab.detrend_linear,
+                window=fft_taper, noverlap=768, sides='onesided',
+                scale_by_freq=True)
+            np.testing.assert_allclose(spec, expected, rtol=1e-10)
+
+    def test_PPSD_batch_processing(self):
+        """
+        Test batched PPSD processing against the default processing of every
+        single segment.
+        """
+        tr, paz = _get_sample_data()
+        ppsd = _get_ppsd()
+        ppsd_batch = PPSD(tr.stats, paz, db_bins=(-200, -50, 0.5),
+                          batch_processing=True)
+        self.assertTrue(ppsd_batch.add(Stream([tr])))
+        self.assertEqual(ppsd_batch.times, ppsd.times)
+        self.assertEqual(ppsd_batch.hist_stack.sum(), ppsd.hist_stack.sum())
+        np.testing.assert_array_equal(ppsd_batch.xedges, ppsd.xedges)
+        np.testing.assert_array_equal(ppsd_batch.yedges, ppsd.yedges)
+        # frequency domain instrument correction only makes a difference at
+        # long periods
+        per, mode = ppsd.get_mode()
+        _, mode_batch = ppsd_batch.get_mode()
+        idx = per < 20
+        np.testing.assert_allclose(mode_batch[idx], mode[idx], atol=1.0)
+        # adding the same data again does nothing
+        hist = ppsd_batch.hist_stack.copy()
+        with warnings.catch_warnings(record=True):
+            warnings.simplefilter('ignore', UserWarning)
+            self.assertFalse(ppsd_batch.add(Stream([tr])))
+        np.testing.assert_array_equal(ppsd_batch.hist_stack, hist)
+
+    def test_PPSD_batch_processing_empty_band(self):
+        """
+        The mean of a period band without any frequency bins is NaN and not
+        counted in the histogram, also with batched processing.
+        """
+        tr, paz = _get_sample_data()
+        hists = []
+        for batch_processing in (False, True):
+            ppsd = PPSD(tr.stats, paz, db_bins=(-200, 20, 0.5),
+                        batch_processing=batch_processing)
+            # first band only covers periods shorter than the shortest one
+            ppsd.per_octaves_left[0] = ppsd.per[0] / 4
+            ppsd.per_octaves_right[0] = ppsd.per[0] / 2
+            with warnings.catch_warnings(record=True):
+                warnings.simplefilter('ignore')
+                self.assertTrue(ppsd.add(Stream([tr])))
+            self.assertEqual(ppsd.hist_stack[0].sum(), 0)
+            self.assertTrue(ppsd.hist_stack[1].sum() > 0)
+            hists.append(ppsd.hist_stack)
+        self.assertEqual(hists[0].sum(), hists[1].sum())
+
+    def test_PPSD_merge(self):
+        """
+        Test merging PPSDs computed for different time spans.
+        """
+        tr, paz = _get_sample_data()
+        ppsd = _get_ppsd()
+        t = tr.stats.starttime
+        ppsd1 = PPSD(tr.stats, paz, db_bins=(-200, -50, 0.5))
+        ppsd1.add(tr.slice(t, t + 5400))
+        ppsd2 = PPSD(tr.stats, paz, db_bins=(-200, -50, 0.5))
+        ppsd2.add(tr.slice(t + 3600, tr.stats.endtime))
+        self.assertEqual(len(ppsd1.times), 2)
+        self.assertEqual(len(ppsd2.times), 2)
+        for merged in (ppsd1 + ppsd2, ppsd2 + ppsd1):
+            self.assertEqual(merged.times, ppsd.times)
+            self.assertTrue(merged.times is merged.times_used)
+            np.testing.assert_array_equal(merged.hist_stack, ppsd.hist_stack)
+        # operands are left untouched
+        self.assertEqual(len(ppsd1.times), 2)
+        # in place merge
+        ppsd1.merge(ppsd2)
+        np.testing.assert_array_equal(ppsd1.hist_stack, ppsd.hist_stack)
+        self.assertEqual(len(ppsd1.times_data), 2)
+        # merging the same time spans again is not possible
+        self.assertRaises(ValueError, ppsd1.merge, ppsd2)
+        # neither is merging incompatible PPSDs
+        ppsd3 = PPSD(tr.stats, paz, db_bins=(-200, -50, 1.0))
+        self.assertRaises(ValueError, ppsd3.merge, ppsd2)
+        ppsd3 = PPSD(tr.stats, paz, db_bins=(-200, -50, 0.5),
+                     ppsd_length=1800)
+        self.assertRaises(ValueError, ppsd3.merge, ppsd2)
+        self.assertRaises(TypeError, ppsd3.merge, tr)
+        # or PPSDs with different handling of gaps
+        ppsd3 = PPSD(tr.stats, paz, db_bins=(-200, -50, 0.5),
+                     skip_on_gaps=True)
+        self.assertRaises(ValueError, ppsd3.merge, ppsd2)
+
+    def test_parallel_ppsd(self):
+        """
+        Test computing a PPSD in chunks with a pool of workers.
+        """
+        tr, paz = _get_sample_data()
+        ppsd = _get_ppsd()
+
+        def get_waveforms(starttime, endtime):
+            return Stream([tr.slice(starttime, endtime)])
+
+        pool = ThreadPool(2)
+        try:
+            ppsd_parallel = parallel_ppsd(
+                tr.stats, get_waveforms, tr.stats.starttime,
+                tr.stats.endtime, chunk_length=3600, executor=pool, paz=paz,
+                db_bins=(-200, -50, 0.5))
+        finally:
+            pool.close()
+            pool.join()
+        self.assertEqual(ppsd_parallel.times, ppsd.times)
+        np.testing.assert_array_equal(ppsd_parallel.hist_stack,
+                                      ppsd.hist_stack)
+
+    def test_parallel_ppsd_offset(self):
+        """
+        Test computing a PPSD in chunks if the data does not start at the
+        start of the first chunk. The segments of every chunk start at its
+        first sample like when adding the chunks one by one.
+        """
+        tr, paz = _get_sample_data()
+        t = tr.stats.starttime
+
+        def get_waveforms(starttime, endtime):
+            return Stream([tr.slice(starttime, endtime)])
+
+        pool = ThreadPool(2)
+        try:
+            ppsd_parallel = parallel_ppsd(
+                tr.stats, get_waveforms, t - 600, tr.stats.endtime,
+                chunk_length=3600, executor=pool, paz=paz,
+                db_bins=(-200, -50, 0.5))
+        finally:
+            pool.close()
+            pool.join()
+        # adding all data at once gives segments every 1800 s from the first
+        # sample, the chunks start 600 s before the data and every 3600 s
+        ppsd = PPSD(tr.stats, paz, db_bins=(-200, -50, 0.5))
+        ppsd.add(tr)
+        self.assertEqual(ppsd.times, [t, t + 1800, t + 3600, t + 5400])
+        self.assertEqual(ppsd_parallel.times, [t, t + 3000, t + 4800])
+        ppsd = PPSD(tr.stats, paz, db_bins=(-200, -50, 0.5))
+        ppsd.add(tr.slice(t, t + 4800))
+        ppsd.add(tr.slice(t + 3000, t + 8400))
+        self.assertEqual(ppsd_parallel.times, ppsd.times)
+        np.testing.assert_array_equal(ppsd_parallel.hist_stack,
+                                      ppsd.hist_stack)
+
+    def test_PPSD_save_load(self):
+        """
+        Test that saved PPSDs are restored completely and can be used further.
+        """
+        tr, paz = _get_sample_data()
+        t = tr.stats.starttime
+        ppsd = PPSD(tr.stats, paz, db_bins=(-200, -50, 0.5))
+        ppsd.add(tr.slice(t, t + 5400))
+        with NamedTemporaryFile() as tf:
+            ppsd.save(tf.name)
+            with open(tf.name, 'rb') as fh:
+                self.assertEqual(fh.read(2), b'PK')
+            ppsd_loaded = PPSD.load(tf.name)
+        self.assertEqual(ppsd_loaded.id, ppsd.id)
+        self.assertEqual(ppsd_loaded.times, ppsd.times)
+        self.assertTrue(ppsd_loaded.times is ppsd_loaded.times_used)
+        self.assertEqual(ppsd_loaded.times_data, ppsd.times_data)
+        self.assertEqual(ppsd_loaded.times_gaps, ppsd.times_gaps)
+        self.assertEqual(ppsd_loaded.paz, paz)
+        # add remaining data to both and compare
+        for p in (ppsd, ppsd_loaded):
+            with warnings.catch_warnings(record=True):
+                warnings.simplefilter('ignore', UserWarning)
+                p.add(tr)
+        self.assertEqual(ppsd_loaded.times, ppsd.times)
+        np.testing.assert_array_equal(ppsd_loaded.hist_stack,
+                                      ppsd.hist_stack)
+        np.testing.assert_array_equal(ppsd_loaded.get_mean()[1],
+                                      ppsd.get_mean()[1])
+        self.assertEqual(ppsd_loaded.merge_method, 0)
+        # handling of gaps is restored
+        ppsd = PPSD(tr.stats, paz, db_bins=(-200, -50, 0.5),
+                    skip_on_gaps=True)
+        with NamedTemporaryFile() as tf:
+            ppsd.save(tf.name)
+            ppsd_loaded = PPSD.load(tf.name)
+        self.assertEqual(ppsd_loaded.merge_method, -1)
+
+    def test_PPSD_add_realtime(self):
+        """
+        Test adding data packet by packet, directly and via an RtTrace.
+        """
+        tr, paz = _get_sample_data()
+        ppsd = _get_ppsd()
+        packets = tr / 200
+        ppsd_rt = PPSD(tr.stats, paz, db_bins=(-200, -50, 0.5))
+        added = []
+        for packet in packets:
+            added += ppsd_rt.add_realtime(packet)
+        self.assertEqual(added, ppsd.times)
+        self.assertEqual(ppsd_rt.times, ppsd.times)
+        np.testing.assert_array_equal(ppsd_rt.hist_stack, ppsd.hist_stack)
+        self.assertEqual(ppsd_rt.times_data,
+                         [[tr.stats.starttime, tr.stats.endtime]])
+        # data that was already seen is skipped
+        self.assertEqual(ppsd_rt.add_realtime(packets[-1]), [])
+        np.testing.assert_array_equal(ppsd_rt.hist_stack, ppsd.hist_stack)
+        # pass in the same, growing RtTrace again and again
+        rt_trace = RtTrace(max_length=600)
+        ppsd_rt = PPSD(tr.stats, paz, db_bins=(-200, -50, 0.5))
+        for packet in packets:
+            rt_trace.append(packet)
+            ppsd_rt.add_realtime(rt_trace)
+        self.assertEqual(ppsd_rt.times, ppsd.times)
+        np.testing.assert_array_equal(ppsd_rt.hist_stack, ppsd.hist_stack)
+
 
 def suite():
     return unittest.makeSuite(PsdTestCase, 'test')
@@ -13,8 +13,9 @@ import unittest
 import numpy as np
 from scipy.signal import hilbert
 
-from obspy.signal.tf_misfit import (eg, em, feg, fem, fpg, fpm, pg, pm, teg,
-                                    tem, tfeg, tfem, tfpg, tfpm, tpg, tpm)
+from obspy.signal.tf_misfit import (cwt, eg, em, feg, fem, fpg, fpm, pg, pm,
+                                    teg, tem, tf_gofs, tf_misfits, tfeg,
+                                    tfem, tfpg, tfpm, tpg, tpm)
 
 
 class TfTestCase(unittest.TestCase):
@@ -234,6 +235,114 @@ class TfTestCase(unittest.TestCase):
         self.assertTrue(np.allclose(EG, 10., rtol=tol))
         self.assertTrue(np.allclose(PG, 10., rtol=tol))
 
+    def test_cwt_batches(self):
+        """
+        Transforming several signals at once gives the same result as
+        transforming them one by one.
+        """
+        np.random.seed(42)
+        st = np.random.randn(3, 250)
+        W = cwt(st, 0.01, 6, 1., 20., 30)
+        self.assertEqual(W.shape, (3, 30, 250))
+        for i in range(3):
+            W_single = cwt(st[i], 0.01, 6, 1., 20., 30)
+            self.assertEqual(W_single.shape, (30, 250))
+            np.testing.assert_allclose(W[i], W_single, rtol=1e-12)
+        self.assertRaises(ValueError, cwt, st, 0.01, 6, 1., 20., 30,
+                          wl='mexican_hat')
+
+    def test_cwt_cache_size(self):
+        """
+        The cached wavelet banks stay within their size limit, transforms
+        with banks too large for the cache and in several frequency chunks
+        give the same result.
+        """
+        from obspy.signal import tf_misfit
+        np.random.seed(42)
+        st = np.random.randn(2, 500)
+        W = cwt(st, 0.01, 6, 1., 20., 30)
+        max_bytes = tf_misfit._WAVELET_BANK_CACHE_MAX_BYTES
+        chunk_samples = tf_misfit._CWT_CHUNK_SAMPLES
+        try:
+            tf_misfit._WAVELET_BANK_CACHE_MAX_BYTES = 2 * 1024 ** 2
+            for npts in (100, 200, 300, 400, 500):
+                cwt(st[0, :npts], 0.01, 6, 1., 20., 30)
+                nbytes = sum(bank.nbytes for bank in
+                             tf_misfit._WAVELET_BANKS.values())
+                self.assertEqual(tf_misfit._WAVELET_BANKS_NBYTES, nbytes)
+                self.assertLessEqual(nbytes, 2 * 1024 ** 2)
+            tf_misfit._WAVELET_BANKS.clear()
+            tf_misfit._WAVELET_BANKS_NBYTES = 0
+            tf_misfit._WAVELET_BANK_CACHE_MAX_BYTES = 0
+            tf_misfit._CWT_CHUNK_SAMPLES = 10000
+            W_chunked = cwt(st, 0.01, 6, 1., 20., 30)
+        finally:
+            tf_misfit._WAVELET_BANK_CACHE_MAX_BYTES = max_bytes
+            tf_misfit._CWT_CHUNK_SAMPLES = chunk_samples
+        np.testing.assert_allclose(W_chunked, W, rtol=1e-12)
+
+    def test_cwt_long_wavelets(self):
+        """
+        The transform equals the former time domain implementation, also for
+        low frequencies with wavelets longer than the signal.
+        """
+        def cwt_reference(st, dt, w0, fmin, fmax, nf):
+            npts = len(st) * 2
+            t = np.linspace(0., (npts - 1) * dt, npts)
+            f = np.logspace(np.log10(fmin), np.log10(fmax), nf)
+            nfft = 2 ** int(np.ceil(np.log2(npts))) * 2
+            sf = np.fft.fft(st, n=nfft)
+            W = np.zeros((nf, npts // 2), dtype=np.complex128)
+            for n, _f in enumerate(f):
+                a = w0 / (2 * np.pi * _f)
+                tau = -1 * (t - t[-1] / 2.) / a
+                psih = (np.pi ** (-.25) * np.exp(1j * w0 * tau) *
+                        np.exp(-tau ** 2 / 2.)).conjugate() / np.abs(a) ** .5
+                psihf = np.fft.fft(psih, n=nfft)
+                tminin = int(t[-1] / 2. / (t[1] - t[0]))
+                W[n] = np.fft.ifft(psihf * sf)[tminin:tminin + npts // 2] * \
+                    (t[1] - t[0])
+            return W
+
+        np.random.seed(42)
+        st = np.random.randn(200)
+        for fmin, fmax in ((0.1, 10.), (0.3, 1.), (1., 20.)):
+            W = cwt(st, 0.01, 6, fmin, fmax, 20)
+            W_ref = cwt_reference(st, 0.01, 6, fmin, fmax, 20)
+            np.testing.assert_allclose(W, W_ref, rtol=1e-10,
+                                       atol=1e-12 * np.abs(W_ref).max())
+
+    def test_all_misfits_and_gofs(self):
+        """
+        tf_misfits() and tf_gofs() give the same results as the single
+        criteria functions.
+        """
+        S1 = self.S1
+        t = self.t
+        kwargs = dict(dt=self.dt, fmin=self.fmin, fmax=self.fmax, nf=self.nf)
+        misfit_funcs = dict(TFEM=tfem, TFPM=tfpm, TEM=tem, TPM=tpm, FEM=fem,
+                            FPM=fpm, EM=em, PM=pm)
+        gof_funcs = dict(TFEG=tfeg, TFPG=tfpg, TEG=teg, TPG=tpg, FEG=feg,
+                         FPG=fpg, EG=eg, PG=pg)
+        st1 = np.array([self.s1p, self.S1a(t)])
+        st2 = np.array([S1(t), S1(t)])
+        for args in ((self.s1p, S1(t)), (st1, st2)):
+            for norm in ('global', 'local'):
+                misfits = tf_misfits(*args, norm=norm, st2_isref=False,
+                                     **kwargs)
+                self.assertEqual(sorted(misfits), sorted(misfit_funcs))
+                for name, func in misfit_funcs.items():
+                    np.testing.assert_allclose(
+                        misfits[name],
+                        func(*args, norm=norm, st2_isref=False, **kwargs),
+                        rtol=1e-12)
+            gofs = tf_gofs(*args, A=5., k=2., **kwargs)
+            self.assertEqual(sorted(gofs), sorted(gof_funcs))
+            for name, func in gof_funcs.items():
+                np.testing.assert_allclose(
+                    gofs[name], func(*args, A=5., k=2., **kwargs),
+                    rtol=1e-12)
+
 
 def suite():
     return unittest.makeSuite(TfTestCase, 'test')
@@ -11,13 +11,15 @@ import os
 import unittest
 import warnings
 from ctypes import ArgumentError
+from multiprocessing.pool import ThreadPool
 
 import numpy as np
 
-from obspy import Stream, UTCDateTime, read
+from obspy import Stream, Trace, UTCDateTime, read
 from obspy.signal.trigger import (
-    ar_pick, classic_STALTA, classic_STALTA_py, coincidence_trigger, pk_baer,
-    recursive_STALTA, recursive_STALTA_py, trigger_onset)
+    CoincidenceTrigger, ar_pick, classic_STALTA, classic_STALTA_py,
+    coincidence_trigger, pk_baer, recursive_STALTA, recursive_STALTA_py,
+    template_detection, trigger_onset)
 from obspy.signal.util import clibsignal
 
 
@@ -419,6 +421,126 @@ class TriggerTestCase(unittest.TestCase):
                             'BW.UH4..EHZ']}]
         self.assertEqual(trig, remaining_results)
 
+    def _assert_same_coincidences(self, res1, res2):
+        self.assertEqual(len(res1), len(res2))
+        for ev1, ev2 in zip(res1, res2):
+            self.assertEqual(sorted(ev1.keys()), sorted(ev2.keys()))
+            for key in ev1:
+                if isinstance(ev1[key], float):
+                    self.assertAlmostEqual(ev1[key], ev2[key], 5)
+                elif key in ('cft_peaks', 'cft_stds'):
+                    np.testing.assert_allclose(ev1[key], ev2[key])
+                else:
+                    self.assertEqual(ev1[key], ev2[key])
+
+    def test_coincidenceTriggerVectorized(self):
+        """
+        Vectorized, parallel and chunked coincidence triggers give the same
+        results as the classic implementation.
+        """
+        st = Stream()
+        files = ["BW.UH1._.SHZ.D.2010.147.cut.slist.gz",
+                 "BW.UH2._.SHZ.D.2010.147.cut.slist.gz",
+                 "BW.UH3._.SHZ.D.2010.147.cut.slist.gz",
+                 "BW.UH4._.EHZ.D.2010.147.cut.slist.gz"]
+        for filename in files:
+            filename = os.path.join(self.path, filename)
+            st += read(filename)
+        st.filter('bandpass', freqmin=10, freqmax=20)
+        st_orig = st.copy()
+        weights = {'BW.UH1..SHZ': 0.4, 'BW.UH2..SHZ': 0.35,
+                   'BW.UH3..SHZ': 0.4, 'BW.UH4..EHZ': 0.25}
+        settings = [
+            (("recstalta", 3.5, 1), 3, dict(sta=0.5, lta=10)),
+            (("recstalta", 3.5, 1), 1.0,
+             dict(trace_ids=weights, sta=0.5, lta=10, details=True)),
+            (("recstalta", 3.5, 1), 1.2,
+             dict(trace_ids={'BW.UH1..SHZ': 0.6, 'BW.UH2..SHZ': 0.6},
+                  max_trigger_length=0.13, sta=0.5, lta=10)),
+            (("recstalta", 2.5, 1), 2,
+             dict(trace_ids=['BW.UH1..SHZ', 'BW.UH3..SHZ'], sta=0.3,
+                  lta=5)),
+            (("classicstalta", 5, 1), 2,
+             dict(sta=0.5, lta=10, max_trigger_length=2,
+                  delete_long_trigger=True))]
+        pool = ThreadPool(2)
+        try:
+            with warnings.catch_warnings(record=True):
+                warnings.simplefilter('ignore', UserWarning)
+                for (trigger_type, thr_on, thr_off), thr_sum, kwargs in \
+                        settings:
+                    args = (trigger_type, thr_on, thr_off, st.copy(), thr_sum)
+                    res = coincidence_trigger(*args, **kwargs)
+                    self.assertTrue(len(res) > 1)
+                    args = (trigger_type, thr_on, thr_off, st, thr_sum)
+                    res_vec = coincidence_trigger(*args, vectorized=True,
+                                                  **kwargs)
+                    self._assert_same_coincidences(res, res_vec)
+                    res_pool = coincidence_trigger(*args, executor=pool,
+                                                   **kwargs)
+                    self._assert_same_coincidences(res, res_pool)
+        finally:
+            pool.close()
+            pool.join()
+        # the stream is not changed
+        self.assertEqual(st, st_orig)
+        # chunked processing, classic STA/LTA does not depend on chunking
+        res = coincidence_trigger("classicstalta", 3.5, 1, st.copy(), 3,
+                                  sta=0.5, lta=10, details=True)
+        self.assertEqual(len(res), 4)
+        for chunk_length in (7.3, 60):
+            trigger = CoincidenceTrigger("classicstalta", 3.5, 1, 3, sta=0.5,
+                                         lta=10, details=True)
+            t = min(tr.stats.starttime for tr in st)
+            end = max(tr.stats.endtime for tr in st)
+            res_chunked = []
+            while t <= end:
+                chunk = st.slice(t, t + chunk_length - 0.001)
+                res_chunked += trigger.process(chunk)
+                t += chunk_length
+            res_chunked += trigger.flush()
+            self._assert_same_coincidences(res, res_chunked)
+
+    def test_coincidenceTriggerVectorizedWithSimilarityChecking(self):
+        """
+        Similarity checks in vectorized coincidence triggers.
+        """
+        st = Stream()
+        files = ["BW.UH1._.SHZ.D.2010.147.cut.slist.gz",
+                 "BW.UH2._.SHZ.D.2010.147.cut.slist.gz",
+                 "BW.UH3._.SHZ.D.2010.147.cut.slist.gz",
+                 "BW.UH3._.SHN.D.2010.147.cut.slist.gz",
+                 "BW.UH3._.SHE.D.2010.147.cut.slist.gz",
+                 "BW.UH4._.EHZ.D.2010.147.cut.slist.gz"]
+        for filename in files:
+            filename = os.path.join(self.path, filename)
+            st += read(filename)
+        st.filter('bandpass', freqmin=10, freqmax=20)
+        templ = {}
+        for sta, t in (("UH3", "2010-05-27T16:24:33.095000"),
+                       ("UH3", "2010-05-27T16:27:30.370000"),
+                       ("UH1", "2010-05-27T16:27:30.574999")):
+            t = UTCDateTime(t)
+            st_ = st.select(station=sta).slice(t, t + 2.5).copy()
+            templ.setdefault(sta, []).append(st_)
+        trace_ids = {"BW.UH1..SHZ": 1, "BW.UH2..SHZ": 1, "BW.UH3..SHZ": 1,
+                     "BW.UH4..EHZ": 1}
+        kwargs = dict(sta=0.5, lta=10, trace_ids=trace_ids,
+                      event_templates=templ,
+                      similarity_threshold={"UH1": 0.8, "UH3": 0.7})
+        with warnings.catch_warnings(record=True):
+            warnings.simplefilter('ignore', UserWarning)
+            res = coincidence_trigger("classicstalta", 5, 1, st.copy(), 4,
+                                      **kwargs)
+            res_vec = coincidence_trigger("classicstalta", 5, 1, st, 4,
+                                          vectorized=True, **kwargs)
+        self.assertEqual(len(res), 4)
+        for ev, ev_vec in zip(res, res_vec):
+            for sta in ("UH1", "UH3"):
+                self.assertAlmostEqual(ev['similarity'].pop(sta),
+                                       ev_vec['similarity'].pop(sta))
+        self._assert_same_coincidences(res, res_vec)
+
     def test_classicSTALTAPyC(self):
         """
         Test case for ctypes version of recursive_STALTA
@@ -430,6 +552,50 @@ class TriggerTestCase(unittest.TestCase):
         ref = np.array([0.38012302, 0.37704431, 0.47674533, 0.67992292])
         self.assertTrue(np.allclose(ref, c2[99:103]))
 
+    def test_template_detection(self):
+        """
+        Matched filter detection of a repeating event buried in noise on two
+        stations.
+        """
+        np.random.seed(4711)
+        t0 = UTCDateTime(2014, 1, 1)
+        event = np.random.randn(300) * np.hanning(300)
+        stream = Stream()
+        for i, sta in enumerate(["A", "B"]):
+            tr = Trace(np.random.randn(30000) * 0.2)
+            tr.stats.network = "XX"
+            tr.stats.station = sta
+            tr.stats.sampling_rate = 100
+            tr.stats.starttime = t0
+            # moveout of 0.5 s to station B
+            for onset in (2000, 11000, 25000):
+                start = onset + i * 50
+                tr.data[start:start + 300] += event
+            stream.append(tr)
+        template = Stream([tr.slice(t0 + 20 + i * 0.5,
+                                    t0 + 22.99 + i * 0.5).copy()
+                           for i, tr in enumerate(stream)])
+        template2 = Stream([template[0].copy()])
+        events = template_detection(stream, {"ab": template, "a": template2},
+                                    0.6, details=True)
+        self.assertEqual([ev['time'] for ev in events],
+                         [t0 + 20, t0 + 110, t0 + 250])
+        for ev in events:
+            self.assertEqual(sorted(ev['similarity'].keys()), ["a", "ab"])
+            best = max(ev['similarity'].values())
+            self.assertEqual(ev['similarity'][ev['template']], best)
+            self.assertEqual(sorted(ev['trace_ids']), ["XX.A..", "XX.B.."])
+            self.assertEqual(ev['stations'], ["A", "B"])
+            self.assertEqual(ev['coincidence_sum'], 2.0)
+            self.assertEqual(len(ev['cft_peaks']), 2)
+        self.assertAlmostEqual(events[0]['similarity']["ab"], 1.0, 5)
+        # only the template event itself is detected with a threshold above
+        # the correlation of the noisy repetitions
+        events = template_detection(stream, [template], 0.99)
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]['time'], t0 + 20)
+        self.assertEqual(list(events[0]['similarity'].keys()), [0])
+
 
 def suite():
     return unittest.makeSuite(TriggerTestCase, 'test')
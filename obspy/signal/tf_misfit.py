@@ -22,6 +22,8 @@ from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
 from future.builtins import *  # NOQA
 
+from collections import OrderedDict
+
 import numpy as np
 
 from obspy.core.util.decorator import deprecated
@@ -34,7 +36,15 @@ def cwt(st, dt, w0, fmin, fmax, nf=100, wl='morlet'):
 
     .. seealso:: [Kristekova2006]_, eq. (4)
 
-    :param st: time dependent signal.
+    The spectra of the wavelets are computed at once for many frequencies and
+    cached for the last used parameters if they are not too large (see
+    :func:`_get_wavelet_bank`), so repeated transforms only need one FFT of
+    the signal and one inverse FFT per frequency. The frequencies are
+    transformed in chunks to limit the memory usage.
+
+    :param st: time dependent signal. Several signals of equal length can be
+        transformed at once by passing an array with shape (..., number of
+        time samples).
     :param dt: time step between two samples in st (in seconds)
     :param w0: parameter for the wavelet, tradeoff between time and frequency
         resolution
@@ -45,38 +55,178 @@ def cwt(st, dt, w0, fmin, fmax, nf=100, wl='morlet'):
     :param wl: wavelet to use, for now only 'morlet' is implemented
 
     :return: time frequency representation of st, type numpy.ndarray of complex
-        values, shape = (nf, len(st)).
+        values, shape = (nf, len(st)) or (..., nf, number of time samples) for
+        several signals.
     """
-    npts = len(st) * 2
-    tmax = (npts - 1) * dt
-    t = np.linspace(0., tmax, npts)
+    if wl != 'morlet':
+        raise ValueError('wavelet type "' + wl + '" not defined!')
+    st = np.asarray(st)
+    npts = st.shape[-1]
+    nfft = util.next_pow_2(2 * npts) * 2
+    bank = _get_wavelet_bank(npts, dt, w0, fmin, fmax, nf)
+    sf = np.fft.fft(st, n=nfft, axis=-1)
+    W = np.empty(st.shape[:-1] + (nf, npts), dtype=np.complex128)
+    # number of frequencies transformed at once
+    rows = max(1, _CWT_CHUNK_SAMPLES // sf.size)
     f = np.logspace(np.log10(fmin), np.log10(fmax), nf)
+    for i in range(0, nf, rows):
+        if bank is not None:
+            psihf = bank[i:i + rows]
+        else:
+            psihf = _wavelet_spectra(npts, dt, w0, f[i:i + rows], nfft)
+        W[..., i:i + rows, :] = np.fft.ifft(
+            sf[..., np.newaxis, :] * psihf, axis=-1)[..., :npts]
+    return W
 
-    cwt = np.zeros((npts // 2, nf), dtype=np.complex)
-
-    if wl == 'morlet':
 
-        def psi(t):
-            return np.pi ** (-.25) * np.exp(1j * w0 * t) * \
-                np.exp(-t ** 2 / 2.)
+def _get_wavelet_bank(npts, dt, w0, fmin, fmax, nf):
+    """
+    Returns the spectra of the (conjugated, time reversed) Morlet wavelets for
+    all frequencies, shape (nf, nfft), or ``None`` if they would take more
+    than ``_WAVELET_BANK_CACHE_MAX_BYTES``.
 
-        def scale(f):
-            return w0 / (2 * np.pi * f)
+    The banks of the last used parameters are cached, in total up to
+    ``_WAVELET_BANK_CACHE_MAX_BYTES``.
+    """
+    global _WAVELET_BANKS_NBYTES
+    key = (npts, dt, w0, fmin, fmax, nf)
+    try:
+        bank = _WAVELET_BANKS.pop(key)
+    except KeyError:
+        pass
     else:
-        raise ValueError('wavelet type "' + wl + '" not defined!')
+        _WAVELET_BANKS[key] = bank
+        return bank
+    nfft = util.next_pow_2(2 * npts) * 2
+    nbytes = nf * nfft * np.dtype(np.complex128).itemsize
+    if nbytes > _WAVELET_BANK_CACHE_MAX_BYTES:
+        return None
+    f = np.logspace(np.log10(fmin), np.log10(fmax), nf)
+    bank = np.empty((nf, nfft), dtype=np.complex128)
+    rows = max(1, _CWT_CHUNK_SAMPLES // nfft)
+    for i in range(0, nf, rows):
+        bank[i:i + rows] = _wavelet_spectra(npts, dt, w0, f[i:i + rows],
+                                            nfft)
+    _WAVELET_BANKS[key] = bank
+    _WAVELET_BANKS_NBYTES += bank.nbytes
+    while _WAVELET_BANKS_NBYTES > _WAVELET_BANK_CACHE_MAX_BYTES:
+        _, old = _WAVELET_BANKS.popitem(last=False)
+        _WAVELET_BANKS_NBYTES -= old.nbytes
+    return bank
+
+
+def _wavelet_spectra(npts, dt, w0, f, nfft):
+    """
+    Returns the spectra of the (conjugated, time reversed) Morlet wavelets for
+    the given frequencies, shape (len(f), nfft).
+
+    Like in the former implementation the wavelets are sampled on a time
+    axis of twice the signal length centered around zero (i.e. truncated)
+    and zero padded, so the convolution does not wrap around. The shift of
+    the wavelet center to the analyzed sample is applied to the sampled
+    wavelets before the FFT, thus the transform is the first npts samples of
+    the inverse FFT.
+    """
+    nt = 2 * npts
+    t = np.linspace(0., (nt - 1) * dt, nt)
+    scale = (w0 / (2 * np.pi * f))[:, np.newaxis]
+    # time shift necessary, because wavelet is defined around t = 0
+    tau = -1 * (t - t[-1] / 2.) / scale
+    psih = np.zeros((len(f), nfft), dtype=np.complex128)
+    psih[:, :nt] = (np.pi ** (-.25) * np.exp(1j * w0 * tau) *
+                    np.exp(-tau ** 2 / 2.)).conjugate() / scale ** .5 * dt
+    tminin = int(t[-1] / 2. / (t[1] - t[0]))
+    return np.fft.fft(np.roll(psih, -tminin, axis=-1), axis=-1)
+
+
+# Least recently used cache of wavelet banks, see _get_wavelet_bank().
+_WAVELET_BANKS = OrderedDict()
+_WAVELET_BANKS_NBYTES = 0
+_WAVELET_BANK_CACHE_MAX_BYTES = 64 * 1024 ** 2
+# Maximum number of complex samples of all signals and frequencies
+# transformed at once by cwt().
+_CWT_CHUNK_SAMPLES = 2 ** 21
+
+
+def _get_cwts(st1, st2, dt, w0, fmin, fmax, nf):
+    """
+    Transforms both signals at once, returns the time frequency
+    representations with shape (number of components, nf, number of time
+    samples).
+    """
+    st1 = np.asarray(st1)
+    W = cwt(np.array([st1, st2]), dt, w0, fmin, fmax, nf)
+    if len(st1.shape) == 1:
+        return W[0][np.newaxis], W[1][np.newaxis]
+    return W[0], W[1]
 
-    nfft = util.next_pow_2(npts) * 2
-    sf = np.fft.fft(st, n=nfft)
 
-    for n, _f in enumerate(f):
-        a = scale(_f)
-        # time shift necessary, because wavelet is defined around t = 0
-        psih = psi(-1 * (t - t[-1] / 2.) / a).conjugate() / np.abs(a) ** .5
-        psihf = np.fft.fft(psih, n=nfft)
-        tminin = int(t[-1] / 2. / (t[1] - t[0]))
-        cwt[:, n] = np.fft.ifft(psihf * sf)[tminin:tminin + npts // 2] * \
-            (t[1] - t[0])
-    return cwt.T
+def tf_misfits(st1, st2, dt=0.01, fmin=1., fmax=10., nf=100, w0=6,
+               norm='global', st2_isref=True):
+    """
+    All time frequency misfits computed from one pair of wavelet transforms.
+
+    Returns the same values as :func:`tfem`, :func:`tfpm`, :func:`tem`,
+    :func:`tpm`, :func:`fem`, :func:`fpm`, :func:`em` and :func:`pm` but
+    transforms the signals only once.
+
+    .. seealso:: [Kristekova2009]_, Table 1. and 2.
+
+    :param st1: signal 1 of two signals to compare, type numpy.ndarray with
+        shape (number of components, number of time samples) or (number of
+        timesamples, ) for single component data
+    :param st2: signal 2 of two signals to compare, type and shape as st1
+    :param dt: time step between two samples in st1 and st2
+    :param fmin: minimal frequency to be analyzed
+    :param fmax: maximal frequency to be analyzed
+    :param nf: number of frequencies (will be chosen with logarithmic spacing)
+    :param w0: parameter for the wavelet, tradeoff between time and frequency
+        resolution
+    :param norm: 'global' or 'local' normalization of the misfit
+    :type st2_isref: bool
+    :param st2_isref: True if st2 is a reference signal, False if none is a
+        reference
+
+    :return: dictionary with keys 'TFEM', 'TFPM', 'TEM', 'TPM', 'FEM', 'FPM',
+        'EM' and 'PM'
+    """
+    W1, W2 = _get_cwts(st1, st2, dt, w0, fmin, fmax, nf)
+    single = len(np.shape(st1)) == 1
+    return dict((name, func(W1, W2, norm, st2_isref, single))
+                for name, func in (('TFEM', _tfem), ('TFPM', _tfpm),
+                                   ('TEM', _tem), ('TPM', _tpm),
+                                   ('FEM', _fem), ('FPM', _fpm),
+                                   ('EM', _em), ('PM', _pm)))
+
+
+def tf_gofs(st1, st2, dt=0.01, fmin=1., fmax=10., nf=100, w0=6,
+            norm='global', st2_isref=True, A=10., k=1.):
+    """
+    All time frequency Goodness-of-Fits computed from one pair of wavelet
+    transforms.
+
+    Returns the same values as :func:`tfeg`, :func:`tfpg`, :func:`teg`,
+    :func:`tpg`, :func:`feg`, :func:`fpg`, :func:`eg` and :func:`pg` but
+    transforms the signals only once.
+
+    .. seealso:: [Kristekova2009]_, Eq.(15) and (16)
+
+    See :func:`tf_misfits` for the parameters.
+
+    :param A: Maximum value of Goodness-of-Fit for perfect agreement
+    :param k: sensitivity of Goodness-of-Fit to the misfit
+
+    :return: dictionary with keys 'TFEG', 'TFPG', 'TEG', 'TPG', 'FEG', 'FPG',
+        'EG' and 'PG'
+    """
+    misfits = tf_misfits(st1, st2, dt=dt, fmin=fmin, fmax=fmax, nf=nf, w0=w0,
+                         norm=norm, st2_isref=st2_isref)
+    gofs = {}
+    for name in ('TFE', 'TE', 'FE', 'E'):
+        gofs[name + 'G'] = A * np.exp(-np.abs(misfits[name + 'M']) ** k)
+    for name in ('TFP', 'TP', 'FP', 'P'):
+        gofs[name + 'G'] = A * (1 - np.abs(misfits[name + 'M']) ** k)
+    return gofs
 
 
 def tfem(st1, st2, dt=0.01, fmin=1., fmax=10., nf=100, w0=6, norm='global',
@@ -105,20 +255,14 @@ def tfem(st1, st2, dt=0.01, fmin=1., fmax=10., nf=100, w0=6, norm='global',
         type numpy.ndarray with shape (nf, len(st1)) for single component data
         and (number of components, nf, len(st1)) for multicomponent data
     """
-    if len(st1.shape) == 1:
-        W1 = np.zeros((1, nf, st1.shape[0]), dtype=np.complex)
-        W2 = np.zeros((1, nf, st1.shape[0]), dtype=np.complex)
-
-        W1[0] = cwt(st1, dt, w0, fmin, fmax, nf)
-        W2[0] = cwt(st2, dt, w0, fmin, fmax, nf)
-    else:
-        W1 = np.zeros((st1.shape[0], nf, st1.shape[1]), dtype=np.complex)
-        W2 = np.zeros((st2.shape[0], nf, st2.shape[1]), dtype=np.complex)
+    W1, W2 = _get_cwts(st1, st2, dt, w0, fmin, fmax, nf)
+    return _tfem(W1, W2, norm, st2_isref, len(st1.shape) == 1)
 
-        for i in np.arange(st1.shape[0]):
-            W1[i] = cwt(st1[i], dt, w0, fmin, fmax, nf)
-            W2[i] = cwt(st2[i], dt, w0, fmin, fmax, nf)
 
+def _tfem(W1, W2, norm, st2_isref, single):
+    """
+    Time frequency envelope misfit of two wavelet transforms, see :func:`tfem`.
+    """
     if st2_isref:
         Ar = np.abs(W2)
     else:
@@ -130,12 +274,12 @@ def tfem(st1, st2, dt=0.01, fmin=1., fmax=10., nf=100, w0=6, norm='global',
     TFEM = (np.abs(W1) - np.abs(W2))
 
     if norm == 'global':
-        if len(st1.shape) == 1:
+        if single:
             return TFEM[0] / np.max(Ar)
         else:
             return TFEM / np.max(Ar)
     elif norm == 'local':
-        if len(st1.shape) == 1:
+        if single:
             return TFEM[0] / Ar[0]
         else:
             return TFEM / Ar
@@ -169,20 +313,14 @@ def tfpm(st1, st2, dt=0.01, fmin=1., fmax=10., nf=100, w0=6, norm='global',
         type numpy.ndarray with shape (nf, len(st1)) for single component data
         and (number of components, nf, len(st1)) for multicomponent data
     """
-    if len(st1.shape) == 1:
-        W1 = np.zeros((1, nf, st1.shape[0]), dtype=np.complex)
-        W2 = np.zeros((1, nf, st1.shape[0]), dtype=np.complex)
-
-        W1[0] = cwt(st1, dt, w0, fmin, fmax, nf)
-        W2[0] = cwt(st2, dt, w0, fmin, fmax, nf)
-    else:
-        W1 = np.zeros((st1.shape[0], nf, st1.shape[1]), dtype=np.complex)
-        W2 = np.zeros((st2.shape[0], nf, st2.shape[1]), dtype=np.complex)
+    W1, W2 = _get_cwts(st1, st2, dt, w0, fmin, fmax, nf)
+    return _tfpm(W1, W2, norm, st2_isref, len(st1.shape) == 1)
 
-        for i in np.arange(st1.shape[0]):
-            W1[i] = cwt(st1[i], dt, w0, fmin, fmax, nf)
-            W2[i] = cwt(st2[i], dt, w0, fmin, fmax, nf)
 
+def _tfpm(W1, W2, norm, st2_isref, single):
+    """
+    Time frequency phase misfit of two wavelet transforms, see :func:`tfpm`.
+    """
     if st2_isref:
         Ar = np.abs(W2)
     else:
@@ -194,12 +332,12 @@ def tfpm(st1, st2, dt=0.01, fmin=1., fmax=10., nf=100, w0=6, norm='global',
     TFPM = np.angle(W1 / W2) / np.pi
 
     if norm == 'global':
-        if len(st1.shape) == 1:
+        if single:
             return Ar[0] * TFPM[0] / np.max(Ar)
         else:
             return Ar * TFPM / np.max(Ar)
     elif norm == 'local':
-        if len(st1.shape) == 1:
+        if single:
             return TFPM[0]
         else:
             return TFPM
@@ -233,20 +371,14 @@ def tem(st1, st2, dt=0.01, fmin=1., fmax=10., nf=100, w0=6, norm='global',
         (len(st1),) for single component data and (number of components,
         len(st1)) for multicomponent data
     """
-    if len(st1.shape) == 1:
-        W1 = np.zeros((1, nf, st1.shape[0]), dtype=np.complex)
-        W2 = np.zeros((1, nf, st1.shape[0]), dtype=np.complex)
+    W1, W2 = _get_cwts(st1, st2, dt, w0, fmin, fmax, nf)
+    return _tem(W1, W2, norm, st2_isref, len(st1.shape) == 1)
 
-        W1[0] = cwt(st1, dt, w0, fmin, fmax, nf)
-        W2[0] = cwt(st2, dt, w0, fmin, fmax, nf)
-    else:
-        W1 = np.zeros((st1.shape[0], nf, st1.shape[1]), dtype=np.complex)
-        W2 = np.zeros((st2.shape[0], nf, st2.shape[1]), dtype=np.complex)
-
-        for i in np.arange(st1.shape[0]):
-            W1[i] = cwt(st1[i], dt, w0, fmin, fmax, nf)
-            W2[i] = cwt(st2[i], dt, w0, fmin, fmax, nf)
 
+def _tem(W1, W2, norm, st2_isref, single):
+    """
+    Time-dependent envelope misfit of two wavelet transforms, see :func:`tem`.
+    """
     if st2_isref:
         Ar = np.abs(W2)
     else:
@@ -258,12 +390,12 @@ def tem(st1, st2, dt=0.01, fmin=1., fmax=10., nf=100, w0=6, norm='global',
     TEM = np.sum((np.abs(W1) - np.abs(W2)), axis=1)
 
     if norm == 'global':
-        if len(st1.shape) == 1:
+        if single:
             return TEM[0] / np.max(np.sum(Ar, axis=1))
         else:
             return TEM / np.max(np.sum(Ar, axis=1))
     elif norm == 'local':
-        if len(st1.shape) == 1:
+        if single:
             return TEM[0] / np.sum(Ar, axis=1)[0]
         else:
             return TEM / np.sum(Ar, axis=1)
@@ -297,20 +429,14 @@ def tpm(st1, st2, dt=0.01, fmin=1., fmax=10., nf=100, w0=6, norm='global',
         (len(st1),) for single component data and (number of components,
         len(st1)) for multicomponent data
     """
-    if len(st1.shape) == 1:
-        W1 = np.zeros((1, nf, st1.shape[0]), dtype=np.complex)
-        W2 = np.zeros((1, nf, st1.shape[0]), dtype=np.complex)
-
-        W1[0] = cwt(st1, dt, w0, fmin, fmax, nf)
-        W2[0] = cwt(st2, dt, w0, fmin, fmax, nf)
-    else:
-        W1 = np.zeros((st1.shape[0], nf, st1.shape[1]), dtype=np.complex)
-        W2 = np.zeros((st2.shape[0], nf, st2.shape[1]), dtype=np.complex)
+    W1, W2 = _get_cwts(st1, st2, dt, w0, fmin, fmax, nf)
+    return _tpm(W1, W2, norm, st2_isref, len(st1.shape) == 1)
 
-        for i in np.arange(st1.shape[0]):
-            W1[i] = cwt(st1[i], dt, w0, fmin, fmax, nf)
-            W2[i] = cwt(st2[i], dt, w0, fmin, fmax, nf)
 
+def _tpm(W1, W2, norm, st2_isref, single):
+    """
+    Time-dependent phase misfit of two wavelet transforms, see :func:`tpm`.
+    """
     if st2_isref:
         Ar = np.abs(W2)
     else:
@@ -323,12 +449,12 @@ def tpm(st1, st2, dt=0.01, fmin=1., fmax=10., nf=100, w0=6, norm='global',
     TPM = np.sum(Ar * TPM, axis=1)
 
     if norm == 'global':
-        if len(st1.shape) == 1:
+        if single:
             return TPM[0] / np.max(np.sum(Ar, axis=1))
         else:
             return TPM / np.max(np.sum(Ar, axis=1))
     elif norm == 'local':
-        if len(st1.shape) == 1:
+        if single:
             return TPM[0] / np.sum(Ar, axis=1)[0]
         else:
             return TPM / np.sum(Ar, axis=1)
@@ -362,20 +488,15 @@ def fem(st1, st2, dt=0.01, fmin=1., fmax=10., nf=100, w0=6, norm='global',
         (nf,) for single component data and (number of components, nf) for
         multicomponent data
     """
-    if len(st1.shape) == 1:
-        W1 = np.zeros((1, nf, st1.shape[0]), dtype=np.complex)
-        W2 = np.zeros((1, nf, st1.shape[0]), dtype=np.complex)
+    W1, W2 = _get_cwts(st1, st2, dt, w0, fmin, fmax, nf)
+    return _fem(W1, W2, norm, st2_isref, len(st1.shape) == 1)
 
-        W1[0] = cwt(st1, dt, w0, fmin, fmax, nf)
-        W2[0] = cwt(st2, dt, w0, fmin, fmax, nf)
-    else:
-        W1 = np.zeros((st1.shape[0], nf, st1.shape[1]), dtype=np.complex)
-        W2 = np.zeros((st2.shape[0], nf, st2.shape[1]), dtype=np.complex)
-
-        for i in np.arange(st1.shape[0]):
-            W1[i] = cwt(st1[i], dt, w0, fmin, fmax, nf)
-            W2[i] = cwt(st2[i], dt, w0, fmin, fmax, nf)
 
+def _fem(W1, W2, norm, st2_isref, single):
+    """
+    Frequency-dependent envelope misfit of two wavelet transforms, see
+    :func:`fem`.
+    """
     if st2_isref:
         Ar = np.abs(W2)
     else:
@@ -388,12 +509,12 @@ def fem(st1, st2, dt=0.01, fmin=1., fmax=10., nf=100, w0=6, norm='global',
     TEM = np.sum(TEM, axis=2)
 
     if norm == 'global':
-        if len(st1.shape) == 1:
+        if single:
             return TEM[0] / np.max(np.sum(Ar, axis=2))
         else:
             return TEM / np.max(np.sum(Ar, axis=2))
     elif norm == 'local':
-        if len(st1.shape) == 1:
+        if single:
             return TEM[0] / np.sum(Ar, axis=2)[0]
         else:
             return TEM / np.sum(Ar, axis=2)
@@ -427,20 +548,15 @@ def fpm(st1, st2, dt=0.01, fmin=1., fmax=10., nf=100, w0=6, norm='global',
         (nf,) for single component data and (number of components, nf) for
         multicomponent data
     """
-    if len(st1.shape) == 1:
-        W1 = np.zeros((1, nf, st1.shape[0]), dtype=np.complex)
-        W2 = np.zeros((1, nf, st1.shape[0]), dtype=np.complex)
-
-        W1[0] = cwt(st1, dt, w0, fmin, fmax, nf)
-        W2[0] = cwt(st2, dt, w0, fmin, fmax, nf)
-    else:
-        W1 = np.zeros((st1.shape[0], nf, st1.shape[1]), dtype=np.complex)
-        W2 = np.zeros((st2.shape[0], nf, st2.shape[1]), dtype=np.complex)
+    W1, W2 = _get_cwts(st1, st2, dt, w0, fmin, fmax, nf)
+    return _fpm(W1, W2, norm, st2_isref, len(st1.shape) == 1)
 
-        for i in np.arange(st1.shape[0]):
-            W1[i] = cwt(st1[i], dt, w0, fmin, fmax, nf)
-            W2[i] = cwt(st2[i], dt, w0, fmin, fmax, nf)
 
+def _fpm(W1, W2, norm, st2_isref, single):
+    """
+    Frequency-dependent phase misfit of two wavelet transforms, see
+    :func:`fpm`.
+    """
     if st2_isref:
         Ar = np.abs(W2)
     else:
@@ -453,12 +569,12 @@ def fpm(st1, st2, dt=0.01, fmin=1., fmax=10., nf=100, w0=6, norm='global',
     TPM = np.sum(Ar * TPM, axis=2)
 
     if norm == 'global':
-        if len(st1.shape) == 1:
+        if single:
             return TPM[0] / np.max(np.sum(Ar, axis=2))
         else:
             return TPM / np.max(np.sum(Ar, axis=2))
     elif norm == 'local':
-        if len(st1.shape) == 1:
+        if single:
             return TPM[0] / np.sum(Ar, axis=2)[0]
         else:
             return TPM / np.sum(Ar, axis=2)
@@ -490,20 +606,14 @@ def em(st1, st2, dt=0.01, fmin=1., fmax=10., nf=100, w0=6, norm='global',
 
     :return: Single Valued Envelope Misfit
     """
-    if len(st1.shape) == 1:
-        W1 = np.zeros((1, nf, st1.shape[0]), dtype=np.complex)
-        W2 = np.zeros((1, nf, st1.shape[0]), dtype=np.complex)
+    W1, W2 = _get_cwts(st1, st2, dt, w0, fmin, fmax, nf)
+    return _em(W1, W2, norm, st2_isref, len(st1.shape) == 1)
 
-        W1[0] = cwt(st1, dt, w0, fmin, fmax, nf)
-        W2[0] = cwt(st2, dt, w0, fmin, fmax, nf)
-    else:
-        W1 = np.zeros((st1.shape[0], nf, st1.shape[1]), dtype=np.complex)
-        W2 = np.zeros((st2.shape[0], nf, st2.shape[1]), dtype=np.complex)
-
-        for i in np.arange(st1.shape[0]):
-            W1[i] = cwt(st1[i], dt, w0, fmin, fmax, nf)
-            W2[i] = cwt(st2[i], dt, w0, fmin, fmax, nf)
 
+def _em(W1, W2, norm, st2_isref, single):
+    """
+    Single valued envelope misfit of two wavelet transforms, see :func:`em`.
+    """
     if st2_isref:
         Ar = np.abs(W2)
     else:
@@ -515,12 +625,12 @@ def em(st1, st2, dt=0.01, fmin=1., fmax=10., nf=100, w0=6, norm='global',
     EM = (np.sum(np.sum((np.abs(W1) - np.abs(W2)) ** 2, axis=2), axis=1)) ** .5
 
     if norm == 'global':
-        if len(st1.shape) == 1:
+        if single:
             return EM[0] / (np.sum(Ar ** 2)) ** .5
         else:
             return EM / ((np.sum(np.sum(Ar ** 2, axis=2), axis=1)) ** .5).max()
     elif norm == 'local':
-        if len(st1.shape) == 1:
+        if single:
             return EM[0] / (np.sum(Ar ** 2)) ** .5
         else:
             return EM / (np.sum(np.sum(Ar ** 2, axis=2), axis=1)) ** .5
@@ -552,20 +662,14 @@ def pm(st1, st2, dt=0.01, fmin=1., fmax=10., nf=100, w0=6, norm='global',
 
     :return: Single Valued Phase Misfit
     """
-    if len(st1.shape) == 1:
-        W1 = np.zeros((1, nf, st1.shape[0]), dtype=np.complex)
-        W2 = np.zeros((1, nf, st1.shape[0]), dtype=np.complex)
-
-        W1[0] = cwt(st1, dt, w0, fmin, fmax, nf)
-        W2[0] = cwt(st2, dt, w0, fmin, fmax, nf)
-    else:
-        W1 = np.zeros((st1.shape[0], nf, st1.shape[1]), dtype=np.complex)
-        W2 = np.zeros((st2.shape[0], nf, st2.shape[1]), dtype=np.complex)
+    W1, W2 = _get_cwts(st1, st2, dt, w0, fmin, fmax, nf)
+    return _pm(W1, W2, norm, st2_isref, len(st1.shape) == 1)
 
-        for i in np.arange(st1.shape[0]):
-            W1[i] = cwt(st1[i], dt, w0, fmin, fmax, nf)
-            W2[i] = cwt(st2[i], dt, w0, fmin, fmax, nf)
 
+def _pm(W1, W2, norm, st2_isref, single):
+    """
+    Single valued phase misfit of two wavelet transforms, see :func:`pm`.
+    """
     if st2_isref:
         Ar = np.abs(W2)
     else:
@@ -579,12 +683,12 @@ def pm(st1, st2, dt=0.01, fmin=1., fmax=10., nf=100, w0=6, norm='global',
     PM = (np.sum(np.sum((Ar * PM) ** 2, axis=2), axis=1)) ** .5
 
     if norm == 'global':
-        if len(st1.shape) == 1:
+        if single:
             return PM[0] / (np.sum(Ar ** 2)) ** .5
         else:
             return PM / ((np.sum(np.sum(Ar ** 2, axis=2), axis=1)) ** .5).max()
     elif norm == 'local':
-        if len(st1.shape) == 1:
+        if single:
             return PM[0] / (np.sum(Ar ** 2)) ** .5
         else:
             return PM / (np.sum(np.sum(Ar ** 2, axis=2), axis=1)) ** .5
@@ -986,22 +1090,16 @@ def plot_tf_misfits(st1, st2, dt=0.01, t0=0., fmin=1., fmax=10., nf=100, w0=6,
         cmap = LinearSegmentedColormap('cmap_tfm', CDICT_TFM, 1024)
 
     # compute time frequency misfits
-    TFEM = tfem(st1, st2, dt=dt, fmin=fmin, fmax=fmax, nf=nf, w0=w0, norm=norm,
-                st2_isref=st2_isref)
-    TEM = tem(st1, st2, dt=dt, fmin=fmin, fmax=fmax, nf=nf, w0=w0, norm=norm,
-              st2_isref=st2_isref)
-    FEM = fem(st1, st2, dt=dt, fmin=fmin, fmax=fmax, nf=nf, w0=w0, norm=norm,
-              st2_isref=st2_isref)
-    EM = em(st1, st2, dt=dt, fmin=fmin, fmax=fmax, nf=nf, w0=w0, norm=norm,
-            st2_isref=st2_isref)
-    TFPM = tfpm(st1, st2, dt=dt, fmin=fmin, fmax=fmax, nf=nf, w0=w0, norm=norm,
-                st2_isref=st2_isref)
-    TPM = tpm(st1, st2, dt=dt, fmin=fmin, fmax=fmax, nf=nf, w0=w0, norm=norm,
-              st2_isref=st2_isref)
-    FPM = fpm(st1, st2, dt=dt, fmin=fmin, fmax=fmax, nf=nf, w0=w0, norm=norm,
-              st2_isref=st2_isref)
-    PM = pm(st1, st2, dt=dt, fmin=fmin, fmax=fmax, nf=nf, w0=w0, norm=norm,
-            st2_isref=st2_isref)
+    misfits = tf_misfits(st1, st2, dt=dt, fmin=fmin, fmax=fmax, nf=nf, w0=w0,
+                         norm=norm, st2_isref=st2_isref)
+    TFEM = misfits['TFEM']
+    TEM = misfits['TEM']
+    FEM = misfits['FEM']
+    EM = misfits['EM']
+    TFPM = misfits['TFPM']
+    TPM = misfits['TPM']
+    FPM = misfits['FPM']
+    PM = misfits['PM']
 
     if len(st1.shape) == 1:
         TFEM = TFEM.reshape((1, nf, npts))
@@ -1266,22 +1364,16 @@ def plot_tf_gofs(st1, st2, dt=0.01, t0=0., fmin=1., fmax=10., nf=100, w0=6,
         cmap = LinearSegmentedColormap('cmap_gof', CDICT_GOF, 1024)
 
     # compute time frequency misfits
-    TFEG = tfeg(st1, st2, dt=dt, fmin=fmin, fmax=fmax, nf=nf, w0=w0, norm=norm,
-                st2_isref=st2_isref, A=A, k=k)
-    TEG = teg(st1, st2, dt=dt, fmin=fmin, fmax=fmax, nf=nf, w0=w0, norm=norm,
-              st2_isref=st2_isref, A=A, k=k)
-    FEG = feg(st1, st2, dt=dt, fmin=fmin, fmax=fmax, nf=nf, w0=w0, norm=norm,
-              st2_isref=st2_isref, A=A, k=k)
-    EG = eg(st1, st2, dt=dt, fmin=fmin, fmax=fmax, nf=nf, w0=w0, norm=norm,
-            st2_isref=st2_isref, A=A, k=k)
-    TFPG = tfpg(st1, st2, dt=dt, fmin=fmin, fmax=fmax, nf=nf, w0=w0, norm=norm,
-                st2_isref=st2_isref, A=A, k=k)
-    TPG = tpg(st1, st2, dt=dt, fmin=fmin, fmax=fmax, nf=nf, w0=w0, norm=norm,
-              st2_isref=st2_isref, A=A, k=k)
-    FPG = fpg(st1, st2, dt=dt, fmin=fmin, fmax=fmax, nf=nf, w0=w0, norm=norm,
-              st2_isref=st2_isref, A=A, k=k)
-    PG = pg(st1, st2, dt=dt, fmin=fmin, fmax=fmax, nf=nf, w0=w0, norm=norm,
-            st2_isref=st2_isref, A=A, k=k)
+    gofs = tf_gofs(st1, st2, dt=dt, fmin=fmin, fmax=fmax, nf=nf, w0=w0,
+                   norm=norm, st2_isref=st2_isref, A=A, k=k)
+    TFEG = gofs['TFEG']
+    TEG = gofs['TEG']
+    FEG = gofs['FEG']
+    EG = gofs['EG']
+    TFPG = gofs['TFPG']
+    TPG = gofs['TPG']
+    FPG = gofs['FPG']
+    PG = gofs['PG']
 
     if len(st1.shape) == 1:
         TFEG = TFEG.reshape((1, nf, npts))
@@ -1531,12 +1623,8 @@ def plot_tfr(st, dt=0.01, t0=0., fmin=1., fmax=10., nf=100, w0=6, left=0.1,
 
         st = st.reshape((1, npts))
     else:
-        W = np.zeros((st.shape[0], nf, npts), dtype=np.complex)
-        spec = np.zeros((st.shape[0], nfft // 2 + 1), dtype=np.complex)
-
-        for i in np.arange(st.shape[0]):
-            W[i] = cwt(st[i], dt, w0, fmin, fmax, nf)
-            spec[i] = np.fft.rfft(st[i], n=nfft) * dt
+        W = cwt(st, dt, w0, fmin, fmax, nf)
+        spec = np.fft.rfft(st, n=nfft, axis=-1) * dt
 
         ntr = st.shape[0]
 
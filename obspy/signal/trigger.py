@@ -30,13 +30,16 @@ from __future__ import (absolute_import, division, print_function,
 from future.builtins import *  # NOQA
 
 import ctypes as C
+import multiprocessing
 import warnings
 from collections import deque
 
 import numpy as np
 
 from obspy import UTCDateTime
-from obspy.signal.cross_correlation import templatesMaxSimilarity
+from obspy.core.util.base import _get_function_from_entry_point
+from obspy.signal.cross_correlation import (correlate_templates,
+                                            templatesMaxSimilarity)
 from obspy.signal.headers import clibsignal, head_stalta_t
 
 
@@ -346,7 +349,7 @@ def trigger_onset(charfct, thres1, thres2, max_len=9e99, max_len_delete=False):
     #
     on = deque([ind1[0]])
     of = deque([-1])
-    of.extend(ind2[np.diff(ind2) > 1].tolist())
+    of.extend(ind2[:-1][np.diff(ind2) > 1].tolist())
     on.extend(ind1[np.where(np.diff(ind1) > 1)[0] + 1].tolist())
     # include last pick if trigger is on or drop it
     if max_len_delete:
@@ -505,6 +508,7 @@ def coincidence_trigger(trigger_type, thr_on, thr_off, stream,
                         max_trigger_length=1e6, delete_long_trigger=False,
                         trigger_off_extension=0, details=False,
                         event_templates={}, similarity_threshold=0.7,
+                        vectorized=False, workers=None, executor=None,
                         **options):
     """
     Perform a network coincidence trigger.
@@ -601,9 +605,58 @@ def coincidence_trigger(trigger_type, thr_on, thr_off, stream,
         trigger list. A common threshold can be set for all stations (float) or
         a dictionary mapping station names to float values for each station.
     :type similarity_threshold: float or dict
+    :type vectorized: bool, optional
+    :param vectorized: If set to ``True`` the characteristic functions are
+        computed without copying the stream (``stream`` is not changed) and
+        overlapping single station triggers are found with a sorted interval
+        sweep, see :class:`CoincidenceTrigger`. Template similarities are
+        computed once per coincidence. All triggers overlapping a coincidence
+        (including repeated triggers of one trace) contribute to its
+        duration.
+    :type workers: int
+    :param workers: Compute the characteristic functions in a
+        :class:`multiprocessing.Pool` with this number of processes (implies
+        ``vectorized=True``).
+    :param executor: Same as ``workers`` but uses the given pool with an order
+        preserving ``map()`` method.
     :rtype: list
     :returns: List of event triggers sorted chronologically.
     """
+    if vectorized or workers is not None or executor is not None:
+        if not isinstance(similarity_threshold, dict):
+            similarity_threshold = dict.fromkeys(
+                [tr.stats.station for tr in stream], similarity_threshold)
+        # coincidences not reaching the coincidence sum might still be
+        # included because of their similarity to templates
+        thr_sum = thr_coincidence_sum
+        if event_templates:
+            thr_sum = -np.inf
+        coincidence = CoincidenceTrigger(
+            trigger_type, thr_on, thr_off, thr_sum, trace_ids=trace_ids,
+            max_trigger_length=max_trigger_length,
+            delete_long_trigger=delete_long_trigger,
+            trigger_off_extension=trigger_off_extension, details=details,
+            workers=workers, executor=executor, **options)
+        events = coincidence.process(stream) + coincidence.flush()
+        if not event_templates:
+            return events
+        coincidence_triggers = []
+        for event in events:
+            for sta in event['stations']:
+                templates = event_templates.get(sta)
+                if templates and sta not in event['similarity']:
+                    event['similarity'][sta] = \
+                        templatesMaxSimilarity(stream, event['time'],
+                                               templates)
+            if event['coincidence_sum'] < thr_coincidence_sum:
+                if not event['similarity']:
+                    continue
+                elif not any([val > similarity_threshold[_s]
+                              for _s, val in event['similarity'].items()]):
+                    continue
+            coincidence_triggers.append(event)
+        return coincidence_triggers
+
     st = stream.copy()
     # if no trace ids are specified use all traces ids found in stream
     if trace_ids is None:
@@ -717,6 +770,446 @@ def coincidence_trigger(trigger_type, thr_on, thr_off, stream,
     return coincidence_triggers
 
 
+class CoincidenceTrigger(object):
+    """
+    Network coincidence trigger working on chunks of continuous data.
+
+    Works like :func:`coincidence_trigger` (without template similarity
+    checks) but data can be processed in consecutive chunks, e.g. day by
+    day. The state at the end of a chunk is kept for every trace: the last
+    part of the raw data to initialize the characteristic function of the
+    next chunk (``overlap``), the characteristic function of single station
+    triggers that are still on and all single station triggers that might
+    still be part of a coincidence with triggers in the next chunk. Each call
+    of :meth:`process` returns the coincidences that are complete, call
+    :meth:`flush` at the end of the data.
+
+    The characteristic functions of all traces of a chunk can be computed in
+    parallel, overlapping single station triggers are found with a sorted
+    interval sweep in NumPy. All triggers overlapping a coincidence
+    (including repeated triggers of one trace) contribute to its duration.
+
+    >>> from obspy import read
+    >>> st = read()
+    >>> st.filter('highpass', freq=1.0)  # doctest: +ELLIPSIS
+    <...Stream object at 0x...>
+    >>> trigger = CoincidenceTrigger('recstalta', 3.0, 1.0, 2, sta=0.5,
+    ...                              lta=5)
+    >>> events = []
+    >>> t = st[0].stats.starttime
+    >>> for i in range(3):
+    ...     chunk = st.slice(t + i * 10, t + (i + 1) * 10 - st[0].stats.delta)
+    ...     events += trigger.process(chunk)
+    >>> events += trigger.flush()
+    >>> print(len(events), events[0]['time'], events[0]['coincidence_sum'])
+    1 2009-08-24T00:20:08.000000Z 3.0
+
+    :type overlap: float
+    :param overlap: Length of raw data (seconds) prepended to a chunk of a
+        trace to initialize the characteristic function. Defaults to the
+        longest (``n``)``sta``/(``n``)``lta`` option which makes e.g. the
+        classic STA/LTA independent of the chunking. Recursive
+        characteristic functions are approximated.
+    :type workers: int
+    :param workers: Compute the characteristic functions in a
+        :class:`multiprocessing.Pool` with this number of processes.
+    :param executor: Same as ``workers`` but uses the given pool with an order
+        preserving ``map()`` method.
+
+    See :func:`coincidence_trigger` for the other parameters.
+    """
+    def __init__(self, trigger_type, thr_on, thr_off, thr_coincidence_sum,
+                 trace_ids=None, max_trigger_length=1e6,
+                 delete_long_trigger=False, trigger_off_extension=0,
+                 details=False, overlap=None, workers=None, executor=None,
+                 **options):
+        self.trigger_type = trigger_type
+        self.thr_on = thr_on
+        self.thr_off = thr_off
+        self.thr_coincidence_sum = thr_coincidence_sum
+        if isinstance(trace_ids, list) or isinstance(trace_ids, tuple):
+            trace_ids = dict.fromkeys(trace_ids, 1)
+        self.trace_ids = trace_ids
+        self.max_trigger_length = max_trigger_length
+        self.delete_long_trigger = delete_long_trigger
+        self.trigger_off_extension = trigger_off_extension
+        self.details = details
+        self.overlap = overlap
+        self.workers = workers
+        self.executor = executor
+        self.options = options
+        # per trace id: raw data tail, characteristic function of a trigger
+        # that is still on, its first sample (offset to the start time of the
+        # trace) and the expected start of the next chunk
+        self._state = {}
+        # single station triggers not yet assigned to a coincidence, as
+        # (on, off, trace id, cft peak, cft std) with on/off timestamps
+        self._triggers = []
+        self._weights = {}
+
+    def _get_overlap(self, sampling_rate):
+        """
+        Number of raw data samples kept to initialize the characteristic
+        function of the next chunk.
+        """
+        if self.trigger_type is None:
+            return 0
+        if self.overlap is not None:
+            return int(self.overlap * sampling_rate)
+        nsamp = 0
+        for key in ('sta', 'lta'):
+            if key in self.options:
+                nsamp = max(nsamp, int(self.options[key] * sampling_rate))
+            if 'n' + key in self.options:
+                nsamp = max(nsamp, int(self.options['n' + key]))
+        return nsamp
+
+    def process(self, stream):
+        """
+        Processes the next chunk of data.
+
+        Samples of a trace that were part of the previous chunk are skipped,
+        a gap after the previous chunk restarts the trigger of the trace.
+
+        :type stream: :class:`~obspy.core.stream.Stream`
+        :param stream: Waveform data (or characteristic functions if
+            ``trigger_type`` is ``None``). The data is not changed.
+        :rtype: list
+        :returns: Coincidence triggers completed with this chunk, sorted
+            chronologically.
+        """
+        args = []
+        traces = []
+        for tr in stream:
+            if self.trace_ids is not None and tr.id not in self.trace_ids:
+                msg = "At least one trace's ID was not found in the " + \
+                      "trace ID list and was disregarded (%s)" % tr.id
+                warnings.warn(msg, UserWarning)
+                continue
+            if len(tr) == 0:
+                continue
+            data = tr.data
+            if isinstance(data, np.ma.masked_array):
+                data = data.filled(0)
+            state = self._state.get(tr.id)
+            if state is not None:
+                # skip samples that were part of the previous chunk
+                nold = int(round((state['next'] - tr.stats.starttime) *
+                                 tr.stats.sampling_rate))
+                if nold >= len(data):
+                    continue
+                elif nold > 0:
+                    data = data[nold:]
+                elif nold < 0:
+                    # gap, close triggers that are still on
+                    self._close(tr.id)
+                    state = None
+            if state is None:
+                state = {'raw': np.empty(0), 'cft': np.empty(0),
+                         'starttime': tr.stats.starttime, 'offset': 0,
+                         'sampling_rate': tr.stats.sampling_rate}
+                self._state[tr.id] = state
+            state['next'] = tr.stats.endtime + tr.stats.delta
+            nwarm = len(state['raw'])
+            if nwarm:
+                data = np.concatenate([state['raw'], data])
+            noverlap = self._get_overlap(tr.stats.sampling_rate)
+            state['raw'] = np.array(data[max(len(data) - noverlap, 0):],
+                                    dtype=np.float64)
+            args.append((data, nwarm, noverlap, self.trigger_type,
+                         tr.stats.sampling_rate, self.options))
+            traces.append(tr.id)
+        if self.executor is not None:
+            results = self.executor.map(_characteristic_function, args)
+        elif self.workers is not None:
+            pool = multiprocessing.Pool(processes=self.workers)
+            try:
+                results = pool.map(_characteristic_function, args)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            results = (_characteristic_function(arg) for arg in args)
+        for tr_id, cft in zip(traces, results):
+            self._single_station_triggers(tr_id, cft)
+        # no trigger of the processed traces can start before this time
+        if traces:
+            safe = min((self._state[tr_id]['starttime'] +
+                        self._state[tr_id]['offset'] /
+                        self._state[tr_id]['sampling_rate']).timestamp
+                       for tr_id in traces)
+        else:
+            safe = -np.inf
+        return self._coincidences(safe)
+
+    def flush(self):
+        """
+        Closes all triggers that are still on and returns all remaining
+        coincidence triggers. Resets the state of all traces.
+        """
+        for tr_id in list(self._state.keys()):
+            self._close(tr_id)
+        self._state = {}
+        return self._coincidences(np.inf)
+
+    def _close(self, tr_id):
+        """
+        Closes a trigger of the given trace that is still on at the end of
+        the data and resets its state.
+        """
+        state = self._state.pop(tr_id)
+        self._add_triggers(tr_id, state, state['cft'],
+                           self._onsets(state, state['cft']))
+
+    def _onsets(self, state, cft):
+        max_len = int(self.max_trigger_length * state['sampling_rate'] + 0.5)
+        return trigger_onset(cft, self.thr_on, self.thr_off, max_len=max_len,
+                             max_len_delete=self.delete_long_trigger)
+
+    def _single_station_triggers(self, tr_id, cft):
+        """
+        Adds the complete triggers of the given new part of the
+        characteristic function, keeps a trigger that is still on.
+        """
+        state = self._state[tr_id]
+        if len(state['cft']):
+            cft = np.concatenate([state['cft'], cft])
+        keep = len(cft)
+        if len(cft) and cft[-1] > self.thr_off:
+            # the first trigger in the part above thr_off at the end of the
+            # data might not be complete
+            below = np.flatnonzero(cft <= self.thr_off)
+            first = below[-1] + 1 if len(below) else 0
+            above = np.flatnonzero(cft[first:] > self.thr_on)
+            if len(above):
+                keep = first + above[0]
+        triggers = self._onsets(state, cft[:keep])
+        self._add_triggers(tr_id, state, cft, triggers)
+        state['cft'] = cft[keep:]
+        state['offset'] += keep
+
+    def _add_triggers(self, tr_id, state, cft, triggers):
+        sampling_rate = state['sampling_rate']
+        starttime = state['starttime']
+        offset = state['offset']
+        weight = 1 if self.trace_ids is None else self.trace_ids[tr_id]
+        self._weights[tr_id] = weight
+        for on, off in triggers:
+            try:
+                cft_peak = cft[on:off].max()
+                cft_std = cft[on:off].std()
+            except ValueError:
+                cft_peak = cft[on]
+                cft_std = 0
+            on = starttime + float(on + offset) / sampling_rate
+            off = starttime + float(off + offset) / sampling_rate
+            self._triggers.append((on.timestamp, off.timestamp, tr_id,
+                                   cft_peak, cft_std))
+
+    def _coincidences(self, safe):
+        """
+        Returns the coincidences of all single station triggers that can not
+        overlap with triggers starting after ``safe`` (timestamp).
+        """
+        if not self._triggers:
+            return []
+        self._triggers.sort()
+        on = np.array([trig[0] for trig in self._triggers])
+        off = np.array([trig[1] for trig in self._triggers])
+        # sweep: a new coincidence starts if a trigger starts after the end
+        # of all previous triggers (plus extension)
+        end = np.maximum.accumulate(off)
+        new = np.empty(len(on), dtype=np.bool_)
+        new[0] = True
+        new[1:] = on[1:] > end[:-1] + self.trigger_off_extension
+        starts = np.flatnonzero(new)
+        stops = np.append(starts[1:], len(on))
+        ends = end[stops - 1]
+        # only complete coincidences (ends are increasing)
+        ncomplete = int((ends + self.trigger_off_extension < safe).sum())
+        events = []
+        for start, stop, off_ in zip(starts[:ncomplete], stops[:ncomplete],
+                                     ends[:ncomplete]):
+            event = self._event(self._triggers[start:stop], off_)
+            if event is not None:
+                events.append(event)
+        if ncomplete == len(starts):
+            self._triggers = []
+        else:
+            self._triggers = self._triggers[starts[ncomplete]:]
+        return events
+
+    def _event(self, triggers, off):
+        """
+        Builds the coincidence trigger dictionary of overlapping triggers.
+        """
+        on, _, tr_id, cft_peak, cft_std = triggers[0]
+        event = {}
+        event['time'] = UTCDateTime(on)
+        event['stations'] = []
+        event['trace_ids'] = []
+        event['coincidence_sum'] = 0.0
+        event['similarity'] = {}
+        if self.details:
+            event['cft_peaks'] = []
+            event['cft_stds'] = []
+        for _, _, tr_id, cft_peak, cft_std in triggers:
+            # repeated triggers of a trace count once
+            if tr_id in event['trace_ids']:
+                continue
+            event['stations'].append(tr_id.split(".")[1])
+            event['trace_ids'].append(tr_id)
+            event['coincidence_sum'] += self._weights[tr_id]
+            if self.details:
+                event['cft_peaks'].append(cft_peak)
+                event['cft_stds'].append(cft_std)
+        if event['coincidence_sum'] < self.thr_coincidence_sum:
+            return None
+        event['coincidence_sum'] = float(event['coincidence_sum'])
+        event['duration'] = off - on
+        if self.details:
+            weights = np.array([self._weights[i] for i in event['trace_ids']])
+            weighted_values = np.array(event['cft_peaks']) * weights
+            event['cft_peak_wmean'] = weighted_values.sum() / weights.sum()
+            event['cft_std_wmean'] = \
+                (np.array(event['cft_stds']) * weights).sum() / weights.sum()
+        return event
+
+
+def _characteristic_function(args):
+    """
+    Computes the characteristic function of (warm up and new) data.
+
+    :type args: tuple
+    :param args: Data, number of warm up samples at the start of the data,
+        minimum number of samples, trigger type, sampling rate and trigger
+        options.
+    :returns: Characteristic function of the new data.
+    """
+    data, nwarm, nmin, trigger_type, sampling_rate, options = args
+    if trigger_type is None:
+        return np.asarray(data)[nwarm:]
+    if len(data) < nmin:
+        # start of the data, shorter than the averaging windows
+        return np.zeros(len(data) - nwarm)
+    func = _get_function_from_entry_point('trigger', trigger_type)
+    options = dict(options)
+    for key in ['sta', 'lta']:
+        if key in options:
+            options['n%s' % (key)] = int(options.pop(key) * sampling_rate)
+    return func(data, **options)[nwarm:]
+
+
+def template_detection(stream, templates, threshold, trigger_off_extension=0,
+                       details=False, workers=None, executor=None):
+    """
+    Matched filter detection of template events in continuous data.
+
+    The templates are correlated with the continuous data using
+    :func:`~obspy.signal.cross_correlation.correlate_templates`, a detection
+    is declared while the correlation coefficient stacked over all channels
+    of a template exceeds ``threshold``. Detections of different templates
+    that overlap in time are combined into one event, like the single
+    station triggers in :func:`coincidence_trigger`, and the events have the
+    same structure as the ones returned by :func:`coincidence_trigger`.
+
+    >>> from obspy import read, UTCDateTime
+    >>> st = read()
+    >>> t = UTCDateTime(2009, 8, 24, 0, 20, 7, 700000)
+    >>> templ = st.copy().slice(t, t + 5)
+    >>> events = template_detection(st, {'templ': templ}, 0.9)
+    >>> print(len(events), events[0]['time'], events[0]['template'])
+    1 2009-08-24T00:20:07.700000Z templ
+
+    :type stream: :class:`~obspy.core.stream.Stream`
+    :param stream: Continuous data, one trace per SEED id.
+    :type templates: list or dict of :class:`~obspy.core.stream.Stream`
+    :param templates: Template events. A dictionary maps template names to
+        streams, templates of a list are named by their index.
+    :type threshold: float
+    :param threshold: Threshold for the stacked correlation coefficient
+        (0.0-1.0).
+    :type trigger_off_extension: int or float, optional
+    :param trigger_off_extension: Extends search window for detections of
+        other templates after the end of the last detection.
+    :type details: bool, optional
+    :param details: If set to ``True`` the events additionally contain the
+        peak values and standard deviations of the stacked correlation
+        coefficients of all detecting templates and their means.
+    :type workers: int
+    :param workers: Correlate the channels in a :class:`multiprocessing.Pool`
+        with this number of processes.
+    :param executor: Same as ``workers`` but uses the given pool with an order
+        preserving ``map()`` method.
+    :rtype: list
+    :returns: List of events sorted chronologically. ``time`` is the start
+        time of the best matching template in the continuous data,
+        ``template`` its name and ``similarity`` maps the names of all
+        detecting templates to their maximum correlation coefficients.
+        ``coincidence_sum`` is the number of detecting templates.
+    """
+    cc = correlate_templates(stream, templates, workers=workers,
+                             executor=executor)
+    detections = []
+    for tr in cc:
+        sampling_rate = tr.stats.sampling_rate
+        starttime = tr.stats.starttime
+        # first and last sample of all intervals above threshold
+        above = np.concatenate([[False], tr.data > threshold, [False]])
+        edges = np.diff(above.astype(np.int8))
+        ons = np.where(edges == 1)[0]
+        offs = np.where(edges == -1)[0] - 1
+        for on, off in zip(ons, offs):
+            values = tr.data[on:off + 1]
+            peak = on + values.argmax()
+            detections.append((
+                (starttime + on / sampling_rate).timestamp,
+                (starttime + off / sampling_rate).timestamp,
+                starttime + peak / sampling_rate, tr.stats.template,
+                tr.stats.trace_ids, float(values.max()), float(values.std())))
+    detections.sort(key=lambda x: x[:2])
+
+    events = []
+    while detections:
+        on, off, time, name, trace_ids, cc_peak, cc_std = detections.pop(0)
+        event = {}
+        event['time'] = time
+        event['template'] = name
+        event['trace_ids'] = list(trace_ids)
+        event['similarity'] = {name: cc_peak}
+        if details:
+            event['cft_peaks'] = [cc_peak]
+            event['cft_stds'] = [cc_std]
+        # combine with overlapping detections of other templates
+        while detections and detections[0][0] <= off + trigger_off_extension:
+            (_, tmp_off, tmp_time, tmp_name, tmp_trace_ids, tmp_cc_peak,
+             tmp_cc_std) = detections.pop(0)
+            if tmp_name in event['similarity']:
+                event['similarity'][tmp_name] = max(
+                    event['similarity'][tmp_name], tmp_cc_peak)
+            else:
+                event['similarity'][tmp_name] = tmp_cc_peak
+            if tmp_cc_peak > event['similarity'][event['template']]:
+                event['time'] = tmp_time
+                event['template'] = tmp_name
+            for tr_id in tmp_trace_ids:
+                if tr_id not in event['trace_ids']:
+                    event['trace_ids'].append(tr_id)
+            if details:
+                event['cft_peaks'].append(tmp_cc_peak)
+                event['cft_stds'].append(tmp_cc_std)
+            off = max(off, tmp_off)
+        event['stations'] = sorted(set(
+            tr_id.split(".")[1] for tr_id in event['trace_ids']))
+        event['coincidence_sum'] = float(len(event['similarity']))
+        event['duration'] = off - on
+        if details:
+            event['cft_peak_wmean'] = np.mean(event['cft_peaks'])
+            event['cft_std_wmean'] = np.mean(event['cft_stds'])
+        events.append(event)
+    return events
+
+
 if __name__ == '__main__':
     import doctest
     doctest.testmod(exclude_empty=True)
@@ -93,6 +93,23 @@ object which can be queried for various attributes.
 >>> arr.ray_param, arr.time, arr.incident_angle  # doctest: +ELLIPSIS
 (453.7188..., 485.2041..., 24.3968...)
 
+Travel Time Tables
+^^^^^^^^^^^^^^^^^^
+
+For many source-receiver pairs (e.g. predicting phase arrivals of a whole
+catalog at all stations) first arrival travel times can be precomputed once on
+a grid of source depths and distances with
+:meth:`~obspy.taup.tau.TauPyModel.build_travel_time_table`. The resulting
+:class:`~obspy.taup.travel_time_table.TravelTimeTable` interpolates arrays of
+depths and distances at once and can be saved to and loaded from ``.npz``
+files.
+
+>>> table = model.build_travel_time_table(phase_list=["P", "S"])
+... # doctest: +SKIP
+>>> table.get_travel_times([10, 100], [20, 45], phase_list=["P"])
+... # doctest: +SKIP
+array([ 272.68...,  485.20...])
+
 Ray Paths
 ^^^^^^^^^
 
@@ -19,6 +19,7 @@ from .taup_create import TauP_Create
 from .taup_path import TauP_Path
 from .taup_pierce import TauP_Pierce
 from .taup_time import TauP_Time
+from .travel_time_table import TravelTimeTable
 
 
 # Pretty paired colors. Reorder to have saturated colors first and remove
@@ -379,6 +380,32 @@ class TauPyModel(object):
         return Arrivals(sorted(rp.arrivals, key=lambda x: x.time),
                         model=self.model)
 
+    def build_travel_time_table(self, phase_list=("P", "S"), depths=None,
+                                distances=None, estimate_errors=True):
+        """
+        Precompute first arrival travel times on a grid of source depths and
+        distances for fast (vectorized) bulk queries.
+
+        :param phase_list: List of phases to tabulate.
+        :type phase_list: list of str
+        :param depths: Source depths of the grid in km. Defaults to 0 to
+            700 km in steps of 10 km plus the discontinuities of the model.
+        :type depths: array_like
+        :param distances: Epicentral distances of the grid in degrees.
+            Defaults to 0 to 180 degrees in steps of 0.5 degrees.
+        :type distances: array_like
+        :param estimate_errors: Estimate the interpolation error of the table
+            by comparing with exact travel times.
+        :type estimate_errors: bool
+
+        :return: The travel time table. It can be saved to and loaded from
+            ``.npz`` files.
+        :rtype: :class:`~obspy.taup.travel_time_table.TravelTimeTable`
+        """
+        return TravelTimeTable.build(self.model, phase_list=phase_list,
+                                     depths=depths, distances=distances,
+                                     estimate_errors=estimate_errors)
+
 
 def create_taup_model(model_name, output_dir, input_dir):
     """
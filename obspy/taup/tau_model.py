@@ -9,6 +9,7 @@ from future.builtins import *  # NOQA
 from future.utils import native_str
 
 import os
+from collections import OrderedDict
 from copy import deepcopy
 from itertools import count
 from math import pi
@@ -21,6 +22,10 @@ from .tau_branch import TauBranch
 from .velocity_model import VelocityModel
 
 
+# Number of depth corrected models kept by each TauModel.
+DEPTH_CACHE_SIZE = 16
+
+
 class TauModel(object):
     """
     Provides storage of all the TauBranches comprising a model.
@@ -59,6 +64,8 @@ class TauModel(object):
         self.tauBranches = None
 
         self.sMod = sMod
+        # Depth corrected models by source depth, see depth_correct().
+        self._depth_cache = OrderedDict()
 
         if not skip_calc:
             self.calcTauIncFrom()
@@ -211,13 +218,36 @@ class TauModel(object):
             depthCorrected.source_depth = depth
             depthCorrected.sourceBranch = depthCorrected.findBranch(depth)
             depthCorrected.validate()
-            # Put in cache somehow: self.depthCache.put(depthCorrected)
+            self.saveToDepthCache(depth, depthCorrected)
         return depthCorrected
 
     def loadFromDepthCache(self, depth):
-        # Could speed up by implementing cache.
-        # Must return None if loading fails.
-        return None
+        """
+        Returns the cached model corrected for the given depth or None.
+        """
+        cache = self.__dict__.get("_depth_cache")
+        if not cache or depth not in cache:
+            return None
+        # move to the end to mark as most recently used
+        depthCorrected = cache.pop(depth)
+        cache[depth] = depthCorrected
+        return depthCorrected
+
+    def saveToDepthCache(self, depth, depthCorrected):
+        """
+        Stores a depth corrected model, dropping the least recently used
+        models if the cache is full.
+        """
+        cache = self.__dict__.setdefault("_depth_cache", OrderedDict())
+        cache[depth] = depthCorrected
+        while len(cache) > DEPTH_CACHE_SIZE:
+            cache.popitem(last=False)
+
+    def __getstate__(self):
+        # The cached depth corrected models are not copied or pickled.
+        state = self.__dict__.copy()
+        state.pop("_depth_cache", None)
+        return state
 
     def splitBranch(self, depth):
         """
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tests the travel time tables of obspy.taup.
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+from future.builtins import *  # NOQA
+
+import unittest
+
+import numpy as np
+
+from obspy.core.util.base import NamedTemporaryFile
+from obspy.taup import TauPyModel
+from obspy.taup.travel_time_table import TravelTimeTable
+
+
+class TravelTimeTableTestCase(unittest.TestCase):
+    """
+    Test suite for obspy.taup.travel_time_table.
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.model = TauPyModel("iasp91")
+        cls.table = cls.model.build_travel_time_table(
+            phase_list=["P", "S"], depths=np.arange(0.0, 201.0, 10.0),
+            distances=np.arange(0.0, 100.1, 1.0))
+
+    def _exact(self, depth, distance, phase):
+        arrivals = self.model.get_travel_times(depth, distance, [phase])
+        if not arrivals:
+            return np.nan, np.nan
+        return arrivals[0].time, arrivals[0].ray_param
+
+    def test_grid_nodes(self):
+        """
+        Travel times and ray parameters at the grid nodes are the exact first
+        arrivals.
+        """
+        table = self.table
+        for i, phase in enumerate(table.phase_names):
+            for j in (0, 4, 13, 20):
+                for k in (0, 1, 17, 55, 100):
+                    time, ray_param = self._exact(
+                        table.depths[j], table.distances[k], phase)
+                    np.testing.assert_allclose(
+                        [table.times[i, j, k], table.ray_params[i, j, k]],
+                        [time, ray_param], rtol=1e-10)
+
+    def test_interpolation(self):
+        """
+        Interpolated travel times match exact ones within the estimated
+        errors.
+        """
+        table = self.table
+        self.assertTrue(np.all(table.max_errors > 0))
+        self.assertTrue(np.all(table.max_errors < 2))
+        rng = np.random.RandomState(42)
+        depths = rng.uniform(0, 200, 40)
+        distances = rng.uniform(0, 100, 40)
+        for phase, max_error in zip(table.phase_names, table.max_errors):
+            times = table.get_travel_times(depths, distances, [phase])
+            ray_params = table.get_ray_params(depths, distances, [phase])
+            self.assertEqual(times.shape, (40,))
+            for depth, distance, time, ray_param in zip(
+                    depths, distances, times, ray_params):
+                exact_time, exact_ray_param = self._exact(depth, distance,
+                                                          phase)
+                if np.isnan(time):
+                    continue
+                self.assertLess(abs(time - exact_time), max_error + 0.05)
+                # ray parameters jump where branches of triplications cross
+                self.assertLess(abs(ray_param - exact_ray_param),
+                                0.05 * exact_ray_param)
+
+    def test_query(self):
+        """
+        Broadcasting, distance folding, phase selection and out of range
+        queries.
+        """
+        table = self.table
+        times = table.get_travel_times([[10], [50]], [20, 30, 40])
+        self.assertEqual(times.shape, (2, 3))
+        # earliest phase is used
+        np.testing.assert_array_equal(
+            times, table.get_travel_times([[10], [50]], [20, 30, 40], ["P"]))
+        self.assertTrue(np.all(
+            times < table.get_travel_times([[10], [50]], [20, 30, 40],
+                                           ["S"])))
+        # distances are folded like in TauPyModel.get_travel_times()
+        np.testing.assert_allclose(
+            table.get_travel_times(10, [30, -30, 330, 390, 750]),
+            table.get_travel_times(10, 30), rtol=1e-10)
+        # outside of the table
+        self.assertTrue(np.isnan(table.get_travel_times(300, 20)))
+        self.assertTrue(np.isnan(table.get_travel_times(10, 120)))
+        self.assertRaises(ValueError, table.get_travel_times, 10, 20,
+                          ["PKIKP"])
+
+    def test_save_load(self):
+        """
+        Tables can be stored in and read from npz files.
+        """
+        with NamedTemporaryFile() as tf:
+            self.table.save(tf.name)
+            table = TravelTimeTable.load(tf.name)
+        self.assertEqual(table.model_name, self.table.model_name)
+        self.assertEqual(table.phase_names, self.table.phase_names)
+        for key in ("depths", "distances", "times", "ray_params", "slopes",
+                    "max_errors"):
+            np.testing.assert_array_equal(getattr(table, key),
+                                          getattr(self.table, key))
+
+    def test_invalid_grid(self):
+        """
+        Grids have to be increasing and distances within 0 and 180 degree.
+        """
+        model = self.model.model
+        self.assertRaises(ValueError, TravelTimeTable.build, model,
+                          depths=[10.0], estimate_errors=False)
+        self.assertRaises(ValueError, TravelTimeTable.build, model,
+                          depths=[10.0, 0.0], estimate_errors=False)
+        self.assertRaises(ValueError, TravelTimeTable.build, model,
+                          depths=[0.0, 10.0], distances=[170.0, 190.0],
+                          estimate_errors=False)
+
+    def test_depth_cache(self):
+        """
+        Depth corrected models are reused.
+        """
+        model = TauPyModel("iasp91").model
+        depth_corrected = model.depth_correct(33.0)
+        self.assertIs(model.depth_correct(33.0), depth_corrected)
+        self.assertIsNot(model.depth_correct(34.0), depth_corrected)
+
+
+def suite():
+    return unittest.makeSuite(TravelTimeTableTestCase, 'test')
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite')
@@ -0,0 +1,394 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Precomputed travel time tables for fast bulk travel time queries.
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+from future.builtins import *  # NOQA
+from future.utils import native_str
+
+import numpy as np
+
+from .helper_classes import TauModelError
+from .seismic_phase import SeismicPhase
+from .utils import parse_phase_list
+
+
+# Default source depths (km) and epicentral distances (degree) of tables.
+DEFAULT_DEPTHS = np.arange(0.0, 701.0, 10.0)
+DEFAULT_DISTANCES = np.arange(0.0, 180.01, 0.5)
+
+
+class TravelTimeTable(object):
+    """
+    Travel times and ray parameters of the first arrival of a number of
+    phases on a grid of source depths and epicentral distances.
+
+    Tables are built once per model with :meth:`build` (or
+    :meth:`~obspy.taup.tau.TauPyModel.build_travel_time_table`), can be
+    stored with :meth:`save` and read again with :meth:`load`. Queries are
+    vectorized and interpolate the grid, cubic in distance (using the ray
+    parameter as derivative of the travel time curve) and linear in depth.
+
+    Grid cells with a corner without arrival of a phase (e.g. close to a
+    shadow zone) give ``NaN``, as do queries outside of the depth or distance
+    range of the table.
+
+    :ivar model_name: Name of the velocity model.
+    :ivar phase_names: Names of the phases of the table.
+    :ivar depths: Source depths of the grid in km.
+    :ivar distances: Epicentral distances of the grid in degree.
+    :ivar times: Travel times of the first arrival in s, shape
+        ``(len(phase_names), len(depths), len(distances))``.
+    :ivar ray_params: Ray parameters of the first arrival in s/radian.
+    :ivar slopes: Derivatives of the travel times with respect to the
+        epicentral distance in s/degree.
+    :ivar max_errors: Largest interpolation error in s per phase found when
+        comparing against exact travel times at the centers of the grid
+        cells during :meth:`build` (``NaN`` if not estimated).
+
+    .. rubric:: Example
+
+    >>> from obspy.taup import TauPyModel
+    >>> model = TauPyModel(model="iasp91")
+    >>> table = model.build_travel_time_table(
+    ...     phase_list=["P"], depths=[0, 10, 20],
+    ...     distances=np.arange(15, 25.1, 0.5))
+    >>> print(table.get_travel_times(10, [20, 21.3]).round(1).tolist())
+    [272.7, 286.7]
+    """
+    def __init__(self, model_name, phase_names, depths, distances, times,
+                 ray_params, slopes, max_errors=None):
+        self.model_name = model_name
+        self.phase_names = list(phase_names)
+        self.depths = np.asarray(depths, dtype=np.float64)
+        self.distances = np.asarray(distances, dtype=np.float64)
+        self.times = np.asarray(times, dtype=np.float64)
+        self.ray_params = np.asarray(ray_params, dtype=np.float64)
+        self.slopes = np.asarray(slopes, dtype=np.float64)
+        if max_errors is None:
+            max_errors = np.empty(len(self.phase_names))
+            max_errors.fill(np.nan)
+        self.max_errors = np.asarray(max_errors, dtype=np.float64)
+
+    def __str__(self):
+        return ("Travel time table of model {model} for {phases}\n"
+                "\t{nd} depths from {d0} to {d1} km\n"
+                "\t{nx} distances from {x0} to {x1} degree").format(
+                    model=self.model_name,
+                    phases=", ".join(self.phase_names),
+                    nd=len(self.depths), d0=self.depths[0],
+                    d1=self.depths[-1], nx=len(self.distances),
+                    x0=self.distances[0], x1=self.distances[-1])
+
+    @classmethod
+    def build(cls, model, phase_list=("P", "S"), depths=None, distances=None,
+              estimate_errors=True):
+        """
+        Computes a travel time table for a model.
+
+        :param model: The model.
+        :type model: :class:`~obspy.taup.tau_model.TauModel`
+        :param phase_list: List of phases to tabulate, see
+            :meth:`~obspy.taup.tau.TauPyModel.get_travel_times`.
+        :type phase_list: list of str
+        :param depths: Source depths of the grid in km, increasing. Defaults
+            to 0 to 700 km in steps of 10 km plus the depths of the
+            discontinuities of the model in this range.
+        :type depths: array_like
+        :param distances: Epicentral distances of the grid in degree,
+            increasing and within 0 and 180 degree. Defaults to 0 to 180
+            degree in steps of 0.5 degree.
+        :type distances: array_like
+        :param estimate_errors: Compare the interpolated travel times with
+            exact travel times at the centers of all grid cells and store the
+            largest deviation per phase in :attr:`max_errors`. This roughly
+            doubles the time needed to build the table.
+        :type estimate_errors: bool
+        """
+        if depths is None:
+            # travel times have a kink for sources on discontinuities
+            discons = np.asarray(model.sMod.vMod.getDisconDepths())
+            discons = discons[(discons > DEFAULT_DEPTHS[0]) &
+                              (discons < DEFAULT_DEPTHS[-1])]
+            depths = np.union1d(DEFAULT_DEPTHS, discons)
+        depths = np.array(depths, dtype=np.float64)
+        distances = np.array(
+            DEFAULT_DISTANCES if distances is None else distances,
+            dtype=np.float64)
+        for name, values in (("depths", depths), ("distances", distances)):
+            if values.ndim != 1 or len(values) < 2 or \
+                    np.any(np.diff(values) <= 0):
+                msg = "%s must be increasing and contain at least two " \
+                      "values." % name
+                raise ValueError(msg)
+        if distances[0] < 0 or distances[-1] > 180:
+            raise ValueError("distances must be within 0 and 180 degree.")
+        phase_names = parse_phase_list(phase_list)
+
+        times, ray_params, slopes = _tabulate(model, phase_names, depths,
+                                              distances)
+        table = cls(model.sMod.vMod.modelName, phase_names, depths,
+                    distances, times, ray_params, slopes)
+        if estimate_errors:
+            table._estimate_errors(model)
+        return table
+
+    def _estimate_errors(self, model):
+        """
+        Sets :attr:`max_errors` comparing interpolated travel times at the
+        cell centers with exact ones.
+        """
+        mid_depths = (self.depths[1:] + self.depths[:-1]) / 2.0
+        mid_distances = (self.distances[1:] + self.distances[:-1]) / 2.0
+        # cell edges at the grid depths and cell centers
+        exact = [
+            _tabulate(model, self.phase_names, self.depths,
+                      mid_distances)[0],
+            _tabulate(model, self.phase_names, mid_depths,
+                      self.distances)[0],
+            _tabulate(model, self.phase_names, mid_depths,
+                      mid_distances)[0]]
+        points = [np.meshgrid(self.depths, mid_distances, indexing="ij"),
+                  np.meshgrid(mid_depths, self.distances, indexing="ij"),
+                  np.meshgrid(mid_depths, mid_distances, indexing="ij")]
+        for i in range(len(self.phase_names)):
+            errors = []
+            for exact_, (depth, distance) in zip(exact, points):
+                interpolated = self._interpolate(i, depth, distance)[0]
+                errors.append(np.abs(interpolated - exact_[i]).ravel())
+            errors = np.concatenate(errors)
+            errors = errors[np.isfinite(errors)]
+            self.max_errors[i] = errors.max() if len(errors) else np.nan
+
+    def save(self, filename):
+        """
+        Saves the table to a NumPy ``.npz`` file.
+        """
+        with open(filename, "wb") as fh:
+            self._save(fh)
+
+    def _save(self, fh):
+        np.savez_compressed(
+            fh, model_name=np.array(self.model_name),
+            phase_names=np.array(self.phase_names), depths=self.depths,
+            distances=self.distances, times=self.times,
+            ray_params=self.ray_params, slopes=self.slopes,
+            max_errors=self.max_errors)
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Loads a table saved with :meth:`save`.
+        """
+        # XXX: Make this a with statement when old NumPy support is dropped.
+        npz = np.load(filename)
+        try:
+            table = cls(
+                native_str(npz["model_name"][()]),
+                [native_str(x) for x in npz["phase_names"]],
+                npz["depths"], npz["distances"], npz["times"],
+                npz["ray_params"], npz["slopes"], npz["max_errors"])
+        finally:
+            if hasattr(npz, 'close'):
+                npz.close()
+            else:
+                del npz
+        return table
+
+    def get_travel_times(self, source_depth_in_km, distance_in_degree,
+                         phase_list=None):
+        """
+        Returns the travel times of the first arrival of the given phases.
+
+        All arguments but ``phase_list`` can be arrays, they are broadcast
+        against each other.
+
+        :param source_depth_in_km: Source depths in km
+        :type source_depth_in_km: float or array_like
+        :param distance_in_degree: Epicentral distances in degrees.
+        :type distance_in_degree: float or array_like
+        :param phase_list: Phases to consider, defaults to all phases of the
+            table. If multiple phases are given, the earliest of them is
+            used.
+        :type phase_list: list of str
+        :rtype: :class:`numpy.ndarray`
+        :return: Travel times in s, ``NaN`` where none of the phases arrives
+            or outside of the table.
+        """
+        return self._lookup(source_depth_in_km, distance_in_degree,
+                            phase_list)[0]
+
+    def get_ray_params(self, source_depth_in_km, distance_in_degree,
+                       phase_list=None):
+        """
+        Returns the ray parameters of the first arrival of the given phases.
+
+        See :meth:`get_travel_times` for the arguments.
+
+        :rtype: :class:`numpy.ndarray`
+        :return: Ray parameters in s/radian.
+        """
+        return self._lookup(source_depth_in_km, distance_in_degree,
+                            phase_list)[1]
+
+    def _lookup(self, depth, distance, phase_list):
+        if phase_list is None:
+            indices = range(len(self.phase_names))
+        else:
+            indices = []
+            for name in parse_phase_list(phase_list):
+                try:
+                    indices.append(self.phase_names.index(name))
+                except ValueError:
+                    msg = "Phase '%s' is not in the table." % name
+                    raise ValueError(msg)
+        depth, distance = np.broadcast_arrays(
+            np.asarray(depth, dtype=np.float64),
+            np.asarray(distance, dtype=np.float64))
+        distance = _fold_distances(distance)
+        times = None
+        for i in indices:
+            times_, ray_params_ = self._interpolate(i, depth, distance)
+            if times is None:
+                times, ray_params = times_, ray_params_
+                continue
+            earlier = times_ < times
+            earlier |= np.isnan(times) & ~np.isnan(times_)
+            times = np.where(earlier, times_, times)
+            ray_params = np.where(earlier, ray_params_, ray_params)
+        return times, ray_params
+
+    def _interpolate(self, index, depth, distance):
+        """
+        Interpolates travel times and ray parameters of one phase at depths
+        and (folded) distances.
+        """
+        i, wd, outside_d = _locate(self.depths, depth)
+        j, s, outside_x = _locate(self.distances, distance)
+        h = self.distances[j + 1] - self.distances[j]
+        times = self.times[index]
+        slopes = self.slopes[index]
+        ray_params = self.ray_params[index]
+        # cubic Hermite basis functions
+        h00 = (1 + 2 * s) * (1 - s) ** 2
+        h10 = s * (1 - s) ** 2
+        h01 = s ** 2 * (3 - 2 * s)
+        h11 = s ** 2 * (s - 1)
+
+        def hermite(row):
+            return (h00 * times[row, j] + h10 * h * slopes[row, j] +
+                    h01 * times[row, j + 1] + h11 * h * slopes[row, j + 1])
+
+        def linear(row):
+            return (1 - s) * ray_params[row, j] + s * ray_params[row, j + 1]
+
+        t = (1 - wd) * hermite(i) + wd * hermite(i + 1)
+        p = (1 - wd) * linear(i) + wd * linear(i + 1)
+        outside = outside_d | outside_x
+        if np.any(outside):
+            t = np.where(outside, np.nan, t)
+            p = np.where(outside, np.nan, p)
+        return t, p
+
+
+def _locate(nodes, values):
+    """
+    Returns the grid cell index, the relative position within the cell and
+    a mask of values outside of the grid.
+    """
+    index = np.searchsorted(nodes, values, side="right") - 1
+    index = np.clip(index, 0, len(nodes) - 2)
+    weight = (values - nodes[index]) / (nodes[index + 1] - nodes[index])
+    outside = (values < nodes[0]) | (values > nodes[-1]) | np.isnan(values)
+    return index, weight, outside
+
+
+def _fold_distances(distances):
+    """
+    Maps epicentral distances in degree into [0, 180] the same way
+    :meth:`~obspy.taup.seismic_phase.SeismicPhase.calc_time` does.
+    """
+    distances = np.abs(distances)
+    distances = np.where(distances > 360.0, distances - 360.0 * np.ceil(
+        (distances - 360.0) / 360.0), distances)
+    return np.where(distances > 180.0, 360.0 - distances, distances)
+
+
+def _tabulate(model, phase_names, depths, distances):
+    """
+    Computes first arrival travel times, ray parameters and travel time
+    slopes of the given phases for all combinations of depths and
+    distances.
+    """
+    shape = (len(phase_names), len(depths), len(distances))
+    times = np.empty(shape)
+    times.fill(np.nan)
+    ray_params = times.copy()
+    slopes = times.copy()
+    for i, depth in enumerate(depths):
+        depth_corrected = model.depth_correct(depth)
+        for j, name in enumerate(phase_names):
+            try:
+                phase = SeismicPhase(name, depth_corrected)
+            except TauModelError:
+                continue
+            times[j, i], ray_params[j, i], slopes[j, i] = \
+                _first_arrivals(phase, distances)
+    return times, ray_params, slopes
+
+
+def _first_arrivals(phase, distances):
+    """
+    Vectorized first arrival of a phase at distances in [0, 180] degree.
+
+    Arrivals are searched and interpolated exactly like
+    :meth:`~obspy.taup.seismic_phase.SeismicPhase.calc_time` does, but for
+    all distances at once, keeping only the earliest arrival.
+    """
+    times = np.empty(len(distances))
+    times.fill(np.nan)
+    ray_params = times.copy()
+    slopes = times.copy()
+    dist, time, ray_param = phase.dist, phase.time, phase.ray_param
+    if dist is None or len(dist) < 2:
+        return times, ray_params, slopes
+    count = len(dist)
+    d0, d1 = dist[:-1, np.newaxis], dist[1:, np.newaxis]
+    t0, t1 = time[:-1, np.newaxis], time[1:, np.newaxis]
+    p0, p1 = ray_param[:-1, np.newaxis], ray_param[1:, np.newaxis]
+    not_last = (np.arange(1, count) != count - 1)[:, np.newaxis]
+    constant_p = (p0 == p1) & (count > 2)
+    rad_dist = distances * np.pi / 180.0
+
+    n = 0
+    while True:
+        in_range = n * 2.0 * np.pi + rad_dist <= phase.maxDistance
+        if not in_range.any():
+            break
+        for sign in (1, -1):
+            if sign == 1:
+                search_dist = n * 2 * np.pi + rad_dist
+                valid = in_range
+            else:
+                search_dist = (n + 1) * 2.0 * np.pi - rad_dist
+                valid = in_range & (distances != 180.0)
+            hit = (d0 - search_dist) * (search_dist - d1) >= 0
+            hit &= ~((search_dist == d1) & not_last)
+            hit &= ~constant_p
+            hit &= valid
+            with np.errstate(divide='ignore', invalid='ignore'):
+                t = (search_dist - d0) / (d1 - d0) * (t1 - t0) + t0
+                p = (search_dist - d1) * (p0 - p1) / (d0 - d1) + p1
+            t = np.where(hit & ~np.isnan(t), t, np.inf)
+            k = np.argmin(t, axis=0)
+            columns = np.arange(t.shape[1])
+            t = t[k, columns]
+            p = p[k, columns]
+            earlier = np.isfinite(t) & ~(t >= times)
+            times[earlier] = t[earlier]
+            ray_params[earlier] = p[earlier]
+            slopes[earlier] = sign * p[earlier] * np.pi / 180.0
+        n += 1
+    return times, ray_params, slopes